@@ -18,6 +18,7 @@ import sys
 import time
 import weakref
 from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 import pyqtgraph as pg
 import pyqtgraph.reload as reload
@@ -30,6 +31,7 @@ from .Interfaces import InterfaceDirectory
 from .devices.Device import Device, DeviceTask
 from .util import DataManager, ptime, Qt
 from .util.DataManager import DirHandle
+from .util.DataManager.index_store import setDefaultIndexBackend
 from .util.HelpfulException import HelpfulException
 from .util.debug import logExc, logMsg, createLogWindow
 
@@ -310,27 +312,7 @@ class Manager(Qt.QObject):
 
                 ## configure new devices
                 elif key == 'devices':
-                    for k in cfg['devices']:
-                        if self.disableAllDevs or k in self.disableDevs:
-                            print(f"    --> Ignoring device '{k}' -- disabled by request")
-                            logMsg(f"    --> Ignoring device '{k}' -- disabled by request")
-                            continue
-                        print(f"  === Configuring device '{k}' ===")
-                        logMsg(f"  === Configuring device '{k}' ===")
-                        try:
-                            conf = cfg['devices'][k]
-                            driverName = conf['driver']
-                            if 'config' in conf:  # for backward compatibility
-                                conf = conf['config']
-                            self.loadDevice(driverName, conf, k)
-                        except:
-                            print(f"Error configuring device {k}:")
-                            if self.exitOnError:
-                                raise
-                            else:
-                                printExc()
-                    print("=== Device configuration complete ===")
-                    logMsg("=== Device configuration complete ===")
+                    self._loadDevices(cfg['devices'], maxWorkers=cfg.get('deviceInitThreads', 8))
 
                 ## Copy in new module definitions
                 elif key == 'modules':
@@ -360,6 +342,11 @@ class Manager(Qt.QObject):
                     from MetaArray import MetaArray
                     MetaArray.defaultCompression = comp
 
+                elif key == 'indexBackend':
+                    print(f"=== Setting directory index backend: {val} ===")
+                    logMsg(f"=== Setting directory index backend: {val} ===")
+                    setDefaultIndexBackend(val)
+
                 elif key == 'folderTypes':
                     self._folderTypes = val
 
@@ -399,6 +386,59 @@ class Manager(Qt.QObject):
                 else:
                     printExc("Error in ACQ4 configuration:")
 
+    def _loadDevices(self, devConfigs, maxWorkers=8):
+        """Create the devices described in the 'devices' section of a configuration.
+
+        Devices are created after the devices they refer to in their configuration (see deviceDependencies).
+        Devices that allow it (see Device.concurrentInit) are created on up to *maxWorkers* threads at the same
+        time; all others are created in the calling thread.
+        """
+        enabled = OrderedDict()
+        for k, conf in devConfigs.items():
+            if self.disableAllDevs or k in self.disableDevs:
+                print(f"    --> Ignoring device '{k}' -- disabled by request")
+                logMsg(f"    --> Ignoring device '{k}' -- disabled by request")
+                continue
+            enabled[k] = conf
+
+        def getClass(name):
+            return devices.getDeviceClass(enabled[name]['driver'])
+
+        def concurrent(name):
+            conf = enabled[name]
+            try:
+                return conf.get('concurrentInit', conf.get('config', {}).get('concurrentInit', getClass(name).concurrentInit))
+            except Exception:
+                return False  # let the error be reported when the device is created
+
+        def construct(name):
+            conf = enabled[name]
+            driverName = conf['driver']
+            if 'config' in conf:  # for backward compatibility
+                conf = conf['config']
+            return self.loadDevice(driverName, conf, name)
+
+        def starting(name, inThread):
+            where = " (in background)" if inThread else ""
+            print(f"  === Configuring device '{name}'{where} ===")
+            logMsg(f"  === Configuring device '{name}'{where} ===")
+
+        start = time.perf_counter()
+        deps = deviceDependencies(enabled)
+        for k, result in constructDevices(deps, construct, concurrent, maxWorkers=maxWorkers, starting=starting):
+            try:
+                result.result()
+                print(f"      device '{k}' configured in {result.elapsed:0.2f} s")
+                logMsg(f"      device '{k}' configured in {result.elapsed:0.2f} s")
+            except:
+                print(f"Error configuring device {k}:")
+                if self.exitOnError:
+                    raise
+                else:
+                    printExc()
+        print(f"=== Device configuration complete ({time.perf_counter() - start:0.2f} s) ===")
+        logMsg(f"=== Device configuration complete ({time.perf_counter() - start:0.2f} s) ===")
+
     def listConfigurations(self):
         """Return a list of the named configurations available"""
         return list(self.config.get('configurations', {}).keys())
@@ -864,6 +904,103 @@ class Manager(Qt.QObject):
         Qt.QApplication.quit()
 
 
+def deviceDependencies(devConfigs):
+    """Return {name: [names of devices it depends on]} for the devices in the 'devices' section of a configuration.
+
+    A device depends on every other configured device whose name appears as a string anywhere in its configuration
+    (for example 'parentDevice', the 'device' of a DAQ channel, or the clamp device of a pipette). This may include
+    some devices that are not really needed, which only means that fewer devices are created at the same time.
+    """
+    deps = OrderedDict()
+    for name, conf in devConfigs.items():
+        found = []
+        stack = [conf]
+        while stack:
+            obj = stack.pop()
+            if isinstance(obj, str):
+                if obj in devConfigs and obj != name and obj not in found:
+                    found.append(obj)
+            elif isinstance(obj, dict):
+                stack.extend(obj.values())
+            elif isinstance(obj, (list, tuple)):
+                stack.extend(obj)
+        deps[name] = found
+    return deps
+
+
+def constructDevices(deps, construct, concurrent, maxWorkers=8, starting=None):
+    """Call *construct(name)* for each name in *deps* after the names it depends on (see deviceDependencies).
+
+    Names for which *concurrent(name)* is True are constructed on a pool of up to *maxWorkers* threads, while the
+    others are constructed in the calling thread; anything that becomes ready is started as soon as possible, in the
+    order of *deps*. If the dependencies contain a cycle, the remaining names are constructed in order. 
+    *starting(name, inThread)* is called (in the calling thread) just before each name is constructed.
+
+    Yields (name, future) as each construction finishes; future.result() returns the constructed object or raises the
+    exception that was raised while constructing it, and future.elapsed is the time taken to construct it.
+    Objects constructed on a worker thread are moved to the thread of the QApplication, if there is one.
+    """
+    remaining = OrderedDict((name, set(d) & set(deps)) for name, d in deps.items())
+    running = {}
+    app = Qt.QCoreApplication.instance()
+    pool = ThreadPoolExecutor(max_workers=maxWorkers, thread_name_prefix='DeviceInit') if maxWorkers > 0 else None
+
+    def timedConstruct(name):
+        start = time.perf_counter()
+        obj = construct(name)
+        if pool is not None and app is not None and isinstance(obj, Qt.QObject) and obj.thread() is not app.thread():
+            obj.moveToThread(app.thread())
+        return obj, time.perf_counter() - start
+
+    def finished(name, fut):
+        for d in remaining.values():
+            d.discard(name)
+        result = Future()
+        try:
+            obj, result.elapsed = fut.result()
+            result.set_result(obj)
+        except Exception as exc:
+            result.elapsed = None
+            result.set_exception(exc)
+        return name, result
+
+    try:
+        while remaining or running:
+            ready = [name for name, d in remaining.items() if len(d) == 0]
+            if not ready and not running:
+                ready = [next(iter(remaining))]  # dependency cycle; fall back to configuration order
+
+            # start everything that can run in the background, then do the first thing that can't
+            local = None
+            for name in ready:
+                if pool is not None and concurrent(name):
+                    del remaining[name]
+                    if starting is not None:
+                        starting(name, True)
+                    running[pool.submit(timedConstruct, name)] = name
+                elif local is None:
+                    local = name
+
+            if local is not None:
+                del remaining[local]
+                if starting is not None:
+                    starting(local, False)
+                fut = Future()
+                try:
+                    fut.set_result(timedConstruct(local))
+                except Exception as exc:
+                    fut.set_exception(exc)
+                yield finished(local, fut)
+                continue
+
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for fut in sorted(done, key=lambda f: list(deps).index(running[f])):
+                yield finished(running.pop(fut), fut)
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
 # All other modules can use this function to get the manager instance
 def getManager() -> Manager:
     if Manager.single is None:
@@ -948,8 +1085,13 @@ class Task:
         self.devNames.remove('protocol')
         self.devs = {devName: self.dm.getDevice(devName) for devName in self.devNames}
 
+        self._armedOrder = None  # (configOrder, startOrder) once all device tasks have been started; allows re-arming
+        self._createDeviceTasks()
+
+    def _createDeviceTasks(self):
         ## Create task objects. Each task object is a handle to the device which is unique for this task run.
         self.tasks = {}
+        self._armedOrder = None
 
         for devName in self.devNames:
             task = self.devs[devName].createTask(self.command[devName], self)
@@ -1017,12 +1159,18 @@ class Task:
 
         If block is true, then the function blocks until the task is complete.
         if processEvents is true, then Qt events are processed while waiting for the task to complete.
+
+        A task may be executed again after it has finished. If every DeviceTask can be re-armed (see
+        DeviceTask.rearm), the same command is run again without reconfiguring the devices; otherwise the device
+        tasks are recreated from the original command and configured from scratch.
         """
         with self.taskLock:
             self.startedDevs = []
             self.stopped = False  # whether sub-tasks have been stopped yet
             self.abortRequested = False
             self._done = False  # cached output of isDone()
+            self.startTime = None
+            self.stopTime = None
 
 
             ## We need to make sure devices are stopped and unlocked properly if anything goes wrong..
@@ -1035,17 +1183,28 @@ class Task:
 
                 prof.mark('reserve')
 
-                ## Determine order of device configuration.
-                configOrder = self.getConfigOrder()
-
-                ## Configure all subtasks. Some devices may need access to other tasks, so we make all available here.
-                ## This is how we allow multiple devices to communicate and decide how to operate together.
-                ## Each task may modify the startOrder list to suit its needs.
-                for devName in configOrder:
-                    self.tasks[devName].configure()
-                    prof.mark(f'configure {devName}')
-
-                startOrder = self.getStartOrder()
+                ## If this task has run before, try to re-arm all device tasks rather than reconfiguring them.
+                armedOrder, self._armedOrder = self._armedOrder, None
+                if armedOrder is not None:
+                    configOrder, startOrder = armedOrder
+                    if not all(self.tasks[devName].rearm() for devName in configOrder):
+                        ## At least one device can not be re-armed; start over with fresh device tasks
+                        self._createDeviceTasks()
+                        armedOrder = None
+                    prof.mark('rearm')
+
+                if armedOrder is None:
+                    ## Determine order of device configuration.
+                    configOrder = self.getConfigOrder()
+
+                    ## Configure all subtasks. Some devices may need access to other tasks, so we make all available here.
+                    ## This is how we allow multiple devices to communicate and decide how to operate together.
+                    ## Each task may modify the startOrder list to suit its needs.
+                    for devName in configOrder:
+                        self.tasks[devName].configure()
+                        prof.mark(f'configure {devName}')
+
+                    startOrder = self.getStartOrder()
 
                 if 'leadTime' in self.cfg:
                     time.sleep(self.cfg['leadTime'])
@@ -1065,6 +1224,7 @@ class Task:
                         raise
                     prof.mark(f'start {devName}')
                 self.startTime = ptime.time()
+                self._armedOrder = (configOrder, startOrder)
 
                 if not block:
                     prof.finish()
@@ -1195,10 +1355,8 @@ class Task:
                     self.result = result
 
                     ## Store data if requested
-                    if 'storeData' in self.cfg and self.cfg['storeData'] is True:
-                        self.cfg['storageDir'].setInfo(result['protocol'])
-                        for t in self.tasks:
-                            self.tasks[t].storeResult(self.cfg['storageDir'])
+                    if self.cfg.get('storeData', False) is True and not self.cfg.get('deferStorage', False):
+                        self.storeResult()
                     prof.mark("store data")
             finally:
                 ## Regardless of any other problems, at least make sure we
@@ -1218,6 +1376,20 @@ class Task:
             self.stop()
             return self.result
 
+    def storeResult(self):
+        """Write the results of all device tasks into the storage directory given by the 'storageDir' key of the
+        task command.
+
+        This is called automatically when the task stops if the command sets storeData=True, unless the command also
+        sets deferStorage=True. In that case the caller is responsible for calling storeResult() once the task has
+        finished; this may be done from another thread (for example, while the next task is running).
+        """
+        with self.taskLock:
+            result = self.getResult()
+            self.cfg['storageDir'].setInfo(result['protocol'])
+            for t in self.tasks:
+                self.tasks[t].storeResult(self.cfg['storageDir'])
+
     def reserveDevices(self):
         if self.deviceLock is None:
             try:
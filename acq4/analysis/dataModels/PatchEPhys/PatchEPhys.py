@@ -2,13 +2,19 @@
 from __future__ import print_function
 
 import os
+import pickle
 import re
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import numpy as np
 
 from MetaArray import MetaArray
 from six.moves import range
 
+from acq4.util.DataManager import SEQUENCE_CACHE_FILE
+from acq4.util.debug import printExc
+
 protocolNames = {
     'IV Curve': ('cciv.*', 'vciv.*'),
     'Photostim Scan': (),
@@ -123,6 +129,8 @@ def buildSequenceArray(*args, **kargs):
         truncate: If join=True and some elements differ in shape, truncate to the smallest shape
         fill:    If join=True, pre-fill the empty array with this value. Any points in the
                  parameter space with no data will be left with this value.
+        workers: If greater than 1, call func for this many protocol dirs at a time on worker threads
+                 (func must be thread-safe). Results are written into the array as they arrive.
         
     Example: Return an array of all primary-channel clamp recordings across a sequence 
         buildSequenceArray(seqDir, lambda protoDir: getClampFile(protoDir).read()['primary'])"""
@@ -132,7 +140,7 @@ def buildSequenceArray(*args, **kargs):
             return i
 
 
-def buildSequenceArrayIter(dh, func=None, join=True, truncate=False, fill=None):
+def buildSequenceArrayIter(dh, func=None, join=True, truncate=False, fill=None, workers=1):
     """Iterator for buildSequenceArray that yields progress updates."""
 
     if func is None:
@@ -177,41 +185,128 @@ def buildSequenceArrayIter(dh, func=None, join=True, truncate=False, fill=None):
         info = info + []
         data = MetaArray(np.empty(shape, object), info=info)
 
+    ## read each protocol dir, concurrently if requested
+    def load(name):
+        subd = dh[name]
+        return subd.info(), func(subd)
+
+    pool = None
+    if workers > 1:
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='SequenceLoader')
+        futures = [pool.submit(load, name) for name in subDirs]
+        results = (fut.result() for fut in as_completed(futures))
+    else:
+        results = map(load, subDirs)
+
     ## fill data
     i = 0
-    if join and truncate:
-        minShape = first.shape
-        for name in subDirs:
-            subd = dh[name]
-            d = func(subd)
-            minShape = [min(d.shape[j], minShape[j]) for j in range(d.ndim)]
-            dhInfo = subd.info()
-            ind = []
-            for k in params:
-                ind.append(dhInfo[k])
-            sl = [slice(0, m) for m in minShape]
-            ind += sl
-            data[tuple(ind)] = d[sl]
-            i += 1
-            yield i, len(subDirs)
-        sl = [slice(None)] * len(seqShape)
-        sl += [slice(0, m) for m in minShape]
-        data = data[sl]
-    else:
-        for name in subDirs:
-            subd = dh[name]
-            d = func(subd)
-            dhInfo = subd.info()
-            ind = []
-            for k in params:
-                ind.append(dhInfo[k])
-            data[tuple(ind)] = d
-            i += 1
-            yield i, len(subDirs)
+    try:
+        if join and truncate:
+            minShape = first.shape
+            for dhInfo, d in results:
+                minShape = [min(d.shape[j], minShape[j]) for j in range(d.ndim)]
+                ind = []
+                for k in params:
+                    ind.append(dhInfo[k])
+                sl = [slice(0, m) for m in minShape]
+                ind += sl
+                data[tuple(ind)] = d[tuple(sl)]
+                i += 1
+                yield i, len(subDirs)
+            sl = [slice(None)] * len(seqShape)
+            sl += [slice(0, m) for m in minShape]
+            data = data[tuple(sl)]
+        else:
+            for dhInfo, d in results:
+                ind = []
+                for k in params:
+                    ind.append(dhInfo[k])
+                data[tuple(ind)] = d
+                i += 1
+                yield i, len(subDirs)
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
 
     yield data, None
 
 
+SEQUENCE_CACHE_VERSION = 1
+
+
+def readSequenceClampFiles(dh, dirs=None, workers=8, cache=False):
+    """Read the clamp data for the runs in a protocol sequence.
+
+    Runs are read concurrently by up to *workers* threads. Returns an OrderedDict mapping each directory name in
+    *dirs* (default: all sub-directories of *dh*) to (clampFileHandle, MetaArray); runs that have no clamp file
+    (usually because the protocol was stopped early) map to (None, None).
+
+    If *cache* is True, the data are also saved to a single consolidated file in the sequence directory
+    (SEQUENCE_CACHE_FILE). Later calls read runs from that file instead of from the individual clamp files, as long
+    as the clamp files have not been modified since (their modification times and sizes are recorded in the cache).
+    """
+    if dirs is None:
+        dirs = dh.subDirs()
+    cacheFile = os.path.join(dh.name(), SEQUENCE_CACHE_FILE)
+    cached = _readSequenceCache(cacheFile) if cache else {}
+
+    def load(name):
+        subd = dh[name]
+        if name in cached:
+            fileName, stamp, data = cached[name]
+            if subd.isFile(fileName) and _fileStamp(os.path.join(subd.name(), fileName)) == stamp:
+                return subd[fileName], data, False
+        fh = getClampFile(subd)
+        if fh is None:
+            return None, None, False
+        stamp = _fileStamp(fh.name())
+        data = fh.read()
+        cached[name] = (fh.shortName(), stamp, data)
+        return fh, data, True
+
+    if workers > 1 and len(dirs) > 1:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='SequenceLoader') as pool:
+            loaded = list(pool.map(load, dirs))
+    else:
+        loaded = list(map(load, dirs))
+
+    if cache and any(changed for fh, data, changed in loaded):
+        _writeSequenceCache(cacheFile, cached)
+
+    return OrderedDict((name, (fh, data)) for name, (fh, data, changed) in zip(dirs, loaded))
+
+
+def _fileStamp(fileName):
+    st = os.stat(fileName)
+    return st.st_mtime_ns, st.st_size
+
+
+def _readSequenceCache(cacheFile):
+    """Return {dirName: (clampFileName, fileStamp, data)} from a sequence cache file, or {} if there is none."""
+    try:
+        with open(cacheFile, 'rb') as fd:
+            version, runs = pickle.load(fd)
+    except FileNotFoundError:
+        return {}
+    except Exception:
+        printExc("Ignoring unreadable sequence cache %s:" % cacheFile)
+        return {}
+    if version != SEQUENCE_CACHE_VERSION:
+        return {}
+    return runs
+
+
+def _writeSequenceCache(cacheFile, runs):
+    tmp = cacheFile + '.tmp'
+    try:
+        with open(tmp, 'wb') as fd:
+            pickle.dump((SEQUENCE_CACHE_VERSION, runs), fd, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, cacheFile)
+    except OSError:
+        ## read-only data (eg. a shared archive); the cache is just an optimization
+        printExc("Could not write sequence cache %s:" % cacheFile)
+
+
 def getParent(child, parentType):
     """Return the (grand)parent of child that matches parentType"""
     if dirType(child) == parentType:
@@ -310,14 +405,16 @@ def getClampMode(data_handle, dir_handle=None):
             #     return 'vc'  # None  kludge to handle simulations, which don't seem to fully fill the structures.
 
 
-def getClampHoldingLevel(data_handle):
+def getClampHoldingLevel(data_handle, data=None):
     """Given a clamp file handle, return the holding level (voltage for VC, current for IC).
+    If the file has already been read, its MetaArray may be given as *data* to avoid reading it again.
     TODO: This function should add in the amplifier's internal holding value, if available?
     """
     if not isClampFile(data_handle):
         raise Exception('%s not a clamp file.' % data_handle.shortName())
 
-    data = data_handle.read(readAllData=False)
+    if data is None:
+        data = data_handle.read(readAllData=False)
     info = data._info[-1]
     p1 = data_handle.parent()
     p2 = p1.parent()
@@ -345,11 +442,14 @@ def getClampHoldingLevel(data_handle):
 
 def getClampState(data_handle):
     """
-    Return the full clamp state
+    Return the full clamp state, given a clamp file handle or MetaArray
     """
-    if not isClampFile(data_handle):
+    if (hasattr(data_handle, 'implements') and data_handle.implements('MetaArray')):
+        data = data_handle
+    elif isClampFile(data_handle):
+        data = data_handle.read(readAllData=False)
+    else:
         raise Exception('%s not a clamp file.' % data_handle.shortName())
-    data = data_handle.read(readAllData=False)
     info = data._info[-1]
     if 'ClampState' in info.keys():
         return info['ClampState']
@@ -359,12 +459,15 @@ def getClampState(data_handle):
 
 def getWCCompSettings(data_handle):
     """
-    return the compensation settings, if available
+    return the compensation settings, if available, given a clamp file handle or MetaArray
     Settings are returned as a group in a dictionary
     """
-    if not isClampFile(data_handle):
+    if (hasattr(data_handle, 'implements') and data_handle.implements('MetaArray')):
+        data = data_handle
+    elif isClampFile(data_handle):
+        data = data_handle.read(readAllData=False)
+    else:
         raise Exception('%s not a clamp file.' % data_handle.shortName())
-    data = data_handle.read(readAllData=False)
     info = data._info[-1]
     d = {}
     if 'ClampState' in info.keys() and 'ClampParams' in info['ClampState'].keys():
@@ -618,12 +721,13 @@ class GetClamps():
     def __init__(self):
         pass
 
-    def getClampData(self, dh, pars=None):
+    def getClampData(self, dh, pars=None, workers=8, cache=False):
         """
         Read the clamp data - whether it is voltage or current clamp, and put the results
         into our class variables. 
         dh is the file handle (directory)
         pars is a structure that provides some control parameters usually set by the GUI
+        workers and cache are passed to readSequenceClampFiles, which reads the runs in the sequence
         Returns a short dictionary of some values; others are accessed through the class.
         Returns None if no data is found.
         """
@@ -687,18 +791,19 @@ class GetClamps():
                         dirs.append('%03d_%03d' % (i, j))
         ### --- end of possibly broken section
 
+        try:
+            clampFiles = readSequenceClampFiles(dh, dirs, workers=workers, cache=cache)
+        except Exception as exc:
+            raise Exception("Error loading data for protocol %s: %s" % (dh.name(), exc))
+
         for i, directory_name in enumerate(dirs):  # dirs has the names of the runs withing the protocol
             data_dir_handle = dh[directory_name]  # get the directory within the protocol
-            try:
-                data_file_handle = getClampFile(data_dir_handle)  # get pointer to clamp data
-                # Check if there is no clamp file for this iteration of the protocol
-                # Usually this indicates that the protocol was stopped early.
-                if data_file_handle is None:
-                    print('PatchEPhys/GetClamps: Missing data in %s, element: %d' % (directory_name, i))
-                    continue
-            except:
-                raise Exception("Error loading data for protocol %s:" % directory_name)
-            data_file = data_file_handle.read()
+            data_file_handle, data_file = clampFiles[directory_name]  # pointer to clamp data, and the data
+            # Check if there is no clamp file for this iteration of the protocol
+            # Usually this indicates that the protocol was stopped early.
+            if data_file_handle is None:
+                print('PatchEPhys/GetClamps: Missing data in %s, element: %d' % (directory_name, i))
+                continue
 
             self.data_mode = getClampMode(data_file, dir_handle=dh)
             if self.data_mode is None:
@@ -724,12 +829,8 @@ class GetClamps():
                 if cval < cmin or cval > cmax:
                     continue  # skip adding the data to the arrays
 
-            self.devicesUsed = getDevices(data_dir_handle)
-            self.clampDevices = getClampDeviceNames(data_dir_handle)
-            self.holding = getClampHoldingLevel(data_file_handle)
-            self.amplifierSettings = getWCCompSettings(data_file_handle)
-            self.clampState = getClampState(data_file_handle)
-            # print self.devicesUsed
+            # device and amplifier settings are taken from the last run that is loaded (see below)
+            last_run = (data_dir_handle, data_file_handle, data_file)
             cmd = getClampCommand(data_file)
 
             data = getClampPrimary(data_file)
@@ -756,6 +857,11 @@ class GetClamps():
         if traces is None or len(traces) == 0:
             print("PatchEPhys/GetClamps: No data found in this run...")
             return None
+        self.devicesUsed = getDevices(last_run[0])
+        self.clampDevices = getClampDeviceNames(last_run[0])
+        self.holding = getClampHoldingLevel(last_run[1], data=last_run[2])
+        self.amplifierSettings = getWCCompSettings(last_run[2])
+        self.clampState = getClampState(last_run[2])
         self.RSeriesUncomp = 0.
         if self.amplifierSettings['WCCompValid']:
             if self.amplifierSettings['WCEnabled'] and self.amplifierSettings['CompEnabled']:
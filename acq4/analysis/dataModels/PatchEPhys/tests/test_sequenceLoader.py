@@ -0,0 +1,114 @@
+import os
+import shutil
+import tempfile
+
+import numpy as np
+from MetaArray import MetaArray
+
+import acq4.util.DataManager as dm
+from acq4.analysis.dataModels import PatchEPhys
+
+
+def makeSequence(root, amplitudes=(-100e-12, 0, 100e-12, 200e-12), repetitions=2, nPts=500):
+    dh = dm.getDirHandle(root)
+    params = {('Clamp1', 'Pulse_amplitude'): list(amplitudes), ('protocol', 'repetitions'): list(range(repetitions))}
+    pulse = {'start': {'value': 0.01}, 'length': {'value': 0.03}}
+    devices = {'Clamp1': {'waveGeneratorWidget': {'stimuli': {'Pulse': pulse}}}}
+    seq = dh.mkdir('cciv_000', info={'dirType': 'ProtocolSequence', 'sequenceParams': params, 'devices': devices})
+    for rep in range(repetitions):
+        for i, amp in enumerate(amplitudes):
+            run = seq.mkdir('%03d_%03d' % (rep, i), info={('protocol', 'repetitions'): rep,
+                                                           ('Clamp1', 'Pulse_amplitude'): i})
+            cmd = np.zeros(nPts)
+            cmd[100:400] = amp
+            primary = -65e-3 + cmd * 1e8 + rep * 1e-3
+            data = MetaArray(np.stack([cmd, primary]), info=[
+                {'name': 'Channel', 'cols': [{'name': 'command', 'units': 'A'}, {'name': 'primary', 'units': 'V'}]},
+                {'name': 'Time', 'units': 's', 'values': np.arange(nPts) * 1e-4},
+                {'ClampState': {'mode': 'IC', 'holding': 0.0}, 'DAQ': {'primary': {'rate': 1e4}},
+                 'startTime': 1000.0 + rep},
+            ])
+            run.writeFile(data, 'Clamp1.ma')
+    return seq
+
+
+def test_build_sequence_array():
+    root = tempfile.mkdtemp()
+    try:
+        seq = makeSequence(root)
+        func = lambda protoDir: PatchEPhys.getClampFile(protoDir).read()['Channel': 'primary']
+        serial = PatchEPhys.buildSequenceArray(seq, func)
+        parallel = PatchEPhys.buildSequenceArray(seq, func, workers=4)
+        assert serial.shape == (4, 2, 500)
+        assert np.array_equal(parallel.asarray(), serial.asarray())
+        assert np.array_equal(parallel[:, 1, 0], np.full(4, -64e-3))
+
+        progress = [i for i, n in PatchEPhys.buildSequenceArrayIter(seq, func, workers=4) if n is not None]
+        assert progress == list(range(1, 9))
+    finally:
+        shutil.rmtree(root)
+
+
+def test_read_sequence_clamp_files():
+    root = tempfile.mkdtemp()
+    try:
+        seq = makeSequence(root)
+        files = PatchEPhys.readSequenceClampFiles(seq, workers=4, cache=True)
+        assert list(files) == seq.subDirs()
+        for name, (fh, data) in files.items():
+            assert fh is seq[name]['Clamp1.ma']
+            assert np.array_equal(data.asarray(), fh.read().asarray())
+        assert os.path.exists(os.path.join(seq.name(), PatchEPhys.SEQUENCE_CACHE_FILE))
+        assert PatchEPhys.SEQUENCE_CACHE_FILE not in seq.ls()
+
+        ## reopening reads everything from the cache
+        reads = []
+        origRead = PatchEPhys.MetaArray.readFile
+        PatchEPhys.MetaArray.readFile = lambda *args, **kwds: reads.append(args) or origRead(*args, **kwds)
+        try:
+            cached = PatchEPhys.readSequenceClampFiles(seq, workers=4, cache=True)
+            assert reads == []
+            for name in files:
+                assert np.array_equal(cached[name][1].asarray(), files[name][1].asarray())
+
+            ## a modified run is read again
+            fh = seq['001_002']['Clamp1.ma']
+            modified = fh.read()
+            modified[1] += 1
+            modified.write(fh.name())
+            os.utime(fh.name(), ns=(0, 0))
+            del reads[:]
+            cached = PatchEPhys.readSequenceClampFiles(seq, workers=4, cache=True)
+            assert len(reads) == 1
+            assert np.array_equal(cached['001_002'][1].asarray(), modified.asarray())
+        finally:
+            PatchEPhys.MetaArray.readFile = origRead
+
+        ## runs stopped early have no clamp file
+        seq.mkdir('002_000')
+        files = PatchEPhys.readSequenceClampFiles(seq, workers=1)
+        assert files['002_000'] == (None, None)
+    finally:
+        shutil.rmtree(root)
+
+
+def test_get_clamp_data():
+    root = tempfile.mkdtemp()
+    try:
+        seq = makeSequence(root)
+        ## select all runs: repetitions 0-1 x amplitudes 0-3
+        pars = {'sequence1': {'index': [0, 1], 'count': 2}, 'sequence2': {'index': [0, 1, 2, 3], 'count': 4}}
+        clamps = PatchEPhys.GetClamps()
+        info = clamps.getClampData(seq, dict(pars), cache=True)
+        assert clamps.traces.shape == (8, 500)
+        assert np.allclose(clamps.commandLevels, [-100e-12, 0, 100e-12, 200e-12] * 2)
+        assert np.allclose(info['PulseWindow'], [0.01, 0.04, 0.03])
+        assert np.allclose(clamps.trace_StartTimes, [0] * 4 + [1] * 4)
+        assert clamps.data_mode == 'IC'
+        assert clamps.clampDevices == ['Clamp1'] and clamps.holding == 0.0
+
+        again = PatchEPhys.GetClamps()
+        again.getClampData(seq, dict(pars), workers=1, cache=True)
+        assert np.array_equal(again.traces.asarray(), clamps.traces.asarray())
+    finally:
+        shutil.rmtree(root)
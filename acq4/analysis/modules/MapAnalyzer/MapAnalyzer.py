@@ -66,6 +66,7 @@ import numpy as np
 import acq4.analysis.modules.Photostim.Scan as Scan
 from acq4.analysis.modules.Photostim.Map import Map
 import acq4.analysis.tools.poissonScore as poissonScore
+from acq4.analysis.tools.functions import GroupIndex
 import acq4.util.flowchart.EventDetection as FCEventDetection
 from six.moves import range
 
@@ -574,13 +575,10 @@ class SpontRateAnalyzer:
         events = events[events['fitTime'] < stimTime]
         
         ## measure spont. rate for each handle
-        spontRate = []
-        amps = []
-        for site in sites:
-            ev = events[events['ProtocolDir'] == site['ProtocolDir']]
-            spontRate.append(len(ev) / stimTime)
-            amps.extend(ev['fitAmplitude'])
-        spontRate = np.array(spontRate)
+        groups = GroupIndex(events['ProtocolDir'])
+        spontRate = groups.counts(sites['ProtocolDir']) / stimTime
+        siteEvents = [np.empty(0, dtype=int)] + [groups.indices(dh) for dh in sites['ProtocolDir']]
+        amps = events['fitAmplitude'][np.concatenate(siteEvents)]
         
         self.spontRatePlot.setData(x=sites['start'], y=spontRate)
         
@@ -678,10 +676,23 @@ class EventStatisticsAnalyzer:
         preMask = (events['fitTime'] > preStart)  &  (events['fitTime'] < preStop)
         preEvents = events[preMask]
         
+        ## group events by protocol directory once rather than masking the whole table for every site
+        postGroups = GroupIndex(postEvents['ProtocolDir'])
+        postSorted = np.empty(len(postEvents), dtype=[('time', float), ('amp', float)])
+        postSorted['time'] = postGroups.sort(postEvents['fitTime']) - stimTime
+        postSorted['amp'] = postGroups.sort(postEvents['fitAmplitude'])
+        preGroups = GroupIndex(preEvents['ProtocolDir'])
+        preSorted = np.empty(len(preEvents), dtype=[('time', float), ('amp', float)])
+        preSorted['time'] = preGroups.sort(preEvents['fitTime'])
+        preSorted['amp'] = preGroups.sort(preEvents['fitAmplitude'])
+
         preScores = {'PoissonScore': [], 'PoissonAmpScore': [], 'SpontZScore':[]}
         postScores = {'PoissonScore': [], 'PoissonAmpScore': [], 'ZScore': [], 'FitAmpSum': []}
         
         
+        allPostEvents = []
+        allPreEvents = []
+        allRates = []
         for site in map.spots:
             postSiteEvents = []
             preSiteEvents = []
@@ -692,38 +703,42 @@ class EventStatisticsAnalyzer:
             ## generate lists of post-stimulus events for each site
             for scan,dh in site['data']['sites']:
                 ## collect post-stim events
-                ev = postEvents[postEvents['ProtocolDir'] == dh]
-                ev2 = np.empty(len(ev), dtype=[('time', float), ('amp', float)])
-                ev2['time'] = ev['fitTime'] - stimTime
-                ev2['amp'] = ev['fitAmplitude']
+                start, stop = postGroups.bounds(dh)
+                ev2 = postSorted[start:stop]
                 postSiteEvents.append(ev2)
                 latencies.append(ev2['time'].min() if len(ev2) > 0 else -1)
                 nEvents.append(len(ev2))
                 
                 ## collect pre-stim events
-                ev = preEvents[preEvents['ProtocolDir'] == dh]
-                ev2 = np.empty(len(ev), dtype=[('time', float), ('amp', float)])
-                ev2['time'] = ev['fitTime']
-                ev2['amp'] = ev['fitAmplitude']
-                preSiteEvents.append(ev2)
+                start, stop = preGroups.bounds(dh)
+                preSiteEvents.append(preSorted[start:stop])
                 
                 rates.append(spontRate[dh]['filteredSpontRate'])
         
-            ## compute score for each site
+            allPostEvents.append(postSiteEvents)
+            allPreEvents.append(preSiteEvents)
+            allRates.append(rates)
+            site['data']['FirstLatency'] = np.median(latencies)
+            site['data']['NumEvents'] = np.median(nEvents)
+            
+        ## compute scores for all sites at once
+        postScores['PoissonScore'] = list(poissonScore.PoissonScore.scoreMany(allPostEvents, allRates, tMax=postDt))
+        postScores['PoissonAmpScore'] = list(poissonScore.PoissonAmpScore.scoreMany(allPostEvents, allRates, tMax=postDt, ampMean=ampMean, ampStdev=ampStdev))
+        preScores['PoissonScore'] = list(poissonScore.PoissonScore.scoreMany(allPreEvents, allRates, tMax=postDt))
+        preScores['PoissonAmpScore'] = list(poissonScore.PoissonAmpScore.scoreMany(allPreEvents, allRates, tMax=postDt, ampMean=ampMean, ampStdev=ampStdev))
+        
+        for i, site in enumerate(map.spots):
+            rates = allRates[i]
+            
             ## note that keys added to site here are ultimately passed to host.getColor via Map.recolor
             site['data']['spontaneousRates'] = rates
             site['data']['events'] = events
             site['data']['ampMean'] = ampMean
             site['data']['ampStdev'] = ampStdev
-            site['data']['PoissonScore'] = poissonScore.PoissonScore.score(postSiteEvents, rates, tMax=postDt)
-            site['data']['PoissonAmpScore'] = poissonScore.PoissonAmpScore.score(postSiteEvents, rates, tMax=postDt, ampMean=ampMean, ampStdev=ampStdev)
-            postScores['PoissonScore'].append(site['data']['PoissonScore'])
-            postScores['PoissonAmpScore'].append(site['data']['PoissonAmpScore'])
-            
-            site['data']['PoissonScore_Pre'] = poissonScore.PoissonScore.score(preSiteEvents, rates, tMax=postDt)
-            site['data']['PoissonAmpScore_Pre'] = poissonScore.PoissonAmpScore.score(preSiteEvents, rates, tMax=postDt, ampMean=ampMean, ampStdev=ampStdev)
-            preScores['PoissonScore'].append(site['data']['PoissonScore_Pre'])
-            preScores['PoissonAmpScore'].append(site['data']['PoissonAmpScore_Pre'])
+            site['data']['PoissonScore'] = postScores['PoissonScore'][i]
+            site['data']['PoissonAmpScore'] = postScores['PoissonAmpScore'][i]
+            site['data']['PoissonScore_Pre'] = preScores['PoissonScore'][i]
+            site['data']['PoissonAmpScore_Pre'] = preScores['PoissonAmpScore'][i]
             
             #if site['data']['sites'][0][1].shortName() == '051':
                 #raise Exception()
@@ -741,8 +756,6 @@ class EventStatisticsAnalyzer:
                 site['data']['FitAmpSum'] = np.median([s['fitAmplitude_PostRegion_sum'] for s in stats])
                 postScores['FitAmpSum'].append(site['data']['FitAmpSum'])
             #site['data']['FitAmpSum_Pre'] = np.median([s['fitAmplitude_PreRegion_sum'] for s in stats])  
-            site['data']['FirstLatency'] = np.median(latencies)
-            site['data']['NumEvents'] = np.median(nEvents)
             site['data']['SpontRate'] = np.median(rates)
             
             
@@ -1,9 +1,10 @@
 from __future__ import print_function
 import numpy as np
-import math
+import scipy.spatial
+import scipy.stats
 from pyqtgraph.debug import Profiler
 import acq4.util.functions as utilFn
-from six.moves import range
+from acq4.util.HelpfulException import HelpfulException
 
 
 
@@ -52,26 +53,62 @@ def convertPtsToSparseImage(data, params, spacing=5e-6):
     return arr
 
 
+def neighbourhoodCounts(data, radius, eventMask):
+    """For each site in *data*, count the sites that lie within *radius* of it (including the site itself), and how
+    many of those sites are selected by the boolean array *eventMask*.
+
+    Neighbourhoods are found with a KD-tree, so the cost grows with the number of neighbouring pairs rather than with
+    the square of the number of sites. Sites are neighbours when
+    ``np.sqrt((x1-x2)**2 + (y1-y2)**2) < radius``, exactly as when the distances are computed directly.
+
+    Return (nSpots, nEventSpots), two integer arrays aligned with *data*. Sites with a NaN or infinite position have
+    no neighbours (not even themselves), so both counts are 0 for them.
+    """
+    x = np.asarray(data['xPos'], dtype=float)
+    y = np.asarray(data['yPos'], dtype=float)
+    eventMask = np.asarray(eventMask, dtype=bool)
+    finite = np.isfinite(x) & np.isfinite(y)
+    sites = np.flatnonzero(finite)
+
+    ## candidate pairs from the tree (with a little slack for rounding), then the same strict test as before
+    tree = scipy.spatial.cKDTree(np.column_stack([x[sites], y[sites]]))
+    pairs = sites[tree.query_pairs(max(radius, 0) * (1 + 1e-9), output_type='ndarray')].reshape(-1, 2)
+    i, j = pairs[:, 0], pairs[:, 1]
+    pairs = pairs[np.sqrt((x[i] - x[j])**2 + (y[i] - y[j])**2) < radius]
+    i, j = pairs[:, 0], pairs[:, 1]
+
+    ## each pair is counted at both ends; every site is its own neighbour
+    selfCount = finite.astype(int) if radius > 0 else 0
+    nSpots = np.bincount(i, minlength=len(x)) + np.bincount(j, minlength=len(x)) + selfCount
+    nEventSpots = np.bincount(i, weights=eventMask[j], minlength=len(x)) + np.bincount(j, weights=eventMask[i], minlength=len(x))
+    nEventSpots = nEventSpots.astype(int) + (eventMask * selfCount)
+    return nSpots, nEventSpots
+
+
+def _neighbourhoodProbability(data, radius, p, eventMask, printProcess):
+    ## probability of seeing at least as many event sites as were observed in each neighbourhood,
+    ## if each site had an event at random with probability p
+    nSpots, nEventSpots = neighbourhoodCounts(data, radius, eventMask)
+    prob = scipy.stats.binom.sf(nEventSpots - 1, nSpots, p)
+    if printProcess: ## for debugging
+        for k, n, pr in zip(nEventSpots, nSpots, prob):
+            print("    %i out of %i spots had events. Probability: %f" %(k, n, pr))
+    return prob
+
+
 def bendelsSpatialCorrelationAlgorithm(data, radius, spontRate, timeWindow, printProcess=False, eventsKey='numOfPostEvents'):
     ## check that data has 'xPos', 'yPos' and 'numOfPostEvents'
-    #SpatialCorrelator.checkArrayInput(data) 
-    #prof = Profiler("bendelsSpatialCorrelationAlgorithm", disabled=True)
     fields = data.dtype.names
     if 'xPos' not in fields or 'yPos' not in fields or eventsKey not in fields:
         raise HelpfulException("Array input needs to have the following fields: 'xPos', 'yPos', the field specified in *eventsKey*. Current fields are: %s" %str(fields))   
-    #prof.mark("checked fields")
     
     ## add 'prob' field to data array
     if 'prob' not in data.dtype.names:
         arr = utilFn.concatenateColumns([data, np.zeros(len(data), dtype=[('prob', float)])])
-        #arr[:] = data     
         data = arr
     else:
         data['prob']=0
-    #prof.mark("set 'prob' field")
         
-    table = np.zeros((200, 200)) ## add a lookup table so that we don't have to calculate the same probabilities over and over...saves a bit of time
-    
     ## spatial correlation algorithm from :
     ## Bendels, MHK; Beed, P; Schmitz, D; Johenning, FW; and Leibold C. Detection of input sites in 
     ## scanning photostimulation data based on spatial correlations. 2010. Journal of Neuroscience Methods.
@@ -80,55 +117,24 @@ def bendelsSpatialCorrelationAlgorithm(data, radius, spontRate, timeWindow, prin
     p = 1-np.exp(-spontRate*timeWindow)
     if printProcess:
         print("======  Spontaneous Probability: %f =======" % p)
-    #prof.mark('calculated spontaneous probability')
         
     ## for each spot, calculate the probability of having the events in nearby spots occur randomly
-    for x in data:
-        spots = data[(np.sqrt((data['xPos']-x['xPos'])**2+(data['yPos']-x['yPos'])**2)) < radius]
-        nSpots = len(spots)
-        nEventSpots = len(spots[spots[eventsKey] > 0])
-        
-        prob = 0
-        if table[nEventSpots, nSpots] != 0: ## try looking up value in table (it was stored there if we calculated it before), otherwise calculate it now
-            prob = table[nEventSpots, nSpots]
-            #prof.mark('look-up')
-        else: 
-            for j in range(nEventSpots, nSpots+1):
-                a = ((p**j)*((1-p)**(nSpots-j))*math.factorial(nSpots))/(math.factorial(j)*math.factorial(nSpots-j))
-                if printProcess:
-                    print("        Prob for %i events: %f     Total: %f" %(j, a, prob+a))
-                prob += a
-            table[nEventSpots, nSpots] = prob
-            #prof.mark('calculate')
-        if printProcess: ## for debugging
-            print("    %i out of %i spots had events. Probability: %f" %(nEventSpots, nSpots, prob))
-        x['prob'] = prob
-        
-        
-    #prof.mark("calculated probabilities")
-    #prof.finish()
+    data['prob'] = _neighbourhoodProbability(data, radius, p, data[eventsKey] > 0, printProcess)
     
     return data
 
 def spatialCorrelationAlgorithm_ZScore(data, radius, printProcess=False, eventsKey='ZScore', spontKey='SpontZScore', threshold=1.645):
     ## check that data has 'xPos', 'yPos' and 'numOfPostEvents'
-    #SpatialCorrelator.checkArrayInput(data) 
-    #prof = Profiler("bendelsSpatialCorrelationAlgorithm", disabled=True)
     fields = data.dtype.names
     if 'xPos' not in fields or 'yPos' not in fields or eventsKey not in fields or spontKey not in fields:
         raise HelpfulException("Array input needs to have the following fields: 'xPos', 'yPos', the fields specified in *eventsKey* and *spontKey*. Current fields are: %s" %str(fields))   
-    #prof.mark("checked fields")
     
     ## add 'prob' field to data array
     if 'prob' not in data.dtype.names:
         arr = utilFn.concatenateColumns([data, np.zeros(len(data), dtype=[('prob', float)])])
-        #arr[:] = data     
         data = arr
     else:
         data['prob']=0
-    #prof.mark("set 'prob' field")
-        
-    table = np.zeros((200, 200)) ## add a lookup table so that we don't have to calculate the same probabilities over and over...saves a bit of time
     
     ## spatial correlation algorithm from :
     ## Bendels, MHK; Beed, P; Schmitz, D; Johenning, FW; and Leibold C. Detection of input sites in 
@@ -136,36 +142,55 @@ def spatialCorrelationAlgorithm_ZScore(data, radius, printProcess=False, eventsK
     
     ## calculate probability of seeing a spontaneous event in time window -- for ZScore method, calculate probability that ZScore is spontaneously high
     p = len(data[data[spontKey] < -threshold])/float(len(data))
-    #p = 1-np.exp(-spontRate*timeWindow)
-    #if printProcess:
-    #    print "======  Spontaneous Probability: %f =======" % p
-    #prof.mark('calculated spontaneous probability')
-    
         
     ## for each spot, calculate the probability of having the events in nearby spots occur randomly
-    for x in data:
-        spots = data[(np.sqrt((data['xPos']-x['xPos'])**2+(data['yPos']-x['yPos'])**2)) < radius]
-        nSpots = len(spots)
-        nEventSpots = len(spots[spots[eventsKey] < -threshold])
-        
-        prob = 0
-        if table[nEventSpots, nSpots] != 0: ## try looking up value in table (it was stored there if we calculated it before), otherwise calculate it now
-            prob = table[nEventSpots, nSpots]
-            #prof.mark('look-up')
-        else: 
-            for j in range(nEventSpots, nSpots+1):
-                a = ((p**j)*((1-p)**(nSpots-j))*math.factorial(nSpots))/(math.factorial(j)*math.factorial(nSpots-j))
-                if printProcess:
-                    print("        Prob for %i events: %f     Total: %f" %(j, a, prob+a))
-                prob += a
-            table[nEventSpots, nSpots] = prob
-            #prof.mark('calculate')
-        if printProcess: ## for debugging
-            print("    %i out of %i spots had events. Probability: %f" %(nEventSpots, nSpots, prob))
-        x['prob'] = prob
-        
-        
-    #prof.mark("calculated probabilities")
-    #prof.finish()
+    data['prob'] = _neighbourhoodProbability(data, radius, p, data[eventsKey] < -threshold, printProcess)
     
-    return data
\ No newline at end of file
+    return data
+
+class GroupIndex:
+    """Index of the rows of a table grouped by the value of one column (a CSR-style layout).
+
+    Rows are stably sorted by key, so the rows of each group are contiguous and keep their original order;
+    ``order[offsets[i]:offsets[i+1]]`` are the row indices of the i-th distinct key. Keys may be any hashable
+    values that compare equal to themselves (for example, the DirHandles in the 'ProtocolDir' column of an event
+    table).
+
+    Looking up a group returns the same rows, in the same order, as ``table[table[column] == key]``, but the table
+    is only scanned once instead of once per key.
+    """
+
+    def __init__(self, keys):
+        self._codes = {}
+        codes = np.fromiter((self._codes.setdefault(k, len(self._codes)) for k in keys), dtype=int, count=len(keys))
+        self.keys = list(self._codes)
+        self.order = np.argsort(codes, kind='stable')
+        self.offsets = np.zeros(len(self.keys) + 1, dtype=int)
+        np.cumsum(np.bincount(codes, minlength=len(self.keys)), out=self.offsets[1:])
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self._codes
+
+    def bounds(self, key):
+        """Return (start, stop) of the rows for *key* in the sorted table (see sort()); (0, 0) if *key* is absent."""
+        i = self._codes.get(key)
+        if i is None:
+            return 0, 0
+        return self.offsets[i], self.offsets[i + 1]
+
+    def indices(self, key):
+        """Return the indices of the rows for *key*, in their original order."""
+        start, stop = self.bounds(key)
+        return self.order[start:stop]
+
+    def counts(self, keys):
+        """Return the number of rows for each of *keys*."""
+        bounds = np.array([self.bounds(k) for k in keys], dtype=int).reshape(-1, 2)
+        return bounds[:, 1] - bounds[:, 0]
+
+    def sort(self, table):
+        """Return the rows of *table* (which must be aligned with the keys) sorted so that groups are contiguous."""
+        return table[self.order]
@@ -153,6 +153,38 @@ def gaussProb(amps, mean, stdev):
     if len(amps) == 0:
         return 1.0
     return stats.norm(mean, stdev).sf(amps)
+
+
+def eventCounts(times, groups=None):
+    """
+    For each event time, return the number of other events that occur at or before that time
+    (events with identical times count each other). If *groups* is given, events are only
+    counted against other events with the same group value.
+    
+    This is equivalent to ``[(times<=t).sum()-1 for t in times]``, but runs in O(n log n).
+    """
+    times = np.asarray(times)
+    if groups is None:
+        return np.searchsorted(np.sort(times), times, side='right') - 1
+    
+    order = np.lexsort((times, groups))
+    st = times[order]
+    sg = np.asarray(groups)[order]
+    n = len(st)
+    if n == 0:
+        return np.zeros(0, dtype=int)
+    
+    ## index of the last event in each run of identical (group, time) values
+    last = np.empty(n, dtype=bool)
+    last[-1] = True
+    last[:-1] = (st[1:] != st[:-1]) | (sg[1:] != sg[:-1])
+    ends = np.flatnonzero(last)
+    runEnd = ends[np.searchsorted(ends, np.arange(n))]
+    groupStart = np.searchsorted(sg, sg, side='left')
+    
+    counts = np.empty(n, dtype=int)
+    counts[order] = runEnd - groupStart
+    return counts
     
     
 class PoissonScore:
@@ -181,48 +213,61 @@ class PoissonScore:
         ev must be a list of record arrays. Each array describes a set of events; only required field is 'time'
         *rate* may be either a single value or a list (in which case the mean will be used)
         """
-        nSets = len(ev)
-        events = np.concatenate(ev)
+        return cls.scoreMany([ev], [rate], tMax=tMax, normalize=normalize, **kwds)[0]
 
-        if not np.isscalar(rate):   ### Is this valid???  I think so..
-            rate = np.mean(rate)
+    @classmethod
+    def scoreMany(cls, evSets, rates, tMax=None, normalize=True, **kwds):
+        """
+        Compute poisson scores for many sets of events in one call (for example, every site in a map).
+        
+        Equivalent to ``[cls.score(ev, rate, tMax, normalize, **kwds) for ev, rate in zip(evSets, rates)]``,
+        but all sets are scored together with array operations. Each item in *evSets* is a list of record
+        arrays as accepted by score(), and each item in *rates* is a rate (or list of rates) for that item.
+        Extra keyword arguments are passed to amplitudeScore. Returns an array of scores.
+        """
+        nSets = np.array([len(ev) for ev in evSets])
+        rates = np.array([r if np.isscalar(r) else np.mean(r) for r in rates], dtype=float)   ### Is this valid???  I think so..
+        sizes = np.array([sum(len(x) for x in ev) for ev in evSets], dtype=int)
+        arrays = [x for ev in evSets for x in ev]
+        events = np.concatenate(arrays) if len(arrays) > 0 else np.empty(0, dtype=[('time', float), ('amp', float)])
+        scores = cls._maxScores(events, np.repeat(np.arange(len(evSets)), sizes), sizes, rates*nSets, **kwds)
         
-        if len(events) == 0:
-            score = 1.0
-        else:
-            #ev = [x['time'] for x in ev]  ## select times from event set
-            #ev = np.concatenate(ev)   ## mix events together
-            ev = events['time']
-            
-            nVals = np.array([(ev<=t).sum()-1 for t in ev]) ## looks like arange, but consider what happens if two events occur at the same time.
-            pi = poissonProb(nVals, ev, rate*nSets)  ## note that by using n=0 to len(ev)-1, we correct for the fact that the time window always ends at the last event
-            pi = 1.0 / pi
-            
-            ## apply extra score for uncommonly large amplitudes
-            ## (note: by default this has no effect; see amplitudeScore)
-            ampScore = cls.amplitudeScore(events, **kwds)
-            pi *= ampScore
-            
-            mp = pi.max()
-            #mpp = min(cls.maxPoissonProb(ev, rate*nSets), 1.0-1e-12)  ## don't allow returning inf
-            #mpp = min(mp, 1.0-1e-12)
-            
-            score = mp
-            #score =  1.0 / (1.0 - mpp)
-            
-            
-        #n = len(ev)
         if normalize:
-            ret = cls.mapScore(score, rate*tMax*nSets)
+            ret = cls.mapScore(scores, rates*tMax*nSets)
         else:
-            ret = score
-        if np.isscalar(ret):
-            assert not np.isnan(ret)
-        else:
-            assert not any(np.isnan(ret))
-        
+            ret = scores
+        assert not np.any(np.isnan(ret))
         return ret
 
+    @classmethod
+    def _maxScores(cls, events, groups, sizes, rates, **kwds):
+        """Return the unnormalized score for each group of events.
+        
+        *events* is a record array of all events, sorted by group; *groups* gives the group index of each
+        event and *sizes* the number of events in each group. *rates* is the total expected event rate for
+        each group (the sum over all of the group's event sets).
+        """
+        scores = np.ones(len(sizes))
+        if len(events) == 0:
+            return scores
+        
+        times = events['time']
+        nVals = eventCounts(times, groups) ## looks like arange, but consider what happens if two events occur at the same time.
+        l = rates[groups]
+        ## note that by using n=0 to len(ev)-1, we correct for the fact that the time window always ends at the last event
+        p = np.where(l == 0, np.where(nVals == 0, 1.0, 1e-25), stats.poisson(l*times).sf(nVals))
+        with np.errstate(divide='ignore'):
+            pi = 1.0 / p
+        
+        ## apply extra score for uncommonly large amplitudes
+        ## (note: by default this has no effect; see amplitudeScore)
+        pi *= cls.amplitudeScore(events, **kwds)
+        
+        nonEmpty = sizes > 0
+        starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+        scores[nonEmpty] = np.maximum.reduceat(pi, starts[nonEmpty])
+        return scores
+
     @classmethod
     def amplitudeScore(cls, events, **kwds):
         """Computes extra probability information about events based on their amplitude.
@@ -247,37 +292,33 @@ class PoissonScore:
         #return mp
 
     @classmethod
-    def mapScore(cls, x, n):
-        """
-        Map score x to probability given we expect n events per set
-        """
+    def getNormalizationTable(cls):
         if cls.normalizationTable is None:
             cls.normalizationTable = cls.generateNormalizationTable()
             cls.extrapolateNormTable()
-            
-        nind = max(0, np.log(n)/np.log(2))
-        n1 = np.clip(int(np.floor(nind)), 0, cls.normalizationTable.shape[1]-2)
-        n2 = n1+1
+        return cls.normalizationTable
+
+    @classmethod
+    def mapScore(cls, x, n):
+        """
+        Map score x to probability given we expect n events per set.
+        *x* and *n* may be scalars or arrays of the same shape.
+        """
+        table = cls.getNormalizationTable()
+        scalar = np.isscalar(x) and np.isscalar(n)
+        x, n = np.broadcast_arrays(np.atleast_1d(np.asarray(x, dtype=float)), np.atleast_1d(np.asarray(n, dtype=float)))
         
-        mapped1 = []
-        for i in [n1, n2]:
-            norm = cls.normalizationTable[:,i]
-            ind = np.argwhere(norm[0] > x)
-            if len(ind) == 0:
-                ind = len(norm[0])-1
-            else:
-                ind = ind[0,0]
-            if ind == 0:
-                ind = 1
-            x1, x2 = norm[0, ind-1:ind+1]
-            y1, y2 = norm[1, ind-1:ind+1]
-            if x1 == x2:
-                s = 0.0
-            else:
-                s = (x-x1) / float(x2-x1)
-            mapped1.append(y1 + s*(y2-y1))
+        with np.errstate(divide='ignore'):
+            nind = np.maximum(0, np.log2(n))
+        n1 = np.clip(np.floor(nind).astype(int), 0, table.shape[1]-2)
+        n2 = n1+1
         
-        mapped = mapped1[0] + (mapped1[1]-mapped1[0]) * (nind-n1)/float(n2-n1)
+        ## interpolate x along each row of the table, then between the two rows bracketing n
+        mapped1 = np.array([cls._interpolateRow(table[:, i], x) for i in range(table.shape[1])])
+        cols = np.arange(len(x))
+        y1 = mapped1[n1, cols]
+        y2 = mapped1[n2, cols]
+        mapped = y1 + (y2-y1) * (nind-n1)/(n2-n1)
         
         ## doesn't handle points outside of the original data.
         #mapped = scipy.interpolate.griddata(poissonScoreNorm[0], poissonScoreNorm[1], [x], method='cubic')[0]
@@ -285,9 +326,21 @@ class PoissonScore:
         #spline = scipy.interpolate.RectBivariateSpline(tVals, xVals, normTable)
         #mapped = spline.ev(n, x)[0]
         #raise Exception()
-        assert not (np.isinf(mapped) or np.isnan(mapped))
-        assert mapped>0
-        return mapped
+        assert not np.any(np.isinf(mapped) | np.isnan(mapped))
+        assert np.all(mapped>0)
+        return mapped[0] if scalar else mapped
+
+    @staticmethod
+    def _interpolateRow(norm, x):
+        ## Linear interpolation of norm[1] over norm[0] (which is sorted), extrapolating linearly
+        ## from the first / last segment for values outside the table
+        ind = np.clip(np.searchsorted(norm[0], x, side='right'), 1, norm.shape[1]-1)
+        x1, x2 = norm[0, ind-1], norm[0, ind]
+        y1, y2 = norm[1, ind-1], norm[1, ind]
+        dx = x2 - x1
+        with np.errstate(divide='ignore', invalid='ignore'):
+            s = np.where(dx == 0, 0.0, (x-x1) / dx)
+        return y1 + s*(y2-y1)
 
     #@classmethod
     #def generateNormalizationTable(cls, nEvents=1000000000):
@@ -354,7 +407,22 @@ class PoissonScore:
         return ret
         
     @classmethod
-    def generateNormalizationTable(cls, nEvents=1000000):
+    def generateRandomEvents(cls, rng, rate, tMax, n):
+        """Generate *n* random event sets as a single record array sorted by set, as used by _maxScores.
+        
+        Returns (events, groups, sizes).
+        """
+        ## the number of events of a poisson process in [0, tMax] is poisson-distributed, and
+        ## given that number, the event times are uniformly distributed.
+        sizes = rng.poisson(rate*tMax, size=n)
+        total = sizes.sum()
+        events = np.empty(total, dtype=[('time', float), ('amp', float)])
+        events['time'] = rng.uniform(0, tMax, size=total)
+        events['amp'] = rng.normal(size=total)
+        return events, np.repeat(np.arange(n), sizes), sizes
+
+    @classmethod
+    def generateNormalizationTable(cls, nEvents=1000000, seed=0, chunkSize=10000):
         ## table looks like this:
         ##   (2 x M x N)
         ##   Axis 0:  (score, mapped)
@@ -384,25 +452,23 @@ class PoissonScore:
             norm = np.fromfile(cacheFile, dtype=np.float64).reshape(tableShape)
         else:
             print("Generating %s ..." % cacheFile)
+            ## Simulations are generated and scored *chunkSize* sets at a time; the fixed *seed* makes
+            ## the table reproducible.
+            rng = np.random.default_rng(seed)
             norm = np.empty(tableShape)
-            counts = []
-            with mp.Parallelize(counts=counts) as tasker:
-                for task in tasker:
-                    count = np.zeros(tableShape[1:], dtype=float)
-                    for i, t in enumerate(tVals):
-                        n = nev[i] / tasker.numWorkers()
-                        for j in range(int(n)):
-                            if j%1000==0:
-                                print(t, j)
-                                tasker.process()
-                            ev = cls.generateRandom(rate=rate, tMax=t, reps=1)
+            count = np.zeros(tableShape[1:], dtype=float)
+            for i, t in enumerate(tVals):
+                print(t)
+                remaining = nev[i]
+                while remaining > 0:
+                    n = min(chunkSize, remaining)
+                    remaining -= n
+                    events, groups, sizes = cls.generateRandomEvents(rng, rate, t, n)
+                    scores = cls._maxScores(events, groups, sizes, np.full(n, rate))
+                    ## count[i, j] is the number of simulations with score >= xVals[j]
+                    ind = np.clip(np.floor(np.log(scores) / np.log(r)), 0, xSteps-1).astype(int)
+                    count[i] += np.cumsum(np.bincount(ind, minlength=xSteps)[::-1])[::-1]
                             
-                            score = cls.score(ev, rate, normalize=False)
-                            ind = np.log(score) / np.log(r)
-                            count[i, :ind+1] += 1
-                    tasker.counts.append(count)
-                            
-            count = sum(counts)
             count[count==0] = 1
             norm[0] = xVals.reshape(1, len(xVals))
             norm[1] = nev.reshape(len(nev), 1) / count
@@ -434,7 +500,7 @@ class PoissonScore:
     
     @classmethod
     def poissonScoreBlame(cls, ev, rate):
-        nVals = np.array([(ev<=t).sum()-1 for t in ev]) 
+        nVals = eventCounts(ev)
         pp1 = 1.0 /   (1.0 - poissonProb(nVals, ev, rate, clip=True))
         pp2 = 1.0 /   (1.0 - poissonProb(nVals-1, ev, rate, clip=True))
         diff = pp1 / pp2
@@ -0,0 +1,96 @@
+import numpy as np
+import scipy.stats as stats
+
+from acq4.analysis.tools.poissonScore import PoissonScore, PoissonAmpScore, eventCounts
+
+
+def randomSets(n, seed=0):
+    rng = np.random.default_rng(seed)
+    sets = []
+    rates = []
+    for i in range(n):
+        reps = rng.integers(1, 4)
+        ev = []
+        for j in range(reps):
+            times = np.round(rng.uniform(0.01, 1, size=rng.poisson(3)), 2)  # rounding creates simultaneous events
+            e = np.empty(len(times), dtype=[('time', float), ('amp', float)])
+            e['time'] = times
+            e['amp'] = rng.normal(size=len(times))
+            ev.append(e)
+        sets.append(ev)
+        rates.append(list(rng.uniform(0.5, 5, size=reps)))
+    return sets, rates
+
+
+def loopMapScore(cls, x, n):
+    # previous (scalar) implementation of PoissonScore.mapScore
+    if cls.normalizationTable is None:
+        cls.normalizationTable = cls.generateNormalizationTable()
+        cls.extrapolateNormTable()
+    nind = max(0, np.log(n) / np.log(2))
+    n1 = np.clip(int(np.floor(nind)), 0, cls.normalizationTable.shape[1] - 2)
+    n2 = n1 + 1
+    mapped1 = []
+    for i in [n1, n2]:
+        norm = cls.normalizationTable[:, i]
+        ind = np.argwhere(norm[0] > x)
+        ind = len(norm[0]) - 1 if len(ind) == 0 else ind[0, 0]
+        if ind == 0:
+            ind = 1
+        x1, x2 = norm[0, ind - 1:ind + 1]
+        y1, y2 = norm[1, ind - 1:ind + 1]
+        s = 0.0 if x1 == x2 else (x - x1) / float(x2 - x1)
+        mapped1.append(y1 + s * (y2 - y1))
+    return mapped1[0] + (mapped1[1] - mapped1[0]) * (nind - n1) / float(n2 - n1)
+
+
+def loopScore(cls, ev, rate, tMax=None, normalize=True, ampMean=None, ampStdev=None):
+    # previous per-set implementation of PoissonScore.score / PoissonAmpScore.score
+    nSets = len(ev)
+    events = np.concatenate(ev)
+    if not np.isscalar(rate):
+        rate = np.mean(rate)
+    if len(events) == 0:
+        score = 1.0
+    else:
+        times = events['time']
+        nVals = np.array([(times <= t).sum() - 1 for t in times])
+        pi = 1.0 / stats.poisson(times * rate * nSets).sf(nVals)
+        if ampStdev is not None:
+            pi *= 1.0 / np.clip(stats.norm(ampMean, ampStdev).sf(events['amp']), 1e-100, np.inf)
+        score = pi.max()
+    if normalize:
+        return loopMapScore(cls, score, rate * tMax * nSets)
+    return score
+
+
+def test_eventCounts():
+    times = np.array([0.3, 0.1, 0.2, 0.2, 0.5, 0.1])
+    expected = [(times <= t).sum() - 1 for t in times]
+    assert list(eventCounts(times)) == expected
+
+    groups = np.array([0, 1, 0, 1, 0, 0])
+    expected = [((times <= t) & (groups == g)).sum() - 1 for t, g in zip(times, groups)]
+    assert list(eventCounts(times, groups)) == expected
+
+
+def test_scores_match_loop_implementation():
+    sets, rates = randomSets(50)
+    sets[3] = [ev[:0] for ev in sets[3]]
+    for cls, kwds in [(PoissonScore, {}), (PoissonAmpScore, {'ampMean': 0.5, 'ampStdev': 1.0})]:
+        for normalize in (False, True):
+            expected = [loopScore(cls, ev, rate, tMax=1.0, normalize=normalize, **kwds)
+                        for ev, rate in zip(sets, rates)]
+            batch = cls.scoreMany(sets, rates, tMax=1.0, normalize=normalize, **kwds)
+            single = [cls.score(ev, rate, tMax=1.0, normalize=normalize, **kwds) for ev, rate in zip(sets, rates)]
+            assert np.allclose(batch, expected)
+            assert np.allclose(single, expected)
+    assert PoissonScore.score(sets[3], rates[3], normalize=False) == 1.0
+
+
+def test_mapScore_vectorized():
+    x = np.array([1.0, 3.0, 1e4, 1e40])
+    n = np.array([0.5, 3.0, 20.0, 1000.0])
+    mapped = PoissonScore.mapScore(x, n)
+    assert np.allclose(mapped, [loopMapScore(PoissonScore, xi, ni) for xi, ni in zip(x, n)])
+    assert np.all(np.diff(PoissonScore.mapScore(np.logspace(0, 10, 20), 4.0)) >= 0)
@@ -0,0 +1,32 @@
+import numpy as np
+
+from acq4.analysis.tools.functions import GroupIndex
+
+
+class Handle:
+    """Hashable by identity, like DirHandle."""
+
+
+def test_group_index():
+    rng = np.random.default_rng(0)
+    handles = [Handle() for i in range(20)]
+    table = np.empty(500, dtype=[('ProtocolDir', object), ('fitTime', float)])
+    table['ProtocolDir'] = [handles[i] for i in rng.integers(0, 15, size=len(table))]
+    table['fitTime'] = rng.uniform(size=len(table))
+
+    groups = GroupIndex(table['ProtocolDir'])
+    assert len(groups) == len(set(table['ProtocolDir']))
+    assert handles[17] not in groups
+    sortedTimes = groups.sort(table['fitTime'])
+    for h in handles:
+        masked = table[table['ProtocolDir'] == h]
+        assert np.array_equal(table[groups.indices(h)], masked)
+        start, stop = groups.bounds(h)
+        assert np.array_equal(sortedTimes[start:stop], masked['fitTime'])
+    assert list(groups.counts(handles)) == [(table['ProtocolDir'] == h).sum() for h in handles]
+
+    empty = GroupIndex(table['ProtocolDir'][:0])
+    assert len(empty) == 0
+    assert len(empty.indices(handles[0])) == 0
+    assert list(empty.counts(handles[:2])) == [0, 0]
+    assert len(empty.counts([])) == 0
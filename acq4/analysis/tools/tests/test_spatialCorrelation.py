@@ -0,0 +1,91 @@
+import math
+
+import numpy as np
+
+from acq4.analysis.tools import functions
+
+
+def makeMap(n=400, seed=0):
+    rng = np.random.default_rng(seed)
+    data = np.zeros(n, dtype=[('xPos', float), ('yPos', float), ('numOfPostEvents', int), ('ZScore', float),
+                              ('SpontZScore', float)])
+    ## stimulation grid with some repeated sites
+    side = int(np.ceil(np.sqrt(n)))
+    grid = np.stack(np.meshgrid(np.arange(side), np.arange(side)), axis=-1).reshape(-1, 2)[:n] * 30e-6
+    dup = np.arange(7, n, 7)
+    grid[dup] = grid[dup - 1]
+    data['xPos'] = grid[:, 0] + 1e-3
+    data['yPos'] = grid[:, 1] - 2e-3
+    inputSite = np.hypot(data['xPos'] - data['xPos'].mean(), data['yPos'] - data['yPos'].mean()) < 150e-6
+    data['numOfPostEvents'] = rng.poisson(np.where(inputSite, 2.0, 0.1))
+    data['ZScore'] = rng.normal(size=n) - 3 * inputSite
+    data['SpontZScore'] = rng.normal(size=n)
+    return data
+
+
+def loopProbabilities(data, radius, p, eventMask):
+    ## previous per-site implementation
+    prob = np.zeros(len(data))
+    for i, x in enumerate(data):
+        near = np.sqrt((data['xPos'] - x['xPos'])**2 + (data['yPos'] - x['yPos'])**2) < radius
+        nSpots = near.sum()
+        nEventSpots = (near & eventMask).sum()
+        for j in range(nEventSpots, nSpots + 1):
+            prob[i] += (p**j) * ((1 - p)**(nSpots - j)) * math.factorial(nSpots) / (math.factorial(j) * math.factorial(nSpots - j))
+    return prob
+
+
+def test_bendels():
+    data = makeMap()
+    spontRate, timeWindow = 3.0, 0.1
+    result = functions.bendelsSpatialCorrelationAlgorithm(data, 90e-6, spontRate, timeWindow)
+    p = 1 - np.exp(-spontRate * timeWindow)
+    expected = loopProbabilities(data, 90e-6, p, data['numOfPostEvents'] > 0)
+    assert np.allclose(result['prob'], expected, rtol=1e-10, atol=1e-14)
+    assert result['prob'].min() < 1e-6
+
+    ## existing 'prob' field is overwritten in place
+    again = functions.bendelsSpatialCorrelationAlgorithm(result, 90e-6, spontRate, timeWindow)
+    assert again is result
+    assert np.allclose(again['prob'], expected, rtol=1e-10, atol=1e-14)
+
+
+def test_nonfinite_positions():
+    data = makeMap()
+    data['xPos'][[3, 50]] = np.nan
+    data['yPos'][[3, 80]] = [np.inf, -np.inf]
+    data['numOfPostEvents'][[3, 50, 80]] = 1
+    spontRate, timeWindow = 3.0, 0.1
+    result = functions.bendelsSpatialCorrelationAlgorithm(data, 90e-6, spontRate, timeWindow)
+    p = 1 - np.exp(-spontRate * timeWindow)
+    expected = loopProbabilities(data, 90e-6, p, data['numOfPostEvents'] > 0)
+    assert np.allclose(result['prob'], expected, rtol=1e-10, atol=1e-14)
+    assert np.all(result['prob'][[3, 50, 80]] == 1)
+
+    ## no usable positions at all
+    data['xPos'] = np.nan
+    nSpots, nEventSpots = functions.neighbourhoodCounts(data, 90e-6, data['numOfPostEvents'] > 0)
+    assert np.all(nSpots == 0) and np.all(nEventSpots == 0)
+
+
+def test_zscore():
+    data = makeMap(seed=1)
+    result = functions.spatialCorrelationAlgorithm_ZScore(data, 90e-6)
+    p = (data['SpontZScore'] < -1.645).mean()
+    expected = loopProbabilities(data, 90e-6, p, data['ZScore'] < -1.645)
+    assert np.allclose(result['prob'], expected, rtol=1e-10, atol=1e-14)
+
+
+def test_neighbourhood_counts():
+    data = makeMap(300)
+    ## sites exactly one grid step apart lie on the boundary of a 30 um radius and are excluded, as before
+    for radius in (30e-6, 30.000001e-6, 65e-6, 0):
+        nSpots, nEventSpots = functions.neighbourhoodCounts(data, radius, data['numOfPostEvents'] > 0)
+        for i in range(0, len(data), 13):
+            near = np.sqrt((data['xPos'] - data['xPos'][i])**2 + (data['yPos'] - data['yPos'][i])**2) < radius
+            assert nSpots[i] == near.sum()
+            assert nEventSpots[i] == (near & (data['numOfPostEvents'] > 0)).sum()
+
+    ## neighbourhoods larger than 200 sites
+    nSpots, nEventSpots = functions.neighbourhoodCounts(data, 1, np.ones(len(data), dtype=bool))
+    assert np.all(nSpots == len(data)) and np.all(nEventSpots == len(data))
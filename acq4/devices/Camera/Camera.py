@@ -2,6 +2,7 @@ import queue
 import threading
 import time
 from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager, ExitStack
 from typing import Callable, Optional
 
@@ -19,6 +20,7 @@ from acq4.util.Mutex import Mutex
 from acq4.util.Thread import Thread
 from acq4.util.debug import printExc
 from acq4.util.future import Future
+from acq4.util.imaging.buffer_pool import FrameBufferPool
 from acq4.util.imaging.frame import Frame
 from pyqtgraph import Vector, SRTTransform3D
 from pyqtgraph.debug import Profiler
@@ -52,6 +54,10 @@ class Camera(DAQGeneric, OptomechDevice):
         params:
             GAIN_INDEX: 2
             CLEAR_MODE: 'CLEAR_PRE_SEQUENCE'  # Overlap mode for QuantEM
+        frameProcessing:
+            queueSize: 100  # max. frames waiting for processing; when full, new frames wait (None for unbounded)
+            workers: 1      # number of frames that may be processed concurrently by thread-safe processors
+        bufferPoolSize: 64  # max. idle frame buffers kept for reuse by the driver (see frameBufferPool)
     """
 
     sigCameraStopped = Qt.Signal()
@@ -74,6 +80,7 @@ class Camera(DAQGeneric, OptomechDevice):
 
         self.camConfig = config
         self.stateStack = []
+        self._bufferPool = None
 
         if "scaleFactor" not in self.camConfig:
             self.camConfig["scaleFactor"] = [1.0, 1.0]
@@ -108,7 +115,10 @@ class Camera(DAQGeneric, OptomechDevice):
         self.acqThread.started.connect(self.acqThreadStarted)
         self.acqThread.sigShowMessage.connect(self.showMessage)
 
-        self._processingThread = FrameProcessingThread()
+        procConfig = config.get("frameProcessing", {})
+        self._processingThread = FrameProcessingThread(
+            queueSize=procConfig.get("queueSize", 100), workers=procConfig.get("workers", 1)
+        )
         self._processingThread.sigFrameFullyProcessed.connect(self.sigNewFrame)
         self._processingThread.start()
         self._processingThread.addFrameProcessor(self.addFrameInfo)
@@ -231,12 +241,26 @@ class Camera(DAQGeneric, OptomechDevice):
         """Returns a list of all new frames that have arrived since the last call. The list looks like:
             [{'id': 0, 'data': array, 'time': 1234678.3213}, ...]
         id is a unique integer representing the frame number since the start of the program.
-        data should be a permanent copy of the image (ie, not directly from a circular buffer)
+        data should be a permanent copy of the image (ie, not directly from a circular buffer). To avoid allocating
+            a new array for every frame, drivers should copy into arrays obtained from frameBufferPool().
         time is the time of arrival of the frame. Optionally, 'exposeStartTime' and 'exposeDoneTime' 
             may be specified if they are available.
         """
         raise NotImplementedError("Function must be reimplemented in subclass.")
 
+    def frameBufferPool(self, shape, dtype) -> FrameBufferPool:
+        """Return a pool of reusable image buffers with the given shape and dtype.
+
+        Drivers fill buffers from pool.get() in place; buffers are returned to the pool automatically once the
+        frames using them are no longer referenced. The pool is replaced when the requested shape or dtype changes
+        (for example, after a change of binning or region). The number of idle buffers retained may be set with
+        the 'bufferPoolSize' config option.
+        """
+        with self.lock:
+            if self._bufferPool is None or not self._bufferPool.matches(shape, dtype):
+                self._bufferPool = FrameBufferPool(shape, dtype, maxFree=self.camConfig.get("bufferPoolSize", 64))
+            return self._bufferPool
+
     def startCamera(self):
         """Calls the camera driver to start the camera's acquisition. Call start instead of this to actually record frames."""
         raise NotImplementedError("Function must be reimplemented in subclass.")
@@ -528,10 +552,24 @@ class Camera(DAQGeneric, OptomechDevice):
     def showMessage(self, msg):
         self.sigShowMessage.emit(msg)
 
-    def addFrameProcessor(self, processor: Callable[[Frame], None], final: bool = False):
-        self._processingThread.addFrameProcessor(processor, final)
+    def addFrameProcessor(self, processor: Callable[[Frame], None], final: bool = False, policy: str = "lossless",
+                          threadSafe: bool = False, name: Optional[str] = None):
+        """Add a callback to be invoked with each new frame before sigNewFrame is emitted.
+
+        *policy* is 'lossless' (default; called for every frame, in order) or 'latest' (called from a separate
+        thread with only the newest frame, so a slow processor never holds up the others). Lossless processors
+        that set *threadSafe* may be run for several frames at once if the camera is configured with more than
+        one frame processing worker. See frameProcessingStats() for per-processor timing and drop counts.
+        """
+        self._processingThread.addFrameProcessor(processor, final, policy=policy, threadSafe=threadSafe, name=name)
         # TODO will we remove them ever?
 
+    def frameProcessingStats(self) -> dict:
+        """Return frame queue depth, how often (and for how long) new frames waited for room in the queue, and
+        processed/dropped counts and timing for each frame processor.
+        """
+        return self._processingThread.stats()
+
     def isRunning(self):
         return self.acqThread.isRunning()
 
@@ -556,6 +594,10 @@ class CameraTask(DAQGenericTask):
         self.resultObj = None
         self._future = None
 
+    def rearm(self):
+        # camera state and frame collection are set up for a single run in configure()
+        return False
+
     def configure(self):
         # Merge command into default values:
         prof = Profiler("Camera.CameraTask.configure", disabled=True)
@@ -817,26 +859,165 @@ class CameraTaskResult:
         return self._frameTimes, self._frameTimesPrecise
 
 
+class FrameProcessor:
+    """Wraps a frame processing callback along with its scheduling options and statistics.
+
+    *policy* may be 'lossless' (the callback is invoked for every frame, in order) or 'latest' (the callback runs
+    in its own thread and is only given the most recent frame; frames arriving while it is busy replace any frame
+    still waiting and are counted as dropped). *threadSafe* lossless processors may be invoked for several frames
+    concurrently when the processing thread is configured with more than one worker.
+    """
+
+    def __init__(self, callback: Callable[[Frame], None], policy="lossless", threadSafe=False, name=None):
+        if policy not in ("lossless", "latest"):
+            raise ValueError(f"Unknown frame processing policy '{policy}'")
+        self.callback = callback
+        self.policy = policy
+        self.threadSafe = threadSafe
+        self.name = name or getattr(callback, "__qualname__", repr(callback))
+        self._lock = threading.Lock()
+        self._turn = threading.Condition()
+        self._nextSeq = 0
+        self.processed = 0
+        self.dropped = 0
+        self.totalTime = 0.0
+        self.maxTime = 0.0
+        self.lastLatency = None
+
+    def __call__(self, frame, arrivalTime=None):
+        start = time.perf_counter()
+        try:
+            self.callback(frame)
+        except Exception:
+            printExc(f"Frame processing callback {self.name} failed")
+        finally:
+            now = time.perf_counter()
+            dt = now - start
+            with self._lock:
+                self.processed += 1
+                self.totalTime += dt
+                self.maxTime = max(self.maxTime, dt)
+                if arrivalTime is not None:
+                    self.lastLatency = now - arrivalTime
+
+    def runInOrder(self, seq, frame, arrivalTime):
+        """Invoke the callback for frame number *seq* after all earlier frames have been processed."""
+        with self._turn:
+            while self._nextSeq != seq:
+                self._turn.wait()
+        try:
+            self(frame, arrivalTime)
+        finally:
+            with self._turn:
+                self._nextSeq += 1
+                self._turn.notify_all()
+
+    def countDropped(self):
+        with self._lock:
+            self.dropped += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "policy": self.policy,
+                "processed": self.processed,
+                "dropped": self.dropped,
+                "meanTime": self.totalTime / self.processed if self.processed > 0 else None,
+                "maxTime": self.maxTime,
+                "lastLatency": self.lastLatency,
+            }
+
+
+class LatestFrameWorker(threading.Thread):
+    """Runs a 'latest' FrameProcessor in its own thread, keeping only the newest waiting frame."""
+
+    def __init__(self, processor: FrameProcessor):
+        super().__init__(name=f"FrameProcessor-{processor.name}", daemon=True)
+        self.processor = processor
+        self._cond = threading.Condition()
+        self._pending = None  # (seq, frame, arrivalTime)
+        self._stopRequested = False
+
+    def post(self, seq, frame, arrivalTime):
+        with self._cond:
+            if self._pending is not None:
+                self.processor.countDropped()
+                if self._pending[0] > seq:
+                    # a newer frame is already waiting
+                    return
+            self._pending = (seq, frame, arrivalTime)
+            self._cond.notify()
+
+    def stop(self):
+        with self._cond:
+            self._stopRequested = True
+            self._cond.notify()
+
+    def run(self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self._stopRequested:
+                    self._cond.wait()
+                if self._stopRequested:
+                    return
+                seq, frame, arrivalTime = self._pending
+                self._pending = None
+            self.processor(frame, arrivalTime)
+
+
 class FrameProcessingThread(Thread):
+    """Passes each new frame through the registered frame processors, then emits sigFrameFullyProcessed.
+
+    Incoming frames wait in a queue of up to *queueSize* frames (None for unbounded). Lossless processors (eg.
+    recording) are called for every frame, in the order they were added; if they fall so far behind that the queue
+    fills, handleNewRawFrame blocks until there is room, rather than dropping frames or growing without limit.
+    Only 'latest' processors drop frames, and each counts its own drops. With *workers* > 1, several frames are processed concurrently: thread-safe
+    processors may then run in parallel, while all other processors and sigFrameFullyProcessed still see frames
+    one at a time and in acquisition order.
+    """
     sigFrameFullyProcessed = Qt.Signal(object)  # Frame
 
-    def __init__(self):
+    def __init__(self, queueSize=100, workers=1):
         super().__init__()
         self._stop = False
         self._processors = []
         self._final_processor = None
-        self._queue = queue.Queue()
-
-    def addFrameProcessor(self, processor: Callable[[Frame], None], final=False):
-        if final:
-            if self._final_processor is not None:
-                raise RuntimeError("Only one `final` processor can be added.")
-            self._final_processor = processor
-        else:
-            self._processors.append(processor)
+        self._latestWorkers = {}
+        self._lock = threading.Lock()
+        self._nextSeq = 0
+        self._emitTurn = threading.Condition()
+        self._nextEmitSeq = 0
+        self._queue = queue.Queue(maxsize=queueSize or 0)
+        self._blocked = 0
+        self._blockedTime = 0.0
+        self._workers = workers
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="FrameProcessing") if workers > 1 else None
+        self._inFlight = threading.Semaphore(workers)
+
+    def addFrameProcessor(self, processor: Callable[[Frame], None], final=False, policy="lossless", threadSafe=False,
+                          name=None):
+        proc = FrameProcessor(processor, policy=policy, threadSafe=threadSafe, name=name)
+        with self._lock:
+            if final:
+                if self._final_processor is not None:
+                    raise RuntimeError("Only one `final` processor can be added.")
+                self._final_processor = proc
+            else:
+                self._processors.append(proc)
+            # frames that have already been dispatched will not visit this processor
+            proc._nextSeq = self._nextSeq
+            if policy == "latest":
+                worker = LatestFrameWorker(proc)
+                self._latestWorkers[proc] = worker
+                worker.start()
+        return proc
 
     def stop(self):
         self._stop = True
+        for worker in self._latestWorkers.values():
+            worker.stop()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
 
     @property
     def processors(self):
@@ -845,20 +1026,79 @@ class FrameProcessingThread(Thread):
         return self._processors
 
     def handleNewRawFrame(self, frame):
-        self._queue.put(frame)
+        """Queue *frame* for processing, waiting for room if the queue is full."""
+        item = (frame, time.perf_counter())
+        try:
+            self._queue.put_nowait(item)
+            return
+        except queue.Full:
+            pass
+        start = time.perf_counter()
+        try:
+            while not self._stop:
+                try:
+                    self._queue.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+        finally:
+            with self._lock:
+                self._blocked += 1
+                self._blockedTime += time.perf_counter() - start
+
+    def stats(self):
+        """Return a dict describing the state of the frame queue and each processor."""
+        with self._lock:
+            blocked, blockedTime = self._blocked, self._blockedTime
+        return {
+            "queueDepth": self._queue.qsize(),
+            "queueSize": self._queue.maxsize or None,
+            "blocked": blocked,  # frames that had to wait for room in the queue
+            "blockedTime": blockedTime,  # total time (s) spent waiting
+            "processors": {proc.name: proc.stats() for proc in self.processors},
+        }
 
     def run(self):
         while not self._stop:
             try:
-                frame = self._queue.get(timeout=0.1)
+                frame, arrivalTime = self._queue.get(timeout=0.1)
             except queue.Empty:
                 continue
-            for callback in self.processors:
+            with self._lock:
+                seq = self._nextSeq
+                self._nextSeq += 1
+                processors = list(self.processors)
+            if self._pool is None:
+                self._processFrame(seq, frame, arrivalTime, processors)
+            else:
+                # bound the number of frames in flight so the queue remains the only place frames wait
+                self._inFlight.acquire()
                 try:
-                    callback(frame)
-                except Exception:
-                    printExc("Frame processing callback failed")
-            self.sigFrameFullyProcessed.emit(frame)
+                    self._pool.submit(self._processFrame, seq, frame, arrivalTime, processors)
+                except RuntimeError:  # pool was shut down
+                    self._inFlight.release()
+
+    def _processFrame(self, seq, frame, arrivalTime, processors):
+        try:
+            for proc in processors:
+                if proc.policy == "latest":
+                    self._latestWorkers[proc].post(seq, frame, arrivalTime)
+                elif proc.threadSafe:
+                    proc(frame, arrivalTime)
+                else:
+                    proc.runInOrder(seq, frame, arrivalTime)
+            with self._emitTurn:
+                while self._nextEmitSeq != seq:
+                    self._emitTurn.wait()
+            try:
+                self.sigFrameFullyProcessed.emit(frame)
+            finally:
+                with self._emitTurn:
+                    self._nextEmitSeq += 1
+                    self._emitTurn.notify_all()
+        finally:
+            if self._pool is not None:
+                self._inFlight.release()
 
 
 class AcquireThread(Thread):
@@ -915,21 +1155,18 @@ class AcquireThread(Thread):
                         if drop > 0:
                             print(f"WARNING: Camera dropped {drop} frames")
 
-                    # Build meta-info for this frame(s)
-                    info = camState.copy()
-
                     # Process all waiting frames. If there is more than one frame waiting, guess the frame times.
                     dt = (now - lastFrameTime) / len(frames)
                     if dt > 0:
-                        info["fps"] = 1.0 / dt
-                        self._recentFPS.append(info["fps"])
+                        fps = 1.0 / dt
+                        self._recentFPS.append(fps)
                     else:
-                        info["fps"] = None
+                        fps = None
 
                     for frame in frames:
-                        frameInfo = info.copy()
                         data = frame.pop("data")
-                        frameInfo.update(frame)  # copies 'time' key supplied by camera
+                        # Build meta-info for this frame; copies 'time' key supplied by camera
+                        frameInfo = {**camState, "fps": fps, **frame}
                         f = Frame(data, frameInfo)
                         self.dev._processingThread.handleNewRawFrame(f)
 
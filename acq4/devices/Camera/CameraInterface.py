@@ -113,8 +113,10 @@ class CameraInterface(CameraModuleInterface):
 
         # We get new frames by adding a processing step to the camera.
         # This allow us to attach metadata (background+contrast info) to the frames before
-        # they are consumed by anyone else
-        self.cam.addFrameProcessor(self.newFrame, final=True)
+        # they are consumed by anyone else. Display only needs the newest frame, so it runs
+        # separately and can never hold up recording.
+        self.cam.addFrameProcessor(self.displayFrame, policy='latest', name='display')
+        self.cam.addFrameProcessor(self.newFrame, final=True, name='record')
 
         # Signals from Camera device
         self.cam.sigCameraStopped.connect(self.cameraStopped)
@@ -136,7 +138,10 @@ class CameraInterface(CameraModuleInterface):
             dev.addKeyCallback(key['key'], self.hotkeyPressed, (action,))
 
     def newFrame(self, frame):
-        self.imagingCtrl.newFrame(frame)
+        self.imagingCtrl.recordFrame(frame)
+
+    def displayFrame(self, frame):
+        self.imagingCtrl.displayFrame(frame)
 
     def controlWidget(self):
         return self.widget
@@ -352,18 +352,10 @@ class DAQGenericTask(DeviceTask):
             # _DAQCmd[ch]['task'] = daqTask  ## ALSO DON't FORGET TO DELETE IT, ASS.
             if chConf['type'] in ['ao', 'do']:
                 # scale = self.getChanScale(ch)
-                cmdData = self._DAQCmd[ch]['command']
-                if cmdData is None:
+                if self._DAQCmd[ch]['command'] is None:
                     continue
                 # cmdData = cmdData * scale
-
-                ## apply scale, offset or inversion for output lines
-                cmdData = self.mapping.mapToDaq(ch, cmdData)
-
-                if chConf['type'] == 'do':
-                    cmdData = cmdData.astype(np.uint32)
-                    cmdData[cmdData <= 0] = 0
-                    cmdData[cmdData > 0] = 0xFFFFFFFF
+                cmdData = self._mapCommand(ch, chConf['type'])
 
                 daqTask.addChannel(chConf['channel'], chConf['type'], **self._DAQCmd[ch].get('lowLevelConf', {}))
                 self.daqTasks[ch] = daqTask  ## remember task so we can stop it later on
@@ -379,6 +371,31 @@ class DAQGenericTask(DeviceTask):
                 daqTask.addChannel(chConf['channel'], chConf['type'], **self._DAQCmd[ch].get('lowLevelConf', {}))
                 self.daqTasks[ch] = daqTask  ## remember task so we can stop it later on
 
+    def _mapCommand(self, ch, chType):
+        """Return the command waveform for output channel *ch*, mapped to DAQ values."""
+        ## apply scale, offset or inversion for output lines
+        cmdData = self.mapping.mapToDaq(ch, self._DAQCmd[ch]['command'])
+
+        if chType == 'do':
+            cmdData = cmdData.astype(np.uint32)
+            cmdData[cmdData <= 0] = 0
+            cmdData[cmdData > 0] = 0xFFFFFFFF
+        return cmdData
+
+    def rearm(self):
+        """Prepare to run the same command again without recreating DAQ channels.
+
+        Holding values and the channel mapping are refreshed as in configure(), and command waveforms are
+        re-sent to the DAQ task(s) created for the previous run.
+        """
+        self.configure()
+        chans = self.dev.listChannels()
+        for ch in self.bufferedChannels:
+            chConf = chans[ch]
+            if chConf['type'] in ['ao', 'do'] and self._DAQCmd[ch].get('command') is not None:
+                self.daqTasks[ch].setWaveform(chConf['channel'], self._mapCommand(ch, chConf['type']))
+        return True
+
     def getChanUnits(self, chan):
         if 'units' in self._DAQCmd[chan]:
             return self._DAQCmd[chan]['units']
@@ -456,10 +473,12 @@ class DAQGenericTask(DeviceTask):
         info = [axis(name='Channel', cols=cols), axis(name='Time', units='s', values=timeVals)] + [
             {'DAQ': daqState}]
 
-        protInfo = self._DAQCmd.copy()  ## copy everything but the command arrays and low-level configuration info
-        for ch in protInfo:
-            protInfo[ch].pop('command', None)
-            protInfo[ch].pop('lowLevelConf', None)
+        ## copy everything but the command arrays and low-level configuration info
+        ## (the command itself must be left intact so that the task can be run again)
+        protInfo = {
+            ch: {k: v for k, v in self._DAQCmd[ch].items() if k not in ('command', 'lowLevelConf')}
+            for ch in self._DAQCmd
+        }
         info[-1]['Protocol'] = protInfo
 
         return MetaArray(arr, info=info)
@@ -20,6 +20,13 @@ class Device(InterfaceMixin, Qt.QObject):  # QObject calls super, which is disas
     # used to ensure devices are shut down in the correct order
     _deviceCreationOrder = []
 
+    # If True, the Manager may create this device on a worker thread at startup, at the same time as other devices
+    # (see Manager.constructDevices). This is only safe if __init__ creates no widgets, no QObjects other than
+    # children of the device (which are moved to the main thread along with it), does not wait on the GUI thread,
+    # and only uses other devices that are named in its configuration. May be overridden with the 'concurrentInit'
+    # option in a device's configuration.
+    concurrentInit = False
+
     def __init__(self, deviceManager: acq4.Manager.Manager, config: dict, name: str):
         Qt.QObject.__init__(self)
 
@@ -226,6 +233,21 @@ class DeviceTask(object):
         """
         pass
 
+    def rearm(self):
+        """
+        This method is called by the parent task, in place of configure(),
+        when a task that has already run is executed again with the same
+        command. It should prepare the device to run again while reusing as
+        much of the previous configuration as possible (for example, without
+        recreating DAQ tasks or reconfiguring sample clocks).
+        
+        Return True if the task was re-armed. The default implementation
+        returns False, in which case the parent task discards all of its
+        DeviceTasks, creates new ones from the original command, and configures
+        them as usual.
+        """
+        return False
+
     def getStartOrder(self):
         """
         This method is called by the parent task before starting any devices.
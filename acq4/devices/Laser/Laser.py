@@ -758,6 +758,10 @@ class LaserTask(DAQGenericTask):
                 
 
         DAQGenericTask.__init__(self, dev, cmd['daqProtocol'], parentTask)
+
+    def rearm(self):
+        ## DAQ commands are generated in configure() and may depend on the current laser state
+        return False
         
     def configure(self):
         ##  Get rate: first get name of DAQ, then ask the DAQ task for its rate
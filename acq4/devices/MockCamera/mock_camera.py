@@ -298,7 +298,9 @@ class MockCamera(Camera):
             data = fn.downsample(data, bin[0], axis=0)
         if bin[1] > 1:
             data = fn.downsample(data, bin[1], axis=1)
-        data = data.astype(np.uint16)
+        out = self.frameBufferPool(data.shape, np.uint16).get()
+        np.copyto(out, data, casting="unsafe")
+        data = out
         prof()
 
         self.frameId += 1
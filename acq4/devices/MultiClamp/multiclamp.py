@@ -1,5 +1,7 @@
-import numpy as np
+import threading
 import time
+
+import numpy as np
 from MetaArray import MetaArray, axis
 
 from acq4.Manager import logMsg
@@ -27,10 +29,6 @@ class MultiClamp(PatchClamp):
         if daq is not None:
             self.daq = daq
 
-        # Cache MC parameters because they are very expensive to retrieve
-        # (especially with multiple channels)
-        self._paramCache = {}
-
         # device parameters that are expected to change when the clamp mode changes
         self.mode_dependent_params = [
             'PrimarySignal', 'SecondarySignal',
@@ -38,6 +36,12 @@ class MultiClamp(PatchClamp):
             'Holding', 'HoldingEnable',
             'PipetteOffset',
         ]
+        # Mirror MC parameters because they are very expensive to retrieve
+        # (especially with multiple channels). Only mode, primary gain and filter changes made in the commander
+        # window are telegraphed; with enableParameterCache, other manual changes are not seen (and recorded)
+        # until refreshParams() is called.
+        self._useMirror = self.config.get('enableParameterCache', False)
+        self._mirror = None
 
         self.stateLock = Mutex(Mutex.Recursive)  ## only for locking self.lastState and self.lastMode
         self.lastState = {}
@@ -99,6 +103,7 @@ class MultiClamp(PatchClamp):
             self.mc = mc.getChannel(self.config['channelID'], multiprocess.proxy(self.mcUpdate, callSync='off'))
         else:
             self.mc = mc.getChannel(self.config['channelID'], self.mcUpdate)
+        self._mirror = ParameterMirror(self.mc, self.mode_dependent_params)
         
         ## wait for first update..
         start = time.time()
@@ -125,6 +130,8 @@ class MultiClamp(PatchClamp):
                 self.mc.setParams(defaults[mode])
         self.setMode('VC')
         self.setMode('I=0')  ## safest mode to leave clamp in
+        if self._useMirror:
+            self._mirror.seed(MultiClampTask.recordParams)
 
         
         if dm is not None:
@@ -145,8 +152,9 @@ class MultiClamp(PatchClamp):
 
     def mcUpdate(self, state=None, mode=None):
         """MC state (or internal holding state) has changed, handle the update."""
+        if state is not None and self._mirror is not None:
+            self._mirror.update(state)
         with self.stateLock:
-            self._paramCache = {}  # not sure if this is necessary or helpful
             if state is None:
                 state = self.getLastState(mode)
             mode = state['mode']
@@ -185,29 +193,59 @@ class MultiClamp(PatchClamp):
         return self.mc.getState()
 
     def getParam(self, param):
-        if param not in self._paramCache:
-            val = self.mc.getParam(param)
-            if self.config.get('enableParameterCache', False):
-                self._paramCache[param] = val
-            else:
-                return val
-        return self._paramCache[param]
+        if self._useMirror:
+            return self._mirror.get([param])[param]
+        return self.mc.getParam(param)
+
+    def getParams(self, params):
+        """Return a dict of values for the named commander parameters."""
+        if self._useMirror:
+            return self._mirror.get(params)
+        return self.mc.getParams(params)
 
     def setParam(self, param, value):
-        if self.config.get('enableParameterCache', False):
-            if param in self._paramCache and self._paramCache[param] == value:
-                return
-            # use special setters for primary / secondary signals due to MCC bugs
-            if param == 'PrimarySignal':
-                self.mc.setPrimarySignal(value)
-            elif param == 'SecondarySignal':
-                self.mc.setSecondarySignal(value)
-            else:
-                self.mc.setParam(param, value)
-            self._paramCache.pop(param)
-            self.getParam(param)
+        if self._useMirror and self._mirror.cached(param, value):
+            return
+        # use special setters for primary / secondary signals due to MCC bugs
+        if param == 'PrimarySignal':
+            self.mc.setPrimarySignal(value)
+        elif param == 'SecondarySignal':
+            self.mc.setSecondarySignal(value)
         else:
             self.mc.setParam(param, value)
+        if param in ('PrimarySignal', 'SecondarySignal'):
+            # signals are set by name but read back as commander constants
+            self._mirror.invalidate([param])
+        else:
+            self._mirror.set(param, value)
+
+    def setParams(self, params):
+        """Set multiple commander parameters; return a dict of param: success."""
+        res = {}
+        for param, value in params.items():
+            try:
+                self.setParam(param, value)
+                res[param] = True
+            except Exception:
+                printExc("Error while setting parameter %s=%s" % (param, value))
+                res[param] = False
+        return res
+
+    def setPrimarySignal(self, signal):
+        self.setParam('PrimarySignal', signal)
+
+    def setSecondarySignal(self, signal):
+        self.setParam('SecondarySignal', signal)
+
+    def refreshParams(self):
+        """Re-read all mirrored parameters from the commander.
+
+        Telegraphs report only mode, gain and filter changes; call this after changing other settings
+        (eg. bridge balance) directly in the MultiClamp Commander window.
+        """
+        self._mirror.invalidate()
+        if self._useMirror:
+            self._mirror.seed(MultiClampTask.recordParams)
 
     def taskInterface(self, taskRunner):
         return MultiClampTaskGui(self, taskRunner)
@@ -313,15 +351,18 @@ class MultiClamp(PatchClamp):
     def autoPipetteOffset(self):
         #with self.dm.reserveDevices([self]):
         self.mc.autoPipetteOffset()
+        self._mirror.invalidate(['PipetteOffset'])
         
     def autoBridgeBalance(self):
         with self.dm.reserveDevices([self]):
             self.mc.autoBridgeBal()
+        self._mirror.invalidate(['BridgeBalEnable', 'BridgeBalResist'])
 
     def autoCapComp(self):
         #with self.dm.reserveDevices([self]):
         self.mc.autoFastComp()
         self.mc.autoSlowComp()
+        self._mirror.invalidate(['FastCompCap', 'FastCompTau', 'SlowCompCap', 'SlowCompTau'])
 
     def listSignals(self, mode):
         return self.mc.listSignals(mode)
@@ -335,16 +376,15 @@ class MultiClamp(PatchClamp):
         if mode not in ['VC', 'IC', 'I=0']:
             raise ValueError(f'MultiClamp mode "{mode}" not recognized.')
 
-        # these parameters change with clamp mode; need to invalidate cache
-        for param in self.mode_dependent_params:
-            self._paramCache.pop(param, None)
-        
         if self.dm is not None:
             with self.dm.reserveDevices([self, self.config['commandChannel']['device']]):
                 mcMode = self.mc.getMode()
                 if mcMode == mode:  ## Mode is already correct
                     return
 
+                # these parameters change with clamp mode; need to invalidate cache
+                self._mirror.invalidate(self.mode_dependent_params)
+
                 # If switching ic <-> vc, switch to i=0 first
                 if (mcMode=='IC' and mode=='VC') or (mcMode=='VC' and mode=='IC'):
                     self._switchingToMode = 'I=0'
@@ -358,11 +398,16 @@ class MultiClamp(PatchClamp):
 
                 # MC requires 200-400 ms to mode switch; don't allow anyone else to access during that time.
                 time.sleep(0.5)
+                # values read while the mode was changing may belong to the previous mode
+                self._mirror.invalidate(self.mode_dependent_params)
         else:
             mcMode = self.mc.getMode()
             if mcMode == mode:  ## Mode is already correct
                 return
 
+            # these parameters change with clamp mode; need to invalidate cache
+            self._mirror.invalidate(self.mode_dependent_params)
+
             # If switching ic <-> vc, switch to i=0 first
             if (mcMode=='IC' and mode=='VC') or (mcMode=='VC' and mode=='IC'):
                 self._switchingToMode = 'I=0'
@@ -376,6 +421,8 @@ class MultiClamp(PatchClamp):
 
             # MC requires 200-400 ms to mode switch; don't allow anyone else to access during that time.
             time.sleep(0.5)
+            # values read while the mode was changing may belong to the previous mode
+            self._mirror.invalidate(self.mode_dependent_params)
 
 
     def getDAQName(self, channel):
@@ -383,6 +430,76 @@ class MultiClamp(PatchClamp):
         return self.config[f'{channel}Channel']['device']
 
 
+class ParameterMirror:
+    """In-memory copy of the commander parameters for one MultiClamp channel.
+
+    Each parameter is read from the commander once, then kept current from telegraph updates and from values set
+    through the device. Parameters that depend on the clamp mode are dropped when the mode changes, and read again
+    the next time they are requested.
+    """
+    # telegraph state keys that report commander parameters
+    telegraphParams = {
+        'mode': 'Mode',
+        'primaryGain': 'PrimarySignalGain',
+        'LPFCutoff': 'PrimarySignalLPF',
+    }
+
+    def __init__(self, mc, modeDependentParams):
+        self.mc = mc
+        self.modeDependentParams = modeDependentParams
+        self.lock = threading.Lock()
+        self.values = {}
+        # incremented on every invalidation, so that values read from the commander meanwhile are not stored
+        self.generation = 0
+
+    def get(self, params):
+        """Return a dict of values for *params*, reading only those not already mirrored from the commander."""
+        with self.lock:
+            res = {p: self.values[p] for p in params if p in self.values}
+            generation = self.generation
+        missing = [p for p in params if p not in res]
+        if len(missing) > 0:
+            # no lock held here; telegraph updates must not wait on commander calls
+            fetched = self.mc.getParams(missing)
+            with self.lock:
+                if generation == self.generation:
+                    self.values.update(fetched)
+            res.update(fetched)
+        return {p: res[p] for p in params}
+
+    def seed(self, params):
+        self.get(params)
+
+    def cached(self, param, value):
+        """Return True if *param* is known to have *value* already."""
+        with self.lock:
+            return param in self.values and self.values[param] == value
+
+    def set(self, param, value):
+        with self.lock:
+            self.values[param] = value
+
+    def invalidate(self, params=None):
+        with self.lock:
+            self.generation += 1
+            if params is None:
+                self.values.clear()
+            else:
+                for param in params:
+                    self.values.pop(param, None)
+
+    def update(self, state):
+        """Apply a telegraph state update."""
+        with self.lock:
+            if state['mode'] != self.values.get('Mode', state['mode']):
+                self.generation += 1
+                for param in self.modeDependentParams:
+                    self.values.pop(param, None)
+            for key, param in self.telegraphParams.items():
+                if key in state:
+                    self.values[param] = state[key]
+
+
 class MultiClampTask(DeviceTask):
     recordParams = [
         'BridgeBalEnable',
@@ -450,18 +567,18 @@ class MultiClampTask(DeviceTask):
         #prof.mark('    Multiclamp: set state')   ## ~300ms if the commander has to do a page-switch.
 
         if 'primaryGain' in self.cmd:
-            self.dev.mc.setParam('PrimarySignalGain', self.cmd['primaryGain'])
+            self.dev.setParam('PrimarySignalGain', self.cmd['primaryGain'])
         if 'secondaryGain' in self.cmd:
             try:
                 ## this is likely to fail..
-                self.dev.mc.setParam('SecondarySignalGain', self.cmd['secondaryGain'])
+                self.dev.setParam('SecondarySignalGain', self.cmd['secondaryGain'])
             except:
                 printExc("Warning -- set secondary signal gain failed.")
 
         #prof.mark('    Multiclamp: set gains')
 
         if 'parameters' in self.cmd:
-            self.dev.mc.setParams(self.cmd['parameters'])
+            self.dev.setParams(self.cmd['parameters'])
 
         #prof.mark('    Multiclamp: set params')
 
@@ -479,7 +596,7 @@ class MultiClampTask(DeviceTask):
             else:
                 raise TypeError("MultiClamp task command['recordParams'] must be bool or list")
 
-            exState = self.dev.mc.getParams(recordParams)
+            exState = self.dev.getParams(recordParams)
             self.state['ClampParams'] = {}
             for k in exState:
                 self.state['ClampParams'][k] = exState[k]
@@ -523,6 +640,17 @@ class MultiClampTask(DeviceTask):
                     mode = chConf.get('mode', None)
                     daqTask.addChannel(chConf['channel'], chConf['type'], mode)
                 self.daqTasks[ch] = daqTask
+
+    def rearm(self):
+        """Prepare to run the same command again without recreating DAQ channels."""
+        self.configure()
+        if 'command' in self.daqTasks:
+            scale = self.state['extCmdScale']
+            if scale == 0.:
+                raise Exception('Can not execute command--external command sensitivity is disabled by MultiClamp commander!', 'ExtCmdSensOff')
+            chConf = self.dev.config['commandChannel']
+            self.daqTasks['command'].setWaveform(chConf['channel'], self.cmd['command'] / scale)
+        return True
         
     def start(self):
         ## possibly nothing required here, DAQ will start recording.
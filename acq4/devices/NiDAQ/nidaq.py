@@ -219,6 +219,14 @@ class NiDAQ(Device):
 
 
 class Task(DeviceTask):
+    """DAQ task shared by all devices in a Manager task.
+
+    Command keys are 'rate', 'numPts', 'downsample', 'triggerChan' / 'triggerDevice' and the filter / denoise options
+    used by getData(). If 'continuous' is True, the task runs until it is stopped: output waveforms of *numPts*
+    samples are regenerated in a loop and input data is streamed to subscribers (see subscribe()) in chunks of
+    'chunkSize' samples, with the most recent 'ringSize' samples retained (see SuperTask.startStreaming). Results are
+    not collected from continuous tasks.
+    """
     def __init__(self, dev, cmd, parentTask):
         DeviceTask.__init__(self, dev, cmd, parentTask)
         self.cmd = cmd
@@ -246,7 +254,7 @@ class Task(DeviceTask):
             return
         
         ## Determine the sample clock source, configure tasks
-        self.st.configureClocks(rate=self.cmd['rate'], nPts=self.cmd['numPts'])
+        self.st.configureClocks(rate=self.cmd['rate'], nPts=self.cmd['numPts'], continuous=self.isContinuous())
         
         ## Determine how the task will be triggered
         if 'triggerChan' in self.cmd:
@@ -258,6 +266,15 @@ class Task(DeviceTask):
             assert triggerChan is not None, f"Task requests for {tDevName} to trigger {self.dev.name()}, but no trigger channel is configured between these devices."
             self.st.setTrigger(triggerChan)
         
+    def rearm(self):
+        """Reuse the channels, clocks and triggers configured for the previous run.
+
+        Devices that write waveforms to this task re-send them from their own rearm(); all output data is written
+        to the hardware again when the task starts.
+        """
+        self.st.rearm()
+        return True
+
     def getStartOrder(self):
         before = []
         after = []
@@ -281,20 +298,46 @@ class Task(DeviceTask):
         
     def setWaveform(self, *args, **kwargs):
         return self.st.setWaveform(*args, **kwargs)
-        
+
+    def isContinuous(self):
+        return self.cmd.get('continuous', False)
+
+    def absChanName(self, channel):
+        """Return the absolute name of *channel* (as used to key streamed data)."""
+        return self.st.absChanName(channel)
+
+    def subscribe(self, callback):
+        """Register *callback* to receive chunks of input data while a continuous task runs.
+
+        Subscribe before the task is started to receive every sample. See SuperTask.subscribe for the chunk format.
+        """
+        self.st.subscribe(callback)
+
+    def unsubscribe(self, callback):
+        self.st.unsubscribe(callback)
+
     def start(self):
-        if self.st.hasTasks():
+        if not self.st.hasTasks():
+            return
+        if self.isContinuous():
+            self.st.startStreaming(chunkSize=self.cmd.get('chunkSize'), ringSize=self.cmd.get('ringSize'))
+        else:
             self.st.start()
         
     def isDone(self):
-        if self.st.hasTasks():
+        if self.st.isStreaming():
+            return False
+        elif self.st.hasTasks():
             return self.st.isDone()
         else:
             return True
         
         
     def stop(self, wait=False, abort=False):
-        if self.st.hasTasks():
+        if self.isContinuous():
+            # every device using this task may stop it; only the first call stops the stream
+            self.st.stopStreaming()
+        elif self.st.hasTasks():
             #print "stopping ST..."
             self.st.stop(wait=wait, abort=abort)
             #print "   ST stopped"
@@ -5,10 +5,83 @@ from acq4.util.Mutex import Mutex
 from acq4.Interfaces import InterfaceMixin
 import pyqtgraph as pg
 import collections
+import contextlib
+import threading
 import numpy as np
 import six
 
 
+class _PendingTransformSignals(object):
+    """Set of devices whose transforms changed while their sigTransformChanged was deferred.
+
+    flush() emits sigTransformChanged once per device (parents before children), no matter how many times
+    each transform changed in the meantime.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._devices = collections.OrderedDict()
+
+    def add(self, dev):
+        """Add *dev* and return True if it is the first device added since the last flush."""
+        with self._lock:
+            first = len(self._devices) == 0
+            self._devices[dev] = None
+        return first
+
+    def flush(self):
+        with self._lock:
+            devices = list(self._devices)
+            self._devices.clear()
+        for dev in sorted(devices, key=lambda d: len(d.parentDevices())):
+            dev.sigTransformChanged.emit(dev)
+
+
+class _DeferredTransformSignals(Qt.QObject):
+    """Emits deferred transform change signals from the GUI thread once per event loop iteration."""
+    sigFlush = Qt.Signal()
+    _instance = None
+    _instanceLock = threading.Lock()
+
+    @classmethod
+    def instance(cls):
+        """Return the shared instance, or None if there is no QApplication to deliver deferred signals."""
+        with cls._instanceLock:
+            if cls._instance is None:
+                app = Qt.QApplication.instance()
+                if app is None:
+                    return None
+                inst = cls()
+                # the instance may be created from any thread; its flush slot must run in the GUI thread
+                inst.moveToThread(app.thread())
+                inst.sigFlush.connect(inst.flush, Qt.Qt.QueuedConnection)
+                cls._instance = inst
+            return cls._instance
+
+    def __init__(self):
+        Qt.QObject.__init__(self)
+        self.pending = _PendingTransformSignals()
+
+    def add(self, dev):
+        if self.pending.add(dev):
+            self.sigFlush.emit()
+
+    @Qt.Slot()
+    def flush(self):
+        self.pending.flush()
+
+
+_transformBatch = threading.local()
+
+
+def _mapPoints(tr, points):
+    """Map an (N, 2) or (N, 3) array of points through the affine transform *tr*."""
+    points = np.asarray(points, dtype=float)
+    m = np.array(tr.copyDataTo()).reshape(4, 4)
+    n = points.shape[-1]
+    # 2D points are mapped as if z=0, like QPointF
+    return points @ m[:n, :n].T + m[:n, 3]
+
+
 class OptomechDevice(InterfaceMixin):
     """
     OptomechDevice is a mixin to the Device class that manages coordinate system mapping between
@@ -266,6 +339,24 @@ class OptomechDevice(InterfaceMixin):
         else:
             return parent.mapToGlobal(o2, subdev)
     
+    def mapPointsToGlobal(self, points, subdev=None):
+        """Map an array of points with shape (N, 3) or (N, 2) from local coordinates to global.
+
+        This is equivalent to mapToGlobal(points.T).T, but is computed with a single matrix multiplication.
+        """
+        tr = self.globalTransform(subdev)
+        if tr is None:
+            return self.mapToGlobal(np.asarray(points).T, subdev).T
+        return _mapPoints(tr, points)
+
+    def mapPointsFromGlobal(self, points, subdev=None):
+        """Map an array of points with shape (N, 3) or (N, 2) from global coordinates to local.
+        """
+        tr = self.inverseGlobalTransform(subdev)
+        if tr is None:
+            return self.mapFromGlobal(np.asarray(points).T, subdev).T
+        return _mapPoints(tr, points)
+
     def mapToDevice(self, device, obj, subdev=None):
         """Map *obj* from local coordinates to *device*'s coordinate system."""
         subdev = self._subdevDict(subdev)
@@ -400,7 +491,16 @@ class OptomechDevice(InterfaceMixin):
         else:
             return dev.inverseDeviceTransform() * tr 
     
-    def setDeviceTransform(self, tr):
+    def setDeviceTransform(self, tr, deferSignals=False):
+        """Set the transform that maps from this device's local coordinates to its parent's coordinates.
+
+        Cached transforms are invalidated immediately, so mapping methods always use the new transform. Normally
+        sigTransformChanged is emitted before returning. Inside a transformBatch() block, it is instead emitted
+        once when the block ends. If *deferSignals* is True, it is emitted from the GUI thread on the next event
+        loop iteration; devices that update their transform at a high rate (e.g. stages streaming position updates)
+        use this so that, however many updates arrive in between, each change is propagated through the device
+        tree only once per iteration.
+        """
         if isinstance(tr, dict):
             allowed = {"pos", "scale", "angle", "axis"}
             if len(set(tr.keys()) - allowed) > 0:
@@ -408,8 +508,38 @@ class OptomechDevice(InterfaceMixin):
         with self.__lock:
             self.__transform = pg.SRTTransform3D(tr)
             self.invalidateCachedTransforms()
-        
-        self.sigTransformChanged.emit(self)
+
+        batch = getattr(_transformBatch, 'pending', None)
+        deferred = _DeferredTransformSignals.instance() if deferSignals else None
+        if batch is not None:
+            batch.add(self)
+        elif deferred is not None:
+            deferred.add(self)
+        else:
+            self.sigTransformChanged.emit(self)
+
+    @staticmethod
+    @contextlib.contextmanager
+    def transformBatch():
+        """Context manager that coalesces transform change signals.
+
+        Devices whose transforms are set inside the block emit sigTransformChanged only once each, when the
+        outermost block exits. Use this when moving several devices together::
+
+            with OptomechDevice.transformBatch():
+                for dev, tr in changes:
+                    dev.setDeviceTransform(tr)
+        """
+        if getattr(_transformBatch, 'pending', None) is not None:
+            yield
+            return
+        _transformBatch.pending = _PendingTransformSignals()
+        try:
+            yield
+        finally:
+            pending = _transformBatch.pending
+            _transformBatch.pending = None
+            pending.flush()
 
     def globalTransform(self, subdev=None):
         """
@@ -574,8 +704,13 @@ class OptomechDevice(InterfaceMixin):
         with self.__lock:
             if invalidateLocal:
                 self.__inverseTransform = 0
+            # children can only cache their global transforms after this device has cached its own, so if this
+            # device's cache is already empty, so are theirs
+            alreadyInvalid = isinstance(self.__globalTransform, int) and isinstance(self.__inverseGlobalTransform, int)
             self.__globalTransform = 0
             self.__inverseGlobalTransform = 0
+        if alreadyInvalid:
+            return
 
         # child global transforms must also be invalidated before any change signals are emitted
         for ch in self.__children:
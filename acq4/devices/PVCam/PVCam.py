@@ -126,12 +126,14 @@ class PVCam(Camera):
     
         dt = (now - self.lastFrameTime) / diff
         frames = []
+        pool = self.frameBufferPool(self.acqBuffer.shape[1:], self.acqBuffer.dtype)
         for i in range(diff):
             fInd = int((i+self.lastIndex+1) % self.ringSize)
             frame = {}
             frame['time'] = self.lastFrameTime + (dt * (i+1))
             frame['id'] = self.frameId
-            frame['data'] = self.acqBuffer[fInd].copy()
+            frame['data'] = pool.get()
+            frame['data'][...] = self.acqBuffer[fInd]
             #print frame['data']
             frames.append(frame)
             self.frameId += 1
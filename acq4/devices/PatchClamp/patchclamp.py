@@ -1,17 +1,23 @@
-import numpy as np
 from typing import Literal
 
 from acq4.devices.Device import Device
 from acq4.devices.PatchClamp.gui import PatchClampDeviceGui
 from acq4.devices.PatchClamp.testpulse import TestPulseThread
-from acq4.filetypes.MultiPatchLog import TEST_PULSE_NUMPY_DTYPE
+from acq4.devices.PatchClamp.testpulse_history import TestPulseHistory
 from acq4.util import Qt
 from neuroanalysis.test_pulse import PatchClampTestPulse
 
 
 class PatchClamp(Device):
     """Base class for all patch clamp amplifier devices.
-    
+
+    Configuration
+    -------------
+    testPulseHistory : dict
+        Optional arguments to TestPulseHistory, e.g. ``{'capacity': 10000, 'tiers': [(1.0, 3600), (60.0, 10080)]}``
+        to set how many test pulse results are kept at full resolution and the (bin width, number of bins) of each
+        downsampled tier.
+
     Signals
     -------
     sigStateChanged(state)
@@ -31,9 +37,8 @@ class PatchClamp(Device):
         self.config = config
         self._lastTestPulse = None
         self._testPulseThread = None
+        self._testPulseHistory = TestPulseHistory(**config.get('testPulseHistory', {}))
         self._initTestPulse(config.get('testPulse', {}))
-        self._testPulseHistorySize = 0
-        self._testPulseHistory = None
         self._testPulseAnalysisOverrides = {}
 
     def deviceInterface(self, win):
@@ -124,29 +129,24 @@ class PatchClamp(Device):
 
     def _testPulseFinished(self, dev, result: PatchClampTestPulse):
         self._lastTestPulse = result
-        if self._testPulseHistorySize >= self._testPulseHistory.shape[0]:
-            newTPH = np.empty(self._testPulseHistory.shape[0] * 2, dtype=self._testPulseHistory.dtype)
-            newTPH[:self._testPulseHistory.shape[0]] = self._testPulseHistory
-            self._testPulseHistory = newTPH
-        analysis = result.analysis
-        self._testPulseHistory[self._testPulseHistorySize]['event_time'] = result.start_time
-        for k in analysis:
-            val = analysis[k]
-            if val is None:
-                val = np.nan
-            self._testPulseHistory[self._testPulseHistorySize][k] = val
-        self._testPulseHistorySize += 1
+        self._testPulseHistory.append(result.start_time, result.analysis)
 
         self.sigTestPulseFinished.emit(self, result)
 
-    def testPulseHistory(self):
-        return self._testPulseHistory[:self._testPulseHistorySize].copy()
+    def testPulseHistory(self, start=None, stop=None, resolution=None, maxPoints=None, stat='mean'):
+        """Return test pulse analysis results as an array of TEST_PULSE_NUMPY_DTYPE.
+
+        With no arguments, all results still kept at full resolution are returned. Otherwise, results between
+        *start* and *stop* are returned at the requested *resolution* (seconds) or downsampled to about *maxPoints*;
+        see TestPulseHistory.window().
+        """
+        if start is None and stop is None and resolution is None and maxPoints is None:
+            return self._testPulseHistory.recent()
+        return self._testPulseHistory.window(start, stop, resolution=resolution, maxPoints=maxPoints, stat=stat)
 
     def resetTestPulseHistory(self):
         self._lastTestPulse = None
-        self._testPulseHistory = np.empty(1000, dtype=TEST_PULSE_NUMPY_DTYPE)
-
-        self._testPulseHistorySize = 0
+        self._testPulseHistory.clear()
 
     def enableTestPulse(self, enable=True, block=False):
         if enable:
@@ -129,14 +129,21 @@ class TestPulseThread(Thread):
         params = self._params
         runMode = currentMode if params['clampMode'] is None else params['clampMode']
 
-        # Can't reuse tasks yet; remove this when we can.
-        self._lastTask = None
-
-        if self._lastTask is None or self._lastTask._paramIndex != params['_index'] or self._lastTask._clampMode != runMode:
+        # Reuse the previous task (re-armed by Task.execute without reconfiguring the DAQ) as long as the command
+        # would be unchanged. The holding level is baked into the command waveform, so auto bias in IC mode
+        # causes the task to be rebuilt whenever the bias current changes.
+        holding = self._clampDev.getHolding(runMode)
+        if (
+            self._lastTask is None
+            or self._lastTask._paramIndex != params['_index']
+            or self._lastTask._clampMode != runMode
+            or self._lastTask._holding != holding
+        ):
             taskParams = self.paramsForMode(runMode)
             task = self.createTask(taskParams)
             task._paramIndex = params['_index']
             task._clampMode = runMode
+            task._holding = holding
             self._lastTask = task
             self._lastTaskParams = taskParams
         else:
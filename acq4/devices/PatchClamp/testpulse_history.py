@@ -0,0 +1,200 @@
+import threading
+
+import numpy as np
+
+from acq4.filetypes.MultiPatchLog import TEST_PULSE_NUMPY_DTYPE
+
+
+class _RingBuffer:
+    """Fixed-size buffer of float rows; once full, each new row overwrites the oldest one."""
+
+    def __init__(self, size, nFields):
+        self.data = np.full((size, nFields), np.nan)
+        self.head = 0  # index where the next row is written
+        self.count = 0
+        self.dropped = False  # True once any row has been overwritten
+
+    def append(self, row):
+        self.data[self.head] = row
+        self.head = (self.head + 1) % len(self.data)
+        if self.count == len(self.data):
+            self.dropped = True
+        else:
+            self.count += 1
+
+    def rows(self):
+        """Return a copy of all rows, oldest first."""
+        start = (self.head - self.count) % len(self.data)
+        return np.roll(self.data, -start, axis=0)[:self.count]
+
+    def clear(self):
+        self.data[:] = np.nan
+        self.head = 0
+        self.count = 0
+        self.dropped = False
+
+
+class _Tier:
+    """Min / max / mean of every field over consecutive time bins of fixed width."""
+
+    def __init__(self, width, size, nFields):
+        self.width = width
+        self.nFields = nFields
+        # each stored row is [bin start, *means, *mins, *maxs]
+        self.bins = _RingBuffer(size, 1 + 3 * nFields)
+        self._resetBin(None)
+
+    def _resetBin(self, index):
+        self._bin = index
+        self._sum = np.zeros(self.nFields)
+        self._n = np.zeros(self.nFields)
+        self._min = np.full(self.nFields, np.nan)
+        self._max = np.full(self.nFields, np.nan)
+
+    def add(self, time, row):
+        index = np.floor(time / self.width)
+        if self._bin is not None and index != self._bin:
+            self.bins.append(self._currentBin())
+            self._resetBin(index)
+        self._bin = index
+        valid = ~np.isnan(row)
+        self._sum[valid] += row[valid]
+        self._n[valid] += 1
+        self._min = np.fmin(self._min, row)
+        self._max = np.fmax(self._max, row)
+
+    def _currentBin(self):
+        with np.errstate(invalid='ignore'):
+            mean = self._sum / self._n
+        return np.concatenate([[self._bin * self.width], mean, self._min, self._max])
+
+    def rows(self):
+        """Return all bins (including the one still being accumulated), oldest first."""
+        rows = self.bins.rows()
+        if self._bin is not None:
+            rows = np.concatenate([rows, self._currentBin()[np.newaxis]])
+        return rows
+
+    def firstTime(self):
+        """Start time of the oldest retained bin, or None if there are no bins."""
+        if self.bins.count > 0:
+            return self.bins.rows()[0, 0]
+        if self._bin is not None:
+            return self._bin * self.width
+        return None
+
+    def clear(self):
+        self.bins.clear()
+        self._resetBin(None)
+
+
+class TestPulseHistory:
+    """Bounded history of test pulse analysis results.
+
+    The most recent *capacity* results are kept at full resolution in a ring buffer. Every result is also added to
+    a set of decimated tiers, one per (bin width in seconds, number of bins) pair in *tiers*, which keep the mean,
+    min and max of each field over each bin. Memory use is fixed no matter how long test pulses run: with the
+    defaults, about 15 minutes of 10 Hz test pulses are kept at full resolution, 1 s bins for an hour, 10 s bins for
+    a day and 1 min bins for a week.
+
+    Results are arrays of TEST_PULSE_NUMPY_DTYPE (or *dtype*), the first field of which must be the event time.
+    """
+
+    def __init__(self, capacity=10000, tiers=((1.0, 3600), (10.0, 8640), (60.0, 10080)), dtype=TEST_PULSE_NUMPY_DTYPE):
+        self.dtype = np.dtype(dtype)
+        self.fields = self.dtype.names
+        nFields = len(self.fields)
+        self._raw = _RingBuffer(capacity, nFields)
+        self._tiers = [_Tier(width, size, nFields - 1) for width, size in sorted(tiers)]
+        self._lock = threading.Lock()
+
+    def append(self, time, values):
+        """Add one result. *values* maps field names to values; missing or None values are stored as NaN."""
+        row = np.array([time] + [np.nan if values.get(k) is None else values[k] for k in self.fields[1:]], dtype=float)
+        with self._lock:
+            self._raw.append(row)
+            for tier in self._tiers:
+                tier.add(time, row[1:])
+
+    def clear(self):
+        with self._lock:
+            self._raw.clear()
+            for tier in self._tiers:
+                tier.clear()
+
+    def __len__(self):
+        """Number of results retained at full resolution."""
+        return self._raw.count
+
+    def recent(self):
+        """Return all results retained at full resolution, oldest first."""
+        with self._lock:
+            return self._toRecords(self._raw.rows())
+
+    def window(self, start=None, stop=None, resolution=None, maxPoints=None, stat='mean'):
+        """Return results between *start* and *stop* with approximately the requested time resolution.
+
+        Data comes from the coarsest source (full-resolution results or one of the tiers) whose bin width does not
+        exceed *resolution*, falling back to coarser tiers when that source no longer reaches back to *start*. If
+        *start* is None, the window begins at the oldest retained data. If *maxPoints* is given instead of
+        *resolution*, the finest source that returns no more than that many points is used. For tier data,
+        *stat* selects 'mean', 'min' or 'max' of each bin, and the event time is the start of the bin.
+        """
+        if stat not in ('mean', 'min', 'max'):
+            raise ValueError("stat must be 'mean', 'min' or 'max'")
+        with self._lock:
+            sources = [(0.0, self._raw)] + [(tier.width, tier) for tier in self._tiers]
+            if start is None:
+                firstTimes = [self._firstTime(src) for _, src in sources]
+                firstTimes = [t for t in firstTimes if t is not None]
+                if len(firstTimes) == 0:
+                    return np.empty(0, dtype=self.dtype)
+                start = min(firstTimes)
+            if resolution is None and maxPoints is not None:
+                # the finest source that reaches back to start with few enough points, or else the coarsest one
+                covering = [src for _, src in sources if self._covers(src, start)] or [sources[-1][1]]
+                for src in covering:
+                    if self._count(src, start, stop) <= maxPoints:
+                        break
+            else:
+                resolution = resolution or 0.0
+                # the coarsest sources that are fine enough, followed by coarser ones as a fallback
+                candidates = [s for s in sources if s[0] <= resolution][::-1]
+                candidates += [s for s in sources if s[0] > resolution]
+                for width, src in candidates:
+                    if self._covers(src, start):
+                        break
+
+            if src is self._raw:
+                rows = src.rows()
+            else:
+                rows = src.rows()
+                n = src.nFields
+                col = {'mean': 1, 'min': 1 + n, 'max': 1 + 2 * n}[stat]
+                rows = np.concatenate([rows[:, :1], rows[:, col:col + n]], axis=1)
+
+        times = rows[:, 0]
+        first = np.searchsorted(times, start, side='left')
+        last = len(times) if stop is None else np.searchsorted(times, stop, side='right')
+        return self._toRecords(rows[first:last])
+
+    def _firstTime(self, src):
+        if src is self._raw:
+            return src.rows()[0, 0] if src.count > 0 else None
+        return src.firstTime()
+
+    def _count(self, src, start, stop):
+        """Number of rows in *src* between *start* and *stop*."""
+        times = src.rows()[:, 0]
+        last = len(times) if stop is None else np.searchsorted(times, stop, side='right')
+        return last - np.searchsorted(times, start, side='left')
+
+    def _covers(self, src, start):
+        """Whether *src* still holds everything it received after *start*."""
+        if not (src.dropped if src is self._raw else src.bins.dropped):
+            return True
+        first = self._firstTime(src)
+        return first is not None and first <= start
+
+    def _toRecords(self, rows):
+        return np.ascontiguousarray(rows, dtype=float).view(self.dtype).reshape(len(rows))
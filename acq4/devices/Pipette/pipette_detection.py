@@ -1,7 +1,7 @@
 from __future__ import print_function
 import scipy.optimize, scipy.ndimage
 import numpy as np
-from acq4.util.image_registration import iterativeImageTemplateMatch
+from acq4.util.image_registration import IterativeTemplateMatcher
 import pyqtgraph as pg
 
 
@@ -89,35 +89,45 @@ class PipetteDetector(object):
 
 
 class TemplateMatchPipetteDetector(PipetteDetector):
-    def __init__(self, reference):
+    def __init__(self, reference, gradientSize=(3, 3)):
         PipetteDetector.__init__(self, reference)
+        self.gradientSize = tuple(gradientSize)
+        self._matcher = None
+
+    @property
+    def matcher(self):
+        """IterativeTemplateMatcher for the filtered reference frames, created on first use.
+        """
+        if self._matcher is None:
+            self._matcher = IterativeTemplateMatcher(np.stack(self.filtered_ref))
+        return self._matcher
 
     def estimateOffset(self, img, show=False):
         reference = self.reference
 
-        # run template match against all template frames
-        match = [iterativeImageTemplateMatch(img, t) for t in self.filtered_ref]
+        # run template match against all template frames at once
+        offsets, vals = self.matcher.match(img)
 
         if show:
-            pg.plot([m[0][0] for m in match], title='x match vs z')
-            pg.plot([m[0][1] for m in match], title='y match vs z')
-            pg.plot([m[1] for m in match], title='match correlation vs z')
+            pg.plot(offsets[:, 0], title='x match vs z')
+            pg.plot(offsets[:, 1], title='y match vs z')
+            pg.plot(vals, title='match correlation vs z')
 
         # find frame with best match
-        maxInd = np.argmax([m[1] for m in match])
+        maxInd = np.argmax(vals)
 
         # estimate z error in meters from focal plane
         zErr = (maxInd - reference['centerInd']) * reference['zStep']
 
         # xy offset in pixels from image origin
-        xyOffset = match[maxInd][0]
+        xyOffset = offsets[maxInd]
 
-        return xyOffset, zErr, match[maxInd][1]
+        return xyOffset, zErr, vals[maxInd]
 
     def filterImage(self, img):
         # Sobel should reduce background artifacts, but it also seems to increase the noise in the signal
         # itself--two images with slightly different focus can have a very bad match.
         # import skimage.feature
         # return skimage.filter.sobel(img)
-        img = scipy.ndimage.morphological_gradient(img, size=(3, 3))
+        img = scipy.ndimage.morphological_gradient(img, size=self.gradientSize)
         return img
@@ -23,9 +23,11 @@ class PipetteTracker(object):
     """
 
     detectorClass = TemplateMatchPipetteDetector
+    detectorOpts = {}  # extra arguments for detectorClass, e.g. filter parameters
 
     def __init__(self, pipette):
         self.dev = pipette
+        self._detectors = {}
         fileName = self.dev.configFileName("ref_frames.pk")
         try:
             with open(fileName, "rb") as fh:
@@ -250,7 +252,7 @@ class PipetteTracker(object):
         minImgPos, maxImgPos, tipRelPos = self.getTipImageArea(frame, padding, pos=pos, tipLength=tipLength)
 
         # apply machine vision algorithm
-        detector = self.detectorClass(reference)
+        detector = self._getDetector(reference)
         tipPos, performance = detector.findPipette(frame, minImgPos, maxImgPos, pos, bg_frame)
 
         if performance < threshold:
@@ -270,6 +272,19 @@ class PipetteTracker(object):
         measuredTipPos, corr = self.measureTipPosition(padding, threshold, frame, pos=pos, movePipette=movePipette)
         return tuple([measuredTipPos[i] - expectedTipPos[i] for i in (0, 1, 2)])
 
+    def _getDetector(self, reference):
+        """Return a detector for *reference*.
+
+        Detectors are reused for as long as the same reference frames and detector options are in use, so that the
+        filtered templates (and their spectra) are only computed once rather than on every measurement.
+        """
+        key = (self._getImager().getDeviceStateKey(), self.detectorClass, tuple(sorted(self.detectorOpts.items())))
+        detector = self._detectors.get(key)
+        if detector is None or detector.reference is not reference:
+            detector = self.detectorClass(reference, **self.detectorOpts)
+            self._detectors[key] = detector
+        return detector
+
     def _getReference(self):
         key = self._getImager().getDeviceStateKey()
         try:
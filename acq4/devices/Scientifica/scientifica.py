@@ -85,10 +85,17 @@ class Scientifica(Stage):
             self.objectiveState = None
             self._checkObjective()
 
-        # thread for polling position changes
-
-        self.monitor = MonitorThread(self, self.monitorObj)
-        self.monitor.start()
+        # poll for position changes: with the shared serial reactor if the port has one, otherwise in a thread
+        reactor = self.dev.reactor
+        if reactor is not None:
+            self.monitor = reactor.addPoller(self.dev.getPosAsync, self._positionReceived, interval=300e-3,
+                                             minInterval=100e-3)
+            if self.monitorObj is True:
+                self.objMonitor = reactor.addPoller(lambda: self.dev.sendAsync('obj'), self._objectiveReceived,
+                                                    interval=300e-3, minInterval=300e-3)
+        else:
+            self.monitor = MonitorThread(self, self.monitorObj)
+            self.monitor.start()
 
     def axes(self):
         return 'x', 'y', 'z'
@@ -136,8 +143,13 @@ class Scientifica(Stage):
 
     def _getPosition(self):
         # Called by superclass when user requests position refresh
+        pos = self.dev.getPos()
+        self._positionReceived(pos)
+        return pos
+
+    def _positionReceived(self, pos):
+        # Called with each position read from the device; return True if the position changed
         with self.lock:
-            pos = self.dev.getPos()
             if pos != self._lastPos:
                 self._lastPos = pos
                 emit = True
@@ -148,7 +160,7 @@ class Scientifica(Stage):
             # don't emit signal while locked
             self.posChanged(pos)
 
-        return pos
+        return emit
 
     def targetPosition(self):
         with self.lock:
@@ -160,6 +172,8 @@ class Scientifica(Stage):
     def quit(self):
         if hasattr(self, 'monitor'):  # in case __init__ failed
             self.monitor.stop()
+        if hasattr(self, 'objMonitor'):
+            self.objMonitor.stop()
         Stage.quit(self)
 
     def _move(self, pos, speed, linear, **kwargs):
@@ -181,11 +195,16 @@ class Scientifica(Stage):
         self.dev.send('VJ -%d %d %d' % tuple(s))
 
     def _checkObjective(self):
+        self._objectiveReceived(self.dev.send('obj'))
+
+    def _objectiveReceived(self, obj):
         with self.lock:
-            obj = int(self.dev.send('obj'))
+            obj = int(obj)
             if obj != self.objectiveState:
                 self.objectiveState = obj
                 self.sigSwitchChanged.emit(self, {'objective': obj})
+                return True
+        return False
 
     def getSwitch(self, name):
         if name == 'objective' and self.monitorObj:
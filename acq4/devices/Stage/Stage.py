@@ -306,7 +306,9 @@ class Stage(Device, OptomechDevice):
             lastPos = self._lastPos
             self._lastPos = pos
             self._stageTransform, self._inverseStageTransform = self._makeStageTransform(pos)
-            self._updateTransform()
+            # position updates can arrive faster than the device tree can handle; propagate at most once per
+            # event loop iteration
+            self._updateTransform(deferSignals=True)
 
         self.sigPositionChanged.emit(self, pos, lastPos)
 
@@ -335,9 +337,9 @@ class Stage(Device, OptomechDevice):
         self._inverseBaseTransform = None
         self._updateTransform()
 
-    def _updateTransform(self):
+    def _updateTransform(self, deferSignals=False):
         ## this informs rigidly-connected devices that they have moved
-        self.setDeviceTransform(self._baseTransform * self._stageTransform)
+        self.setDeviceTransform(self._baseTransform * self._stageTransform, deferSignals=deferSignals)
 
     @property
     def positionUpdatesPerSecond(self):
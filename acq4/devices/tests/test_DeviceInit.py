@@ -0,0 +1,106 @@
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pyqtgraph as pg
+import pytest
+
+from acq4.Manager import constructDevices, deviceDependencies
+from acq4.devices.Device import Device
+from acq4.util import Qt
+
+
+class SlowDevice(Device):
+    concurrentInit = True
+
+    def __init__(self, dm, config, name):
+        Device.__init__(self, dm, config, name)
+        self.timer = Qt.QTimer(self)
+        self.parent = dm.getDevice(config['parentDevice']) if 'parentDevice' in config else None
+        self.thread_ = threading.current_thread()
+        time.sleep(config.get('delay', 0.1))
+        if config.get('fail'):
+            raise RuntimeError(f"{name} failed")
+
+
+class MainThreadDevice(SlowDevice):
+    concurrentInit = False
+
+
+CONFIG = {
+    'DAQ': {'driver': 'SlowDevice'},
+    'Stage1': {'driver': 'SlowDevice'},
+    'Stage2': {'driver': 'SlowDevice'},
+    'Camera': {'driver': 'MainThreadDevice', 'parentDevice': 'Stage1'},
+    'Clamp': {'driver': 'SlowDevice', 'channels': {'primary': {'device': 'DAQ', 'channel': '/Dev1/ai0'}}},
+    'Pipette': {'driver': 'SlowDevice', 'parentDevice': 'Stage2', 'clampDevice': 'Clamp'},
+}
+
+
+def build(config, maxWorkers):
+    pg.mkQApp()
+    devs = {}
+    dm = MagicMock()
+    dm.getDevice.side_effect = lambda name: devs[name]
+    classes = {'SlowDevice': SlowDevice, 'MainThreadDevice': MainThreadDevice}
+
+    def construct(name):
+        devs[name] = classes[config[name]['driver']](dm, config[name], name)
+        return devs[name]
+
+    order = []
+    results = {}
+    for name, result in constructDevices(deviceDependencies(config), construct,
+                                         lambda name: classes[config[name]['driver']].concurrentInit,
+                                         maxWorkers=maxWorkers, starting=lambda name, inThread: order.append(name)):
+        results[name] = result
+    return devs, results, order
+
+
+def test_device_dependencies():
+    deps = {name: sorted(d) for name, d in deviceDependencies(CONFIG).items()}
+    assert deps == {'DAQ': [], 'Stage1': [], 'Stage2': [], 'Camera': ['Stage1'], 'Clamp': ['DAQ'],
+                    'Pipette': ['Clamp', 'Stage2']}
+
+
+def test_construct_devices():
+    start = time.perf_counter()
+    devs, results, order = build(CONFIG, maxWorkers=8)
+    elapsed = time.perf_counter() - start
+    # three levels of dependencies, each 0.1 s
+    assert elapsed < 0.45
+    assert set(devs) == set(CONFIG)
+    for name, result in results.items():
+        assert result.result() is devs[name]
+        assert result.elapsed >= 0.1
+    for name, deps in deviceDependencies(CONFIG).items():
+        for dep in deps:
+            assert order.index(dep) < order.index(name)
+    assert devs['Pipette'].parent is devs['Stage2']
+
+    # devices built in the background belong to the main thread afterward, along with their children
+    app = Qt.QCoreApplication.instance()
+    assert devs['Clamp'].thread_ is not threading.main_thread()
+    assert devs['Camera'].thread_ is threading.main_thread()
+    for dev in devs.values():
+        assert dev.thread() is app.thread() and dev.timer.thread() is app.thread()
+
+    # without workers, devices are created one at a time in the calling thread
+    start = time.perf_counter()
+    devs, results, order = build(CONFIG, maxWorkers=0)
+    assert time.perf_counter() - start >= 0.6
+    assert all(dev.thread_ is threading.main_thread() for dev in devs.values())
+
+
+def test_construct_errors_and_cycles():
+    config = dict(CONFIG)
+    config['DAQ'] = {'driver': 'SlowDevice', 'fail': True}
+    # a cycle between the two stages
+    config['Stage1'] = {'driver': 'SlowDevice', 'delay': 0.01, 'note': 'Stage2'}
+    config['Stage2'] = {'driver': 'SlowDevice', 'delay': 0.01, 'note': 'Stage1'}
+    devs, results, order = build(config, maxWorkers=4)
+    with pytest.raises(RuntimeError):
+        results['DAQ'].result()
+    assert results['DAQ'].elapsed is None
+    assert set(order) == set(config)
+    assert results['Pipette'].result() is devs['Pipette']
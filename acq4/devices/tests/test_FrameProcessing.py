@@ -0,0 +1,86 @@
+import threading
+import time
+
+from acq4.devices.Camera.Camera import FrameProcessingThread
+from acq4.util import Qt
+
+
+def _runFrames(thread, frames, timeout=10):
+    """Start *thread*, feed it *frames*, and return the frames emitted once the queue has been processed."""
+    done = threading.Event()
+    emitted = []
+    expected = thread.stats()['queueDepth'] + len(frames)
+
+    def fullyProcessed(frame):
+        emitted.append(frame)
+        if len(emitted) == expected:
+            done.set()
+
+    thread.sigFrameFullyProcessed.connect(fullyProcessed, type=Qt.Qt.DirectConnection)
+    thread.start()
+    try:
+        for f in frames:
+            thread.handleNewRawFrame(f)
+        assert done.wait(timeout)
+    finally:
+        thread.stop()
+        thread.wait(5000)
+    return emitted
+
+
+def test_ordered_parallel_processing():
+    thread = FrameProcessingThread(workers=4)
+    serialOrder = []
+    active = [0]
+    maxActive = [0]
+    lock = threading.Lock()
+
+    def slowThreadSafe(frame):
+        with lock:
+            active[0] += 1
+            maxActive[0] = max(maxActive[0], active[0])
+        time.sleep(0.01)
+        with lock:
+            active[0] -= 1
+
+    thread.addFrameProcessor(slowThreadSafe, threadSafe=True, name='slow')
+    thread.addFrameProcessor(serialOrder.append, name='serial')
+    slowLatest = thread.addFrameProcessor(lambda f: time.sleep(0.05), policy='latest', name='display')
+
+    frames = list(range(40))
+    emitted = _runFrames(thread, frames)
+
+    assert emitted == frames
+    assert serialOrder == frames
+    assert maxActive[0] > 1
+    stats = thread.stats()
+    assert stats['processors']['serial']['processed'] == 40
+    assert stats['processors']['slow']['processed'] == 40
+    # slow 'latest' processor only sees some of the frames, and its drops are counted
+    assert slowLatest.dropped > 0
+    assert slowLatest.processed + slowLatest.dropped <= 40
+
+
+def test_bounded_queue_blocks_producer():
+    thread = FrameProcessingThread(queueSize=10, workers=1)
+    recorded = []
+    depths = []
+
+    def record(frame):
+        time.sleep(0.002)
+        depths.append(thread.stats()['queueDepth'])
+        recorded.append(frame)
+
+    recorder = thread.addFrameProcessor(record, name='recorder')
+    display = thread.addFrameProcessor(lambda f: time.sleep(0.05), policy='latest', name='display')
+
+    # frames arriving faster than a lossless processor can keep up wait for room in the queue rather than being
+    # discarded or piling up without limit
+    assert _runFrames(thread, list(range(100))) == list(range(100))
+    assert recorded == list(range(100))
+    assert max(depths) <= 10
+    stats = thread.stats()
+    assert stats['queueSize'] == 10
+    assert stats['blocked'] > 0
+    assert stats['processors']['recorder']['dropped'] == recorder.dropped == 0
+    assert stats['processors']['display']['dropped'] == display.dropped > 0
@@ -0,0 +1,228 @@
+import queue
+import sys
+import threading
+import time
+import types
+from unittest import mock
+from unittest.mock import MagicMock
+
+import pyqtgraph as pg
+
+import acq4.drivers
+from acq4.devices.MultiClamp.multiclamp import MultiClamp, MultiClampTask
+
+MODE_PARAMS = {
+    'VC': {'Holding': -0.065, 'HoldingEnable': True, 'PipetteOffset': 0.012, 'PrimarySignal': 'SIGNAL_VC_MEMBCURRENT',
+           'SecondarySignal': 'SIGNAL_VC_MEMBPOTENTIAL', 'PrimarySignalGain': 2.0, 'SecondarySignalGain': 1.0},
+    'IC': {'Holding': 0.0, 'HoldingEnable': False, 'PipetteOffset': 0.011, 'PrimarySignal': 'SIGNAL_IC_MEMBPOTENTIAL',
+           'SecondarySignal': 'SIGNAL_IC_MEMBCURRENT', 'PrimarySignalGain': 5.0, 'SecondarySignalGain': 1.0},
+}
+
+SHARED_PARAMS = {
+    'BridgeBalEnable': False, 'BridgeBalResist': 0.0, 'FastCompCap': 3e-12, 'FastCompTau': 1e-6,
+    'LeakSubEnable': False, 'LeakSubResist': 0.0, 'NeutralizationCap': 0.0, 'NeutralizationEnable': False,
+    'OutputZeroAmplitude': 0.0, 'OutputZeroEnable': False, 'PrimarySignalHPF': 0.0, 'PrimarySignalLPF': 10e3,
+    'RsCompBandwidth': 1e3, 'RsCompCorrection': 0.0, 'RsCompEnable': False, 'SlowCompCap': 0.0,
+    'SlowCompTau': 1e-5, 'WholeCellCompCap': 0.0, 'WholeCellCompEnable': False, 'WholeCellCompResist': 0.0,
+}
+
+
+class FakeMultiClampChannel:
+    """Stands in for acq4.drivers.MultiClamp.MultiClampChannel with a simulated MultiClamp Commander.
+
+    Every parameter read or write costs *callDelay* seconds, as a call through AxMultiClampMsg does. Like the
+    commander, each mode (I=0 shares IC settings) has its own holding, offset, and output signal settings, and
+    telegraphs are delivered from a separate thread when the mode, primary gain, or filter change.
+    Use commanderSet() to simulate changes made in the commander window.
+    """
+
+    def __init__(self, callDelay=2e-3, mode='I=0'):
+        self.callDelay = callDelay
+        self.mode = mode
+        self.modeParams = {m: dict(p) for m, p in MODE_PARAMS.items()}
+        self.sharedParams = dict(SHARED_PARAMS)
+        self.calls = 0
+        self.callback = None
+        self.state = None
+        self.mc = types.SimpleNamespace(quit=lambda: None)
+        self.telegraphs = queue.Queue()
+        threading.Thread(target=self._telegraphLoop, daemon=True).start()
+
+    def _params(self, param):
+        mode = 'IC' if self.mode == 'I=0' else self.mode
+        return self.modeParams[mode] if param in MODE_PARAMS['VC'] else self.sharedParams
+
+    def value(self, param):
+        """Current commander value (without the cost of a call)."""
+        return self.mode if param == 'Mode' else self._params(param)[param]
+
+    def commanderSet(self, param, value):
+        if param == 'Mode':
+            self.mode = value
+        else:
+            self._params(param)[param] = value
+        if param in ('Mode', 'PrimarySignalGain', 'PrimarySignalLPF', 'PrimarySignal', 'SecondarySignal'):
+            self.telegraph()
+
+    def telegraph(self):
+        vc = self.mode == 'VC'
+        self.telegraphs.put({
+            'mode': self.mode,
+            'primarySignal': self.value('PrimarySignal'),
+            'primaryGain': self.value('PrimarySignalGain'),
+            'primaryUnits': 'A' if vc else 'V',
+            'primaryScaleFactor': 1.0 / (0.5e9 * self.value('PrimarySignalGain')),
+            'secondarySignal': self.value('SecondarySignal'),
+            'secondaryGain': 1.0,
+            'secondaryUnits': 'V' if vc else 'A',
+            'secondaryScaleFactor': 0.1,
+            'membraneCapacitance': 0.0,
+            'LPFCutoff': self.value('PrimarySignalLPF'),
+            'extCmdScale': 0.02 if vc else 4e-10,
+        })
+
+    def waitTelegraphs(self):
+        self.telegraphs.join()
+
+    def _telegraphLoop(self):
+        while True:
+            state = self.telegraphs.get()
+            self.state = state
+            try:
+                if self.callback is not None:
+                    self.callback(state)
+            finally:
+                self.telegraphs.task_done()
+
+    def _call(self):
+        self.calls += 1
+        time.sleep(self.callDelay)
+
+    def setCallback(self, cb):
+        self.callback = cb
+        self.telegraph()
+
+    def getState(self):
+        return self.state
+
+    def getMode(self):
+        return self.state['mode']
+
+    def getParam(self, param):
+        self._call()
+        return self.value(param)
+
+    def getParams(self, params):
+        return {p: self.getParam(p) for p in params}
+
+    def setParam(self, param, value):
+        self._call()
+        self.commanderSet(param, value)
+
+    def setParams(self, params):
+        for p, v in params.items():
+            self.setParam(p, v)
+        return {p: True for p in params}
+
+    def setMode(self, mode):
+        self.setParam('Mode', mode)
+        self.waitTelegraphs()
+
+    def setPrimarySignal(self, signal):
+        self.setParam('PrimarySignal', 'SIGNAL_%s_%s' % ('IC' if self.mode == 'I=0' else self.mode, signal))
+
+    def setSecondarySignal(self, signal):
+        self.setParam('SecondarySignal', 'SIGNAL_%s_%s' % ('IC' if self.mode == 'I=0' else self.mode, signal))
+
+    def autoPipetteOffset(self):
+        self._call()
+        self._params('PipetteOffset')['PipetteOffset'] += 1e-3
+
+
+def makeClamp(channel, **config):
+    """Create a MultiClamp device connected to *channel* (a FakeMultiClampChannel)."""
+    pg.mkQApp()
+    driver = types.ModuleType('acq4.drivers.MultiClamp')
+    mc = types.SimpleNamespace(getChannel=lambda chanId, callback: channel.setCallback(callback) or channel)
+    driver.MultiClamp = types.SimpleNamespace(instance=lambda: mc)
+    config.update({
+        'channelID': 'model:MC700B,sn:1,chan:1',
+        'commandChannel': {'device': 'DAQ', 'channel': '/Dev1/ao0', 'type': 'ao'},
+        'primaryChannel': {'device': 'DAQ', 'channel': '/Dev1/ai0', 'type': 'ai'},
+        'secondaryChannel': {'device': 'DAQ', 'channel': '/Dev1/ai1', 'type': 'ai'},
+    })
+    with mock.patch.dict(sys.modules, {'acq4.drivers.MultiClamp': driver}), \
+            mock.patch.object(acq4.drivers, 'MultiClamp', driver, create=True):
+        return MultiClamp(MagicMock(), config, 'Clamp')
+
+
+def configureTask(clamp, **cmd):
+    cmd.setdefault('mode', 'VC')
+    cmd.setdefault('recordState', True)
+    task = MultiClampTask(clamp, cmd, None)
+    task.configure()
+    return task.state
+
+
+def assertMirrorConsistent(clamp, channel):
+    state = configureTask(clamp, mode=channel.mode)
+    for param, value in state['ClampParams'].items():
+        assert value == channel.value(param), param
+
+
+def test_task_configure_reads_mirror():
+    channel = FakeMultiClampChannel()
+    clamp = makeClamp(channel, enableParameterCache=True)
+    configureTask(clamp)
+    calls = channel.calls
+    for i in range(5):
+        state = configureTask(clamp, parameters={'FastCompCap': 4e-12})
+    # the parameter is written once, and recorded state comes from memory
+    assert channel.calls == calls + 1
+    assert state['ClampParams']['FastCompCap'] == 4e-12
+    assert state['ClampParams']['Holding'] == -0.065
+    assertMirrorConsistent(clamp, channel)
+
+
+def test_mirror_follows_telegraphs_and_mode_changes():
+    channel = FakeMultiClampChannel()
+    clamp = makeClamp(channel, enableParameterCache=True)
+    clamp.setMode('VC')
+    assertMirrorConsistent(clamp, channel)
+
+    # gain and filter changes made in the commander arrive by telegraph
+    channel.commanderSet('PrimarySignalGain', 10.0)
+    channel.commanderSet('PrimarySignalLPF', 2e3)
+    channel.waitTelegraphs()
+    calls = channel.calls
+    assert clamp.getParams(['PrimarySignalGain', 'PrimarySignalLPF']) == {'PrimarySignalGain': 10.0,
+                                                                         'PrimarySignalLPF': 2e3}
+    assert channel.calls == calls
+
+    # switching mode (from acq4 or the commander) drops values that belong to the previous mode
+    configureTask(clamp, mode='IC', primary='MEMBCURRENT')
+    assert clamp.getParam('PrimarySignal') == 'SIGNAL_IC_MEMBCURRENT'
+    assertMirrorConsistent(clamp, channel)
+    channel.commanderSet('Mode', 'VC')
+    channel.waitTelegraphs()
+    assertMirrorConsistent(clamp, channel)
+
+    # settings changed by acq4 are kept without reading them back
+    clamp.autoPipetteOffset()
+    clamp.setParam('BridgeBalResist', 15e6)
+    assertMirrorConsistent(clamp, channel)
+
+    # other commander changes are not telegraphed; refreshParams picks them up
+    channel.commanderSet('WholeCellCompCap', 20e-12)
+    clamp.refreshParams()
+    assertMirrorConsistent(clamp, channel)
+
+
+def test_mirror_disabled():
+    channel = FakeMultiClampChannel()
+    clamp = makeClamp(channel)
+    configureTask(clamp)
+    calls = channel.calls
+    configureTask(clamp)
+    assert channel.calls == calls + len(MultiClampTask.recordParams)
+    assertMirrorConsistent(clamp, channel)
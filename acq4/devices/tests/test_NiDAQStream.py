@@ -0,0 +1,62 @@
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+from MetaArray import MetaArray
+
+from acq4.drivers.nidaq.mock import NIDAQ
+from acq4.drivers.nidaq.SuperTask import RingBuffer, StreamRecorder
+
+
+def test_ring_buffer():
+    ring = RingBuffer(2, 10, float)
+    written = np.vstack([np.arange(27), -np.arange(27)]).astype(float)
+    for chunk in (written[:, :4], written[:, 4:12], written[:, 12:13], written[:, 13:]):
+        ring.write(chunk)
+    assert ring.count == 27
+    index, data = ring.read()
+    assert index == 17
+    assert np.all(data == written[:, 17:])
+    index, data = ring.read(3)
+    assert index == 24
+    assert np.all(data == written[:, 24:])
+
+
+def test_stream():
+    rate = 20000.
+    st = NIDAQ.createSuperTask()
+    st.addChannel('/Dev1/ai0', 'ai', mockStreamFunc=lambda t: t)
+    st.addChannel('/Dev1/ai1', 'ai', mockStreamFunc=lambda t: -t)
+    st.configureClocks(rate=rate, nPts=10000, continuous=True)
+
+    chunks = []
+    tmp = tempfile.mkdtemp()
+    try:
+        fileName = os.path.join(tmp, 'stream.ma')
+        st.subscribe(chunks.append)
+        st.subscribe(StreamRecorder(fileName))
+        st.startStreaming(chunkSize=500, ringSize=2000, interval=0.01)
+        assert st.isStreaming()
+        time.sleep(0.3)
+        st.stopStreaming()
+        assert not st.isStreaming()
+
+        # chunks are contiguous and complete
+        assert len(chunks) > 5
+        assert all(len(c['data']['/Dev1/ai0']) == 500 for c in chunks[:-1])
+        ai0 = np.concatenate([c['data']['/Dev1/ai0'] for c in chunks])
+        assert np.allclose(ai0, np.arange(len(ai0)) / rate)
+        assert [c['start'] for c in chunks] == list(np.cumsum([0] + [len(c['data']['/Dev1/ai0']) for c in chunks[:-1]]))
+
+        recent = st.getStreamData(1000)
+        assert recent['start'] == len(ai0) - 1000
+        assert np.allclose(recent['data']['/Dev1/ai1'], -ai0[-1000:])
+
+        ma = MetaArray(file=fileName)
+        assert ma.shape == (2, len(ai0))
+        assert np.allclose(ma['Channel': '/Dev1/ai0'].asarray(), ai0)
+        assert np.allclose(ma.xvals('Time'), ai0)
+    finally:
+        shutil.rmtree(tmp)
@@ -0,0 +1,65 @@
+import threading
+
+import numpy as np
+import pyqtgraph as pg
+
+from acq4.devices import OptomechDevice as optomech
+from acq4.devices.OptomechDevice import OptomechDevice
+
+
+def makeTree():
+    pg.mkQApp()
+    root = OptomechDevice(None, {}, 'root')
+    child = OptomechDevice(None, {}, 'child')
+    child.setParentDevice(root)
+    child.setDeviceTransform({'pos': (1e-3, 0, 0), 'angle': 90, 'axis': (0, 0, 1)})
+    changes = {'root': [], 'child': []}
+    root.sigTransformChanged.connect(lambda dev: changes['root'].append(dev))
+    child.sigGlobalTransformChanged.connect(lambda dev, changed: changes['child'].append(changed))
+    return root, child, changes
+
+
+def test_transform_batch():
+    root, child, changes = makeTree()
+    with OptomechDevice.transformBatch():
+        for i in range(5):
+            root.setDeviceTransform({'pos': (0, i * 1e-3, 0)})
+            # mapping reflects the change even though signals have not been emitted yet
+            assert np.allclose(child.mapToGlobal((0, 0, 0)), (1e-3, i * 1e-3, 0))
+        assert changes == {'root': [], 'child': []}
+    assert changes == {'root': [root], 'child': [root]}
+
+
+def test_deferred_signals():
+    root, child, changes = makeTree()
+    for i in range(5):
+        root.setDeviceTransform({'pos': (0, i * 1e-3, 0)}, deferSignals=True)
+    assert changes['root'] == []
+    pg.QtWidgets.QApplication.processEvents()
+    assert changes == {'root': [root], 'child': [root]}
+
+
+def test_deferred_signals_from_worker_thread(monkeypatch):
+    root, child, changes = makeTree()
+    # the shared instance is created by whichever thread first defers a signal
+    monkeypatch.setattr(optomech._DeferredTransformSignals, '_instance', None)
+    threads = []
+    root.sigTransformChanged.connect(lambda dev: threads.append(threading.current_thread()))
+    worker = threading.Thread(target=root.setDeviceTransform, args=({'pos': (0, 1e-3, 0)},),
+                              kwargs={'deferSignals': True})
+    worker.start()
+    worker.join()
+    assert changes['root'] == []
+    pg.QtWidgets.QApplication.processEvents()
+    assert changes == {'root': [root], 'child': [root]}
+    assert threads == [threading.main_thread()]
+
+
+def test_map_points():
+    root, child, changes = makeTree()
+    root.setDeviceTransform({'pos': (0, 2e-3, 5e-3), 'scale': (2, 2, 2)})
+    points = np.random.default_rng(0).normal(size=(10, 3))
+    mapped = child.mapPointsToGlobal(points)
+    assert np.allclose(mapped, [child.mapToGlobal(tuple(p)) for p in points])
+    assert np.allclose(child.mapPointsFromGlobal(mapped), points)
+    assert np.allclose(child.mapPointsToGlobal(points[:, :2]), [child.mapToGlobal(tuple(p)) for p in points[:, :2]])
@@ -0,0 +1,93 @@
+from unittest.mock import MagicMock
+
+import numpy as np
+import pyqtgraph as pg
+
+from acq4.Manager import Task
+from acq4.devices.DAQGeneric.DAQGeneric import DAQGeneric
+from acq4.devices.Device import Device, DeviceTask
+from acq4.devices.NiDAQ.nidaq import NiDAQ
+
+
+class CountingTask(DeviceTask):
+    created = 0
+    configured = 0
+
+    def __init__(self, dev, cmd, parentTask):
+        DeviceTask.__init__(self, dev, cmd, parentTask)
+        CountingTask.created += 1
+
+    def configure(self):
+        CountingTask.configured += 1
+
+
+class CountingDevice(Device):
+    def createTask(self, cmd, parentTask):
+        return CountingTask(self, cmd, parentTask)
+
+
+def makeDevices(extra=False):
+    pg.mkQApp()
+    devs = {}
+    dm = MagicMock()
+    dm.getDevice.side_effect = lambda name: devs[name]
+    devs['DAQ'] = NiDAQ(dm, {'mock': True}, 'DAQ')
+    devs['Dev'] = DAQGeneric(dm, {'channels': {
+        'cmd': {'device': 'DAQ', 'channel': '/Dev1/ao0', 'type': 'ao', 'scale': 2.0},
+        'rec': {'device': 'DAQ', 'channel': '/Dev1/ai0', 'type': 'ai'},
+    }}, 'Dev')
+    if extra:
+        devs['Counter'] = CountingDevice(dm, {}, 'Counter')
+    return dm
+
+
+def makeCommand(written, extra=False):
+    cmd = {
+        'protocol': {'duration': 0.01},
+        'DAQ': {'rate': 10000, 'numPts': 100},
+        'Dev': {
+            'cmd': {'command': np.linspace(0, 1, 100), 'lowLevelConf': {'mockFunc': lambda d, dt: written.append(d.copy())}},
+            'rec': {'record': True},
+        },
+    }
+    if extra:
+        cmd['Counter'] = {}
+    return cmd
+
+
+def test_rearm_daq_task():
+    dm = makeDevices()
+    written = []
+    cmd = makeCommand(written)
+    task = Task(dm, cmd)
+    task.execute()
+    assert task.getResult()['Dev'].shape == (2, 100)
+    superTask = task.tasks['DAQ'].st
+
+    # waveform is re-sent (with the current channel mapping) on every run, but DAQ channels are not recreated
+    cmd['Dev']['cmd']['command'][:] = 0.25
+    task.execute()
+    result = task.getResult()
+    assert task.tasks['DAQ'].st is superTask
+    assert len(written) == 2
+    assert np.all(written[0] == np.linspace(0, 2, 100))
+    assert np.all(written[1] == 0.5)
+    assert result['Dev'].shape == (2, 100)
+    assert 'command' in cmd['Dev']['cmd']
+
+
+def test_rearm_fallback():
+    dm = makeDevices(extra=True)
+    written = []
+    task = Task(dm, makeCommand(written, extra=True))
+    CountingTask.created = CountingTask.configured = 0
+    daqTask = task.tasks['DAQ']
+    for i in range(3):
+        task.execute()
+        task.getResult()
+
+    # CountingTask does not support rearm, so all device tasks are recreated and configured for every run
+    assert CountingTask.configured == 3
+    assert CountingTask.created == 2
+    assert task.tasks['DAQ'] is not daqTask
+    assert len(written) == 3
@@ -0,0 +1,52 @@
+from unittest.mock import MagicMock
+
+import pyqtgraph as pg
+
+from acq4.Manager import Task
+from acq4.devices.Device import Device, DeviceTask
+
+
+class StoringTask(DeviceTask):
+    def getResult(self):
+        return {}
+
+    def storeResult(self, dirHandle):
+        self.dev.stored.append(dirHandle)
+
+
+class StoringDevice(Device):
+    def __init__(self, dm, config, name):
+        Device.__init__(self, dm, config, name)
+        self.stored = []
+
+    def createTask(self, cmd, parentTask):
+        return StoringTask(self, cmd, parentTask)
+
+
+def runTask(deferStorage):
+    pg.mkQApp()
+    dm = MagicMock()
+    dev = StoringDevice(dm, {}, 'Dev')
+    dm.getDevice.side_effect = lambda name: dev
+    storageDir = MagicMock()
+    protocol = {'duration': 0.0, 'storeData': True, 'storageDir': storageDir, 'deferStorage': deferStorage}
+    task = Task(dm, {'protocol': protocol, 'Dev': {}})
+    task.execute()
+    task.getResult()
+    return task, dev, storageDir
+
+
+def test_store_on_stop():
+    task, dev, storageDir = runTask(deferStorage=False)
+    assert dev.stored == [storageDir]
+    storageDir.setInfo.assert_called_once()
+
+
+def test_deferred_storage():
+    task, dev, storageDir = runTask(deferStorage=True)
+    assert dev.stored == []
+    storageDir.setInfo.assert_not_called()
+
+    task.storeResult()
+    assert dev.stored == [storageDir]
+    storageDir.setInfo.assert_called_once()
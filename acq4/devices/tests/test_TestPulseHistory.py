@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from acq4.devices.PatchClamp.testpulse_history import TestPulseHistory as History
+from acq4.filetypes.MultiPatchLog import TEST_PULSE_NUMPY_DTYPE
+
+
+def fill(history, times):
+    for t in times:
+        history.append(t, {'steady_state_resistance': t * 2, 'capacitance': None})
+
+
+def test_recent_is_bounded():
+    history = History(capacity=100)
+    fill(history, np.arange(250) * 0.1)
+    recent = history.recent()
+    assert recent.dtype == np.dtype(TEST_PULSE_NUMPY_DTYPE)
+    assert len(history) == len(recent) == 100
+    assert np.allclose(recent['event_time'], np.arange(150, 250) * 0.1)
+    assert np.allclose(recent['steady_state_resistance'], recent['event_time'] * 2)
+    assert np.all(np.isnan(recent['capacitance']))
+
+
+def test_window_tiers():
+    history = History(capacity=100, tiers=((1.0, 50), (10.0, 50)))
+    fill(history, np.arange(1000) * 0.1)  # 100 s at 10 Hz
+
+    # full resolution only reaches back 10 s
+    assert np.allclose(history.window(95.0, 96.0)['event_time'], np.arange(950, 961) * 0.1)
+
+    # older data comes from the 1 s tier, which keeps min / max / mean of each bin
+    old = history.window(60.0, 62.0)
+    assert np.allclose(old['event_time'], [60, 61, 62])
+    assert np.allclose(old['steady_state_resistance'], [120.9, 122.9, 124.9])
+    assert np.allclose(history.window(60.0, 62.0, stat='max')['steady_state_resistance'], [121.8, 123.8, 125.8])
+    assert np.allclose(history.window(60.0, 62.0, stat='min')['steady_state_resistance'], [120.0, 122.0, 124.0])
+
+    # beyond the 1 s tier's 50 bins, fall back to the 10 s tier; the bin in progress is included
+    everything = history.window()
+    assert np.allclose(everything['event_time'], np.arange(10) * 10)
+    assert np.allclose(everything['steady_state_resistance'][-1], np.mean(np.arange(900, 1000) * 0.2))
+
+    # a coarse resolution request uses a coarse tier even when finer data is available
+    assert len(history.window(90.0, resolution=10.0)) == 1
+    assert len(history.window(50.0, maxPoints=5)) == 5
+
+
+def test_window_maxPoints_prefers_raw_data():
+    history = History()
+    fill(history, np.arange(300) * 0.1)
+    # full-resolution data that already fits is returned unchanged
+    recent = history.recent()
+    for maxPoints in (2000, 300):
+        window = history.window(maxPoints=maxPoints)
+        assert np.array_equal(window['event_time'], recent['event_time'])
+        assert np.array_equal(window['steady_state_resistance'], recent['steady_state_resistance'])
+    # otherwise the finest tier that fits is used
+    assert len(history.window(maxPoints=299)) == 30
+    assert len(history.window(maxPoints=20)) == 3
+
+
+def test_clear():
+    history = History(capacity=10)
+    fill(history, np.arange(20) * 0.1)
+    history.clear()
+    assert len(history.recent()) == 0
+    assert len(history.window()) == 0
+    with pytest.raises(ValueError):
+        history.window(stat='median')
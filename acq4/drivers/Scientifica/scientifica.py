@@ -9,6 +9,7 @@ from typing import Optional
 from acq4.util.Mutex import RecursiveMutex as RLock
 from acq4.util.debug import printExc
 from ..SerialDevice import SerialDevice
+from ..SerialReactor import mapFuture
 from ...util.typing import Number
 
 # Data provided by Scientifica
@@ -61,6 +62,7 @@ class Scientifica(SerialDevice):
     """
     openDevices = {}
     availableDevices = None
+    useReactor = True
 
     @classmethod
     def enumerateDevices(cls) -> dict[str, str]:
@@ -172,14 +174,15 @@ class Scientifica(SerialDevice):
         del Scientifica.openDevices[port]
 
     def send(self, msg, timeout=5.0):
-        with self.lock:
-            self.write(msg + '\r')
-            try:
-                result = self.readUntil(b'\r', timeout=timeout)[:-1]
-                self.readAll() # should be nothing left in the buffer at this point
-            except TimeoutError:
-                self.readAll()
-                raise
+        return self.sendAsync(msg, timeout=timeout).result()
+
+    def sendAsync(self, msg, timeout=5.0):
+        """Send a command and return a Future that resolves to the response (see send()).
+
+        When the serial port is serviced by a SerialReactor, this returns without waiting for the response.
+        """
+        def checkResult(result):
+            result = result[:-1]
             if result.startswith(b'E,'):
                 errno = int(result.strip()[2:])
                 exc = RuntimeError(f"Received error {errno:d} from Scientifica controller (request: {msg!r})")
@@ -187,6 +190,8 @@ class Scientifica(SerialDevice):
                 raise exc
             return result
 
+        return mapFuture(self.request(msg + '\r', term=b'\r', timeout=timeout), checkResult)
+
     def getFirmwareVersion(self):
         return self.send('DATE').partition(b' ')[2].partition(b'\t')[0]
 
@@ -259,15 +264,8 @@ class Scientifica(SerialDevice):
         before returning). However, this relies on having correct axis scaling--see get/setAxisScale().
         """
         with self.lock:
-            ## request position
-            if self._version < 3:
-                packet = self.send('POS')
-                scale = 10.
-            else:
-                packet = self.send('P')
-                scale = 100.
             try:
-                return [int(x) / scale for x in packet.split(b'\t')]
+                return self.getPosAsync().result()
             except ValueError:
                 if _tryagain:
                     # packet corruption; clear and try again
@@ -277,6 +275,15 @@ class Scientifica(SerialDevice):
                 else:
                     raise
 
+    def getPosAsync(self):
+        """Request the current position, and return a Future that resolves to the position (see getPos)."""
+        ## request position
+        if self._version < 3:
+            cmd, scale = 'POS', 10.
+        else:
+            cmd, scale = 'P', 100.
+        return mapFuture(self.sendAsync(cmd), lambda packet: [int(x) / scale for x in packet.split(b'\t')])
+
     _param_commands = {
         'maxSpeed': ('TOP', 'TOP %f', float),
         'minSpeed': ('FIRST', 'FIRST %f', float),
@@ -481,8 +488,7 @@ class Scientifica(SerialDevice):
                 self.setSpeed(speed)
 
             # Send move command
-            self.write(b'ABS %d %d %d\r' % tuple(pos))
-            self.readUntil(b'\r')
+            self.request(b'ABS %d %d %d\r' % tuple(pos), term=b'\r').result()
 
     def zeroPosition(self):
         """Reset the stage coordinates to (0, 0, 0) without moving the stage.
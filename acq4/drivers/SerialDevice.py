@@ -1,9 +1,13 @@
 import logging
 import sys
+import threading
 import time
+from concurrent.futures import Future
 
 import serial
 
+from .SerialReactor import SerialReactor
+
 
 class DataError(Exception):
     """Raised when a serial communication is corrupt.
@@ -25,8 +29,14 @@ class SerialDevice(object):
 
     Provides some commonly used functions for reading and writing 
     serial packets.
+
+    Subclasses that set *useReactor* = True have their port serviced by the shared SerialReactor (where the platform
+    allows it): reads wait for data to arrive instead of polling, and request() returns a Future without blocking.
+    Such subclasses must not access self.serial directly to read data.
     """
 
+    useReactor = False
+
     def __init__(self, **kwds):
         """
         All keyword arguments define the default arguments to use when 
@@ -35,7 +45,12 @@ class SerialDevice(object):
         If both 'port' and 'baudrate' are provided here, then 
         self.open() is called automatically.
         """
+        if getattr(self, 'serial', None) is not None:
+            # re-initializing (eg. to try another baud rate); release the port first
+            SerialDevice.close(self)
         self.serial = None
+        self._channel = None
+        self._requestLock = threading.RLock()
         self.__serialOpts = {
             'bytesize': serial.EIGHTBITS,
             'timeout': 0,  # no timeout. See SerialDevice._readWithTimeout()
@@ -78,15 +93,33 @@ class SerialDevice(object):
         self.__serialOpts.update(kwds)
         self.serial = serial.Serial(**self.__serialOpts)
         logging.info('Opened serial port: %s', self.__serialOpts)
+        if self.useReactor and SerialReactor.available(self.serial):
+            self._channel = SerialReactor.instance().register(self.serial, port)
+
+    @property
+    def reactor(self):
+        """The SerialReactor servicing this port, or None if the port is polled."""
+        return None if self._channel is None else self._channel.reactor
 
     def close(self):
         """Close the serial port."""
+        if self._channel is not None:
+            self._channel.reactor.unregister(self._channel)
+            self._channel = None
+        if self.serial is None:
+            return
         self.serial.close()
         self.serial = None
         logging.info('Closed serial port: %s', self.__serialOpts['port'])
 
     def readAll(self):
         """Read all bytes waiting in buffer; non-blocking."""
+        if self._channel is not None:
+            d = self._channel.readAll()
+            if len(d) > 0:
+                logging.info('Serial port %s readAll: %r', self.__serialOpts['port'], d)
+                return d
+            return ''
         n = self.serial.inWaiting()
         if n > 0:
             d = self.serial.read(n)
@@ -99,7 +132,43 @@ class SerialDevice(object):
         if sys.version > '3' and isinstance(data, str):
             data = data.encode()
         logging.info('Serial port %s write: %r', self.__serialOpts['port'], data)
-        self.serial.write(data)
+        if self._channel is not None:
+            self._channel.write(data)
+        else:
+            self.serial.write(data)
+
+    def request(self, data, term=None, length=None, timeout=5.0):
+        """Write *data* and return a Future that resolves to the response.
+
+        The response is complete when *term* has been received (it is included in the response), or when *length*
+        bytes have been received; the Future fails with TimeoutError if that takes longer than *timeout*. Any
+        unread data are discarded before *data* is written.
+
+        If the port is serviced by a SerialReactor, requests are queued and written in order, and this method
+        returns immediately. Otherwise the request is carried out before returning.
+        """
+        if isinstance(data, str):
+            data = data.encode()
+        if isinstance(term, str):
+            term = term.encode()
+        if self._channel is not None:
+            return self._channel.request(data, term=term, length=length, timeout=timeout)
+
+        fut = Future()
+        with self._requestLock:
+            self.readAll()
+            self.write(data)
+            try:
+                if term is not None:
+                    result = self.readUntil(term, timeout=timeout)
+                else:
+                    result = self.read(length, timeout=timeout)
+            except Exception as exc:
+                self.readAll()
+                fut.set_exception(exc)
+            else:
+                fut.set_result(result)
+        return fut
 
     def read(self, length, timeout=5.0, term=None):
         """
@@ -127,6 +196,9 @@ class SerialDevice(object):
         return packet
 
     def _readWithTimeout(self, nBytes, timeout):
+        if self._channel is not None:
+            return self._channel.read(nBytes, timeout)
+
         # Note: pyserial's timeout mechanism is broken (specifically, calling setTimeout can cause 
         # serial data to be lost) so we implement our own in readWithTimeout().
         start = time.time()
@@ -156,6 +228,15 @@ class SerialDevice(object):
         if isinstance(term, str):
             term = term.encode()
 
+        if self._channel is not None:
+            packet = self._channel.readUntil(term, minBytes, timeout)
+            if packet is None:
+                packet = self._channel.readAll()
+                err = TimeoutError("Timed out while reading serial packet. Data so far: '%r'" % packet)
+                err.data = packet
+                raise err
+            return packet
+
         start = time.time()
 
         if minBytes > 0:
@@ -183,6 +264,8 @@ class SerialDevice(object):
         return self.readUntil("\n", **kwargs)
 
     def hasDataToRead(self):
+        if self._channel is not None:
+            return self._channel.waiting() > 0
         return self.serial.inWaiting() > 0
 
     def clearBuffer(self):
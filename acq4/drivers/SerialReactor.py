@@ -0,0 +1,390 @@
+"""
+Event-driven I/O shared by serial device drivers.
+
+A single SerialReactor thread waits on every registered serial port with a selector, instead of each driver polling
+its own port with sleeps. Incoming bytes are collected in a per-port buffer that SerialDevice reads from, and drivers
+may issue requests that resolve a Future when the response has arrived. The reactor also runs a polling scheduler
+that lets many devices (eg. stage position monitors) share one thread, with polls that fall due together issued at
+the same time.
+
+Selectors only work with serial ports on POSIX systems; on other platforms SerialDevice falls back to polling.
+"""
+import heapq
+import itertools
+import logging
+import os
+import selectors
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from acq4.util.debug import printExc
+
+
+def mapFuture(future, fn):
+    """Return a Future that resolves to fn(future.result()), or with the exception raised by either."""
+    mapped = Future()
+
+    def done(fut):
+        try:
+            mapped.set_result(fn(fut.result()))
+        except Exception as exc:
+            mapped.set_exception(exc)
+
+    future.add_done_callback(done)
+    return mapped
+
+
+class SerialRequest(Future):
+    """Future for a request sent through SerialChannel.request(); resolves to the response bytes."""
+
+    def __init__(self, data, term, length, timeout):
+        Future.__init__(self)
+        self.data = data
+        self.term = term
+        self.length = length
+        self.timeout = timeout
+        self.deadline = None
+
+    def _match(self, buffer):
+        """Return the length of the complete response at the start of *buffer*, or None."""
+        if self.length is not None:
+            return self.length if len(buffer) >= self.length else None
+        i = buffer.find(self.term)
+        return None if i < 0 else i + len(self.term)
+
+
+class SerialChannel:
+    """Reactor-side state for one serial port: a buffer of received bytes and a queue of requests.
+
+    Synchronous reads (read, readAll) take bytes from the buffer, waiting on a condition instead of polling.
+    Requests are written one at a time, in order; each one is resolved when its response has arrived (or fails
+    with TimeoutError), and bytes left over from previous exchanges are discarded before it is written.
+    """
+
+    def __init__(self, reactor, port, name):
+        self.reactor = reactor
+        self.port = port
+        self.name = name
+        self.buffer = bytearray()
+        self.cond = threading.Condition()
+        self.writeLock = threading.Lock()
+        self.requests = deque()
+        self.active = None
+        self.error = None
+
+    def waiting(self):
+        with self.cond:
+            return len(self.buffer)
+
+    def read(self, nBytes, timeout):
+        """Return *nBytes* from the buffer, or as many as arrived before *timeout* elapsed."""
+        deadline = time.monotonic() + timeout
+        with self.cond:
+            while len(self.buffer) < nBytes and self.error is None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.cond.wait(remaining)
+            data = bytes(self.buffer[:nBytes])
+            del self.buffer[:nBytes]
+            return data
+
+    def readUntil(self, term, minBytes, timeout):
+        """Return bytes from the buffer up to and including the first *term* that ends after *minBytes*.
+
+        Returns None after *timeout*; the partial packet is left in the buffer.
+        """
+        deadline = time.monotonic() + timeout
+        start = max(0, minBytes - len(term) + 1)
+        with self.cond:
+            while True:
+                i = self.buffer.find(term, start)
+                if i >= 0:
+                    data = bytes(self.buffer[:i + len(term)])
+                    del self.buffer[:i + len(term)]
+                    return data
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self.error is not None:
+                    return None
+                self.cond.wait(remaining)
+
+    def readAll(self):
+        with self.cond:
+            data = bytes(self.buffer)
+            self.buffer.clear()
+            return data
+
+    def write(self, data):
+        with self.writeLock:
+            self.port.write(data)
+
+    def request(self, data, term=None, length=None, timeout=5.0):
+        """Queue *data* to be written, and return a SerialRequest that resolves to the response.
+
+        The response is complete when *term* has been received (the response includes *term*), or when *length*
+        bytes have been received.
+        """
+        if (term is None) == (length is None):
+            raise ValueError("Must specify exactly one of term or length.")
+        req = SerialRequest(data, term, length, timeout)
+        with self.cond:
+            if self.error is not None:
+                raise self.error
+            self.requests.append(req)
+        self.reactor._wake()
+        return req
+
+    # methods below are called only from the reactor thread
+
+    def _received(self, data):
+        with self.cond:
+            self.buffer += data
+            self.cond.notify_all()
+            self._checkActive()
+
+    def _checkActive(self):
+        if self.active is None:
+            return
+        n = self.active._match(self.buffer)
+        if n is not None:
+            response = bytes(self.buffer[:n])
+            del self.buffer[:n]
+            req, self.active = self.active, None
+            logging.info('Serial port %s response: %r', self.name, response)
+            req.set_result(response)
+
+    def _service(self, now):
+        """Expire the active request or start the next one; return the deadline of the active request."""
+        with self.cond:
+            if self.active is not None and now >= self.active.deadline:
+                req, self.active = self.active, None
+                err = TimeoutError("Timed out waiting for serial response (request: %r, received so far: %r)" %
+                                   (req.data, bytes(self.buffer)))
+                err.data = bytes(self.buffer)
+                self.buffer.clear()
+                req.set_exception(err)
+            while self.active is None and self.requests:
+                req = self.requests.popleft()
+                if not req.set_running_or_notify_cancel():
+                    continue
+                if len(self.buffer) > 0:
+                    logging.info('Serial port %s discarded: %r', self.name, bytes(self.buffer))
+                    self.buffer.clear()
+                try:
+                    self.write(req.data)
+                except Exception as exc:
+                    req.set_exception(exc)
+                    continue
+                logging.info('Serial port %s request: %r', self.name, req.data)
+                req.deadline = now + req.timeout
+                self.active = req
+            return None if self.active is None else self.active.deadline
+
+    def _close(self, error):
+        with self.cond:
+            self.error = error
+            pending = ([self.active] if self.active is not None else []) + list(self.requests)
+            self.active = None
+            self.requests.clear()
+            self.cond.notify_all()
+        for req in pending:
+            if not req.done():
+                req.set_exception(error)
+
+
+class Poller:
+    """Handle for a periodic poll registered with SerialReactor.addPoller()."""
+
+    def __init__(self, reactor, request, handler, interval, minInterval):
+        self.reactor = reactor
+        self.request = request
+        self.handler = handler
+        self.interval = interval
+        self.minInterval = minInterval
+        self.currentInterval = minInterval
+        self.stopped = False
+
+    def setInterval(self, interval):
+        """Set the maximum interval between polls."""
+        self.interval = interval
+
+    def stop(self):
+        self.stopped = True
+
+    def _run(self):
+        # reactor thread: start the request, and handle its result on the callback thread
+        if self.stopped:
+            return
+        try:
+            fut = self.request()
+        except Exception:
+            printExc("Error starting serial poll:")
+            self._schedule(False)
+            return
+        fut.add_done_callback(lambda fut: self.reactor._callbacks.submit(self._handle, fut))
+
+    def _handle(self, fut):
+        changed = False
+        try:
+            changed = self.handler(fut.result())
+        except Exception:
+            printExc("Error in serial poll:")
+        self._schedule(changed)
+
+    def _schedule(self, changed):
+        if self.stopped:
+            return
+        if changed:
+            # if there was a change, then poll more rapidly for a short time.
+            self.currentInterval = self.minInterval
+        else:
+            self.currentInterval = min(self.interval, self.currentInterval * 2)
+        self.reactor.callLater(self.currentInterval, self._run)
+
+
+class SerialReactor:
+    """Single thread that services all registered serial ports and timers.
+
+    Use SerialReactor.instance() to get the shared reactor.
+    """
+    _instance = None
+    _instanceLock = threading.Lock()
+
+    # timers falling due within this window are run in the same wakeup
+    coalesceWindow = 5e-3
+
+    @classmethod
+    def instance(cls):
+        with cls._instanceLock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    @staticmethod
+    def available(port):
+        """Return True if *port* (a pyserial Serial) can be serviced by the reactor."""
+        if sys.platform.startswith('win'):
+            return False
+        try:
+            port.fileno()
+        except Exception:
+            return False
+        return True
+
+    def __init__(self):
+        self._selector = selectors.DefaultSelector()
+        self._wakeRead, self._wakeWrite = os.pipe()
+        os.set_blocking(self._wakeRead, False)
+        os.set_blocking(self._wakeWrite, False)
+        self._selector.register(self._wakeRead, selectors.EVENT_READ, None)
+        self._lock = threading.Lock()
+        self._channels = []
+        self._timers = []
+        self._timerCount = itertools.count()
+        # poll results are handled here so that handlers may block (eg. on locks or further requests)
+        self._callbacks = ThreadPoolExecutor(max_workers=1, thread_name_prefix='SerialReactorCallbacks')
+        self.wakeups = 0
+        self._thread = threading.Thread(target=self._run, name='SerialReactor', daemon=True)
+        self._thread.start()
+
+    def register(self, port, name=None):
+        """Start servicing *port* (a pyserial Serial opened with timeout=0). Return its SerialChannel."""
+        channel = SerialChannel(self, port, name or port.port)
+        with self._lock:
+            self._channels.append(channel)
+            self._selector.register(port.fileno(), selectors.EVENT_READ, channel)
+        self._wake()
+        return channel
+
+    def unregister(self, channel):
+        with self._lock:
+            if channel not in self._channels:
+                return
+            self._channels.remove(channel)
+            self._selector.unregister(channel.port.fileno())
+        channel._close(IOError("Serial port %s was closed." % channel.name))
+
+    def callLater(self, delay, callback):
+        """Call *callback()* on the reactor thread after *delay* seconds. The callback must not block."""
+        with self._lock:
+            heapq.heappush(self._timers, (time.monotonic() + delay, next(self._timerCount), callback))
+        self._wake()
+
+    def addPoller(self, request, handler, interval=0.3, minInterval=0.1):
+        """Poll a device repeatedly, without a thread of its own.
+
+        *request()* is called on the reactor thread and must return a Future without blocking (for example, from
+        SerialChannel.request). When it resolves, *handler(result)* is called on a separate callback thread; it
+        returns True if the result changed, in which case the next poll happens after *minInterval*. Otherwise
+        the interval doubles, up to *interval*. Returns a Poller, which may be stopped or given a new interval.
+        """
+        poller = Poller(self, request, handler, interval, minInterval)
+        self.callLater(0, poller._run)
+        return poller
+
+    def _wake(self):
+        try:
+            os.write(self._wakeWrite, b'\0')
+        except BlockingIOError:
+            pass  # already awake
+
+    def _run(self):
+        while True:
+            try:
+                self._iterate()
+            except Exception:
+                printExc("Error in serial reactor:")
+                time.sleep(0.01)
+
+    def _iterate(self):
+        now = time.monotonic()
+        with self._lock:
+            channels = list(self._channels)
+        deadlines = [d for d in (ch._service(now) for ch in channels) if d is not None]
+
+        # run timers that are due (or nearly so)
+        due = []
+        with self._lock:
+            while self._timers and self._timers[0][0] <= now + self.coalesceWindow:
+                due.append(heapq.heappop(self._timers)[2])
+            if self._timers:
+                deadlines.append(self._timers[0][0])
+        for callback in due:
+            try:
+                callback()
+            except Exception:
+                printExc("Error in serial reactor callback:")
+        if due:
+            return  # callbacks may have queued requests
+
+        timeout = None if not deadlines else max(0, min(deadlines) - time.monotonic())
+        events = self._selector.select(timeout)
+        self.wakeups += 1
+        for key, mask in events:
+            channel = key.data
+            if channel is None:
+                try:
+                    while os.read(self._wakeRead, 4096):
+                        pass
+                except BlockingIOError:
+                    pass
+                continue
+            try:
+                data = channel.port.read(max(1, channel.port.in_waiting))
+            except Exception as exc:
+                data = b''
+                error = exc
+            else:
+                error = IOError("Serial port %s was disconnected." % channel.name)
+            if data:
+                channel._received(data)
+            else:
+                # readable with no data: the device has gone away
+                with self._lock:
+                    if channel in self._channels:
+                        self._channels.remove(channel)
+                        self._selector.unregister(key.fd)
+                channel._close(error)
@@ -1,3 +1,4 @@
+import threading
 from collections import OrderedDict
 
 import numpy as np
@@ -5,6 +6,7 @@ import six
 import time
 from six.moves import map
 from acq4.util import ptime
+from acq4.util.debug import printExc
 try:
     from PyDAQmx import DAQException
 except (NotImplementedError, ImportError):
@@ -23,6 +25,12 @@ class SuperTask:
         self.devs = daq.listDevices()
         self.triggerChannel = None
         self.result = None
+        self.continuous = False
+        self._streamReader = None
+        self._subscribers = []
+        self._subscriberLock = threading.Lock()
+        self._ringLock = threading.Lock()
+        self.rings = OrderedDict()
 
     def absChanName(self, chan):
         parts = chan.lstrip("/").split("/")
@@ -129,6 +137,7 @@ class SuperTask:
 
         key = self.getTaskKey(chan)
         self.taskInfo[key]["dataWritten"] = False
+        self.taskInfo[key]["cache"] = None
 
         # if info is not None:
         #     self.channelInfo[chan]['info'] = info
@@ -166,13 +175,21 @@ class SuperTask:
     def hasTasks(self):
         return len(self.tasks) > 0
 
-    def configureClocks(self, rate, nPts):
-        """Configure sample clock and triggering for all tasks"""
+    def configureClocks(self, rate, nPts, continuous=False):
+        """Configure sample clock and triggering for all tasks.
+
+        For finite acquisitions, *nPts* is the number of samples per channel to acquire. If *continuous* is True,
+        the tasks run until they are stopped and *nPts* is the size of the driver's sample buffer per channel (output
+        waveforms of that length are regenerated for as long as the tasks run). Use startStreaming() to run
+        continuous acquisitions.
+        """
         if len(self.tasks) == 0:
             raise Exception("No tasks to configure.")
         keys = list(self.tasks.keys())
         self.numPts = nPts
         self.rate = rate
+        self.continuous = continuous
+        sampleMode = self.daq.Val_ContSamps if continuous else self.daq.Val_FiniteSamps
 
         # Make sure we're only using 1 DAQ device (not sure how to tie 2 together yet)
         # ndevs = len(set([k[0] for k in keys]))
@@ -219,10 +236,10 @@ class SuperTask:
             if k[1] != clkSource:
                 # print "%s CfgSampClkTiming(%s, %f, Val_Rising, Val_FiniteSamps, %d)" % (str(k), clk, rate, nPts)
 
-                self.tasks[k].CfgSampClkTiming(clk, rate, self.daq.Val_Rising, self.daq.Val_FiniteSamps, nPts)
+                self.tasks[k].CfgSampClkTiming(clk, rate, self.daq.Val_Rising, sampleMode, nPts)
             else:
                 # print "%s CfgSampClkTiming('', %f, Val_Rising, Val_FiniteSamps, %d)" % (str(k), rate, nPts)
-                self.tasks[k].CfgSampClkTiming("", rate, self.daq.Val_Rising, self.daq.Val_FiniteSamps, nPts)
+                self.tasks[k].CfgSampClkTiming("", rate, self.daq.Val_Rising, sampleMode, nPts)
 
     def setTrigger(self, trig):
         # self.tasks[self.clockSource].CfgDigEdgeStartTrig(trig, Val_Rising)
@@ -239,6 +256,16 @@ class SuperTask:
             self.tasks[t].CfgDigEdgeStartTrig(trig, self.daq.Val_Rising)
         self.triggerChannel = trig
 
+    def rearm(self):
+        """Prepare to start again with the same channel, clock and trigger configuration.
+
+        Output data is written to the tasks again on the next start(), since stopping the tasks releases the
+        hardware (and its output buffers).
+        """
+        self.result = None
+        for info in self.taskInfo.values():
+            info["dataWritten"] = False
+
     def start(self):
         self.writeTaskData()  # Only writes if needed.
 
@@ -354,6 +381,112 @@ class SuperTask:
             # print ret
             return ret
 
+    def startStreaming(self, chunkSize=None, ringSize=None, interval=0.05):
+        """Start a continuous acquisition and read input data in the background.
+
+        configureClocks() must first be called with continuous=True. A worker thread reads new samples from all
+        input tasks every *interval* seconds and delivers them to subscribers (see subscribe()) in chunks of
+        *chunkSize* samples per channel (default is *interval* seconds of data). The most recent *ringSize* samples
+        per channel (default is 10 s of data) are also retained in memory; see getStreamData().
+        """
+        if not self.continuous:
+            raise Exception("Streaming requires clocks to be configured with continuous=True.")
+        if self._streamReader is not None:
+            raise Exception("Stream is already running.")
+        if chunkSize is None:
+            chunkSize = max(1, int(self.rate * interval))
+        if ringSize is None:
+            ringSize = int(self.rate * 10)
+        ringSize = max(ringSize, chunkSize)
+
+        self.rings = OrderedDict()
+        for k, task in self.tasks.items():
+            if task.isInputTask():
+                dtype = np.float64 if k[1] == "ai" else np.uint32
+                self.rings[k] = RingBuffer(len(self.taskInfo[k]["chans"]), ringSize, dtype)
+        if len(self.rings) == 0:
+            raise Exception("Streaming requires at least one input channel.")
+
+        self._streamReader = StreamReader(self, chunkSize, interval)
+        self.start()
+        self._streamReader.start()
+
+    def stopStreaming(self):
+        """Stop a continuous acquisition started with startStreaming().
+
+        Samples that have been acquired but not yet delivered are read and passed to subscribers before the tasks
+        are stopped.
+        """
+        reader = self._streamReader
+        if reader is None:
+            return
+        try:
+            reader.stop()
+        finally:
+            self._streamReader = None
+            self.stop(abort=True)
+
+    def isStreaming(self):
+        return self._streamReader is not None
+
+    def subscribe(self, callback):
+        """Register *callback* to be invoked with each chunk of streamed data.
+
+        Callbacks are invoked from the stream's worker thread with a single dict argument::
+
+            {'start': index of the first sample in the chunk (counted from the start of the acquisition),
+             'startTime': time of the first sample,
+             'rate': sample rate,
+             'data': {channel: 1D array of samples, ...}}
+
+        Callbacks must return quickly; slow subscribers delay reading and may cause the driver's buffer to
+        overflow.
+        """
+        with self._subscriberLock:
+            self._subscribers = self._subscribers + [callback]
+
+    def unsubscribe(self, callback):
+        with self._subscriberLock:
+            self._subscribers = [cb for cb in self._subscribers if cb != callback]
+
+    def getStreamData(self, nPts=None):
+        """Return the most recent *nPts* samples per channel (default: all retained samples) of a stream.
+
+        The return value has the same structure as the chunks delivered to subscribers.
+        """
+        data = {}
+        with self._ringLock:
+            for k, ring in self.rings.items():
+                start, arr = ring.read(nPts)
+                for i, ch in enumerate(self.taskInfo[k]["chans"]):
+                    data[ch] = arr[i]
+        return self._makeChunk(start, data)
+
+    def _makeChunk(self, start, data):
+        return {"start": start, "startTime": self.startTime + start / self.rate, "rate": self.rate, "data": data}
+
+    def _readChunk(self, nPts):
+        """Read *nPts* samples per channel from all input tasks; store in ring buffers and send to subscribers."""
+        data = {}
+        reads = [(k, self.tasks[k].read(nPts, relativeTo=self.daq.Val_CurrReadPos)) for k in self.rings]
+        with self._ringLock:
+            for k, (arr, n) in reads:
+                arr = arr[:, :n]
+                ring = self.rings[k]
+                start = ring.count
+                ring.write(arr)
+                for i, ch in enumerate(self.taskInfo[k]["chans"]):
+                    data[ch] = arr[i]
+        chunk = self._makeChunk(start, data)
+        for callback in self._subscribers:
+            try:
+                callback(chunk)
+            except Exception:
+                printExc("Error in stream subscriber %r:" % callback)
+
+    def _availableSamples(self):
+        return min(self.tasks[k].GetReadAvailSampPerChan() for k in self.rings)
+
     #
     def run(self):
         # print "Start..", time.time()
@@ -365,3 +498,104 @@ class SuperTask:
         # print "get samples.."
         r = self.getResult()
         return r
+
+
+class RingBuffer:
+    """Fixed-size buffer holding the most recent samples of a multi-channel stream.
+
+    Sample *i* of the stream is stored in column i % size. This class is not thread-safe.
+    """
+
+    def __init__(self, nChans, size, dtype):
+        self.size = size
+        self.count = 0  # total number of samples written
+        self._data = np.zeros((nChans, size), dtype=dtype)
+
+    def write(self, data):
+        """Append *data* (shape nChans x nSamples)."""
+        n = data.shape[1]
+        if n > self.size:
+            self.count += n - self.size
+            data = data[:, -self.size:]
+            n = self.size
+        start = self.count % self.size
+        split = min(n, self.size - start)
+        self._data[:, start:start + split] = data[:, :split]
+        self._data[:, :n - split] = data[:, split:]
+        self.count += n
+
+    def read(self, n=None):
+        """Return (index, data) for the most recent *n* samples, where *index* is the stream index of the first
+        returned sample.
+        """
+        available = min(self.count, self.size)
+        n = available if n is None else min(n, available)
+        start = (self.count - n) % self.size
+        split = min(n, self.size - start)
+        data = np.concatenate([self._data[:, start:start + split], self._data[:, :n - split]], axis=1)
+        return self.count - n, data
+
+
+class StreamReader(threading.Thread):
+    """Worker thread that periodically reads a continuous SuperTask acquisition in fixed-size chunks."""
+
+    def __init__(self, superTask, chunkSize, interval):
+        threading.Thread.__init__(self, name="SuperTaskStreamReader", daemon=True)
+        self.superTask = superTask
+        self.chunkSize = chunkSize
+        self.interval = interval
+        self._stopEvent = threading.Event()
+        self.exc = None
+
+    def run(self):
+        st = self.superTask
+        try:
+            while not self._stopEvent.wait(self.interval):
+                while st._availableSamples() >= self.chunkSize:
+                    st._readChunk(self.chunkSize)
+            # deliver whatever has been acquired since the last full chunk
+            available = st._availableSamples()
+            while available > 0:
+                n = min(available, self.chunkSize)
+                st._readChunk(n)
+                available -= n
+        except Exception as exc:
+            self.exc = exc
+            printExc("Error reading continuous DAQ stream:")
+
+    def stop(self, timeout=10.0):
+        self._stopEvent.set()
+        self.join(timeout)
+        if self.is_alive():
+            raise Exception("Timed out waiting for stream reader to stop.")
+
+
+class StreamRecorder:
+    """Stream subscriber that appends each chunk of data to a MetaArray file on disk.
+
+    Usage::
+
+        recorder = StreamRecorder('stream.ma')
+        superTask.subscribe(recorder)
+        superTask.startStreaming()
+    """
+
+    def __init__(self, fileName, channels=None):
+        self.fileName = fileName
+        self.channels = channels
+        self.samplesWritten = 0
+
+    def __call__(self, chunk):
+        from MetaArray import MetaArray
+
+        chans = self.channels if self.channels is not None else list(chunk["data"].keys())
+        arr = np.vstack([chunk["data"][ch] for ch in chans])
+        times = (chunk["start"] + np.arange(arr.shape[1])) / chunk["rate"]
+        info = [
+            {"name": "Channel", "cols": [{"name": ch} for ch in chans]},
+            {"name": "Time", "units": "s", "values": times},
+            {"rate": chunk["rate"], "startTime": chunk["startTime"] - chunk["start"] / chunk["rate"]},
+        ]
+        ma = MetaArray(arr, info=info)
+        ma.write(self.fileName, appendAxis="Time", newFile=self.samplesWritten == 0)
+        self.samplesWritten += arr.shape[1]
@@ -34,8 +34,11 @@ class MockNIDAQ:
         self.Val_Cfg_Default = -1
         self.Val_ChanForAllLines = 1
         self.Val_ChanPerLine = 0
+        self.Val_ContSamps = 10123
+        self.Val_CurrReadPos = 10425
         self.Val_Diff = 10106
         self.Val_FiniteSamps = 10178
+        self.Val_FirstSample = 10424
         self.Val_NRSE = 10078
         self.Val_RSE = 10083
         self.Val_Rising = 10280
@@ -179,6 +182,10 @@ class Task:
         self.nativeClock = None
         self.data = None
         self.mode = None
+        self.sampleMode = None
+        self.running = False
+        self.startTime = None
+        self.samplesRead = 0
 
     # def __getattr__(self, attr):
     #     return lambda *args: self
@@ -203,7 +210,8 @@ class Task:
         self.chOpts.append(kargs)
         self.mode = 'do'
 
-    def CfgSampClkTiming(self, clock, rate, b, c, nPts):
+    def CfgSampClkTiming(self, clock, rate, b, sampleMode, nPts):
+        self.sampleMode = sampleMode
         if 'ai' in self.chans[0]:
             self.nativeClock = self.device() + '/ai/SampleClock'
         elif 'ao' in self.chans[0]:
@@ -233,7 +241,19 @@ class Task:
 
         return len(data)
 
-    def read(self):
+    def isContinuous(self):
+        return self.sampleMode == self.nd.Val_ContSamps
+
+    def GetReadAvailSampPerChan(self):
+        if self.startTime is None:
+            return 0
+        if not self.isContinuous():
+            return self.nPts if self.isDone() else 0
+        return int((time.time() - self.startTime) * self.rate) - self.samplesRead
+
+    def read(self, samples=None, timeout=10.0, dtype=None, relativeTo=None):
+        if self.isContinuous():
+            return self._readStream(self.nPts if samples is None else samples, timeout)
         dur = self.nPts / self.rate
         tVals = np.linspace(0, dur, self.nPts)
         if 'd' in self.mode:
@@ -248,19 +268,53 @@ class Task:
                 data[i] = 0
         return (data, self.nPts)
 
+    def _readStream(self, samples, timeout):
+        """Return the next *samples* samples of a continuous acquisition, waiting until they have been acquired.
+
+        Channels created with a 'mockStreamFunc' option are filled by calling mockStreamFunc(times), where *times*
+        gives the time of each sample relative to the start of the acquisition; other channels read zero.
+        """
+        if not self.running:
+            raise Exception("Cannot read from a continuous task that is not running.")
+        waitUntil = self.startTime + (self.samplesRead + samples) / self.rate
+        now = time.time()
+        if waitUntil - now > timeout:
+            raise Exception("Timed out waiting for %d samples." % samples)
+        if waitUntil > now:
+            time.sleep(waitUntil - now)
+
+        times = (self.samplesRead + np.arange(samples)) / self.rate
+        dtype = np.int32 if 'd' in self.mode else float
+        data = np.zeros((len(self.chans), samples), dtype=dtype)
+        for i in range(len(self.chOpts)):
+            if 'mockStreamFunc' in self.chOpts[i]:
+                data[i] = self.chOpts[i]['mockStreamFunc'](times)
+        self.samplesRead += samples
+        return (data, samples)
+
     def start(self):
+        self.running = True
+        self.startTime = time.time()
+        self.samplesRead = 0
+        if self.isContinuous():
+            return
         # only start clock if it matches the native clock for this channel
         if self.clock is None or self.clock == self.nativeClock:
             dur = self.nPts / self.rate
             self.nd.startClock(self.nativeClock, dur)
 
     def stop(self):
+        self.running = False
+        if self.isContinuous():
+            return
         if self.clock is None:
             self.nd.stopClock(self.nativeClock)
         else:
             self.nd.stopClock(self.clock)
 
     def isDone(self):
+        if self.isContinuous():
+            return not self.running
         if self.clock is None:
             return self.nd.checkClock(self.nativeClock)
         else:
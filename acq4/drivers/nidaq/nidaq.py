@@ -270,7 +270,12 @@ class Task:
     def isDone(self):
         return self.IsTaskDone()
 
-    def read(self, samples=None, timeout=10.0, dtype=None):
+    def read(self, samples=None, timeout=10.0, dtype=None, relativeTo=None):
+        """Read *samples* samples per channel (default is the task's full sample count).
+
+        By default, samples are read from the beginning of the acquisition; continuous acquisitions should pass
+        relativeTo=PyDAQmx.Val_CurrReadPos to read the next unread samples instead.
+        """
         # reqSamps = samples
         # if samples is None:
         #    samples = self.GetSampQuantSampPerChan()
@@ -321,7 +326,9 @@ class Task:
 
         fName += dataTypeConversions[np.dtype(dtype).descr[0][1]]
 
-        self.SetReadRelativeTo(PyDAQmx.Val_FirstSample)
+        if relativeTo is None:
+            relativeTo = PyDAQmx.Val_FirstSample
+        self.SetReadRelativeTo(relativeTo)
         self.SetReadOffset(0)
 
         nPts = getattr(self, fName)(reqSamps, timeout, PyDAQmx.Val_GroupByChannel, buf, buf.size, None)
@@ -61,7 +61,7 @@ def contReadTest():
     task.start()
     t = ptime.time()
     for i in range(0, 10):
-        data, size = task.read(1000)
+        data, size = task.read(1000, relativeTo=n.Val_CurrReadPos)
         print("Cont read %d - %d samples, %fsec" % (i, size, ptime.time() - t))
         t = ptime.time()
     task.stop()
@@ -0,0 +1,205 @@
+import os
+import pty
+import select
+import sys
+import threading
+import time
+import tty
+
+import pytest
+
+from acq4.drivers.SerialDevice import SerialDevice
+
+pytestmark = pytest.mark.skipif(not sys.platform.startswith('linux'), reason="pseudo-terminals are only used on Linux")
+
+
+class PtyDevice(threading.Thread):
+    """Fake serial device on a pseudo-terminal.
+
+    Reads commands terminated by *term* from the port and writes back ``handler(command) + term`` after *delay*
+    seconds (no reply if the handler returns None). Open ``device.port`` with a SerialDevice to talk to it.
+    """
+
+    def __init__(self, handler, term=b'\r', delay=0.0):
+        threading.Thread.__init__(self, daemon=True)
+        self.handler = handler
+        self.term = term
+        self.delay = delay
+        self.master, self.slave = pty.openpty()
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+        self.commands = []
+        self.stopped = False
+        self.start()
+
+    def run(self):
+        buf = b''
+        while not self.stopped:
+            if not select.select([self.master], [], [], 0.05)[0]:
+                continue
+            try:
+                buf += os.read(self.master, 4096)
+            except OSError:
+                break
+            while self.term in buf:
+                cmd, _, buf = buf.partition(self.term)
+                self.commands.append(cmd)
+                reply = self.handler(cmd)
+                if reply is None:
+                    continue
+                if self.delay > 0:
+                    time.sleep(self.delay)
+                os.write(self.master, reply + self.term)
+
+    def stop(self):
+        self.stopped = True
+        self.join()
+        os.close(self.master)
+        os.close(self.slave)
+
+
+class FakeScientifica(PtyDevice):
+    """Answers the subset of the Scientifica (version 3) command set used by the driver and stage device."""
+
+    def __init__(self, **kwds):
+        self.pos = [0, 0, 0]
+        self.obj = 1
+        PtyDevice.__init__(self, self.respond, **kwds)
+
+    def respond(self, cmd):
+        cmd = cmd.decode()
+        fixed = {'scientifica': 'Y519', 'ver': '3.51', 'desc': 'FakeStar', 'type': '3.05', 'TOP': '10000',
+                 'S': '0', 'STOP': 'A', 'USTEP X': '1600', 'USTEP Y': '1600', 'USTEP Z': '1600'}
+        if cmd in fixed:
+            return fixed[cmd].encode()
+        if cmd == 'P':
+            return b'\t'.join(b'%d' % x for x in self.pos)
+        if cmd == 'obj':
+            return b'%d' % self.obj
+        if cmd.startswith('ABS '):
+            self.pos = [int(x) for x in cmd.split()[1:]]
+            return b'A'
+        if cmd.startswith('TOP '):
+            return b'A'
+        if cmd == 'silent':
+            return None
+        return b'E,1'
+
+
+class ReactorDevice(SerialDevice):
+    useReactor = True
+
+
+def test_request_round_trip():
+    fake = PtyDevice(lambda cmd: cmd.upper())
+    dev = ReactorDevice(port=fake.port, baudrate=9600)
+    try:
+        assert dev.reactor is not None
+        futures = [dev.request('cmd%d\r' % i, term='\r') for i in range(50)]
+        assert [f.result(timeout=5) for f in futures] == [b'CMD%d\r' % i for i in range(50)]
+
+        # requests from several threads are written one at a time
+        results = {}
+
+        def worker(n):
+            results[n] = [dev.request(b'%d_%d\r' % (n, i), term=b'\r').result() for i in range(20)]
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+        [t.start() for t in threads]
+        [t.join() for t in threads]
+        for n in range(4):
+            assert results[n] == [b'%d_%d\r' % (n, i) for i in range(20)]
+
+        # synchronous reads wait on the reactor's buffer
+        dev.write('abc\r')
+        assert dev.readUntil('\r', timeout=2) == b'ABC\r'
+        dev.write('hello\r')
+        assert dev.read(6, timeout=2) == b'HELLO\r'
+        with pytest.raises(TimeoutError):
+            dev.read(1, timeout=0.1)
+        assert not dev.hasDataToRead()
+    finally:
+        dev.close()
+        fake.stop()
+
+
+def test_request_timeout():
+    fake = PtyDevice(lambda cmd: None if cmd == b'silent' else b'ok')
+    dev = ReactorDevice(port=fake.port, baudrate=9600)
+    try:
+        silent = dev.request('silent\r', term='\r', timeout=0.2)
+        after = dev.request('next\r', term='\r')
+        with pytest.raises(TimeoutError):
+            silent.result(timeout=5)
+        assert after.result(timeout=5) == b'ok\r'
+        assert dev.request('fixed\r', length=3).result(timeout=5) == b'ok\r'
+
+        # closing the port fails requests that are still waiting
+        waiting = dev.request('silent\r', term='\r')
+        dev.close()
+        with pytest.raises(IOError):
+            waiting.result(timeout=5)
+    finally:
+        dev.close()
+        fake.stop()
+
+
+def test_polling_fallback():
+    fake = PtyDevice(lambda cmd: cmd[::-1])
+    dev = SerialDevice(port=fake.port, baudrate=9600)
+    try:
+        assert dev.reactor is None
+        assert dev.request('abc\r', term='\r').result() == b'cba\r'
+    finally:
+        dev.close()
+        fake.stop()
+
+
+def test_scientifica_driver():
+    from acq4.drivers.Scientifica import Scientifica
+
+    fake = FakeScientifica()
+    dev = Scientifica(port=fake.port, ctrl_version=3)
+    try:
+        assert dev.reactor is not None
+        assert dev.getDescription() == b'FakeStar'
+        assert dev.getPos() == [0, 0, 0]
+        dev.moveTo([10, None, -5.5])
+        assert fake.pos == [1000, 0, -550]
+        assert dev.getPosAsync().result(timeout=5) == [10, 0, -5.5]
+        with pytest.raises(RuntimeError):
+            dev.send('bogus')
+        assert dev.getSpeed() == 10000
+    finally:
+        dev.close()
+        fake.stop()
+
+
+def test_poller():
+    fakes = [FakeScientifica(delay=0.002) for i in range(4)]
+    devs = [ReactorDevice(port=fake.port, baudrate=9600) for fake in fakes]
+    reactor = devs[0].reactor
+    polls = [[] for dev in devs]
+    pollers = []
+    try:
+        for dev, received in zip(devs, polls):
+            handler = lambda pos, received=received: received.append(pos) or (len(received) < 3 or pos != received[-2])
+            pollers.append(reactor.addPoller(lambda dev=dev: dev.request('P\r', term='\r'), handler,
+                                             interval=0.2, minInterval=0.02))
+        time.sleep(0.3)
+        fakes[0].pos = [1, 2, 3]
+        time.sleep(0.3)
+        for poller in pollers:
+            poller.stop()
+        time.sleep(0.05)
+        counts = [len(p) for p in polls]
+        assert all(n >= 4 for n in counts)
+        assert polls[0][-1] == b'1\t2\t3\r'
+        # the changed device was polled more often after the change
+        assert polls[0].count(b'1\t2\t3\r') >= 2
+        time.sleep(0.3)
+        assert [len(p) for p in polls] == counts
+    finally:
+        for dev, fake in zip(devs, fakes):
+            dev.close()
+            fake.stop()
@@ -1,12 +1,19 @@
 import json
+import queue
 import re
+import threading
+import time
+from collections.abc import Mapping
 from typing import Any
 
+import h5py
 import numpy as np
 
 import pyqtgraph as pg
 from acq4.filetypes.FileType import FileType
 from acq4.util import Qt
+from acq4.util.debug import printExc
+from acq4.util.json_encoder import ACQ4JSONEncoder
 from acq4.util.target import Target
 
 TEST_PULSE_METAARRAY_INFO = [
@@ -178,7 +185,34 @@ class IrregularTimeSeries(object):
         return len(self.events)
 
 
+def _possible_uses_for_type(event_type: str) -> list[str]:
+    uses = ['event']
+    if event_type in {'pipette_transform_changed', 'move_start', 'move_stop'}:
+        uses.append('position')
+    if event_type in {'pressure_changed'}:
+        uses.append('pressure')
+    if event_type in {'state_change', 'state_event'}:
+        uses.append('state')
+    if event_type in {'auto_bias_change'}:
+        uses.append('auto_bias_change')
+    if event_type in {'target_changed'}:
+        uses.append('target')
+    # currently ignored:
+    # if event_type in {'move_requested'}:
+    #     uses.append('move_request')
+    if event_type in {'test_pulse'}:
+        uses.append('test_pulse')
+    return uses
+
+
 class MultiPatchLogData(object):
+    """Per-device data read from a MultiPatch log file.
+
+    Both the JSON-lines format (``MultiPatch_NNN.log``) and the binary format written by MultiPatchLogWriter
+    (``MultiPatch_NNN.mplog``) are supported. Binary logs are loaded lazily: nothing but the list of devices and the
+    time range is read until a device's data is accessed, and test pulse results are read one column at a time. The
+    file is only open while it is being read.
+    """
     def __init__(self, filename=None):
         self._filename = filename
         self._devices = {}
@@ -189,48 +223,31 @@ class MultiPatchLogData(object):
             self.process(filename)
 
     def process(self, filename) -> None:
-        def possible_uses_for_type(event_type: str) -> list[str]:
-            uses = ['event']
-            if event_type in {'pipette_transform_changed', 'move_start', 'move_stop'}:
-                uses.append('position')
-            if event_type in {'pressure_changed'}:
-                uses.append('pressure')
-            if event_type in {'state_change', 'state_event'}:
-                uses.append('state')
-            if event_type in {'auto_bias_change'}:
-                uses.append('auto_bias_change')
-            if event_type in {'target_changed'}:
-                uses.append('target')
-            # currently ignored:
-            # if event_type in {'move_requested'}:
-            #     uses.append('move_request')
-            if event_type in {'test_pulse'}:
-                uses.append('test_pulse')
-            return uses
+        if isBinaryLog(filename):
+            self._processBinary(filename)
+        else:
+            self._processJson(filename)
 
+    def _processJson(self, filename) -> None:
         with open(filename, 'rb') as fh:
             events: list[dict[str, Any]] = [json.loads(line.rstrip(b',\r\n')) for line in fh]
 
-            events_by_dev_and_use = {}
-            bool_fields = ('clean', 'broken', 'active', 'enabled')
-            for ev in events:
-                is_true = [ev[f] for f in bool_fields if f in ev]
-                ev["is_true"] = not is_true or any(is_true)  # empty should mean True
-                for use in possible_uses_for_type(ev['event']):
-                    events_by_dev_and_use.setdefault(ev['device'], {}).setdefault(use, [])
-                    events_by_dev_and_use[ev['device']][use].append(ev)
-            for dev in events_by_dev_and_use:
-                self._devices[dev] = self._initial_data_structures(events_by_dev_and_use[dev])
-                for use in events_by_dev_and_use[dev]:
-                    for i, event in enumerate(events_by_dev_and_use[dev][use]):
-                        if self._minTime is None or event['event_time'] < self._minTime:
-                            self._minTime = event['event_time']
-                        if self._maxTime is None or event['event_time'] > self._maxTime:
-                            self._maxTime = event['event_time']
-                        self._devices[dev][use][i] = self._prepare_event_for_use(event, use)
-                        if use == 'position':
-                            time, *pos = self._prepare_event_for_use(event, use)
-                            self._devices[dev]['position_ITS'][time] = pos
+        events_by_dev = {}
+        for ev in events:
+            events_by_dev.setdefault(ev['device'], []).append(ev)
+            if self._minTime is None or ev['event_time'] < self._minTime:
+                self._minTime = ev['event_time']
+            if self._maxTime is None or ev['event_time'] > self._maxTime:
+                self._maxTime = ev['event_time']
+        for dev, dev_events in events_by_dev.items():
+            self._devices[dev] = self._build_device_data(dev_events)
+
+    def _processBinary(self, filename) -> None:
+        with h5py.File(filename, 'r') as fh:
+            self._minTime = fh.attrs.get('first_time', None)
+            self._maxTime = fh.attrs.get('last_time', None)
+            for group in fh['devices'].values():
+                self._devices[group.attrs['name']] = _BinaryDeviceLog(filename, group)
 
     def devices(self) -> list[str]:
         return list(self._devices.keys())
@@ -241,7 +258,7 @@ class MultiPatchLogData(object):
     def state(self, time):
         # Used by MultiPatchLogCanvasItem
         return {
-            dev: {'position': self._devices[dev]['position_ITS'][time]}
+            dev: {'position': self._position_at(self._devices[dev]['position'], time)}
             for dev in self.devices()
         }
 
@@ -251,14 +268,56 @@ class MultiPatchLogData(object):
     def lastTime(self):
         return self._maxTime
 
+    @staticmethod
+    def _position_at(positions: np.ndarray, time: float):
+        """Return the (linearly interpolated) position at *time* from an array of (time, x, y, z) rows sorted by time,
+        or None if *time* is not after the first row.
+        """
+        times = positions[:, 0]
+        if len(times) == 0 or time <= times[0]:
+            return None
+        i = np.searchsorted(times, time, side='right') - 1
+        if i == len(times) - 1 or times[i] == time:
+            return tuple(positions[i, 1:])
+        s = (time - times[i]) / (times[i + 1] - times[i])
+        return tuple(positions[i, 1:] * (1.0 - s) + positions[i + 1, 1:] * s)
+
+    @classmethod
+    def _build_device_data(cls, events: list[dict], test_pulses=None) -> dict[str, Any]:
+        """Build the per-use data structures for one device from its list of events.
+
+        If *test_pulses* is given, it is used as the device's test pulse table instead of any test pulse events, and
+        its times are merged into the 'event' table.
+        """
+        events_by_use = {}
+        bool_fields = ('clean', 'broken', 'active', 'enabled')
+        for ev in events:
+            is_true = [ev[f] for f in bool_fields if f in ev]
+            ev["is_true"] = not is_true or any(is_true)  # empty should mean True
+            for use in _possible_uses_for_type(ev['event']):
+                events_by_use.setdefault(use, []).append(ev)
+
+        data = cls._initial_data_structures(events_by_use)
+        for use in events_by_use:
+            for i, event in enumerate(events_by_use[use]):
+                data[use][i] = cls._prepare_event_for_use(event, use)
+
+        if test_pulses is not None:
+            data['test_pulse'] = test_pulses
+            tp_events = np.zeros(len(test_pulses), dtype=data['event'].dtype)
+            tp_events['time'] = test_pulses['event_time']
+            tp_events['event'] = 'test_pulse'
+            tp_events['bool'] = True
+            all_events = np.concatenate([data['event'], tp_events])
+            data['event'] = all_events[np.argsort(all_events['time'], kind='stable')]
+        return data
+
     @staticmethod
     def _initial_data_structures(events_by_use: dict[str, list]) -> dict[str, Any]:
         def count_for_use(use: str):
             return len(events_by_use[use]) if use in events_by_use else 0
 
         return {
-            # 'position_ITS' is a special case, to support Canvas
-            'position_ITS': IrregularTimeSeries(interpolate=True),
             'position': np.zeros(
                 (count_for_use('position'), 4),
                 dtype=float,
@@ -316,10 +375,211 @@ class MultiPatchLogData(object):
             return tuple(event[info['name']] for info in TEST_PULSE_METAARRAY_INFO)
 
 
+BINARY_LOG_FORMAT = 'acq4.MultiPatchLog'
+BINARY_LOG_VERSION = 1
+
+
+def isBinaryLog(filename) -> bool:
+    """Return True if *filename* is a binary (HDF5) MultiPatch log rather than a JSON-lines log."""
+    return h5py.is_hdf5(filename)
+
+
+class TestPulseColumns(object):
+    """Test pulse results stored column-wise in a binary MultiPatch log.
+
+    Supports field access like an array of TEST_PULSE_NUMPY_DTYPE (``table['input_resistance']``); each column is
+    read from disk the first time it is requested. *group* is the (open) ``test_pulse`` group, or None.
+    """
+    def __init__(self, filename, group):
+        self._filename = filename
+        self._path = None if group is None else group.name
+        self._length = 0 if group is None else group['event_time'].shape[0]
+        self._columns = {}
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        if name not in self._columns:
+            if name not in dict(TEST_PULSE_NUMPY_DTYPE):
+                raise KeyError(name)
+            if self._path is None:
+                self._columns[name] = np.zeros(0)
+            else:
+                with h5py.File(self._filename, 'r') as fh:
+                    self._columns[name] = fh[self._path][name][:]
+        return self._columns[name]
+
+    def toArray(self) -> np.ndarray:
+        """Return all columns as a structured array of TEST_PULSE_NUMPY_DTYPE."""
+        arr = np.empty(len(self), dtype=TEST_PULSE_NUMPY_DTYPE)
+        for name, _ in TEST_PULSE_NUMPY_DTYPE:
+            arr[name] = self[name]
+        return arr
+
+
+class _BinaryDeviceLog(Mapping):
+    """Data for one device in a binary MultiPatch log; loaded on first access.
+
+    Test pulses are available immediately as a TestPulseColumns table. All other uses are built from the device's
+    (much less frequent) event records the first time any of them is accessed.
+    """
+    def __init__(self, filename, group):
+        self._filename = filename
+        self._path = group.name
+        self._testPulses = TestPulseColumns(filename, group.get('test_pulse'))
+        self._data = None
+
+    def _load(self):
+        events = []
+        with h5py.File(self._filename, 'r') as fh:
+            group = fh[self._path]
+            if 'events' in group:
+                events = [json.loads(rec) for rec in group['events']['record'].asstr()[:]]
+        self._data = MultiPatchLogData._build_device_data(events, test_pulses=self._testPulses)
+
+    def __getitem__(self, use):
+        if use == 'test_pulse':
+            return self._testPulses
+        if self._data is None:
+            self._load()
+        return self._data[use]
+
+    def __iter__(self):
+        if self._data is None:
+            self._load()
+        return iter(self._data)
+
+    def __len__(self):
+        if self._data is None:
+            self._load()
+        return len(self._data)
+
+
+class MultiPatchLogWriter(object):
+    """Writes MultiPatch events to a binary log file from a background thread.
+
+    The file is HDF5 with one group per device under ``/devices``. Test pulse results are stored column-wise
+    (one chunked float dataset per field of TEST_PULSE_NUMPY_DTYPE under ``test_pulse``); all other events are
+    stored as JSON records alongside their times under ``events``. The first and last event times are kept in the
+    file attributes.
+
+    write() only queues records; they are written in batches every *flushInterval* seconds, so recording does not
+    block the caller on disk access. Records that cannot be written are reported and skipped. Call close() to write
+    any remaining records and close the file.
+    """
+    def __init__(self, filename, flushInterval=1.0, chunkSize=4096):
+        self.flushInterval = flushInterval
+        self.chunkSize = chunkSize
+        self._file = h5py.File(filename, 'w')
+        self._file.attrs['format'] = BINARY_LOG_FORMAT
+        self._file.attrs['version'] = BINARY_LOG_VERSION
+        self._file.create_group('devices')
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="MultiPatchLogWriter", daemon=True)
+        self._thread.start()
+
+    def write(self, records):
+        for rec in records:
+            self._queue.put(rec)
+
+    def close(self):
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+        self._file.close()
+
+    def _run(self):
+        done = False
+        while not done:
+            batch = []
+            deadline = time.monotonic() + self.flushInterval
+            while True:
+                try:
+                    rec = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if rec is None:
+                    done = True
+                    break
+                batch.append(rec)
+            if len(batch) > 0:
+                try:
+                    self._writeBatch(batch)
+                except Exception:
+                    printExc("Error writing %d MultiPatch log records:" % len(batch))
+
+    def _writeBatch(self, records):
+        valid = []
+        for rec in records:
+            try:
+                float(rec['event_time'])
+                str(rec['device']), str(rec['event'])
+            except Exception:
+                printExc("Skipping invalid MultiPatch log record %r:" % (rec,))
+            else:
+                valid.append(rec)
+        records = valid
+        if len(records) == 0:
+            return
+
+        testPulses = {}
+        events = {}
+        for rec in records:
+            if rec['event'] == 'test_pulse':
+                testPulses.setdefault(rec['device'], []).append(rec)
+            else:
+                events.setdefault(rec['device'], []).append(rec)
+
+        for dev, recs in testPulses.items():
+            group = self._deviceGroup(dev).require_group('test_pulse')
+            for name, _ in TEST_PULSE_NUMPY_DTYPE:
+                values = np.array([np.nan if rec.get(name) is None else rec[name] for rec in recs], dtype=float)
+                self._append(group, name, values)
+        for dev, recs in events.items():
+            group = self._deviceGroup(dev).require_group('events')
+            self._append(group, 'time', np.array([rec['event_time'] for rec in recs], dtype=float))
+            encoded = [json.dumps(rec, cls=ACQ4JSONEncoder) for rec in recs]
+            self._append(group, 'record', np.array(encoded, dtype=object), dtype=h5py.string_dtype('utf-8'))
+
+        times = [rec['event_time'] for rec in records]
+        attrs = self._file.attrs
+        attrs['first_time'] = min(times + ([attrs['first_time']] if 'first_time' in attrs else []))
+        attrs['last_time'] = max(times + ([attrs['last_time']] if 'last_time' in attrs else []))
+        self._file.flush()
+
+    def _deviceGroup(self, dev):
+        key = dev.replace('/', '_')
+        devices = self._file['devices']
+        if key not in devices:
+            devices.create_group(key).attrs['name'] = dev
+        return devices[key]
+
+    def _append(self, group, name, values, dtype=float):
+        if name not in group:
+            group.create_dataset(name, shape=(0,), maxshape=(None,), chunks=(self.chunkSize,), dtype=dtype)
+        ds = group[name]
+        n = ds.shape[0]
+        ds.resize((n + len(values),))
+        ds[n:] = values
+
+
+def convertJsonLog(jsonFile, binaryFile):
+    """Convert a JSON-lines MultiPatch log to the binary format written by MultiPatchLogWriter."""
+    writer = MultiPatchLogWriter(binaryFile)
+    try:
+        with open(jsonFile, 'rb') as fh:
+            writer.write(json.loads(line.rstrip(b',\r\n')) for line in fh if line.strip())
+    finally:
+        writer.close()
+
+
 class MultiPatchLog(FileType):
     """File type written by MultiPatch module.
     """
-    extensions = ['.log']   # list of extensions handled by this class
+    extensions = ['.log', '.mplog']   # list of extensions handled by this class
     dataTypes = []    # list of python types handled by this class
     priority = 0      # priority for this class when multiple classes support the same file types
     
@@ -334,7 +594,7 @@ class MultiPatchLog(FileType):
         Otherwise, return False.
         The default implementation just checks for the correct name extensions."""
         name = fileHandle.shortName()
-        if name.startswith('MultiPatch_') and name.endswith('.log'):
+        if name.startswith('MultiPatch_') and name.endswith(('.log', '.mplog')):
             return cls.priority
         return False
 
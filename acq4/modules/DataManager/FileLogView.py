@@ -41,6 +41,7 @@ class FileLogView(LogWidget):
         ## if we're already displaying that log file, stop here, otherwise set/display the log file
         if logDir == self.currentLogDir:
             self.updateDirFilter(dh)
+            self.updateFromFile()
             self.filterEntries()
         else:
             self.currentLogDir = logDir
@@ -25,6 +25,7 @@ from collections import OrderedDict
 
 import copy
 import numpy as np
+import queue
 import time
 from six.moves import range
 
@@ -390,6 +391,7 @@ class Imager(Module):
                 dict(name='Overscan', type='float', value=50e-6, suffix='s', siPrefix=True, limits=[0, None], step=10e-6),
                 dict(name='Photodetector', type='list', values=self.detectors),
                 dict(name='Follow Stage', type='bool', value=True),
+                dict(name='Continuous Video', type='bool', value=config.get('continuousVideo', False)),
             ]),
             dict(name='Scan Properties', type='group', children=[
                 dict(name='Frame Time', type='float', value=50e-3, suffix='s', siPrefix=True, readonly=True, dec=True, step=0.5, minStep=100e-6),
@@ -760,10 +762,14 @@ class Imager(Module):
     def updateImagingProtocol(self):
         # send new protocol to acq thread
         protocol = self.generateProtocol()
+        if self.param["Scan Control", "Continuous Video"]:
+            videoProtocol = self.generateProtocol(continuous=True)
+        else:
+            videoProtocol = None
         metainfo = self.saveParams()
         system = self.scanProgram.components[0].ctrlParameter().system
         system.solve()
-        self.imagingThread.setProtocol(protocol, metainfo, system.copy())
+        self.imagingThread.setProtocol(protocol, metainfo, system.copy(), videoProtocol)
 
     def updateDecomb(self):
         if self.lastFrame is not None:
@@ -877,7 +883,12 @@ class Imager(Module):
         self.updateDecomb()
         self.imagingCtrl.newFrame(self.lastFrame)
 
-    def generateProtocol(self):
+    def generateProtocol(self, continuous=False):
+        """Return the task command for one scan.
+
+        If *continuous* is True, the command instead loops the scan on a continuous DAQ task that runs until it is
+        stopped (see ImagingThread.streamVideo).
+        """
         # first make sure laser information is updated on the module interface
         self.updateLaserInfo()
 
@@ -904,18 +915,21 @@ class Imager(Module):
         if self.laserDev.hasPCell:
             pcell = np.empty(vscan.shape[0], dtype=np.float64)  # DAQmx requires float64!
             pcell[:] = scanParams["Pockels"]
-            pcell[-1] = 0
+            if not continuous:
+                # continuous tasks return the pockels cell to its holding level when stopped
+                pcell[-1] = 0
             laserCmd["pCell"] = {"command": pcell}
 
         # Look up device names
         pdDevice, pdChannel = scanParams["Photodetector"]
+        daqName = self.manager.getDevice(pdDevice).getDAQName(pdChannel)
         scanDev = self.scannerDev.name()
 
         prot = {
             'protocol': {
                 'duration': duration,
                 },
-            'DAQ' : {
+            daqName: {
                 'rate': sampleRate, 
                 'numPts': samples,
                 'downsample': scanParams['Downsample']
@@ -930,6 +944,9 @@ class Imager(Module):
                 pdChannel: {'record': True},
             },
         }
+        if continuous:
+            prot['protocol']['timeout'] = None
+            prot[daqName]['continuous'] = True
 
         return prot
 
@@ -1134,6 +1151,55 @@ class ImagingFrame(imaging.Frame):
         self.setDecomb(offset, subpixel)
 
 
+class VideoFrameAssembler:
+    """Cuts a continuously streamed photodetector recording into frames.
+
+    When the scan waveform is looped on a continuous DAQ task, frame *i* of the video occupies samples
+    [i * framePts, (i + 1) * framePts) of the stream. Instances are subscribed to the DAQ task (see
+    NiDAQ Task.subscribe); each time a frame is complete, ``callback(index, startTime, data)`` is invoked with the
+    frame data downsampled by *downsample* and passed through *mapping*, as it would be returned from a single-frame
+    task.
+    """
+
+    def __init__(self, channel, framePts, callback, downsample=1, mapping=None):
+        self.channel = channel
+        self.framePts = framePts
+        self.callback = callback
+        self.downsample = downsample
+        self.mapping = mapping
+        self._buffer = np.empty(framePts)
+        self._filled = 0
+        self._frameIndex = 0
+        self._frameTime = None
+
+    def __call__(self, chunk):
+        data = chunk["data"][self.channel]
+        pos = 0
+        while pos < len(data):
+            if self._filled == 0:
+                self._frameTime = chunk["startTime"] + pos / chunk["rate"]
+            n = min(self.framePts - self._filled, len(data) - pos)
+            self._buffer[self._filled:self._filled + n] = data[pos:pos + n]
+            self._filled += n
+            pos += n
+            if self._filled == self.framePts:
+                self._finishFrame()
+
+    def _finishFrame(self):
+        data = self._buffer
+        ds = self.downsample
+        if ds > 1:
+            data = data[:(len(data) // ds) * ds].reshape(-1, ds).mean(axis=1)
+        else:
+            data = data.copy()
+        if self.mapping is not None:
+            data = self.mapping(data)
+        self._filled = 0
+        index = self._frameIndex
+        self._frameIndex += 1
+        self.callback(index, self._frameTime, data)
+
+
 class ImagingThread(Thread):
 
     sigNewFrame = Qt.Signal(object)
@@ -1149,15 +1215,18 @@ class ImagingThread(Thread):
         self.manager = acq4.Manager.getManager()
         self.laserDev = laserDev
         self.scannerDev = scannerDev
+        self.videoProtocol = None
 
-    def setProtocol(self, prot, meta, sys):
+    def setProtocol(self, prot, meta, sys, videoProt=None):
         #  prot = task protocol
         #  meta = output of saveParams to be stored with image
         #  sys = rectscan system for extracting image from pmt data
+        #  videoProt = continuous task protocol used for video, or None to acquire video one frame at a time
         with self.lock:
             self.protocol = prot
             self.metainfo = meta
             self.system = sys
+            self.videoProtocol = videoProt
 
     def abort(self):
         with self.lock:
@@ -1194,8 +1263,14 @@ class ImagingThread(Thread):
                 self.laserDev.openShutter()
 
             while True:
-                # take one frame
-                self.acquireFrame(allowBlanking=False)
+                with self.lock:
+                    stream = videoRequested and self._video and self.videoProtocol is not None
+                if stream:
+                    # returns when video is stopped or the protocol changes
+                    self.streamVideo()
+                else:
+                    # take one frame
+                    self.acquireFrame(allowBlanking=False)
 
                 # See whether acquisition should end
                 with self.lock:
@@ -1251,6 +1326,57 @@ class ImagingThread(Thread):
         data = task.getResult()
         pdDevice, pdChannel = meta["Photodetector"]
         pmtData = data[pdDevice][pdChannel].view(np.ndarray)
+        self.sigNewFrame.emit(self.makeFrame(pmtData, start, meta, rectSystem))
+
+    def streamVideo(self):
+        """Acquire video frames without gaps between them and emit sigNewFrame for each.
+
+        The scan waveform is generated once and looped on a continuous DAQ task, so the mirrors never wait for a
+        new task to be configured and started; frames are cut from the streamed photodetector data by a
+        VideoFrameAssembler. Returns when video is stopped or a new protocol is set.
+        """
+        with self.lock:
+            prot = self.videoProtocol
+            meta = self.metainfo
+            rectSystem = self.system
+
+        pdDevice, pdChannel = meta["Photodetector"]
+        pdDev = self.manager.getDevice(pdDevice)
+        daqName = pdDev.getDAQName(pdChannel)
+        task = self.manager.createTask(copy.deepcopy(prot))
+        daqTask = task.tasks[daqName]
+        frames = queue.Queue()
+        assembler = VideoFrameAssembler(
+            channel=daqTask.absChanName(pdDev.listChannels()[pdChannel]["channel"]),
+            framePts=prot[daqName]["numPts"],
+            callback=lambda *frame: frames.put(frame),
+            downsample=prot[daqName].get("downsample", 1),
+            mapping=lambda data: pdDev.mapFromDAQ(pdChannel, data),
+        )
+        daqTask.subscribe(assembler)
+
+        task.execute(block=False)
+        try:
+            while True:
+                with self.lock:
+                    video, abort = self._video, self._abort
+                    changed = self.videoProtocol is not prot
+                if abort:
+                    self._abort = False
+                    raise Exception("Imaging acquisition aborted")
+                if not video or changed:
+                    break
+                try:
+                    index, start, pmtData = frames.get(timeout=0.05)
+                except queue.Empty:
+                    task.isDone()  # raises if the task has failed
+                    continue
+                self.sigNewFrame.emit(self.makeFrame(pmtData, start, meta, rectSystem))
+        finally:
+            task.abort()
+            daqTask.unsubscribe(assembler)
+
+    def makeFrame(self, pmtData, start, meta, rectSystem):
         info = meta.copy()
         info["time"] = start
 
@@ -1258,5 +1384,4 @@ class ImagingThread(Thread):
         tr = rectSystem.imageTransform()
         info["transform"] = pg.SRTTransform3D(tr)
 
-        frame = ImagingFrame(pmtData, rectSystem.copy(), info)
-        self.sigNewFrame.emit(frame)
+        return ImagingFrame(pmtData, rectSystem.copy(), info)
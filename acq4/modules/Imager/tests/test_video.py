@@ -0,0 +1,63 @@
+import time
+from unittest.mock import MagicMock
+
+import numpy as np
+
+from acq4.devices.NiDAQ.nidaq import NiDAQ
+from acq4.modules.Imager.Imager import VideoFrameAssembler
+
+
+class ScanTask:
+    """Stands in for the scanner and photodetector tasks: loops a scan waveform and records the detector."""
+
+    def __init__(self, framePts, rate):
+        self.framePts = framePts
+        self.rate = rate
+
+    def createChannels(self, daqTask):
+        daqTask.addChannel('/Dev1/ao0', 'ao')
+        daqTask.setWaveform('/Dev1/ao0', np.linspace(-1, 1, self.framePts))
+        # detector signal is the index of each sample
+        daqTask.addChannel('/Dev1/ai0', 'ai', mockStreamFunc=lambda t: np.round(t * self.rate))
+
+
+def test_video_assembler():
+    frames = []
+    assembler = VideoFrameAssembler('/Dev1/ai0', 10, lambda *f: frames.append(f), downsample=2, mapping=lambda d: -d)
+    samples = np.arange(47, dtype=float)
+    for start in range(0, 47, 7):
+        chunk = samples[start:start + 7]
+        assembler({'start': start, 'startTime': 100 + start / 1e3, 'rate': 1e3, 'data': {'/Dev1/ai0': chunk}})
+
+    assert [f[0] for f in frames] == [0, 1, 2, 3]
+    assert np.allclose([f[1] for f in frames], [100, 100.01, 100.02, 100.03])
+    for i, start, data in frames:
+        assert np.allclose(data, -samples[i * 10:(i + 1) * 10].reshape(5, 2).mean(axis=1))
+
+
+def test_continuous_scan_task():
+    rate = 100e3
+    framePts = 2000
+    dev = NiDAQ(MagicMock(), {'mock': True}, 'DAQ')
+    parent = MagicMock()
+    parent.tasks = {'Scanner': ScanTask(framePts, rate)}
+    task = dev.createTask({'rate': rate, 'numPts': framePts, 'continuous': True, 'chunkSize': 700}, parent)
+
+    frames = []
+    assembler = VideoFrameAssembler(task.absChanName('Dev1/ai0'), framePts, lambda *f: frames.append(f))
+    task.configure()
+    task.subscribe(assembler)
+    task.start()
+    time.sleep(0.3)
+    assert not task.isDone()
+    # DAQGeneric tasks stop the DAQ task once per channel
+    task.stop(abort=True)
+    task.stop(abort=True)
+    assert task.isDone()
+
+    # frames are back to back: every sample acquired belongs to exactly one frame (100% duty cycle)
+    assert len(frames) >= 10
+    assert [f[0] for f in frames] == list(range(len(frames)))
+    data = np.concatenate([f[2] for f in frames])
+    assert np.array_equal(data, np.arange(len(data)))
+    assert np.allclose(np.diff([f[1] for f in frames]), framePts / rate, rtol=0, atol=1e-6)
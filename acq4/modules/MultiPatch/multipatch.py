@@ -8,6 +8,7 @@ from typing import List
 import pyqtgraph as pg
 from acq4 import getManager
 from acq4.devices.PatchPipette import PatchPipette
+from acq4.filetypes.MultiPatchLog import MultiPatchLogWriter
 from acq4.modules.Module import Module
 from acq4.util import Qt, ptime
 from .mockPatch import MockPatch
@@ -26,6 +27,11 @@ class MultiPatch(Module):
     enableMockPatch : bool
         Whether or not to allow mock patching.
 
+    logFormat : str
+        Format of the event log written while recording: 'json' (default) writes one JSON record per line to
+        MultiPatch_NNN.log; 'binary' writes MultiPatch_NNN.mplog using a background writer (see
+        acq4.filetypes.MultiPatchLog.MultiPatchLogWriter), which is much faster to write and to load.
+
     """
     moduleDisplayName = "MultiPatch"
     moduleCategory = "Acquisition"
@@ -564,7 +570,10 @@ class MultiPatchWindow(Qt.QWidget):
         if rec is True:
             man = getManager()
             sdir = man.getCurrentDir()
-            self.storageFile = open(sdir.createFile('MultiPatch.log', autoIncrement=True).name(), 'ab')
+            if self.module.config.get('logFormat', 'json') == 'binary':
+                self.storageFile = MultiPatchLogWriter(sdir.createFile('MultiPatch.mplog', autoIncrement=True).name())
+            else:
+                self.storageFile = open(sdir.createFile('MultiPatch.log', autoIncrement=True).name(), 'ab')
             self.writeRecords(self.eventHistory)
 
     def recordEvent(self, event):
@@ -579,6 +588,9 @@ class MultiPatchWindow(Qt.QWidget):
     def writeRecords(self, recs):
         if self.storageFile is None:
             return
+        if isinstance(self.storageFile, MultiPatchLogWriter):
+            self.storageFile.write(recs)
+            return
         for rec in recs:
             self.storageFile.write(json.dumps(rec, cls=ACQ4JSONEncoder).encode("utf8") + b",\n")
         self.storageFile.flush()
@@ -169,7 +169,8 @@ class PipetteControl(Qt.QWidget):
     def updatePlots(self):
         """Update the pipette data plots."""
         tp = self.pip.clampDevice.lastTestPulse()
-        tph = self.pip.clampDevice.testPulseHistory()
+        # downsampled to roughly the plot width so redraws stay cheap however long test pulses have been running
+        tph = self.pip.clampDevice.testPulseHistory(maxPoints=2000)
         for plt in self.plots:
             plt.newTestPulse(tp, tph)
 
@@ -416,7 +417,8 @@ class PlotWidget(Qt.QWidget):
                 'time constant': ('time_constant', 's'),
                 'capacitance': ('capacitance', 'F'),
             }[self.mode]
-            self.plot.plot(history['event_time'] - history['event_time'][0], history[key], clear=True)
+            if len(history) > 0:
+                self.plot.plot(history['event_time'] - history['event_time'][0], history[key], clear=True)
             val = tp.analysis[key]
             if val is None:
                 val = np.nan
@@ -0,0 +1,93 @@
+import json
+
+import h5py
+import numpy as np
+
+from acq4.filetypes.MultiPatchLog import (
+    MultiPatchLogData,
+    MultiPatchLogWriter,
+    TEST_PULSE_NUMPY_DTYPE,
+    convertJsonLog,
+    isBinaryLog,
+)
+
+
+def makeEvents():
+    events = []
+    t = 1000.0
+    for i in range(200):
+        for dev in ('Pipette1', 'Pipette2'):
+            t += 0.05
+            ev = {'device': dev, 'event_time': t, 'event': 'test_pulse'}
+            for name, _ in TEST_PULSE_NUMPY_DTYPE[1:]:
+                ev[name] = float(i) if name != 'capacitance' or i % 3 else None
+            events.append(ev)
+            t += 0.001  # the binary format does not preserve the order of simultaneous events
+            if i % 20 == 0:
+                events.append({'device': dev, 'event_time': t, 'event': 'move_stop', 'position': [i, 2 * i, -i]})
+            if i % 50 == 0:
+                events.append({'device': dev, 'event_time': t, 'event': 'state_change', 'state': f's{i}', 'info': ''})
+                events.append({'device': dev, 'event_time': t, 'event': 'pressure_changed', 'pressure': -i,
+                               'source': 'regulator'})
+    return events
+
+
+def writeJson(path, events):
+    with open(path, 'wb') as fh:
+        for ev in events:
+            fh.write(json.dumps(ev).encode('utf8') + b",\n")
+
+
+def test_binary_log_matches_json(tmp_path):
+    events = makeEvents()
+    jsonFile = str(tmp_path / 'MultiPatch_000.log')
+    binFile = str(tmp_path / 'MultiPatch_000.mplog')
+    writeJson(jsonFile, events)
+    convertJsonLog(jsonFile, binFile)
+    assert isBinaryLog(binFile) and not isBinaryLog(jsonFile)
+
+    js = MultiPatchLogData(jsonFile)
+    bn = MultiPatchLogData(binFile)
+    assert sorted(bn.devices()) == sorted(js.devices())
+    assert bn.firstTime() == js.firstTime()
+    assert bn.lastTime() == js.lastTime()
+    for dev in js.devices():
+        for name, _ in TEST_PULSE_NUMPY_DTYPE:
+            assert np.array_equal(bn[dev]['test_pulse'][name], js[dev]['test_pulse'][name], equal_nan=True)
+        assert np.array_equal(bn[dev]['position'], js[dev]['position'])
+        assert np.array_equal(bn[dev]['pressure'], js[dev]['pressure'])
+        assert np.array_equal(bn[dev]['event'], js[dev]['event'])
+        assert bn[dev]['state'] == js[dev]['state']
+    for t in np.linspace(js.firstTime() - 1, js.lastTime() + 1, 57):
+        assert bn.state(t) == js.state(t)
+    # the file is not held open between reads
+    h5py.File(binFile, 'a').close()
+
+
+def test_writer_batches(tmp_path):
+    events = makeEvents()
+    binFile = str(tmp_path / 'MultiPatch_001.mplog')
+    writer = MultiPatchLogWriter(binFile, flushInterval=0.01, chunkSize=16)
+    for i in range(0, len(events), 37):
+        writer.write(events[i:i + 37])
+    writer.close()
+
+    data = MultiPatchLogData(binFile)
+    n = sum(1 for ev in events if ev['device'] == 'Pipette1' and ev['event'] == 'test_pulse')
+    assert len(data['Pipette1']['test_pulse']) == n
+    assert data.state(events[-1]['event_time'])['Pipette2']['position'] == (180, 360, -180)
+
+
+def test_writer_survives_bad_records(tmp_path):
+    events = makeEvents()
+    binFile = str(tmp_path / 'MultiPatch_002.mplog')
+    writer = MultiPatchLogWriter(binFile, flushInterval=0.01)
+    writer.write(events[:100])
+    writer.write([{'device': 'Pipette1', 'event_time': 0.5}, {'event': 'move_stop'}])
+    writer.write(events[100:])
+    writer.close()
+
+    data = MultiPatchLogData(binFile)
+    n = sum(1 for ev in events if ev['device'] == 'Pipette1' and ev['event'] == 'test_pulse')
+    assert len(data['Pipette1']['test_pulse']) == n
+    assert data.firstTime() == events[0]['event_time']
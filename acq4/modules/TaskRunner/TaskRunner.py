@@ -1,10 +1,13 @@
 from collections import OrderedDict
 
 import gc
+import itertools
 import numpy as np
 import os
+import queue
 import six
 import sys
+import threading
 import time
 from six.moves import map
 from six.moves import range
@@ -84,6 +87,16 @@ class TaskRunner(Module):
         # Since most modern systems have adequate memory, this is now disabled by default.
         self._reduceMemoryUsage = config.get('reduceMemoryUsage', False)
 
+        # When pipelineDepth > 0, the results of each task are written to disk (and handed to analysis modules) by a
+        # background thread while the next task in the sequence is configured and run. At most pipelineDepth results
+        # may be waiting to be stored; beyond that the sequence blocks until the writer catches up.
+        # pipelineErrorPolicy decides what happens when storing a result fails: 'abort' stops the sequence before the
+        # next task starts, 'continue' logs the error and keeps running.
+        self._pipelineDepth = config.get('pipelineDepth', 0)
+        self._pipelineErrorPolicy = config.get('pipelineErrorPolicy', 'abort')
+        if self._pipelineErrorPolicy not in ('abort', 'continue'):
+            raise ValueError("pipelineErrorPolicy must be 'abort' or 'continue' (got %r)" % self._pipelineErrorPolicy)
+
         self.lastProtoTime = None
         self.loopEnabled = False
         self.devListItems = {}
@@ -641,11 +654,10 @@ class TaskRunner(Module):
                     self.docks[d].widget().prepareTaskStart()
 
             # print params, linkedParams
-            ## Generate the complete array of command structures. This can take a long time, so we start a progress dialog.
-            with pg.ProgressDialog("Generating task commands..", 0, pLen) as progressDlg:
-                self.lastQtProcessTime = ptime.time()
-                prot = runSequence(lambda p: self.generateTask(dh, p, progressDlg), paramInds, list(paramInds.keys()),
-                                   linkedParams=linkedParams)
+            ## Commands are generated just ahead of execution rather than all at once; generate the first
+            ## few now so that errors are raised before the sequence starts.
+            prot = TaskSequence(lambda p: self.generateTask(dh, p), paramInds, linkedParams)
+            prot.prepare()
             if dh is not None:
                 dh.flushSignals()  ## do this now rather than later when task is running
 
@@ -660,7 +672,7 @@ class TaskRunner(Module):
 
         return future
 
-    def generateTask(self, dh, params=None, progressDlg=None):
+    def generateTask(self, dh, params=None):
         # prof = Profiler("Generate Task: %s" % str(params))
         ## Never put {} in the function signature
         if params is None:
@@ -709,15 +721,6 @@ class TaskRunner(Module):
                 # prof.mark("get task from %s" % d)
         # print prot['protocol']['storageDir'].name()
 
-        if progressDlg is not None:
-            progressDlg.setValue(progressDlg.value() + 1)
-            ## only do UI updates every 1 sec.
-            now = ptime.time()
-            if now - self.lastQtProcessTime > 1.0:
-                self.lastQtProcessTime = now
-                Qt.QApplication.processEvents()
-            if progressDlg.wasCanceled():
-                raise Exception("Target sequence computation canceled by user.")
         # prof.mark('done')
         return prot
 
@@ -948,6 +951,90 @@ class Task:
                 self.enabled.remove(newName)
 
 
+class TaskSequence(Qt.QObject):
+    """Generates the command for each point of a task sequence shortly before it is needed.
+
+    Device docks generate their commands from the state of their widgets, so commands are always generated in the
+    GUI thread. When the task thread requests a command, generation of that command and the next *lookAhead*
+    commands is scheduled in the GUI thread; commands that have already been requested are discarded. This keeps
+    memory use constant regardless of the size of the parameter space, and the first task can start as soon as its
+    own command is ready.
+
+    Because commands are generated during the sequence, changes made to the device docks while a sequence is running
+    may affect the commands that have not been generated yet.
+    """
+    sigGenerate = Qt.Signal()
+
+    def __init__(self, generator, paramSpace, linkedParams=None, lookAhead=2):
+        Qt.QObject.__init__(self)
+        self.generator = generator
+        self.paramSpace = paramSpace
+        self.linkedParams = linkedParams or {}
+        self.lookAhead = lookAhead
+        self.keys = list(paramSpace.keys())
+        self.shape = tuple(len(paramSpace[k]) for k in self.keys)
+        self._points = itertools.product(*[paramSpace[k] for k in self.keys])
+        self._nextIndex = 0  # index of the next command to be generated
+        self._requested = 0  # highest index requested so far
+        self._cache = OrderedDict()
+        self._error = None
+        self._cond = threading.Condition()
+        self.sigGenerate.connect(self._generate, Qt.Qt.QueuedConnection)
+
+    def __len__(self):
+        return int(np.prod(self.shape))
+
+    def prepare(self):
+        """Generate the first commands of the sequence immediately (must be called from the GUI thread)."""
+        self._generate()
+        if self._error is not None:
+            raise self._error
+
+    def command(self, params, timeout=None):
+        """Return the command for the sequence point given by *params* ({paramName: index, ...}).
+
+        Return None if the command is not ready within *timeout* seconds.
+        """
+        index = int(np.ravel_multi_index(tuple(params[k] for k in self.keys), self.shape))
+        with self._cond:
+            if index > self._requested:
+                self._requested = index
+                self.sigGenerate.emit()
+            if not self._cond.wait_for(lambda: index in self._cache or self._error is not None, timeout):
+                return None
+            if self._error is not None:
+                raise self._error
+            cmd = self._cache[index]
+            ## earlier commands will not be requested again
+            while next(iter(self._cache)) < index:
+                self._cache.popitem(last=False)
+            return cmd
+
+    def _generate(self):
+        with self._cond:
+            stop = min(self._requested + self.lookAhead + 1, len(self))
+            if self._error is not None:
+                return
+        while self._nextIndex < stop:
+            inds = next(self._points)
+            params = OrderedDict(zip(self.keys, inds))
+            for key, linked in self.linkedParams.items():
+                for lp in linked:
+                    params[lp] = params[key]
+            try:
+                cmd = self.generator(params)
+            except Exception as exc:
+                printExc("Error generating task command:")
+                with self._cond:
+                    self._error = exc
+                    self._cond.notify_all()
+                return
+            with self._cond:
+                self._cache[self._nextIndex] = cmd
+                self._nextIndex += 1
+                self._cond.notify_all()
+
+
 class TaskThread(Thread):
     sigPaused = Qt.Signal()
     sigNewFrame = Qt.Signal(object)
@@ -965,6 +1052,7 @@ class TaskThread(Thread):
         self._currentTask = None
         self._currentFuture = None
         self._systrace = None
+        self.writer = None
 
     def startTask(self, task, paramSpace=None):
         with self.lock:
@@ -1000,14 +1088,23 @@ class TaskThread(Thread):
                 self.stopThread = False
                 self.abortThread = False
 
-            if self.paramSpace is None:
-                try:
-                    self.runOnce()
-                except Exception as e:
-                    if e.args[0] != 'stop':
-                        raise
+            if self.ui._pipelineDepth > 0:
+                self.writer = ResultWriter(self.ui._pipelineDepth, self.ui._pipelineErrorPolicy)
+            try:
+                if self.paramSpace is None:
+                    try:
+                        self.runOnce()
+                    except Exception as e:
+                        if e.args[0] != 'stop':
+                            raise
+                else:
+                    runSequence(self.runOnce, self.paramSpace, list(self.paramSpace.keys()))
+            except Exception:
+                self._finishWriter(raiseError=False)
+                raise
             else:
-                runSequence(self.runOnce, self.paramSpace, list(self.paramSpace.keys()))
+                # results of the last few tasks may still be waiting to be stored
+                self._finishWriter()
 
         except Exception as exc:
             self.task = None  ## free up this memory
@@ -1030,10 +1127,15 @@ class TaskThread(Thread):
             params = {}
 
         ## Select correct command to execute
-        cmd = self.task
-        if params is not None:
-            for p in params:
-                cmd = cmd[p: params[p]]
+        if isinstance(self.task, TaskSequence):
+            cmd = None
+            while cmd is None:
+                with self.lock:
+                    if self.abortThread or self.stopThread:
+                        return
+                cmd = self.task.command(params, timeout=0.1)
+        else:
+            cmd = self.task
         prof.mark('select command')
 
         ## Wait before starting if we've already run too recently
@@ -1070,6 +1172,13 @@ class TaskThread(Thread):
                 "TaskRunner.runOnce failed to generate a proper command structure. Object type was '%s', should have been 'dict'." % type(
                     cmd))
 
+        if self.writer is not None:
+            self.writer.checkError()
+            if cmd['protocol'].get('storeData', False):
+                # storage is done by the writer thread after the task finishes
+                cmd = cmd.copy()
+                cmd['protocol'] = dict(cmd['protocol'], deferStorage=True)
+
         task = self.dm.createTask(cmd)
         prof.mark('create task')
 
@@ -1128,8 +1237,11 @@ class TaskThread(Thread):
         prof.mark('getResult')
 
         frame = {'params': params, 'cmd': cmd, 'result': result}
-        self._currentFuture.newFrame(frame)
-        self.sigNewFrame.emit(frame)
+        if self.writer is None:
+            self._handOffFrame(self._currentFuture, frame)
+        else:
+            # blocks while the writer has pipelineDepth results outstanding
+            self.writer.submit(self._storeAndHandOff, task, self._currentFuture, frame)
         prof.mark('emit newFrame')
         if self.stopThread:
             raise Exception('stop', result)
@@ -1139,6 +1251,25 @@ class TaskThread(Thread):
         prof.mark('yield')
         prof.finish()
 
+    def _handOffFrame(self, future, frame):
+        future.newFrame(frame)
+        self.sigNewFrame.emit(frame)
+
+    def _storeAndHandOff(self, task, future, frame):
+        # runs in the writer thread. The frame is handed off even if storage fails, so analysis modules and the
+        # sequence future still see it (the error itself is reported by the writer).
+        try:
+            if task.cfg.get('deferStorage', False):
+                task.storeResult()
+        finally:
+            self._handOffFrame(future, frame)
+
+    def _finishWriter(self, raiseError=True):
+        if self.writer is None:
+            return
+        writer, self.writer = self.writer, None
+        writer.finish(raiseError=raiseError)
+
     def checkStop(self):
         with self.lock:
             if self.stopThread:
@@ -1161,6 +1292,51 @@ class TaskThread(Thread):
                 self.abortThread = True
 
 
+class ResultWriter:
+    """Runs result-storage jobs for a task sequence in a background thread, in the order they were submitted.
+
+    At most *maxPending* jobs may be outstanding; submit() blocks until there is room. If a job raises an exception,
+    the error is logged; with *errorPolicy* 'abort' the first error is also re-raised by the next call to
+    checkError(), submit() or finish() so that the sequence stops before running another task. Jobs that were already
+    submitted are still run, so no acquired data is dropped.
+    """
+
+    def __init__(self, maxPending, errorPolicy='abort'):
+        self.errorPolicy = errorPolicy
+        self._queue = queue.Queue(maxsize=maxPending)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="TaskRunner.ResultWriter", daemon=True)
+        self._thread.start()
+
+    def submit(self, fn, *args):
+        self.checkError()
+        self._queue.put((fn, args))
+
+    def checkError(self):
+        if self._error is not None and self.errorPolicy == 'abort':
+            raise HelpfulException("Error storing task results; sequence aborted.", self._error)
+
+    def finish(self, raiseError=True):
+        """Wait for all submitted jobs to complete, then stop the writer thread."""
+        self._queue.put(None)
+        self._thread.join()
+        if raiseError:
+            self.checkError()
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+            fn, args = job
+            try:
+                fn(*args)
+            except Exception:
+                printExc("Error storing task results:")
+                if self._error is None:
+                    self._error = sys.exc_info()
+
+
 class TaskFuture(Future):
     """Used to check on progress for a running task or task sequence.
 
@@ -99,7 +99,7 @@ class MultiPatchLogCanvasItem(CanvasItem):
     @classmethod
     def checkFile(cls, fh):
         name = fh.shortName()
-        if name.startswith('MultiPatch_') and name.endswith('.log'):
+        if name.startswith('MultiPatch_') and name.endswith(('.log', '.mplog')):
             return 10
         else:
             return 0
@@ -7,6 +7,7 @@ These classes implement a data management system that allows modules
 to easily store and retrieve data files along with metadata. The objects
 probably only need to be created via functions in the Manager class.
 """
+import bisect
 import contextlib
 import os
 import re
@@ -14,14 +15,23 @@ import shutil
 import time
 import weakref
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from typing import Callable
 
 from acq4 import filetypes
 from acq4.util import Qt, advancedTypes as advancedTypes
 from acq4.util.Mutex import Mutex
 from acq4.util.debug import printExc
+from acq4.util.log_store import indexFileName
 from pyqtgraph import SignalProxy, BusyCursor
-from pyqtgraph.configfile import readConfigFile, writeConfigFile, appendConfigFile
+from .index_store import getIndexStore, getStoreClass, INDEX_FILE_NAMES
+
+# Consolidated data cache written in protocol sequence directories (see PatchEPhys.readSequenceClampFiles)
+SEQUENCE_CACHE_FILE = '.sequence_cache.pkl'
+
+# Files that are hidden from directory listings: index files, the directory log, the index of the LogWindow log, and
+# the sequence data cache
+HIDDEN_FILE_NAMES = INDEX_FILE_NAMES | {'.log', indexFileName('log.txt'), SEQUENCE_CACHE_FILE}
 
 if not hasattr(Qt.QtCore, 'Signal'):
     Qt.Signal = Qt.pyqtSignal
@@ -56,6 +66,17 @@ def getInfo(name) -> dict:
     return getDataManager().getHandle(name).info().deepcopy()
 
 
+_cTimePool = None
+
+
+def _getCTimePool():
+    """Return the thread pool used to look up file timestamps in parallel (see DirHandle.ls)."""
+    global _cTimePool
+    if _cTimePool is None:
+        _cTimePool = ThreadPoolExecutor(max_workers=8, thread_name_prefix='DirHandleCTime')
+    return _cTimePool
+
+
 def cleanup():
     """
     Free memory by deleting cached handles that are not in use elsewhere.
@@ -332,7 +353,7 @@ class FileHandle(Qt.QObject):
             self.manager._handleChanged(self, 'deleted', fn1)
             self.path = None
             self.emitChanged('deleted', fn1)
-            parent._childChanged()
+            parent._childChanged(removed=oldName)
 
     def read(self, *args, **kargs):
         self.checkExists()
@@ -423,11 +444,16 @@ class FileHandle(Qt.QObject):
 
 
 class DirHandle(FileHandle):
+    # Minimum number of file timestamps that must be read from disk before ls() uses a thread pool
+    cTimeParallelThreshold = 16
+
     def __init__(self, path, manager, create=False):
         FileHandle.__init__(self, path, manager)
         self._index = None
+        self._store = None
         self.lsCache = {}  # sortMode: [files...]
         self.cTimeCache = {}
+        self._isDirCache = {}
         self._indexFileExists = False
 
         if not os.path.isdir(self.path) and create:
@@ -435,11 +461,17 @@ class DirHandle(FileHandle):
             self.createIndex()
 
         # Let's avoid reading the index unless we really need to.
-        self._indexFileExists = os.path.isfile(self._indexFile())
+        self._indexFileExists = self._indexStore().exists()
+
+    def _indexStore(self):
+        """Return the IndexStore used to read and write the index for this directory."""
+        if self._store is None or self._store.dirPath != self.path or not self._indexFileExists:
+            self._store = getIndexStore(self.path)
+        return self._store
 
     def _indexFile(self):
         """Return the name of the index file for this directory. NOT the same as indexFile()"""
-        return os.path.join(self.path, '.index')
+        return self._indexStore().path()
 
     def _logFile(self):
         return os.path.join(self.path, '.log')
@@ -501,12 +533,12 @@ class DirHandle(FileHandle):
     def subDirs(self):
         """Return a list of string names for all sub-directories."""
         with self.lock:
-            ls = self.ls()
+            ls = self.ls(useCache=True)
             return [d for d in ls if os.path.isdir(os.path.join(self.name(), d))]
 
     def incrementFileName(self, fileName, useExt=True):
         """Given fileName.ext, finds the next available fileName_NNN.ext"""
-        files = self.ls()
+        files = self.ls(useCache=True)
         if useExt:
             (fileName, ext) = os.path.splitext(fileName)
         else:
@@ -538,7 +570,7 @@ class DirHandle(FileHandle):
             ## Create directory
             ndm = self.manager.getDirHandle(newDir, create=True)
             t = time.time()
-            self._childChanged()
+            self._childChanged(added=fullName, timestamp=t)
 
             if self.isManaged():
                 ## Mark the creation time in the parent directory so it can sort its full list of files without
@@ -574,9 +606,16 @@ class DirHandle(FileHandle):
     def ls(self, normcase=False, sortMode='date', useCache=False):
         """Return a list of all files in the directory.
         If normcase is True, normalize the case of all names in the list.
-        sortMode may be 'date', 'alpha', or None."""
+        sortMode may be 'date', 'alpha', or None.
+
+        If useCache is True, return the cached listing if one is available. Cached listings are updated in place
+        as files are added to or removed from this directory through DirHandle methods, so this is only stale if
+        the directory has been modified by other means, so methods of this class that list the directory use the
+        cache. Listing with useCache=False discards the cached listings for every sort mode."""
         with self.lock:
-            if (not useCache) or (sortMode not in self.lsCache):
+            if not useCache:
+                self.lsCache = {}
+            if sortMode not in self.lsCache:
                 self._updateLsCache(sortMode)
             files = self.lsCache[sortMode]
 
@@ -587,43 +626,115 @@ class DirHandle(FileHandle):
 
     def _updateLsCache(self, sortMode):
         try:
-            files = os.listdir(self.name())
+            with os.scandir(self.name()) as it:
+                entries = {e.name: e for e in it if e.name not in HIDDEN_FILE_NAMES}
         except Exception:
             printExc(f"Error while listing files in {self.name()}:")
-            files = []
-        for i in ['.index', '.log']:
-            if i in files:
-                files.remove(i)
+            entries = {}
+        files = list(entries.keys())
 
         if sortMode == 'date':
             # Sort files by creation time
-            with BusyCursor():
-                for f in files:
-                    if f not in self.cTimeCache:
-                        self.cTimeCache[f] = self._getFileCTime(f)
-            files.sort(key=lambda f: (self.cTimeCache[f], f))  ## sort by time first, then name.
+            missing = [f for f in files if f not in self.cTimeCache]
+            if len(missing) > 0:
+                with BusyCursor():
+                    self._updateCTimeCache(missing, entries)
+        elif sortMode not in ('alpha', None):
+            raise ValueError(f'Unrecognized sort mode "{sortMode}"')
+
+        for f, entry in entries.items():
+            self._isDirCache[f] = self._entryIsDir(entry)
+        if sortMode is not None:
+            files.sort(key=self._lsSortKey(sortMode))
+        self.lsCache[sortMode] = files
+
+    def _lsSortKey(self, sortMode):
+        if sortMode == 'date':
+            return lambda f: (self.cTimeCache[f], f)  ## sort by time first, then name.
         elif sortMode == 'alpha':
             # show directories first when sorting alphabetically.
-            files.sort(key=lambda a: (os.path.isdir(os.path.join(self.name(), a)), a))
-        elif sortMode is None:
-            pass
+            return lambda f: (self._isDirCache[f], f)
         else:
-            raise ValueError(f'Unrecognized sort mode "{sortMode}"')
+            return None
 
-        self.lsCache[sortMode] = files
+    @staticmethod
+    def _entryIsDir(entry):
+        try:
+            return entry.is_dir()
+        except OSError:
+            return False
+
+    def _updateCTimeCache(self, files, entries):
+        """Fill cTimeCache for all *files*.
+
+        Timestamps that can not be read from this directory's index require file system access (reading
+        subdirectory indexes or stat calls). On network-mounted storage these are slow, so they are resolved in
+        parallel.
+        """
+        managed = self.isManaged()
+        index = self._readIndex() if managed else {}
+        slow = []
+        for f in files:
+            try:
+                self.cTimeCache[f] = index[f]['__timestamp__']
+            except KeyError:
+                slow.append(f)
+
+        # Note: the lookups must not acquire self.lock, which is held by the calling thread.
+        lookup = lambda f: self._readFileCTime(self.path, f, entries.get(f), managed)
+        if len(slow) > self.cTimeParallelThreshold:
+            times = _getCTimePool().map(lookup, slow)
+        else:
+            times = map(lookup, slow)
+        for f, t in zip(slow, times):
+            self.cTimeCache[f] = t
+
+    def _lsInsert(self, fileName, timestamp=None):
+        """Insert a new file into all cached listings, keeping them sorted."""
+        self._isDirCache[fileName] = os.path.isdir(os.path.join(self.name(), fileName))
+        if timestamp is not None:
+            self.cTimeCache[fileName] = timestamp
+        elif fileName not in self.cTimeCache and 'date' in self.lsCache:
+            self.cTimeCache[fileName] = self._getFileCTime(fileName)
+        for sortMode, files in self.lsCache.items():
+            if fileName in files:
+                continue
+            keyFn = self._lsSortKey(sortMode)
+            if keyFn is None:
+                files.append(fileName)
+                continue
+            key = keyFn(fileName)
+            # new files are usually the most recent; avoid computing keys for the whole list in that case
+            if len(files) == 0 or keyFn(files[-1]) <= key:
+                files.append(fileName)
+            else:
+                files.insert(bisect.bisect_right([keyFn(f) for f in files], key), fileName)
 
     def __iter__(self):
-        for f in self.ls():
+        for f in self.ls(useCache=True):
             yield self[f]
 
     def _getFileCTime(self, fileName):
-        if self.isManaged():
+        managed = self.isManaged()
+        if managed:
             index = self._readIndex()
             with contextlib.suppress(KeyError):
                 return index[fileName]['__timestamp__']
-            # try getting time directly from file
+        return self._readFileCTime(self.path, fileName, None, managed)
+
+    @staticmethod
+    def _readFileCTime(dirPath, fileName, entry, managed):
+        """Determine the creation time of a file that has no timestamp in its parent's index.
+
+        *entry* may be an os.DirEntry for the file, which avoids a separate stat call on some platforms. This
+        does not touch any handles, so it is safe to call from worker threads.
+        """
+        if managed:
+            # try getting time directly from the subdirectory's index
             with contextlib.suppress(Exception):
-                return self[fileName].info()['__timestamp__']
+                store = getIndexStore(os.path.join(dirPath, fileName))
+                if store.exists():
+                    return store.read()['.']['__timestamp__']
         # if the file has an obvious date in it, use that
         m = re.search(r'(20\d\d\.\d\d?\.\d\d?)', fileName)
         if m is not None:
@@ -631,7 +742,9 @@ class DirHandle(FileHandle):
 
         # if all else fails, just ask the file system
         try:
-            return os.path.getctime(os.path.join(self.name(), fileName))
+            if entry is not None:
+                return entry.stat().st_ctime
+            return os.path.getctime(os.path.join(dirPath, fileName))
         except Exception:
             return 0
 
@@ -640,7 +753,7 @@ class DirHandle(FileHandle):
         return child.isGrandchildOf(self)
 
     def hasChildren(self):
-        return len(self.ls()) > 0
+        return len(self.ls(useCache=True)) > 0
 
     def info(self):
         self._readIndex(unmanagedOk=True)  ## returns None if this directory has no index file
@@ -685,11 +798,10 @@ class DirHandle(FileHandle):
             ## Write file
             open(os.path.join(self.name(), fileName), 'w')
 
-            self._childChanged()
-
             ## Write meta-info
             if '__timestamp__' not in info:
                 info['__timestamp__'] = t
+            self._childChanged(added=fileName, timestamp=info['__timestamp__'])
             self._setFileInfo(fileName, info)
             self.emitChanged('children', fileName)
             return self[fileName]
@@ -720,12 +832,12 @@ class DirHandle(FileHandle):
             ## Write file
             fileName = fileClass.write(obj, self, fileName, **kwargs)
 
-            self._childChanged()
             ## Write meta-info
             if '__object_type__' not in info:
                 info['__object_type__'] = fileType
             if '__timestamp__' not in info:
                 info['__timestamp__'] = t
+            self._childChanged(added=fileName, timestamp=info['__timestamp__'])
             self._setFileInfo(fileName, info)
             self.emitChanged('children', fileName)
             return self[fileName]
@@ -762,7 +874,8 @@ class DirHandle(FileHandle):
                 except:
                     print(type(index))
                     raise
-                self._writeIndex(index, lock=False)
+                self._indexStore().remove(index, fileName)
+                self._indexMTime = self._indexStore().mtime()
                 self.emitChanged('meta', fileName)
 
     def isManaged(self, fileName=None):
@@ -798,7 +911,7 @@ class DirHandle(FileHandle):
     def hasMatchingChildren(self, test: Callable[[FileHandle], bool]):
         """Returns True if any child of this directory matches the given test function."""
         with self.lock:
-            return any(test(self[f]) for f in self.ls())
+            return any(test(self[f]) for f in self.ls(useCache=True))
 
     def representativeFramesForAllImages(self):
         from acq4.util.imaging import Frame
@@ -837,41 +950,80 @@ class DirHandle(FileHandle):
                 self._appendIndex({fileName: info})
 
             else:
-                self._writeIndex(index, lock=False)
+                self._updateIndex(fileName)
             self.emitChanged('meta', fileName)
 
     def _readIndex(self, lock=True, unmanagedOk=False):
         with self.lock:
-            indexFile = self._indexFile()
-            if self._index is None or os.path.getmtime(indexFile) != self._indexMTime:
-                if not os.path.isfile(indexFile):
+            store = self._indexStore()
+            if self._index is None or store.mtime() != self._indexMTime:
+                if not store.exists():
                     if unmanagedOk:
                         return None
                     else:
                         raise Exception("Directory '%s' is not managed!" % (self.name()))
                 try:
-                    self._index = readConfigFile(indexFile)
-                    self._indexMTime = os.path.getmtime(indexFile)
+                    self._index = store.read()
+                    self._indexMTime = store.mtime()
                 except:
-                    print("***************Error while reading index file %s!*******************" % indexFile)
+                    print("***************Error while reading index file %s!*******************" % store.path())
                     raise
             return self._index
 
     def _writeIndex(self, newIndex, lock=True):
         with self.lock:
-            writeConfigFile(newIndex, self._indexFile())
+            store = self._indexStore()
+            store.write(newIndex)
             self._index = newIndex
-            self._indexMTime = os.path.getmtime(self._indexFile())
+            self._indexMTime = store.mtime()
             self._indexFileExists = True
 
     def _appendIndex(self, info):
         with self.lock:
-            indexFile = self._indexFile()
-            appendConfigFile(info, indexFile)
-            self._indexFileExists = True
+            store = self._indexStore()
             for k in info:
                 self._index[k] = info[k]
-            self._indexMTime = os.path.getmtime(indexFile)
+                store.append(self._index, k)
+            self._indexFileExists = True
+            self._indexMTime = store.mtime()
+
+    def _updateIndex(self, fileName):
+        """Store changes made to an existing entry in the index."""
+        with self.lock:
+            store = self._indexStore()
+            store.update(self._index, fileName)
+            self._indexMTime = store.mtime()
+
+    def migrateIndex(self, backend, recursive=False):
+        """Convert the index for this directory to a different storage backend ('config' or 'sqlite').
+
+        The old index file is removed once the new one has been written. If *recursive* is True, all managed
+        subdirectories are converted as well.
+        """
+        with self.lock:
+            if self.isManaged():
+                store = self._indexStore()
+                if store.backend != backend:
+                    index = self._readIndex(lock=False)
+                    newStore = getStoreClass(backend)(self.path)
+                    newStore.write(index)
+                    store.delete()
+                    self._store = newStore
+                    self._indexMTime = newStore.mtime()
+            if recursive:
+                for d in self.subDirs():
+                    self[d].migrateIndex(backend, recursive=True)
+
+    def compactIndex(self, recursive=False):
+        """Rewrite the index for this directory to reclaim space left by updated or removed entries."""
+        with self.lock:
+            if self.isManaged():
+                store = self._indexStore()
+                store.compact()
+                self._index = None
+            if recursive:
+                for d in self.subDirs():
+                    self[d].compactIndex(recursive=True)
 
     def checkIndex(self):
         ind = self._readIndex(unmanagedOk=True)
@@ -886,8 +1038,23 @@ class DirHandle(FileHandle):
         if changed:
             self._writeIndex(ind)
 
-    def _childChanged(self):
-        self.lsCache = {}
+    def _childChanged(self, added=None, removed=None, timestamp=None):
+        """Inform this directory that its list of children has changed.
+
+        If a single file was *added* or *removed*, cached listings are updated in place. Otherwise, they are
+        discarded.
+        """
+        with self.lock:
+            if added is not None:
+                self._lsInsert(added, timestamp)
+            elif removed is not None:
+                for files in self.lsCache.values():
+                    if removed in files:
+                        files.remove(removed)
+                self.cTimeCache.pop(removed, None)
+                self._isDirCache.pop(removed, None)
+            else:
+                self.lsCache = {}
         self.emitChanged('children')
 
 
@@ -0,0 +1,194 @@
+"""
+Storage backends for the per-directory meta-info index used by DirHandle.
+
+The default backend is the human-readable ``.index`` config file. Updating an existing entry in that format
+requires rewriting the whole file, which becomes expensive for directories holding thousands of entries.
+The ``sqlite`` backend keeps one row per entry in ``.index.sqlite`` so that appends, updates and removals only
+touch the affected entry.
+
+The backend used for a directory is decided by which index file is present on disk; the default backend is only
+consulted when a new index is created. Existing ``.index`` files are therefore always readable, and can be
+converted with DirHandle.migrateIndex().
+"""
+import os
+import pickle
+import sqlite3
+from collections import OrderedDict
+from contextlib import closing
+
+from pyqtgraph.configfile import readConfigFile, writeConfigFile, appendConfigFile
+
+
+class IndexStore:
+    """Base class for classes that persist the meta-info index of a single directory.
+
+    All methods operate on the complete in-memory index (an OrderedDict mapping file names to info dicts) that is
+    held by the DirHandle; *name* is the key of the entry that changed.
+    """
+    backend = None
+    fileName = None
+
+    def __init__(self, dirPath):
+        self.dirPath = dirPath
+
+    def path(self):
+        return os.path.join(self.dirPath, self.fileName)
+
+    def exists(self):
+        return os.path.isfile(self.path())
+
+    def mtime(self):
+        return os.path.getmtime(self.path())
+
+    def read(self):
+        """Return the complete index as an OrderedDict."""
+        raise NotImplementedError()
+
+    def write(self, index):
+        """Replace the stored index with *index*."""
+        raise NotImplementedError()
+
+    def append(self, index, name):
+        """Store the new entry index[name]."""
+        raise NotImplementedError()
+
+    def update(self, index, name):
+        """Store the modified entry index[name]."""
+        raise NotImplementedError()
+
+    def remove(self, index, name):
+        """Remove *name*, which has already been deleted from *index*."""
+        raise NotImplementedError()
+
+    def compact(self):
+        """Reclaim space left behind by updates and removals."""
+        raise NotImplementedError()
+
+    def delete(self):
+        """Remove all files belonging to this index."""
+        os.remove(self.path())
+
+
+class ConfigFileIndexStore(IndexStore):
+    """Stores the index in the human-readable ``.index`` config file format."""
+    backend = 'config'
+    fileName = '.index'
+
+    def read(self):
+        return readConfigFile(self.path())
+
+    def write(self, index):
+        writeConfigFile(index, self.path())
+
+    def append(self, index, name):
+        appendConfigFile({name: index[name]}, self.path())
+
+    def update(self, index, name):
+        self.write(index)
+
+    def remove(self, index, name):
+        self.write(index)
+
+    def compact(self):
+        self.write(self.read())
+
+
+class SqliteIndexStore(IndexStore):
+    """Stores the index as one pickled row per entry in ``.index.sqlite``.
+
+    Rows are kept in insertion order, so the index reads back in the same order as the equivalent ``.index`` file.
+    """
+    backend = 'sqlite'
+    fileName = '.index.sqlite'
+
+    def _connect(self):
+        db = sqlite3.connect(self.path())
+        # The .index text format is never fsync'd either; the rollback journal still keeps each write atomic.
+        db.execute("PRAGMA synchronous=OFF")
+        db.execute("CREATE TABLE IF NOT EXISTS entries (name TEXT PRIMARY KEY NOT NULL, info BLOB NOT NULL)")
+        return closing(db)
+
+    @staticmethod
+    def _encode(info):
+        return sqlite3.Binary(pickle.dumps(info, protocol=4))
+
+    def read(self):
+        with self._connect() as db:
+            rows = db.execute("SELECT name, info FROM entries ORDER BY rowid").fetchall()
+        return OrderedDict((name, pickle.loads(info)) for name, info in rows)
+
+    def write(self, index):
+        with self._connect() as db, db:
+            db.execute("DELETE FROM entries")
+            db.executemany(
+                "INSERT INTO entries (name, info) VALUES (?, ?)",
+                [(name, self._encode(info)) for name, info in index.items()],
+            )
+
+    def append(self, index, name):
+        with self._connect() as db, db:
+            db.execute("INSERT INTO entries (name, info) VALUES (?, ?)", (name, self._encode(index[name])))
+
+    def update(self, index, name):
+        # UPDATE (rather than INSERT OR REPLACE) keeps the rowid and therefore the entry order
+        with self._connect() as db, db:
+            cur = db.execute("UPDATE entries SET info=? WHERE name=?", (self._encode(index[name]), name))
+            if cur.rowcount == 0:
+                db.execute("INSERT INTO entries (name, info) VALUES (?, ?)", (name, self._encode(index[name])))
+
+    def remove(self, index, name):
+        with self._connect() as db, db:
+            db.execute("DELETE FROM entries WHERE name=?", (name,))
+
+    def compact(self):
+        with self._connect() as db:
+            db.execute("VACUUM")
+
+    def delete(self):
+        for suffix in ('', '-journal'):
+            fn = self.path() + suffix
+            if os.path.exists(fn):
+                os.remove(fn)
+
+
+STORE_CLASSES = OrderedDict([
+    # Order determines precedence when more than one index file is present in a directory
+    ('sqlite', SqliteIndexStore),
+    ('config', ConfigFileIndexStore),
+])
+
+# Names of files used by index stores; these are hidden from directory listings
+INDEX_FILE_NAMES = {'.index', '.index.sqlite', '.index.sqlite-journal'}
+
+_defaultBackend = 'config'
+
+
+def setDefaultIndexBackend(backend):
+    """Set the backend ('config' or 'sqlite') used when creating new directory indexes."""
+    global _defaultBackend
+    getStoreClass(backend)
+    _defaultBackend = backend
+
+
+def defaultIndexBackend():
+    return _defaultBackend
+
+
+def getStoreClass(backend):
+    try:
+        return STORE_CLASSES[backend]
+    except KeyError:
+        raise ValueError(f"Unknown index backend '{backend}'; options are {list(STORE_CLASSES.keys())}")
+
+
+def getIndexStore(dirPath):
+    """Return the IndexStore for *dirPath*.
+
+    If the directory already has an index, the store for that index is returned. Otherwise, return a store for the
+    default backend.
+    """
+    for cls in STORE_CLASSES.values():
+        store = cls(dirPath)
+        if store.exists():
+            return store
+    return getStoreClass(_defaultBackend)(dirPath)
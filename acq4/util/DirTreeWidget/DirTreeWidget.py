@@ -65,12 +65,12 @@ class DirTreeWidget(Qt.QTreeWidget):
         self.items = {}
         self.clear()
 
-    def refresh(self, handle):
+    def refresh(self, handle, useCache=True):
         try:
             item = self.item(handle)
         except:
             return
-        self.rebuildChildren(item)
+        self.rebuildChildren(item, useCache=useCache)
 
     def selectionChanged(self, item=None, _=None):
         """Selection has changed; check to see whether currentDir item needs to be recolored"""
@@ -241,11 +241,14 @@ class DirTreeWidget(Qt.QTreeWidget):
         #del self.handles[item]
         self.unwatch(handle)
 
-    def rebuildChildren(self, root):
-        """Make sure all children are present and in the correct order"""
+    def rebuildChildren(self, root, useCache=True):
+        """Make sure all children are present and in the correct order.
+
+        Cached listings are kept up to date as children are added or removed through DirHandle; use
+        useCache=False to pick up files created by other means."""
         scroll = self.verticalScrollBar().value()
         handle = self.handle(root)
-        files = handle.ls(sortMode=self.sortMode)
+        files = handle.ls(sortMode=self.sortMode, useCache=useCache)
         handles = [handle[f] for f in files]
         i = 0
         while True:
@@ -304,7 +307,7 @@ class DirTreeWidget(Qt.QTreeWidget):
         if handle is None:
             return
         
-        for f in handle.ls(useCache=useCache):
+        for f in handle.ls(sortMode=self.sortMode, useCache=useCache):
             #print "Add handle", f
             try:
                 childHandle = handle[f]
@@ -20,12 +20,12 @@ if __name__ == "__main__":
     libdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     sys.path = [os.path.join(libdir, "lib", "util")] + sys.path + [libdir]
 
-import pyqtgraph.configfile as configfile
 from acq4.util import Qt
 from acq4.util.DataManager import DirHandle
 from acq4.util.HelpfulException import HelpfulException
 from acq4.util.debug import printExc
 from acq4.util.codeEditor import invokeCodeEditor
+from acq4.util.log_store import FILTER_DTYPE, LogStore, filterMask, parseTimestamp
 from pyqtgraph import FeedbackButton
 from pyqtgraph import FileDialog
 
@@ -108,7 +108,7 @@ class LogWindow(Qt.QMainWindow):
         self.entriesVisible = 0
         self.logFile = None
         # start a new temp log file, destroying anything left over from the last session.
-        configfile.writeConfigFile("", self.fileName())
+        self.logStore = LogStore.create(self.fileName())
         # weak references to all Log Buttons get added to this list, so it's easy to make them all do things, like flash red.
         self.buttons = []
         self.lock = RLock()
@@ -307,17 +307,15 @@ class LogWindow(Qt.QMainWindow):
         oldfName = self.fileName()
         if oldfName == "tempLog.txt":
             with self.lock:
-                temp = configfile.readConfigFile(oldfName)
+                temp = {f"LogEntry_{k}": e for k, e in zip(self.logStore.index["key"], self.logStore.entries())}
         else:  # already saved log messages needn't be copied into the new file
             temp = {}
 
         with self.lock:
             if dh.exists("log.txt"):
                 self.logFile = dh["log.txt"]
-                try:
-                    tempCount = max(e["id"] for e in configfile.readConfigFile(self.logFile.name()).values())
-                except IndexError:
-                    tempCount = 0
+                self.logStore = LogStore(self.logFile.name())
+                tempCount = self.logStore.lastEntryId()
                 newTemp = {}
                 for v in temp.values():
                     # renumber the entries to be relative to the existing file
@@ -328,6 +326,7 @@ class LogWindow(Qt.QMainWindow):
                 self.entriesSaved = tempCount
             else:
                 self.logFile = dh.createFile("log.txt")
+                self.logStore = LogStore(self.logFile.name())
                 self.saveEntries(temp)
 
         self.logMsg(f"Moved log storage from {oldfName} to {self.fileName()}.")
@@ -343,7 +342,7 @@ class LogWindow(Qt.QMainWindow):
 
     def saveEntries(self, entry):
         with self.lock:
-            configfile.appendConfigFile(entry, self.fileName())
+            self.logStore.append(entry)
 
     def disablePopups(self, disable):
         self.errorDialog.disable(disable)
@@ -355,6 +354,8 @@ class LogWidget(Qt.QWidget):
     sigAddEntry = Qt.Signal(object)  # for thread-safetyness
     sigScrollToAnchor = Qt.Signal(object)  # for internal use.
 
+    pageSize = 500  # entries that pass the filters are displayed this many at a time, starting with the most recent
+
     def __init__(self, parent, manager):
         Qt.QWidget.__init__(self, parent)
         self.ui = LogWidgetTemplate()
@@ -362,23 +363,20 @@ class LogWidget(Qt.QWidget):
         self.ui.setupUi(self)
         self.ui.filterTree.topLevelItem(1).setExpanded(True)
 
-        self.entries = []  # stores all log entries in memory
+        self.entries = []  # all log entries; a LogStore when displaying a log file, so entries are read as needed
         self.cache = {}  # for storing html strings of entries that have already been processed
         self.displayedEntries = []
         self.typeFilters = []
         self.importanceFilter = 0
         self.dirFilter = False
-        self.entryArrayBuffer = np.zeros(
-            1000,
-            dtype=[  # a record array for quick filtering of entries
-                ("index", "int32"),
-                ("importance", "int32"),
-                ("msgType", "|S10"),
-                ("directory", "|S100"),
-                ("entryId", "int32"),
-            ],
-        )
+        self.timeFilter = None  # (start, stop) epoch times, or None
+        self.sources = []  # distinct currentDir values of the entries; entryArray["source"] indexes into this list
+        self._sourceIds = {}
+        # a record array for quick filtering of entries; entryId holds the id displayed for each entry
+        self.entryArrayBuffer = np.zeros(1000, dtype=FILTER_DTYPE)
         self.entryArray = self.entryArrayBuffer[:0]
+        self.filteredIndices = np.zeros(0, dtype=int)  # indices of the entries that pass the filters
+        self.displayStart = 0  # position in filteredIndices of the first displayed entry
 
         self.filtersChanged()
 
@@ -391,43 +389,45 @@ class LogWidget(Qt.QWidget):
         self.sigScrollToAnchor.connect(self.scrollToAnchor, Qt.Qt.QueuedConnection)
 
     def loadFile(self, f):
-        """Load the file, f. f must be able to be read by configfile.py"""
-        logConf = configfile.readConfigFile(f)
-        self.entries = []
-        self.entryArrayBuffer = np.zeros(
-            len(logConf),
-            dtype=[
-                ("index", "int32"),
-                ("importance", "int32"),
-                ("msgType", "|S10"),
-                ("directory", "|S100"),
-                ("entryId", "int32"),
-            ],
-        )
+        """Load the log file, f (as written by LogWindow). Entries are read from the file only when displayed."""
+        self.entries = LogStore(f)
+        self.sources = self.entries.sources
+        self.cache = {}
+        self._copyStoreIndex()
+        self.filterEntries()  # puts all entries through current filters and displays the ones that pass
+
+    def updateFromFile(self):
+        """Read entries that were appended to the loaded log file since it was loaded, and return how many there were.
+        """
+        if not isinstance(self.entries, LogStore):
+            return 0
+        count = self.entries.update()
+        if count > 0:
+            self._copyStoreIndex()
+        return count
+
+    def _copyStoreIndex(self):
+        index = self.entries.index
+        self.entryArrayBuffer = np.empty(len(index), dtype=FILTER_DTYPE)
+        for name in FILTER_DTYPE.names:
+            self.entryArrayBuffer[name] = index[name]
+        # record unique ID to facilitate HTML generation (javascript needs this ID)
+        self.entryArrayBuffer["entryId"] = index["key"]
         self.entryArray = self.entryArrayBuffer[:]
 
-        for i, (k, v) in enumerate(logConf.items()):
-            v["id"] = k[9:]  # record unique ID to facilitate HTML generation (javascript needs this ID)
-            self.entries.append(v)
-            self.entryArray[i] = np.array(
-                [
-                    (
-                        i,
-                        v.get("importance", 5),
-                        v.get("msgType", "status"),
-                        v.get("currentDir", ""),
-                        v.get("entryId", v["id"]),
-                    )
-                ],
-                dtype=[
-                    ("index", "int32"),
-                    ("importance", "int32"),
-                    ("msgType", "|S10"),
-                    ("directory", "|S100"),
-                    ("entryId", "int32"),
-                ],
-            )
-        self.filterEntries()  # puts all entries through current filters and displays the ones that pass
+    def _entry(self, i):
+        entry = self.entries[i]
+        if isinstance(self.entries, LogStore):
+            entry["id"] = int(self.entryArray["entryId"][i])
+        return entry
+
+    def _sourceId(self, source):
+        sid = self._sourceIds.get(source)
+        if sid is None:
+            sid = len(self.sources)
+            self.sources.append(source)
+            self._sourceIds[source] = sid
+        return sid
 
     def addEntry(self, entry):
         # All incoming messages begin here
@@ -445,24 +445,19 @@ class LogWidget(Qt.QWidget):
         if entryDir is None:
             entryDir = ""
 
-        arr = np.array(
-            [(i, entry["importance"], entry["msgType"], entryDir, entry["id"])],
-            dtype=[
-                ("index", "int32"),
-                ("importance", "int32"),
-                ("msgType", "|S10"),
-                ("directory", "|S100"),
-                ("entryId", "int32"),
-            ],
-        )
-
         # make more room if needed
         if len(self.entryArrayBuffer) == len(self.entryArray):
-            newArray = np.empty(len(self.entryArrayBuffer) + 1000, self.entryArrayBuffer.dtype)
+            newArray = np.empty(2 * len(self.entryArrayBuffer) + 1000, self.entryArrayBuffer.dtype)
             newArray[: len(self.entryArray)] = self.entryArray
             self.entryArrayBuffer = newArray
         self.entryArray = self.entryArrayBuffer[: len(self.entryArray) + 1]
-        self.entryArray[i] = arr
+        self.entryArray[i] = (
+            parseTimestamp(entry["timestamp"]),
+            entry["importance"],
+            str(entry["msgType"]).encode()[:16],
+            self._sourceId(entryDir),
+            entry["id"],
+        )
         self.checkDisplay(entry)  # displays the entry if it passes the current filters
 
     def setCheckStates(self, item, column):
@@ -501,38 +496,48 @@ class LogWidget(Qt.QWidget):
         else:
             self.dirFilter = False
 
-    def filterEntries(self):
-        """Runs each entry in self.entries through the filters and displays if it makes it through."""
-        # make self.entries a record array, then filtering will be much faster (to OR true/false arrays, + them)
-        # TODO FutureWarning: elementwise comparison failed; returning scalar instead, but in the future will perform elementwise comparison
-        typeMask = self.entryArray["msgType"] == ""
-        for t in self.typeFilters:
-            typeMask += self.entryArray["msgType"] == t
-        mask = (self.entryArray["importance"] > self.importanceFilter) * typeMask
-        if self.dirFilter is not False:
-            _d = np.ascontiguousarray(self.entryArray["directory"])
-            j = len(self.dirFilter)
-            i = len(_d)
-            _d = _d.view(np.byte).reshape(i, 100)[:, :j]
-            _d = _d.reshape(i * j).view("|S%d" % j)
-            mask *= _d == self.dirFilter
+    def filterMask(self, entryArray):
+        """Return a boolean mask of the records in *entryArray* that pass the current filters."""
+        return filterMask(
+            entryArray,
+            self.sources,
+            msgTypes=self.typeFilters,
+            minImportance=self.importanceFilter + 1,
+            sourcePrefix=None if self.dirFilter is False else self.dirFilter,
+            timeRange=self.timeFilter,
+        )
 
-        self.ui.output.clear()
+    def filterEntries(self):
+        """Runs each entry in self.entries through the filters and displays the most recent page of those that make it
+        through."""
+        self.filteredIndices = np.nonzero(self.filterMask(self.entryArray))[0]
+        self.displayStart = max(0, len(self.filteredIndices) - self.pageSize)
+        self.redisplay()
+
+    def showEarlierEntries(self):
+        """Display another page of entries that pass the filters, before those already displayed."""
+        self.displayStart = max(0, self.displayStart - self.pageSize)
+        self.redisplay()
+
+    def redisplay(self):
+        self.clear()
         global Stylesheet
         self.ui.output.document().setDefaultStyleSheet(Stylesheet)
-        indices = list(self.entryArray[mask]["index"])
-        self.displayEntry([self.entries[i] for i in indices])
+        if self.displayStart > 0:
+            count = min(self.displayStart, self.pageSize)
+            self.ui.output.append(
+                f'<a href="more:">Show {count} earlier entries</a> ({self.displayStart} entries not displayed)'
+            )
+        indices = self.filteredIndices[self.displayStart:]
+        if isinstance(self.entries, LogStore):
+            self.entries.entries(indices)  # read all entries of the page at once
+        self.displayEntry([self._entry(i) for i in indices])
 
     def checkDisplay(self, entry):
-        # checks whether entry passes the current filters and displays it if it does.
-        if entry["msgType"] not in self.typeFilters:
-            return
-        elif entry["importance"] < self.importanceFilter:
-            return
-        elif self.dirFilter is not False:
-            if entry["currentDir"][: len(self.dirFilter)] != self.dirFilter:
-                return
-        else:
+        # checks whether entry (the last one added) passes the current filters and displays it if it does.
+        i = len(self.entryArray) - 1
+        if self.filterMask(self.entryArray[i:])[0]:
+            self.filteredIndices = np.append(self.filteredIndices, i)
             self.displayEntry([entry])
 
     def displayEntry(self, entries):
@@ -747,16 +752,16 @@ class LogWidget(Qt.QWidget):
             self.manager.showDocumentation(target)
         elif action == "exc":
             cursor = self.ui.output.document().find(f"Show traceback {target}")
-            try:
-                tb = self.entries[int(target) - 1]["tracebackHtml"]
-            except IndexError:
-                try:
-                    matchingEntry = self.entryArray[(self.entryArray["entryId"] == (int(target)))]
-                    tb = self.entries[int(matchingEntry["index"])]["tracebackHtml"]
-                except IndexError:
-                    print("requested index %d, but only %d entries exist." % (int(target) - 1, len(self.entries)))
-                    raise
+            # the most recent displayed entry with this id
+            matches = np.nonzero(self.entryArray["entryId"] == int(target))[0]
+            entries = [self._entry(i) for i in matches[::-1]]
+            tb = next((e["tracebackHtml"] for e in entries if "tracebackHtml" in e), None)
+            if tb is None:
+                print("requested entry %d, but no displayed entry has that id." % int(target))
+                return
             cursor.insertHtml(tb)
+        elif action == "more":
+            self.showEarlierEntries()
         elif action == 'code':
             lineNum, _, codeFile = target.partition(':')
             invokeCodeEditor(fileName=codeFile, lineNum=lineNum)
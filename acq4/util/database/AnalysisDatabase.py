@@ -7,67 +7,10 @@ import acq4.util.DataManager
 import acq4.util.debug as debug
 from acq4 import Manager
 from acq4.util import DataManager, functions
-from acq4.util.database.database import SqliteDatabase, parseColumnDefs, TableData
+from acq4.util.database.database import SqliteDatabase, parseColumnDefs, TableData, CaselessDict
 from pyqtgraph.widgets.ProgressDialog import ProgressDialog
 
 
-class CaselessDict(OrderedDict):
-    """Case-insensitive dict. Values can be set and retrieved using keys of any case.
-    Note that when iterating, the original case is returned for each key."""
-
-    def __init__(self, *args):
-        OrderedDict.__init__(self, {})  ## requirement for the empty {} here seems to be a python bug?
-        self.keyMap = OrderedDict([(k.lower(), k) for k in OrderedDict.keys(self)])
-        if len(args) == 0:
-            return
-        elif len(args) == 1 and isinstance(args[0], dict):
-            for k in args[0]:
-                self[k] = args[0][k]
-        else:
-            raise Exception("CaselessDict may only be instantiated with a single dict.")
-
-    # def keys(self):
-    # return self.keyMap.values()
-
-    def __setitem__(self, key, val):
-        kl = key.lower()
-        if kl in self.keyMap:
-            OrderedDict.__setitem__(self, self.keyMap[kl], val)
-        else:
-            OrderedDict.__setitem__(self, key, val)
-            self.keyMap[kl] = key
-
-    def __getitem__(self, key):
-        kl = key.lower()
-        if kl not in self.keyMap:
-            raise KeyError(key)
-        return OrderedDict.__getitem__(self, self.keyMap[kl])
-
-    def __contains__(self, key):
-        return key.lower() in self.keyMap
-
-    def update(self, d):
-        for k, v in d.items():
-            self[k] = v
-
-    def copy(self):
-        return CaselessDict(OrderedDict.copy(self))
-
-    def __delitem__(self, key):
-        kl = key.lower()
-        if kl not in self.keyMap:
-            raise KeyError(key)
-        OrderedDict.__delitem__(self, self.keyMap[kl])
-        del self.keyMap[kl]
-
-    def __deepcopy__(self, memo):
-        raise Exception("deepcopy not implemented")
-
-    def clear(self):
-        OrderedDict.clear(self)
-        self.keyMap.clear()
-
-
 class AnalysisDatabase(SqliteDatabase):
     """Defines the structure for DBs used for analysis. Essential features are:
      - a table of control parameters "DbParameters"
@@ -766,7 +709,14 @@ class AnalysisDatabase(SqliteDatabase):
         """Extends select to convert directory/file columns back into Dir/FileHandles. If the file doesn't exist, you will still get a handle, but it may not be the correct type."""
         prof = debug.Profiler("AnalysisDatabase.select()", disabled=True)
         
-        data = SqliteDatabase.select(self, table, columns, where=where, sql=sql, distinct=distinct, limit=limit, offset=offset, toDict=True, toArray=False)
+        if toArray:
+            ## read whole columns rather than building a dict for every record
+            cur = SqliteDatabase.select(self, table, columns, where=where, sql=sql, distinct=distinct, limit=limit, offset=offset, toDict=False, toArray=False)
+            data = self._queryToColumns(cur)
+            if data is None:
+                return None
+        else:
+            data = SqliteDatabase.select(self, table, columns, where=where, sql=sql, distinct=distinct, limit=limit, offset=offset, toDict=True, toArray=False)
         data = TableData(data)
         prof.mark("got data from SQliteDatabase")
         
@@ -778,7 +728,7 @@ class AnalysisDatabase(SqliteDatabase):
                 continue
             
             if conf.get('Type', '').startswith('directory'):
-                rids = set([d[column] for d in data])
+                rids = set(data[column])
                 linkTable = conf['Link']
                 handles = dict([(rid, self.getDir(linkTable, rid)) for rid in rids if rid is not None])
                 handles[None] = None
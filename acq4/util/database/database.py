@@ -2,24 +2,115 @@
 from __future__ import print_function
 
 import collections
+from collections import OrderedDict
 import os
 import pickle
 import sqlite3
+import struct
 
 import numpy as np
+import numpy.lib.recfunctions as recfunctions
 import six
 from six.moves import range
 
-import acq4.util.advancedTypes as advancedTypes
 import acq4.util.debug as debug
-import acq4.util.functions as functions
 
-# :MC: BROKEN in python3; buffer has no analogous function, so maybe we can use a string? nope, then we don't know to
-# de-pickle the contents.
-from acq4.util.pythonVersionCompat import buffer
 from six.moves import map
 
 
+## Numeric arrays written to BLOB columns are stored as raw data following this header instead of being pickled:
+## magic, dtype string length (uint8), dtype string, ndim (uint8), shape (ndim x uint64). Pickles never begin with
+## the magic, so both kinds of value can be read from the same column.
+ARRAY_BLOB_MAGIC = b'ACQ4ARR\x00'
+
+
+def encodeBlob(obj):
+    """Encode *obj* for storage in a BLOB column.
+
+    Numeric numpy arrays are stored as their raw data with a small header giving dtype and shape, which is much
+    cheaper to write and read than a pickle. All other objects are pickled.
+    """
+    if isinstance(obj, np.ndarray) and obj.dtype.kind in 'biufc' and obj.dtype.names is None:
+        dtype = obj.dtype.str.encode()
+        header = struct.pack('<B', len(dtype)) + dtype + struct.pack('<B%dQ' % obj.ndim, obj.ndim, *obj.shape)
+        return ARRAY_BLOB_MAGIC + header + np.ascontiguousarray(obj).tobytes()
+    return pickle.dumps(obj)
+
+
+def decodeBlob(val):
+    """Decode a value written by encodeBlob (or a pickle written by older versions)."""
+    if not isinstance(val, bytes):
+        val = bytes(val)
+    if val[:len(ARRAY_BLOB_MAGIC)] == ARRAY_BLOB_MAGIC:
+        pos = len(ARRAY_BLOB_MAGIC)
+        n = val[pos]
+        dtype = val[pos + 1:pos + 1 + n].decode()
+        pos += 1 + n
+        ndim = val[pos]
+        shape = struct.unpack_from('<%dQ' % ndim, val, pos + 1)
+        pos += 1 + 8 * ndim
+        return np.frombuffer(val, dtype=dtype, offset=pos).reshape(shape).copy()
+    ## latin1 allows reading pickles written by python 2
+    return pickle.loads(val, encoding='latin1')
+
+
+class CaselessDict(OrderedDict):
+    """Case-insensitive dict. Values can be set and retrieved using keys of any case.
+    Note that when iterating, the original case is returned for each key."""
+
+    def __init__(self, *args):
+        OrderedDict.__init__(self, {})  ## requirement for the empty {} here seems to be a python bug?
+        self.keyMap = OrderedDict([(k.lower(), k) for k in OrderedDict.keys(self)])
+        if len(args) == 0:
+            return
+        elif len(args) == 1 and isinstance(args[0], dict):
+            for k in args[0]:
+                self[k] = args[0][k]
+        else:
+            raise Exception("CaselessDict may only be instantiated with a single dict.")
+
+    # def keys(self):
+    # return self.keyMap.values()
+
+    def __setitem__(self, key, val):
+        kl = key.lower()
+        if kl in self.keyMap:
+            OrderedDict.__setitem__(self, self.keyMap[kl], val)
+        else:
+            OrderedDict.__setitem__(self, key, val)
+            self.keyMap[kl] = key
+
+    def __getitem__(self, key):
+        kl = key.lower()
+        if kl not in self.keyMap:
+            raise KeyError(key)
+        return OrderedDict.__getitem__(self, self.keyMap[kl])
+
+    def __contains__(self, key):
+        return key.lower() in self.keyMap
+
+    def update(self, d):
+        for k, v in d.items():
+            self[k] = v
+
+    def copy(self):
+        return CaselessDict(OrderedDict.copy(self))
+
+    def __delitem__(self, key):
+        kl = key.lower()
+        if kl not in self.keyMap:
+            raise KeyError(key)
+        OrderedDict.__delitem__(self, self.keyMap[kl])
+        del self.keyMap[kl]
+
+    def __deepcopy__(self, memo):
+        raise Exception("deepcopy not implemented")
+
+    def clear(self):
+        OrderedDict.clear(self)
+        self.keyMap.clear()
+
+
 class SqliteDatabase:
     """Encapsulates an SQLITE database to add more features.
     Arbitrary SQL may be executed by calling the db object directly, eg: db('select * from table')
@@ -31,7 +122,7 @@ class SqliteDatabase:
     regardless of the type specified by its column.
     """
 
-    def __init__(self, fileName=':memory:'):
+    def __init__(self, fileName=':memory:', wal=True):
         ## decide on an appropriate name for this connection.
         ## For file connections, the name should always be the name of the file
         ## to avoid opening more than one connection to the same file.
@@ -41,6 +132,10 @@ class SqliteDatabase:
         self.db = sqlite3.connect(self._connectionName)
         self.db.row_factory = sqlite3.Row
         self.db.isolation_level = None
+        if wal and fileName != ':memory:':
+            ## write-ahead logging makes commits much cheaper and lets readers proceed during writes
+            self.db.execute('PRAGMA journal_mode=WAL')
+            self.db.execute('PRAGMA synchronous=NORMAL')
         self.tables = None
         self._transactions = []
         self._readTableList()
@@ -73,7 +168,10 @@ class SqliteDatabase:
         p.mark('Command: %s' % cmd)
 
         if data is None:
-            cur = self.db.execute(cmd)
+            cur = self.db.cursor()
+            if toArray:
+                cur.row_factory = None  ## plain tuples are much cheaper to convert in bulk
+            cur.execute(cmd)
             p.mark("Executed with no data")
         else:
             data = TableData(data)
@@ -147,28 +245,53 @@ class SqliteDatabase:
         p.finish()
         return q
 
-    def iterSelect(self, *args, **kargs):
+    def iterSelect(self, table, columns='*', where=None, sql='', toDict=True, toArray=False, distinct=False,
+                   limit=1000, offset=None, chunkSize=None):
         """
-        Return a generator that iterates through the results of a select query using limit/offset arguments.
+        Return a generator that iterates through the results of a select query in chunks of *limit* records.
         This is useful for select queries that would otherwise return a very large list of results.
         
-        All arguments are passed through to select(). By default, limit=1000 and offset=0.
-        Note that if you specify limit or offset, they MUST be given as keyword arguments.
+        All arguments are passed through to select(). *chunkSize* is accepted as an alias for *limit* (for
+        compatibility with iterInsert).
+
+        When reading from a table (rather than a view) with no *sql*, *distinct* or *offset* arguments, chunks are
+        paged by rowid: each query resumes after the last row of the previous chunk, so reading a chunk does not
+        rescan all the rows before it. Otherwise chunks are read using limit/offset.
         """
-        if 'chunkSize' in kargs:  ## for compatibility with iterInsert
-            kargs['limit'] = kargs['chunkSize']
-            del kargs['chunkSize']
-        if 'offset' not in kargs:
-            kargs['offset'] = 0
-        if 'limit' not in kargs:
-            kargs['limit'] = 1000
+        if chunkSize is not None:
+            limit = chunkSize
+
+        if sql or distinct or offset or not self._hasRowid(table):
+            offset = offset or 0
+            while True:
+                res = self.select(table, columns, where=where, sql=sql, toDict=toDict, toArray=toArray,
+                                  distinct=distinct, limit=limit, offset=offset)
+                if res is None or len(res) == 0:
+                    break
+                yield res
+                offset += limit
+            return
 
+        key = '_iterSelect_rowid'
+        if not isinstance(columns, six.string_types):
+            columns = ','.join([f if f == '*' else '"%s"' % f for f in columns])
+        columns += ', rowid AS "%s"' % key
+        conj = 'AND' if (where is not None and len(where) > 0) else 'WHERE'
+        lastRow = None
         while True:
-            res = self.select(*args, **kargs)
+            after = '' if lastRow is None else '%s rowid > %d' % (conj, lastRow)
+            res = self.select(table, columns, where=where, sql=after + ' ORDER BY rowid', toDict=toDict,
+                              toArray=toArray, limit=limit)
             if res is None or len(res) == 0:
                 break
+            if toArray:
+                lastRow = int(res[key][-1])
+                res = recfunctions.repack_fields(res[[name for name in res.dtype.names if name != key]])
+            else:
+                lastRow = res[-1][key]
+                for rec in res:
+                    del rec[key]
             yield res
-            kargs['offset'] += kargs['limit']
 
     def insert(self, table, records=None, replaceOnConflict=False, ignoreExtraColumns=False, **args):
         """Insert records (a dict or list of dicts) into table.
@@ -221,28 +344,42 @@ class SqliteDatabase:
             if replaceOnConflict:
                 insert += " OR REPLACE"
             # print "Insert:", columns
-            cmd = "%s INTO %s (%s) VALUES (%s)" % (
-            insert, table, quoteList(columns), ','.join([':' + f for f in columns]))
+            cmd = "%s INTO %s (%s) VALUES (%s)" % (insert, table, quoteList(columns), ','.join(['?'] * len(columns)))
 
-            numRecs = len(records)
+            ## bind values by position; this avoids building a dict for every record
+            rows = list(zip(*[records[c] for c in columns]))
+            numRecs = len(rows)
             if chunkAll:  ## insert all records in one go.
-                self.exe(cmd, records, batch=True)
+                self.db.executemany(cmd, rows)
                 yield (numRecs, numRecs)
                 return
 
             chunkSize = int(chunkSize)  ## just make sure
             offset = 0
-            i = 0
-            while offset < len(records):
-                # print len(columns), len(records[0]), len(self.tableSchema(table))
-                chunk = records[offset:offset + chunkSize]
-                self.exe(cmd, chunk, batch=True)
+            while offset < numRecs:
+                chunk = rows[offset:offset + chunkSize]
+                self.db.executemany(cmd, chunk)
                 offset += len(chunk)
                 yield (offset, numRecs)
             p.mark("Transaction done")
 
         p.finish()
 
+    def insertBatch(self, table, chunkSize=10000, replaceOnConflict=False, ignoreExtraColumns=False):
+        """Return an InsertBatch that collects records for *table* and inserts them *chunkSize* records at a time.
+
+        Use this when records are generated one (or a few) at a time; each insert() call costs a transaction, so
+        collecting records first is much faster::
+
+            with db.insertBatch('events') as batch:
+                for rec in generateEvents():
+                    batch.add(rec)
+
+        See insert() for a description of the other options.
+        """
+        return InsertBatch(self, table, chunkSize=chunkSize, replaceOnConflict=replaceOnConflict,
+                           ignoreExtraColumns=ignoreExtraColumns)
+
     def delete(self, table, where):
         with self.transaction():
             whereStr = self._buildWhereClause(where, table)
@@ -358,6 +495,11 @@ class SqliteDatabase:
     def tableLength(self, table):
         return self('select count(*) from "%s"' % table)[0]['count(*)']
 
+    def _hasRowid(self, table):
+        ## views and WITHOUT ROWID tables can not be paged by rowid
+        rec = self.db.execute("SELECT type, sql FROM sqlite_master WHERE name=? COLLATE NOCASE", (table,)).fetchone()
+        return rec is not None and rec[0] == 'table' and 'without rowid' not in (rec[1] or '').lower()
+
     def _buildWhereClause(self, where, table):
         if where is None or len(where) == 0:
             return ''
@@ -393,7 +535,7 @@ class SqliteDatabase:
 
             typ = schema[k].lower()
             if typ == 'blob':
-                converters[k] = lambda obj: buffer(pickle.dumps(obj))
+                converters[k] = encodeBlob
             elif typ == 'int':
                 converters[k] = int
             elif typ == 'real':
@@ -403,6 +545,9 @@ class SqliteDatabase:
             else:
                 converters[k] = lambda obj: obj
 
+        if batch and data.mode == 'array':
+            return self._prepareArray(table, data.originalData(), schema, converters, ignoreUnknownColumns)
+
         if batch:
             newData = dict([(k, []) for k in data.columnNames() if not (ignoreUnknownColumns and (k not in schema))])
         else:
@@ -417,18 +562,7 @@ class SqliteDatabase:
                     # if addUnknownColumns:  ## Is this just a bad idea?
                     # dtyp = self.suggestColumnType(rec[k])
                     # self.addColumn(table, k, dtyp)
-                if rec[k] is None:
-                    newRec[k] = None
-                else:
-                    try:
-                        newRec[k] = converters[k](rec[k])
-                    except:
-                        newRec[k] = rec[k]
-                        if k.lower() != 'rowid':
-                            if k not in schema:
-                                raise Exception("Column '%s' not present in table '%s'" % (k, table))
-                            print("Warning: Setting %s column %s.%s with type %s" % (
-                            schema[k], table, k, str(type(rec[k]))))
+                newRec[k] = self._convertValue(table, schema, converters, k, rec[k])
             if batch:
                 for k in newData:
                     newData[k].append(newRec.get(k, None))
@@ -437,6 +571,36 @@ class SqliteDatabase:
         # print "new data:", newData
         return newData
 
+    def _prepareArray(self, table, data, schema, converters, ignoreUnknownColumns):
+        ## Column-wise version of _prepareData for record arrays; returns a dict-of-lists.
+        ## Numeric and string columns that already match the column type are converted in a single call.
+        newData = collections.OrderedDict()
+        for k in data.dtype.names:
+            if k not in schema and ignoreUnknownColumns:
+                continue
+            col = data[k]
+            typ = schema[k].lower() if k in schema else None
+            kind = col.dtype.kind
+            if col.ndim == 1 and ((typ == 'int' and kind in 'iub') or (typ == 'text' and kind == 'U')):
+                newData[k] = col.tolist()
+            elif col.ndim == 1 and typ == 'real' and kind in 'iuf':
+                newData[k] = col.astype(float).tolist()
+            else:
+                newData[k] = [self._convertValue(table, schema, converters, k, v) for v in col]
+        return newData
+
+    def _convertValue(self, table, schema, converters, k, val):
+        if val is None:
+            return None
+        try:
+            return converters[k](val)
+        except:
+            if k.lower() != 'rowid':
+                if k not in schema:
+                    raise Exception("Column '%s' not present in table '%s'" % (k, table))
+                print("Warning: Setting %s column %s.%s with type %s" % (schema[k], table, k, str(type(val))))
+            return val
+
     def _queryToDict(self, q):
         prof = debug.Profiler("_queryToDict", disabled=True)
         res = []
@@ -445,23 +609,54 @@ class SqliteDatabase:
         return res
 
     def _queryToArray(self, q):
+        ## Build a record array column by column from the complete result set.
+        ## As with _queryToDict, the type of each column is decided by its value in the first record; columns
+        ## that can not be stored with that type (for example, numbers mixed with NULL) use dtype=object.
         prof = debug.Profiler("_queryToArray", disabled=True)
-        recs = self._queryToDict(q)
+        names = [d[0] for d in q.description] if q.description is not None else []
+        rows = q.fetchall()
         prof.mark("got records")
-        if len(recs) < 1:
+        if len(rows) < 1:
             # return np.array([])  ## need to return empty array *with correct columns*, but this is very difficult, so just return None
             return None
-        rec1 = recs[0]
-        dtype = functions.suggestRecordDType(rec1, singleRecord=True)
-        # print rec1, dtype
-        arr = np.empty(len(recs), dtype=dtype)
-        arr[0] = tuple(rec1.values())
-        for i in range(1, len(recs)):
-            arr[i] = tuple(recs[i].values())
+
+        columns = collections.OrderedDict()
+        for name, col in zip(names, zip(*rows)):
+            first = col[0]
+            arr = None
+            if isinstance(first, (int, float)) and not isinstance(first, bool):
+                try:
+                    arr = np.array(col, dtype=type(first))
+                except (TypeError, ValueError, OverflowError):
+                    arr = None
+            if arr is None:
+                arr = np.fromiter((decodeBlob(v) if isinstance(v, bytes) else v for v in col), dtype=object,
+                                  count=len(col))
+            columns[name] = arr  ## duplicate names keep the last column, as in _readRecord
+        prof.mark("converted columns")
+
+        arr = np.empty(len(rows), dtype=[(name, col.dtype) for name, col in columns.items()])
+        for name, col in columns.items():
+            arr[name] = col
         prof.mark('converted to array')
         prof.finish()
         return arr
 
+    def _queryToColumns(self, q):
+        ## Return an OrderedDict of {name: list of values} for the complete result set, or None if it is empty.
+        q.row_factory = None  ## plain tuples are much cheaper to convert in bulk
+        names = [d[0] for d in q.description] if q.description is not None else []
+        rows = q.fetchall()
+        if len(rows) < 1:
+            return None
+        columns = collections.OrderedDict()
+        for name, col in zip(names, zip(*rows)):
+            if bytes in set(map(type, col)):
+                columns[name] = [decodeBlob(v) if isinstance(v, bytes) else v for v in col]
+            else:
+                columns[name] = list(col)
+        return columns
+
     def _readRecord(self, rec):
         prof = debug.Profiler("_readRecord", disabled=True)
         data = collections.OrderedDict()
@@ -469,10 +664,10 @@ class SqliteDatabase:
         for i in range(len(rec)):
             val = rec[i]
             name = names[i]
-            ## Unpickle byte arrays into their original objects.
-            ## (Hopefully they were stored as pickled data in the first place!)
-            if isinstance(val, buffer):
-                val = pickle.loads(str(val))
+            ## Decode BLOB values into their original objects.
+            ## (Hopefully they were stored by encodeBlob in the first place!)
+            if isinstance(val, bytes):
+                val = decodeBlob(val)
             data[name] = val
         prof.finish()
         return data
@@ -480,10 +675,10 @@ class SqliteDatabase:
     def _readTableList(self):
         """Reads the schema for each table, extracting the column names and types."""
         names = self("select name from sqlite_master where type='table' or type='view'")
-        tables = advancedTypes.CaselessDict()
+        tables = CaselessDict()
         for table in names:
             table = table['name']
-            columns = advancedTypes.CaselessDict()
+            columns = CaselessDict()
             recs = self('PRAGMA table_info(%s)' % table)
             for rec in recs:
                 columns[rec['name']] = rec['type']
@@ -529,6 +724,57 @@ class Transaction:
         self.db._transactions.pop(-1)
 
 
+class InsertBatch:
+    """Collects records and inserts them into a table in large chunks (see SqliteDatabase.insertBatch).
+
+    Records are written when *chunkSize* records have accumulated, when flush() is called, and when the batch is
+    used as a context manager and exits without error.
+    """
+
+    def __init__(self, db, table, chunkSize=10000, replaceOnConflict=False, ignoreExtraColumns=False):
+        self.db = db
+        self.table = table
+        self.chunkSize = chunkSize
+        self.replaceOnConflict = replaceOnConflict
+        self.ignoreExtraColumns = ignoreExtraColumns
+        self._pending = []
+        self._count = 0
+
+    def add(self, records=None, **args):
+        """Add records (in any form accepted by SqliteDatabase.insert) to the batch."""
+        if records is None:
+            records = [args]
+        records = TableData(records)
+        self._pending.append(records)
+        self._count += len(records)
+        if self._count >= self.chunkSize:
+            self.flush()
+
+    def flush(self):
+        """Insert all pending records."""
+        if self._count == 0:
+            return
+        pending = self._pending
+        self._pending = []
+        self._count = 0
+        if all(r.mode == 'array' for r in pending) and len(set(r.originalData().dtype for r in pending)) == 1:
+            records = np.concatenate([r.originalData() for r in pending])
+        else:
+            records = [dict(rec) for r in pending for rec in r]
+        self.db.insert(self.table, records, replaceOnConflict=self.replaceOnConflict,
+                       ignoreExtraColumns=self.ignoreExtraColumns)
+
+    def __len__(self):
+        return self._count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.flush()
+
+
 class TableData:
     """
     Class for presenting multiple forms of tabular data through a consistent interface.
@@ -569,10 +815,17 @@ class TableData:
         else:
             raise Exception("Cannot create TableData from object '%s' (type='%s')" % (str(data), type(data)))
 
-        for fn in ['__getitem__', '__setitem__']:
-            setattr(self, fn, getattr(self, '_TableData' + fn + self.mode))
+        ## special methods are looked up on the class, so these dispatch to the implementation for this mode
+        self._getitem = getattr(self, '_TableData__getitem__' + self.mode)
+        self._setitem = getattr(self, '_TableData__setitem__' + self.mode)
         self.copy = getattr(self, 'copy_' + self.mode)
 
+    def __getitem__(self, arg):
+        return self._getitem(arg)
+
+    def __setitem__(self, arg, val):
+        self._setitem(arg, val)
+
     def originalData(self):
         return self.data
 
@@ -582,31 +835,8 @@ class TableData:
         if len(self) < 1:
             # return np.array([])  ## need to return empty array *with correct columns*, but this is very difficult, so just return None
             return None
-        rec1 = self[0]
-        # dtype = functions.suggestRecordDType(self)
-        ## Need to look through all data before deciding on dtype.
-        ## It is not sufficient to look at just the first record,
-        ## nor to look at the column types.
-        types = {k: set() for k in self.keys()}
-        for rec in self:
-            for k, v in rec.items():
-                types[k].add(type(v))
-        dtype = []
-        for k in self.keys():
-            t = types[k]
-            if t == set([float]) or t == set([float, type(None)]):
-                dtype.append((k, float))
-            elif t == set([int]):
-                dtype.append((k, int))
-            else:
-                dtype.append((k, object))
-
-        # print rec1, dtype
-        arr = np.empty(len(self), dtype=dtype)
-        arr[0] = tuple(rec1.values())
-        for i in range(1, len(self)):
-            arr[i] = tuple(self[i].values())
-        return arr
+        keys = self.keys()
+        return columnsToArray(keys, [self[k] for k in keys])
 
     def __getitem__array(self, arg):
         if isinstance(arg, six.string_types):
@@ -726,6 +956,29 @@ class TableData:
         return self.columnNames()
 
 
+def columnsToArray(names, columns):
+    """Return a record array with one field for each of *names*, filled from the value sequences in *columns*.
+
+    Every value is examined before deciding on a column's dtype (it is not sufficient to look at just the first
+    record, nor at the column types): columns holding only floats (and None, stored as NaN) are float, columns
+    holding only ints are int, and all others are object.
+    """
+    arrays = []
+    for col in columns:
+        types = set(map(type, col))
+        if types == {float} or types == {float, type(None)}:
+            arr = np.array(col, dtype=float)
+        elif types == {int}:
+            arr = np.array(col, dtype=int)
+        else:
+            arr = np.fromiter(col, dtype=object, count=len(col))
+        arrays.append(arr)
+    arr = np.empty(len(arrays[0]) if arrays else 0, dtype=[(k, a.dtype) for k, a in zip(names, arrays)])
+    for k, a in zip(names, arrays):
+        arr[k] = a
+    return arr
+
+
 def parseColumnDefs(defs, keyOrder=None):
     """
     Translate a few different forms of column definitions into a single common format.
@@ -1,11 +1,11 @@
 from __future__ import print_function
-import os, sys
+import os, shutil, sys, tempfile
 from six.moves import zip
 path = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(os.path.join(path, '..', '..', '..'))
 
 import numpy as np
-from acq4.util.database.database import SqliteDatabase
+from acq4.util.database.database import ARRAY_BLOB_MAGIC, SqliteDatabase
 
 
 def testDataRetrieval():
@@ -85,3 +85,69 @@ def testBatchInsert():
     
     for i, row in enumerate(db.iterSelect('t', limit=1)):
         assert tuple(row[0].values()) == tuple(data[i])
+
+
+def testArrayBlobs():
+    db = SqliteDatabase()
+    db("create table 't' ('id' int, 'trace' blob)")
+    traces = [np.arange(5, dtype=np.float32), np.ones((2, 3), dtype=np.int16), np.zeros(0), {'not': 'an array'}]
+    db.insert('t', [{'id': i, 'trace': t} for i, t in enumerate(traces)])
+
+    raw = db.db.execute("select trace from t").fetchall()
+    assert bytes(raw[0][0]).startswith(ARRAY_BLOB_MAGIC)
+    assert not bytes(raw[3][0]).startswith(ARRAY_BLOB_MAGIC)
+
+    for result in (db.select('t'), db.select('t', toArray=True)):
+        for rec, t in zip(result, traces):
+            if isinstance(t, np.ndarray):
+                assert rec['trace'].dtype == t.dtype and np.array_equal(rec['trace'], t)
+            else:
+                assert rec['trace'] == t
+
+
+def testBulkInsertAndSelect():
+    db = SqliteDatabase()
+    db("create table 't' ('int' int, 'real' real, 'text' text, 'blob' blob)")
+    n = 2500
+    data = np.empty(n, dtype=[('int', int), ('real', float), ('text', 'U10'), ('blob', object)])
+    data['int'] = np.arange(n)
+    data['real'] = np.linspace(0, 1, n)
+    data['text'] = ['rec%d' % i for i in range(n)]
+    data['blob'] = [np.arange(i % 4) for i in range(n)]
+
+    with db.insertBatch('t', chunkSize=1000) as batch:
+        for i in range(0, n, 7):
+            batch.add(data[i:i + 7])
+        assert 0 < db.tableLength('t') < n
+    assert db.tableLength('t') == n
+
+    result = db.select('t', toArray=True)
+    assert result.dtype.names == data.dtype.names
+    for name in ('int', 'real', 'text'):
+        assert list(result[name]) == list(data[name])
+    assert all(np.array_equal(a, b) for a, b in zip(result['blob'], data['blob']))
+
+    ## records inserted from a record array are stored exactly like the same records given as dicts
+    db("create table 't2' ('int' int, 'real' real, 'text' text, 'blob' blob)")
+    db.insert('t2', [dict(zip(data.dtype.names, rec)) for rec in data])
+    assert db.db.execute("select * from t").fetchall() == db.db.execute("select * from t2").fetchall()
+
+    ## paged reads return every matching record exactly once, with or without a where clause and for views
+    db("create view v as select * from t")
+    for table in ('t', 'v'):
+        chunks = list(db.iterSelect(table, ['int', 'text'], limit=300, toArray=True))
+        assert [len(c) for c in chunks] == [300] * 8 + [100]
+        assert chunks[0].dtype.names == ('int', 'text')
+        assert list(np.concatenate(chunks)['int']) == list(range(n))
+    chunks = list(db.iterSelect('t', where={'real': 1.0}, limit=10))
+    assert [[rec['int'] for rec in c] for c in chunks] == [[n - 1]]
+
+
+def testWal():
+    tmp = tempfile.mkdtemp()
+    try:
+        db = SqliteDatabase(os.path.join(tmp, 'test.sqlite'))
+        assert db("PRAGMA journal_mode")[0]['journal_mode'] == 'wal'
+        db.close()
+    finally:
+        shutil.rmtree(tmp)
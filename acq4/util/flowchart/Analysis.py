@@ -1,3 +1,4 @@
+import multiprocessing
 from collections import OrderedDict
 
 import numpy as np
@@ -17,12 +18,14 @@ from pyqtgraph.flowchart.library.common import CtrlNode
 class EventFitter(CtrlNode):
     """Takes a waveform and event list as input, returns extra information about each event.
     Optionally performs an exponential reconvolution before measuring each event.
-    Plots fits of reconstructed events if the plot output is connected."""
+    Plots fits of reconstructed events if the plot output is connected.
+    If *parallel* is checked, events are fitted in batches by a pool of *nProcesses* worker processes;
+    the output is identical to that of the serial fit."""
     nodeName = "EventFitter"
     uiTemplate = [
         ('multiFit', 'check', {'value': False}),
-        #('parallel', 'check', {'value': False}),
-        #('nProcesses', 'spin', {'value': 1, 'min': 1, 'int': True}),
+        ('parallel', 'check', {'value': False}),
+        ('nProcesses', 'intSpin', {'value': max(1, multiprocessing.cpu_count() - 1), 'min': 1}),
         ('plotFits', 'check', {'value': True}),
         ('plotGuess', 'check', {'value': False}),
         ('plotEvents', 'check', {'value': False}),
@@ -41,23 +44,26 @@ class EventFitter(CtrlNode):
         self.deletedFits = []
         self.pool = None  ## multiprocessing pool
         self.poolSize = 0
-        #self.ctrls['parallel'].toggled.connect(self.setupPool)
-        #self.ctrls['nProcesses'].valueChanged.connect(self.setupPool)
     
-    #def setupPool(self):
-        #import multiprocessing as mp
-        #if self.ctrls['parallel'].isChecked():
-            #nProc = self.ctrls['nProcesses'].value()
-            #if self.pool is not None and self.poolSize != nProc:
-                #self.pool.terminate()
-                #self.pool = None
-            #if self.pool is None:
-                #self.pool = mp.Pool(processes=nProc)
-                #self.poolSize = nProc
-        #else:
-            #if self.pool is not None:
-                #self.pool.terminate()
-                #self.pool = None
+    def setupPool(self):
+        """Create, resize or shut down the worker pool to match the parallel / nProcesses controls."""
+        if self.ctrls['parallel'].isChecked():
+            nProc = self.ctrls['nProcesses'].value()
+            if self.pool is not None and self.poolSize != nProc:
+                self.pool.terminate()
+                self.pool = None
+            if self.pool is None:
+                self.pool = multiprocessing.Pool(processes=nProc)
+                self.poolSize = nProc
+        elif self.pool is not None:
+            self.pool.terminate()
+            self.pool = None
+    
+    def close(self):
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool = None
+        CtrlNode.close(self)
     
     def process(self, waveform, events, display=True):
         self.deletedFits = []
@@ -77,44 +83,17 @@ class EventFitter(CtrlNode):
         }
         
         
-        #if not self.ctrls['parallel'].isChecked():
-        output = processEventFits(events, startEvent=0, stopEvent=len(events), opts=opts)
+        self.setupPool()
+        if self.pool is None:
+            output = processEventFits(events, startEvent=0, stopEvent=len(events), opts=opts)
+        else:
+            output = processEventFitsParallel(events, opts, self.pool)
         guesses = output['guesses']
         eventData = output['eventData']
         indexes = output['indexes']
         xVals = output['xVals']
         yVals = output['yVals']
         output = output['output']
-        #else:
-            #print "parallel:", self.pool, self.poolSize
-            #results = []
-            #nProcesses = self.ctrls['nProcesses'].value()
-            #evPerProcess = int(len(events) / nProcesses)
-            #start = 0
-            #for i in range(nProcesses):
-                #stop = start + evPerProcess
-                #if stop > len(events):
-                    #stop = len(events)
-                #args = (events, start, stop, opts)
-                #results.append(self.pool.apply_async(processEventFits, args))
-                #print "started process", start, stop
-                #start = stop
-            #data = []
-            #guesses = []
-            #eventData = []
-            #indexes = []
-            #xVals = []
-            #yVals = []
-            #for res in results:  ## reconstruct results here
-                #print "getting result", res
-                #output = res.get(10)
-                #data.append(output['output'])
-                #guesses.extend(output['guesses'])
-                #eventData.extend(output['eventData'])
-                #indexes.extend(output['indexes'])
-                #xVals.extend(output['xVals'])
-                #yVals.extend(output['yVals'])
-            #output = np.concatenate(data)
             
         for i in range(len(indexes)):            
             if display and self['plot'].isConnected():
@@ -201,18 +180,70 @@ class EventFitter(CtrlNode):
         return False
 
         
-def processEventFits(events, startEvent, stopEvent, opts):
+def eventFitWindows(events, opts):
+    """Return arrays (startIndexes, stopIndexes) giving the region of opts['waveform'] that is fitted
+    for each event by processEventFits.
+    """
+    dt = opts['dt']
+    times = events['time']
+    guessLen = events['len'] * dt
+    if opts['tau'] is not None:
+        guessLen = guessLen + opts['tau'] * 2.
+    sliceLen = np.array(guessLen, dtype=float)
+    ## cut slice back if there is another event coming up
+    sliceLen[:-1] = np.minimum(sliceLen[:-1], times[1:] - times[:-1])
+    startIndexes = np.searchsorted(opts['tvals'], times, side='left')
+    stopIndexes = startIndexes + (sliceLen / dt).astype(int)
+    return startIndexes, stopIndexes
+
+
+def processEventFitsParallel(events, opts, pool, batchSize=100):
+    """Fit events using a multiprocessing *pool*; returns the same structure as processEventFits.
+    
+    Events are sent to the workers in batches of *batchSize*, along with only the part of the
+    waveform that is needed to fit them.
+    """
+    startIndexes, stopIndexes = eventFitWindows(events, opts)
+    jobs = []
+    for first in range(0, len(events), batchSize):
+        last = min(first + batchSize, len(events))
+        lo = startIndexes[first:last].min()
+        hi = max(lo, stopIndexes[first:last].max())
+        batchOpts = dict(opts, waveform=opts['waveform'][lo:hi], tvals=opts['tvals'][lo:hi])
+        windows = (startIndexes[first:last] - lo, stopIndexes[first:last] - lo)
+        args = (events[first:last], 0, last - first, batchOpts, windows)
+        jobs.append((first, pool.apply_async(processEventFits, args)))
+    
+    outputState = {'guesses': [], 'eventData': [], 'indexes': [], 'xVals': [], 'yVals': []}
+    data = []
+    for first, job in jobs:  ## reconstruct results in order
+        result = job.get()
+        data.append(result['output'])
+        for k in ('guesses', 'eventData', 'xVals', 'yVals'):
+            outputState[k].extend(result[k])
+        outputState['indexes'].extend([i + first for i in result['indexes']])
+    if len(data) > 0:
+        outputState['output'] = np.concatenate(data)
+    else:
+        outputState['output'] = processEventFits(events, 0, 0, opts)['output']
+    return outputState
+
+
+def processEventFits(events, startEvent, stopEvent, opts, windows=None):
     ## This function does all the processing work for EventFitter.
+    ## *windows* may be given as (startIndexes, stopIndexes) if they have already been computed by eventFitWindows.
     dt = opts['dt']
     origTau = opts['tau']
     multiFit = opts['multiFit']
     waveform = opts['waveform']
     tvals = opts['tvals']
     
-    nFields = len(events.dtype.fields)
+    if windows is None:
+        windows = eventFitWindows(events, opts)
+    startIndexes, stopIndexes = windows
     
     dtype = [(n, events[n].dtype) for n in events.dtype.names]
-    output = np.empty(len(events), dtype=dtype + [
+    output = np.empty(stopEvent - startEvent, dtype=dtype + [
         ('fitAmplitude', float), 
         ('fitTime', float),
         ('fitRiseTau', float), 
@@ -234,29 +265,14 @@ def processEventFits(events, startEvent, stopEvent, opts):
     }
     
     for i in range(startEvent, stopEvent):
-        start = events[i]['time']
-        #sliceLen = 50e-3
-        sliceLen = dt*300. ## Ca2+ events are much longer than 50ms
-        if i+1 < len(events):
-            nextStart = events[i+1]['time']
-            sliceLen = min(sliceLen, nextStart-start)
-                
         guessLen = events[i]['len']*dt
         tau = origTau
         if tau is not None:
             guessLen += tau*2.
-        #print i, guessLen, tau, events[i]['len']*dt
-
-        #sliceLen = 50e-3
-        sliceLen = guessLen
-        if i+1 < len(events):  ## cut slice back if there is another event coming up
-            nextStart = events[i+1]['time']
-            sliceLen = min(sliceLen, nextStart-start)
-        
         
         ## Figure out from where to pull waveform data that will be fitted
-        startIndex = np.argwhere(tvals>=start)[0][0]
-        stopIndex = startIndex + int(sliceLen/dt)
+        startIndex = startIndexes[i]
+        stopIndex = stopIndexes[i]
         eventData = waveform[startIndex:stopIndex]
         times = tvals[startIndex:stopIndex]
         #print i, startIndex, stopIndex, dt
@@ -328,7 +344,7 @@ def processEventFits(events, startEvent, stopEvent, opts):
         err = (diff**2).sum()
         fracError = diff.std() / computed.std()
         lengthOverDecay = (times[-1] - fit[1]) / fit[3]  # ratio of (length of data that was fit : decay constant)
-        output[i-offset] = tuple(events[i]) + tuple(fit) + (peakTime, err, fracError, lengthOverDecay)
+        output[i-startEvent-offset] = tuple(events[i]) + tuple(fit) + (peakTime, err, fracError, lengthOverDecay)
         #output['fitTime'] += output['time']
             
         #print fit
@@ -443,6 +459,7 @@ class CaEventFitter(EventFitter):
                 'xVals': [],
                 'yVals': []
             }        
+        startIndexes = np.searchsorted(tvals, events['time'], side='left')
         #print "=========="
         for i in range(startEvent, stopEvent):
             start = events[i]['time']
@@ -466,7 +483,7 @@ class CaEventFitter(EventFitter):
             #sliceLen = min(guessLen*3., sliceLen)
             
             ## Figure out from where to pull waveform data that will be fitted
-            startIndex = np.argwhere(tvals>=start)[0][0]
+            startIndex = startIndexes[i]
             stopIndex = startIndex + int(sliceLen/dt)
             startIndex -= 10 ## pull baseline data from before the event starts
             #print "    data to fit: indices:", startIndex, stopIndex, 'dt:', dt, "times:", startIndex*dt, stopIndex*dt
@@ -1418,6 +1418,38 @@ def stdevThresholdEvents(data, threshold=3.0):
         events['peak'][i] = peak
     return events
 
+def segmentReduce(ufunc, data, starts, stops):
+    """Return ufunc.reduce(data[start:stop]) for every segment, computed with a single ufunc.reduceat call.
+
+    Segments must be non-empty and lie within *data*; only the last segment may end at len(data).
+    """
+    if len(starts) == 0:
+        return np.empty(0, dtype=data.dtype)
+    idx = np.empty(2 * len(starts), dtype=np.intp)
+    idx[0::2] = starts
+    idx[1::2] = stops
+    if idx[-1] == len(data):
+        idx = idx[:-1]  # reduceat continues the last segment to the end of the array
+    return ufunc.reduceat(data, idx)[0::2]
+
+
+def _gatherSegments(data, starts, stops):
+    ## Concatenate the non-empty segments data[starts[i]:stops[i]] (which may overlap).
+    ## Returns the values, and the offset and length of each segment within them.
+    lengths = stops - starts
+    offsets = np.cumsum(lengths) - lengths
+    pos = np.arange(lengths.sum()) + np.repeat(starts - offsets, lengths)
+    return data[pos], offsets, lengths
+
+
+def _segmentArgExtreme(values, offsets, lengths, ufunc):
+    ## Index within each gathered segment of its first maximum (ufunc=np.maximum) or minimum (np.minimum), matching
+    ## np.argmax / np.argmin, which return the first nan if there is one.
+    extreme = ufunc.reduceat(values, offsets)
+    hits = np.flatnonzero((values == np.repeat(extreme, lengths)) | np.isnan(values))
+    return hits[np.searchsorted(hits, offsets)] - offsets
+
+
 def findEvents(*args, **kargs):
     return zeroCrossingEvents(*args, **kargs)
 
@@ -1446,7 +1478,7 @@ def zeroCrossingEvents(data, minLength=3, minPeak=0.0, minSum=0.0, noiseThreshol
     
     ## find all 0 crossings
     mask = data1 > 0
-    diff = mask[1:] - mask[:-1]  ## mask is True every time the trace crosses 0 between i and i+1
+    diff = mask[1:] != mask[:-1]  ## mask is True every time the trace crosses 0 between i and i+1
     times1 = np.argwhere(diff)[:, 0]  ## index of each point immediately before crossing.
     
     times = np.empty(len(times1)+2, dtype=times1.dtype)  ## add first/last indexes to list of crossing times
@@ -1470,25 +1502,26 @@ def zeroCrossingEvents(data, minLength=3, minPeak=0.0, minSum=0.0, noiseThreshol
     else:
         events = np.empty(nEvents, dtype=[('index',int),('time',float),('len', int),('sum', float),('peak', float)])  ### rows are [start, length, sum]
     #p.mark('empty %d -> %d'% (len(times), nEvents))
-    #n = 0
-    for i in range(nEvents):
-        t1 = times[longEvents[i]]+1
-        t2 = times[longEvents[i]+1]+1
-        events[i]['index'] = t1
-        events[i]['len'] = t2-t1
-        evData = data1[t1:t2]
-        events[i]['sum'] = evData.sum()
-        if events[i]['sum'] > 0:
-            peak = evData.max()
-        else:
-            peak = evData.min()
-        events[i]['peak'] = peak
+    if nEvents > 0:
+        t1 = times[longEvents]+1
+        t2 = times[longEvents+1]+1
+        events['index'] = t1
+        events['len'] = t2-t1
+        ## measure all events at once; the last event may extend past the end of the data
+        stops = np.minimum(t2, len(data1))
+        sums = segmentReduce(np.add, data1, t1, stops)
+        events['sum'] = sums
+        events['peak'] = np.where(
+            sums > 0,
+            segmentReduce(np.maximum, data1, t1, stops),
+            segmentReduce(np.minimum, data1, t1, stops),
+        )
     #p.mark('generate event array')
     
     if xvals is not None:
         events['time'] = xvals[events['index']]
     
-    if noiseThreshold  > 0:
+    if noiseThreshold is not None and noiseThreshold > 0:
         ## Fit gaussian to peak in size histogram, use fit sigma as criteria for noise rejection
         stdev = measureNoise(data1)
         #p.mark('measureNoise')
@@ -1534,14 +1567,12 @@ def thresholdEvents(data, threshold, adjustTimes=True, baseline=0.0):
     
     ## find all threshold crossings
     masks = [(data1 > threshold).astype(np.byte), (data1 < -threshold).astype(np.byte)]
-    hits = []
+    starts = [np.empty(0, dtype=int)]
+    stops = [np.empty(0, dtype=int)]
     for mask in masks:
         diff = mask[1:] - mask[:-1]
         onTimes = np.argwhere(diff==1)[:,0]+1
         offTimes = np.argwhere(diff==-1)[:,0]+1
-        #print mask
-        #print diff
-        #print onTimes, offTimes
         if len(onTimes) == 0 or len(offTimes) == 0:
             continue
         if offTimes[0] < onTimes[0]:
@@ -1550,137 +1581,86 @@ def thresholdEvents(data, threshold, adjustTimes=True, baseline=0.0):
                 continue
         if offTimes[-1] < onTimes[-1]:
             onTimes = onTimes[:-1]
-        for i in range(len(onTimes)):
-            hits.append((onTimes[i], offTimes[i]))
-    
-    ## sort hits  ## NOTE: this can be sped up since we already know how to interleave the events..
-    hits.sort(key=lambda a: a[0])
-    
-    nEvents = len(hits)
+        starts.append(onTimes)
+        stops.append(offTimes[:len(onTimes)])
+
+    ## sort hits (positive and negative events never start at the same index)
+    starts = np.concatenate(starts)
+    order = np.argsort(starts, kind='stable')
+    t1 = starts[order]
+    t2 = np.concatenate(stops)[order]
+
+    nEvents = len(t1)
     if xvals is None:
         events = np.empty(nEvents, dtype=[('index',int),('len', int),('sum', float),('peak', float),('peakIndex', int)])  ### rows are [start, length, sum]
     else:
         events = np.empty(nEvents, dtype=[('index',int),('time',float),('len', int),('sum', float),('peak', float),('peakIndex', int)])  ### rows are     
+    if nEvents == 0:
+        return events
 
-    mask = np.ones(nEvents, dtype=bool)
-    
     ## Lots of work ahead:
     ## 1) compute length, peak, sum for each event
     ## 2) adjust event times if requested, then recompute parameters
-    for i in range(nEvents):
-        t1, t2 = hits[i]
-        ln = t2-t1
-        evData = data1[t1:t2]
-        sum = evData.sum()
-        if sum > 0:
-            #peak = evData.max()
-            #ind = argwhere(evData==peak)[0][0]+t1
-            peakInd = np.argmax(evData)
-        else:
-            #peak = evData.min()
-            #ind = argwhere(evData==peak)[0][0]+t1
-            peakInd = np.argmin(evData)
-        peak = evData[peakInd]
-        peakInd += t1
-            
-        #print "event %f: %d" % (xvals[t1], t1) 
-        if adjustTimes:  ## Move start and end times outward, estimating the zero-crossing point for the event
-        
-            ## adjust t1 first
-            mind = np.argmax(evData)
-            pdiff = abs(peak - evData[0])
-            if pdiff == 0:
-                adj1 = 0
-            else:
-                adj1 = int(threshold * mind / pdiff)
-                adj1 = min(ln, adj1)
-            t1 -= adj1
-            #print "   adjust t1", adj1
-            
-            ## check for collisions with previous events
-            if i > 0:
-                #lt2 = events[i-1]['index'] + events[i-1]['len']
-                lt2 = hits[i-1][1]
-                if t1 < lt2:
-                    diff = lt2-t1   ## if events have collided, force them to compromise
-                    tot = adj1 + lastAdj
-                    if tot != 0:
-                        d1 = diff * float(lastAdj) / tot
-                        d2 = diff * float(adj1) / tot
-                        #events[i-1]['len'] -= (d1+1)
-                        hits[i-1] = (hits[i-1][0], hits[i-1][1]-(d1+1))
-                        t1 += d2
-                        #recompute[i-1] = True
-                        #print "  correct t1", d2, "  correct prev.", d1+1
-            #try:
-                #print "   correct t1", d2, "  correct prev.", d1+1
-            #except:
-                #pass
-            
-            ## adjust t2
-            mind = ln - mind
-            pdiff = abs(peak - evData[-1])
-            if pdiff == 0:
-                adj2 = 0
-            else:
-                adj2 = int(threshold * mind / pdiff)
-                adj2 = min(ln, adj2)
-            t2 += adj2
-            lastAdj = adj2
-            #print "  adjust t2", adj2
-            
-            #recompute[i] = True
-            
-        #starts.append(t1)
-        #stops.append(t2)
-        hits[i] = (t1, t2)
-        events[i]['peak'] = peak
-        #if index == 'peak':
-            #events[i]['index']=ind
-        #else:
-        events[i]['index'] = t1
-        events[i]['peakIndex'] = peakInd
-        events[i]['len'] = ln
-        events[i]['sum'] = sum
-        
-    if adjustTimes:  ## go back and re-compute event parameters.
-        for i in range(nEvents):
-            t1, t2 = hits[i]
-            
-            ln = t2-t1
-            evData = data1[int(t1):int(t2)]
-            sum = evData.sum()
-            if len(evData) == 0:
-                mask[i] = False
-                continue
-            if sum > 0:
-                #peak = evData.max()
-                #ind = argwhere(evData==peak)[0][0]+t1
-                peakInd = np.argmax(evData)
-            else:
-                #peak = evData.min()
-                #ind = argwhere(evData==peak)[0][0]+t1
-                peakInd = np.argmin(evData)
-            peak = evData[peakInd]
-            peakInd += t1
-                
-            events[i]['peak'] = peak
-            #if index == 'peak':
-                #events[i]['index']=ind
-            #else:
-            events[i]['index'] = t1
-            events[i]['peakIndex'] = peakInd
-            events[i]['len'] = ln
-            events[i]['sum'] = sum
-    
-    ## remove masked events
-    events = events[mask]
+    ln = t2-t1
+    values, offsets, lengths = _gatherSegments(data1, t1, t2)
+    sums = np.add.reduceat(values, offsets)
+    maxInd = _segmentArgExtreme(values, offsets, lengths, np.maximum)
+    peakInd = np.where(sums > 0, maxInd, _segmentArgExtreme(values, offsets, lengths, np.minimum))
+    peak = data1[t1 + peakInd]
+
+    if not adjustTimes:
+        events['peak'] = peak
+        events['index'] = t1
+        events['peakIndex'] = peakInd + t1
+        events['len'] = ln
+        events['sum'] = sums
+    else:
+        ## Move start and end times outward, estimating the zero-crossing point for each event
+        def adjustment(mind, pdiff):
+            with np.errstate(divide='ignore', invalid='ignore'):
+                adj = np.minimum(ln, np.floor(threshold * mind / pdiff))
+            return np.where(pdiff == 0, 0, adj).astype(int)
+
+        adj1 = adjustment(maxInd, abs(peak - data1[t1]))
+        adj2 = adjustment(ln - maxInd, abs(peak - data1[t2-1]))
+        t1 = (t1 - adj1).astype(float)
+        t2 = (t2 + adj2).astype(float)
+
+        ## check for collisions with previous events; if events have collided, force them to compromise
+        lt2 = t2[:-1].copy()
+        diff = lt2 - t1[1:]
+        tot = adj1[1:] + adj2[:-1]
+        collided = (diff > 0) & (tot != 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            d1 = diff * adj2[:-1] / tot
+            d2 = diff * adj1[1:] / tot
+        t2[:-1][collided] = lt2[collided] - (d1[collided]+1)
+        t1[1:][collided] += d2[collided]
+
+        ## go back and re-compute event parameters, with python's slicing rules for the new boundaries
+        n = len(data1)
+        i1, i2 = t1.astype(int), t2.astype(int)
+        i1 = np.clip(np.where(i1 < 0, i1 + n, i1), 0, n)
+        i2 = np.clip(np.where(i2 < 0, i2 + n, i2), 0, n)
+        mask = i2 > i1  ## remove events that are now empty
+        events = events[mask]
+        t1, t2, i1, i2 = t1[mask], t2[mask], i1[mask], i2[mask]
+        if len(events) > 0:
+            values, offsets, lengths = _gatherSegments(data1, i1, i2)
+            sums = np.add.reduceat(values, offsets)
+            peakInd = np.where(
+                sums > 0,
+                _segmentArgExtreme(values, offsets, lengths, np.maximum),
+                _segmentArgExtreme(values, offsets, lengths, np.minimum),
+            )
+            events['peak'] = data1[i1 + peakInd]
+            events['index'] = t1
+            events['peakIndex'] = peakInd + t1
+            events['len'] = t2 - t1
+            events['sum'] = sums
     
     if xvals is not None:
         events['time'] = xvals[events['index']]
-        
-    #for i in range(len(events)):
-        #print events[i]['time'], events[i]['peak']
 
     return events
 
@@ -1842,9 +1822,13 @@ def denoise(data, radius=2, threshold=4):
 
 
 def rollingSum(data, n):
-    d1 = data.copy()
-    d1[1:] += d1[:-1]  # integrate
-    d2 = np.empty(len(d1) - n + 1, dtype=data.dtype)
+    """Return the sum of every *n* consecutive values in *data*.
+
+    Floating point data is integrated in double precision to limit the error accumulated over long recordings.
+    """
+    dtype = np.float64 if data.dtype.kind == 'f' else None
+    d1 = np.cumsum(data, dtype=dtype)  # integrate
+    d2 = np.empty(len(d1) - n + 1, dtype=d1.dtype)
     d2[0] = d1[n-1]  # copy first point
     d2[1:] = d1[n:] - d1[:-n]  # subtract
     return d2
@@ -1854,6 +1838,9 @@ def clementsBekkers(data, template):
     """Implements Clements-bekkers algorithm: slides template across data,
     returns array of points indicating goodness of fit.
     Biophysical Journal, 73: 220-229, 1997.
+
+    The sliding sums are computed from cumulative sums, and the correlation with the template by FFT when that is
+    faster than computing it directly (see scipy.signal.correlate).
     """
     
     ## Strip out meta-data for faster computation
@@ -1866,44 +1853,67 @@ def clementsBekkers(data, template):
     sumT2 = (T**2).sum()
     sumD = rollingSum(D, N)
     sumD2 = rollingSum(D**2, N)
-    sumTD = scipy.correlate(D, T, mode='valid')
+    sumTD = scipy.signal.correlate(D, T, mode='valid')
     
     ## compute scale factor, offset at each location:
-    scale = (sumTD - sumT * sumD /N) / (sumT2 - sumT**2 /N)
-    offset = (sumD - scale * sumT) /N
-    
-    ## compute SSE at every location
-    SSE = sumD2 + scale**2 * sumT2 + N * offset**2 - 2 * (scale*sumTD + offset*sumD - scale*offset*sumT)
+    ## scale = (sumTD - sumT * sumD /N) / (sumT2 - sumT**2 /N)
+    ## offset = (sumD - scale * sumT) /N
+    ## (evaluated in place to avoid allocating temporary arrays the size of the data)
+    scale = np.multiply(sumD, sumT)
+    scale /= N
+    np.subtract(sumTD, scale, out=scale)
+    scale /= sumT2 - sumT**2 /N
+    offset = np.multiply(scale, sumT)
+    np.subtract(sumD, offset, out=offset)
+    offset /= N
+    
+    ## compute SSE at every location:
+    ## SSE = sumD2 + scale**2 * sumT2 + N * offset**2 - 2 * (scale*sumTD + offset*sumD - scale*offset*sumT)
+    SSE = np.square(scale)
+    SSE *= sumT2
+    SSE += sumD2
+    tmp = np.square(offset)
+    tmp *= N
+    SSE += tmp
+    cross = np.multiply(scale, sumTD)
+    np.multiply(offset, sumD, out=tmp)
+    cross += tmp
+    np.multiply(scale, offset, out=tmp)
+    tmp *= sumT
+    cross -= tmp
+    cross *= 2
+    SSE -= cross
     
     ## finally, compute error and detection criterion
-    error = np.sqrt(SSE / (N-1))
-    DC = scale / error
+    SSE /= N-1
+    error = np.sqrt(SSE, out=SSE)
+    DC = np.divide(scale, error, out=cross)
     return DC, scale, offset
     
 def cbTemplateMatch(data, template, threshold=3.0):
+    """Detect events with clementsBekkers. For each region where the detection criterion exceeds *threshold*, returns
+    the index of its peak and the detection criterion, scale and offset there.
+    """
     dc, scale, offset = clementsBekkers(data, template)
-    mask = dc > threshold
+    mask = (dc > threshold).astype(np.byte)
     diff = mask[1:] - mask[:-1]
-    times = np.argwhere(diff==1)[:, 0]  ## every time we start OR stop a spike
-    
-    ## in the unlikely event that the very first or last point is matched, remove it
-    if abs(dc[0]) > threshold:
-        times = times[1:]
-    if abs(dc[-1]) > threshold:
-        times = times[:-1]
-    
-    nEvents = len(times) / 2
-    
-    result = np.empty(nEvents, dtype=[('peak', int), ('dc', float), ('scale', float), ('offset', float)])
-    for i in range(nEvents):
-        i1 = times[i*2]
-        i2 = times[(i*2)+1]
-        d = dc[i1:i2]
-        p = np.argmax(d)
-        result[0] = p+i1
-        result[1] = d[p]
-        result[2] = scale[p+i1]
-        result[3] = offset[p+i1]
+    starts = np.argwhere(diff==1)[:, 0] + 1
+    stops = np.argwhere(diff==-1)[:, 0] + 1
+    
+    ## in the unlikely event that the very first or last point is matched, remove that event
+    if mask[0]:
+        stops = stops[1:]
+    if mask[-1]:
+        starts = starts[:-1]
+    
+    result = np.empty(len(starts), dtype=[('peak', int), ('dc', float), ('scale', float), ('offset', float)])
+    if len(starts) > 0:
+        values, offsets, lengths = _gatherSegments(dc, starts, stops)
+        peaks = starts + _segmentArgExtreme(values, offsets, lengths, np.maximum)
+        result['peak'] = peaks
+        result['dc'] = dc[peaks]
+        result['scale'] = scale[peaks]
+        result['offset'] = offset[peaks]
     return result
 
 
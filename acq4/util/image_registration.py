@@ -1,4 +1,5 @@
 import numpy as np
+import scipy.fft
 import scipy.ndimage
 import pyqtgraph as pg
 
@@ -58,3 +59,145 @@ def iterativeImageTemplateMatch(img, template, dsVals=(4, 2, 1), matchFn=imageTe
             end = offset + np.array(tmpDs[i+1].shape) + 3
             end = np.clip(end, 0, imgDs[i+1].shape)
             imgDs[i+1] = imgDs[i+1][offset[0]:end[0], offset[1]:end[1]]
+
+
+def _windowSums(imgs, shape):
+    """Return the sums of *imgs* and of its square over every *shape*-sized window that fits inside the last two axes."""
+    h, w = shape
+    sums = []
+    for a in (imgs, np.square(imgs)):
+        c = np.cumsum(a, axis=-2)
+        a = c[..., h - 1:, :].copy()
+        a[..., 1:, :] -= c[..., :-h, :]
+        c = np.cumsum(a, axis=-1)
+        a = c[..., w - 1:].copy()
+        a[..., 1:] -= c[..., :-w]
+        sums.append(a)
+    return sums
+
+
+class TemplateMatcher:
+    """Normalized cross-correlation of images against a stack of equally sized templates.
+
+    This computes the same correlation as skimage.feature.match_template, but for all templates at once: template
+    statistics are computed once, and the template spectra are computed once per image shape and reused for every
+    subsequent image of that shape, so each match only needs one batched FFT over the stack. When there are no more
+    than *directLimit* offsets to test, the correlation is computed directly instead.
+    """
+
+    directLimit = 64
+
+    def __init__(self, templates, unsharp=3):
+        self.templates = np.asarray(templates, dtype=float)
+        self.shape = self.templates.shape[1:]
+        self.unsharp = unsharp
+        centered = self.templates - self.templates.mean(axis=(1, 2), keepdims=True)
+        self._mean = self.templates.mean(axis=(1, 2))
+        self._ssd = (centered ** 2).sum(axis=(1, 2))
+        self._spectra = {}
+
+    def __len__(self):
+        return len(self.templates)
+
+    def _templateSpectra(self, fftShape):
+        spectra = self._spectra.get(fftShape)
+        if spectra is None:
+            spectra = np.conj(scipy.fft.rfft2(self.templates, s=fftShape))
+            self._spectra[fftShape] = spectra
+        return spectra
+
+    def correlate(self, img, index=None):
+        """Return the normalized cross-correlation of *img* with each template.
+
+        *img* is either a single 2D image matched against every template, or a stack with one image per template.
+        If *index* is given, only those templates are used (and *img*, if a stack, must have one image for each).
+        The result has shape (templates, img rows - template rows + 1, img cols - template cols + 1).
+        """
+        img = np.asarray(img, dtype=float)
+        if img.shape[-2] < self.shape[0] or img.shape[-1] < self.shape[1]:
+            raise ValueError(f"Image ({img.shape}) must be larger than template ({self.shape})")
+        index = slice(None) if index is None else index
+        outShape = (img.shape[-2] - self.shape[0] + 1, img.shape[-1] - self.shape[1] + 1)
+
+        if outShape[0] * outShape[1] <= self.directLimit:
+            # only a few offsets to test (e.g. when refining an earlier match); correlating directly is cheaper
+            windows = np.lib.stride_tricks.sliding_window_view(img, self.shape, axis=(-2, -1))
+            subscripts = 'abij,nij->nab' if img.ndim == 2 else 'nabij,nij->nab'
+            xcorr = np.einsum(subscripts, windows, self.templates[index])
+        else:
+            # circular correlation with an FFT at least as large as the image has no wrap-around in the valid region
+            fftShape = tuple(scipy.fft.next_fast_len(n, real=True) for n in img.shape[-2:])
+            imgSpec = scipy.fft.rfft2(img, s=fftShape)
+            xcorr = scipy.fft.irfft2(imgSpec * self._templateSpectra(fftShape)[index], s=fftShape)
+            xcorr = xcorr[..., :outShape[0], :outShape[1]]
+
+        winSum, winSum2 = _windowSums(img, self.shape)
+        mean = self._mean[index, np.newaxis, np.newaxis]
+        ssd = self._ssd[index, np.newaxis, np.newaxis]
+        numerator = xcorr - winSum * mean
+        denominator = (winSum2 - winSum ** 2 / np.prod(self.shape)) * ssd
+        np.maximum(denominator, 0, out=denominator)
+        np.sqrt(denominator, out=denominator)
+        cc = np.zeros(numerator.shape)
+        mask = denominator > np.finfo(float).eps
+        cc[mask] = numerator[mask] / denominator[mask]
+        return cc
+
+    def match(self, img, index=None):
+        """Return the offset (n, 2) and value (n,) of the best match for each template, and the correlation images.
+
+        As in imageTemplateMatch, the best offset is chosen after high-pass filtering the correlation images.
+        """
+        cc = self.correlate(img, index)
+        if self.unsharp is not False:
+            ccFilt = cc - scipy.ndimage.gaussian_filter(cc, (0, self.unsharp, self.unsharp))
+        else:
+            ccFilt = cc
+        flat = ccFilt.reshape(len(cc), -1).argmax(axis=1)
+        pos = np.stack(np.unravel_index(flat, cc.shape[1:]), axis=1)
+        val = cc[np.arange(len(cc)), pos[:, 0], pos[:, 1]]
+        return pos, val, cc
+
+
+class IterativeTemplateMatcher:
+    """Batched equivalent of iterativeImageTemplateMatch for a stack of templates (e.g. a z-stack of reference frames).
+
+    Templates are downsampled and prepared once for each level in *dsVals*. Every call to match() correlates the
+    downsampled image against all templates in a single batched FFT, then refines each template's match at higher
+    resolutions within a small window around its previous best offset.
+    """
+
+    def __init__(self, templates, dsVals=(4, 2, 1), unsharp=3):
+        for ds, nextDs in zip(dsVals[:-1], dsVals[1:]):
+            assert ds % nextDs == 0, "dsVals must satisfy constraint: dsVals[i] == dsVals[i+1] * int(x)"
+        self.dsVals = dsVals
+        templates = np.asarray(templates)
+        self.levels = [
+            TemplateMatcher(pg.downsample(pg.downsample(templates, n, axis=1), n, axis=2), unsharp=unsharp)
+            for n in dsVals
+        ]
+
+    def match(self, img):
+        """Return the (x, y) pixel offset (n, 2) and match strength (n,) of every template in *img*."""
+        imgDs = [pg.downsample(pg.downsample(img, n, axis=0), n, axis=1) for n in self.dsVals]
+        pos, val, _ = self.levels[0].match(imgDs[0])
+        offsets = np.zeros((len(pos), 2), dtype=int)
+        for i in range(1, len(self.dsVals)):
+            scale = self.dsVals[i - 1] // self.dsVals[i]
+            levelImg = imgDs[i]
+            imgShape = np.array(levelImg.shape)
+            offsets = offsets * scale + np.clip((pos - 1) * scale, 0, imgShape)
+            ends = np.clip(offsets + np.array(self.levels[i].shape) + 3, 0, imgShape)
+
+            # windows clipped at the image edge may differ in size; match each group of equal shape together
+            pos = np.empty_like(offsets)
+            val = np.empty(len(offsets))
+            sizes = ends - offsets
+            for size in np.unique(sizes, axis=0):
+                index = np.nonzero((sizes == size).all(axis=1))[0]
+                crops = np.stack([
+                    levelImg[offsets[j, 0]:offsets[j, 0] + size[0], offsets[j, 1]:offsets[j, 1] + size[1]]
+                    for j in index
+                ])
+                pos[index], val[index], _ = self.levels[i].match(crops, index)
+        return offsets + pos, val
@@ -0,0 +1,58 @@
+import threading
+import weakref
+
+import numpy as np
+
+
+class FrameBufferPool:
+    """Recycles fixed-size image buffers so that camera drivers do not need to allocate a new array for every frame.
+
+    Drivers call get() to obtain a writable array of the pool's shape and dtype and fill it in place. No explicit
+    release is needed: the memory is returned to the pool when the array and every view derived from it (including
+    the Frame that carries it and any copies of the Frame's data made with np.asarray, slicing, etc.) have been
+    garbage collected. Consumers that hold on to frame data for a long time therefore never see it overwritten;
+    they only keep that buffer out of circulation.
+
+    At most *maxFree* idle buffers are retained; any more are released to the system.
+    """
+
+    def __init__(self, shape, dtype, maxFree=64):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.maxFree = maxFree
+        self._nbytes = int(np.prod(self.shape)) * self.dtype.itemsize
+        self._free = []
+        self._lock = threading.Lock()
+        self.allocated = 0  # number of buffers allocated from the system
+        self.reused = 0  # number of buffers handed out from the free list
+
+    def matches(self, shape, dtype):
+        return self.shape == tuple(shape) and self.dtype == np.dtype(dtype)
+
+    def get(self) -> np.ndarray:
+        """Return an (uninitialized) array with the shape and dtype of this pool."""
+        with self._lock:
+            if len(self._free) > 0:
+                slab = self._free.pop()
+                self.reused += 1
+            else:
+                slab = None
+                self.allocated += 1
+        if slab is None:
+            slab = bytearray(self._nbytes)
+
+        # All arrays derived from *raw* keep it alive (numpy collapses view chains onto the first array that does not
+        # own its memory), so the finalizer runs only after the last view of this buffer is gone.
+        raw = np.frombuffer(slab, dtype=self.dtype)
+        fin = weakref.finalize(raw, self._recycle, slab)
+        fin.atexit = False
+        return raw.reshape(self.shape)
+
+    def _recycle(self, slab):
+        with self._lock:
+            if len(self._free) < self.maxFree:
+                self._free.append(slab)
+
+    def stats(self):
+        with self._lock:
+            return {'allocated': self.allocated, 'reused': self.reused, 'free': len(self._free)}
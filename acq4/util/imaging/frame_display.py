@@ -84,11 +84,20 @@ class FrameDisplay(Qt.QObject):
         return self.currentFrame.getImage()
 
     def newFrame(self, frame):
+        self.displayFrame(frame)
+        self.annotateFrame(frame)
+
+    def displayFrame(self, frame):
+        """Integrate *frame* into the background and possibly draw it. Need not be called for every frame.
+        """
         # integrate new frame into background
         self.bgCtrl.includeNewFrame(frame)
         # possibly draw the frame and update auto gain (rate limited)
         self.checkForDraw(frame)
-        # annotate frame with background and contrast info
+
+    def annotateFrame(self, frame):
+        """Add the current background and contrast info to *frame*.
+        """
         frame.addInfo(backgroundInfo=self.bgCtrl.deferredSave(), contrastInfo=self.contrastCtrl.saveState())
 
     def checkForDraw(self, frame=None):
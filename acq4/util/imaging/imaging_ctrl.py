@@ -121,6 +121,12 @@ class ImagingCtrl(Qt.QWidget):
         btn.clicked.connect(self._handleNamedVideoButtonClick)
 
     def newFrame(self, frame):
+        self.recordFrame(frame)
+        self.displayFrame(frame)
+
+    def recordFrame(self, frame):
+        """Annotate *frame* and pass it to the record thread. Must be called for every frame, in order.
+        """
         # update acquisition frame rate
         now = frame.info()["time"]
         if self.lastFrameTime is not None:
@@ -138,11 +144,15 @@ class ImagingCtrl(Qt.QWidget):
                 # new image does not match stack shape; need to stop recording.
                 self.endStack()
 
+        self.frameDisplay.annotateFrame(frame)
         self.recordThread.newFrame(frame)
         if self.ui.recordStackBtn.isChecked():
             self.ui.stackSizeLabel.setText("%d frames" % self.recordThread.stackSize)
 
-        self.frameDisplay.newFrame(frame)
+    def displayFrame(self, frame):
+        """Update the display with *frame*. Frames may be skipped if display falls behind.
+        """
+        self.frameDisplay.displayFrame(frame)
         self.sigUpdateUi.emit()
 
     def updateUi(self):
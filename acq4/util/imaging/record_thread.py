@@ -1,7 +1,9 @@
+import threading
 from typing import Callable, Optional
 
 import numpy as np
 import time
+import MetaArray as metaarray
 from MetaArray import MetaArray
 
 from acq4 import Manager
@@ -17,17 +19,33 @@ try:
 except ImportError:
     HAVE_IMAGEFILE = False
 
+try:
+    from .stack_writer import StackWriter
+
+    HAVE_STACKWRITER = True
+except ImportError:
+    HAVE_STACKWRITER = False
+
 
 class RecordThread(Thread):
-    """Class for offloading image recording to a worker thread."""
+    """Class for offloading image recording to a worker thread.
+
+    By default, stack frames are streamed individually into the file with a StackWriter. If *streaming* is False
+    (or h5py is unavailable), pending frames are instead concatenated and appended to the file in batches.
+
+    The number of frames waiting to be written is reported by writeStats() and sigWriteStats; a growing queue
+    indicates that the disk is not keeping up with acquisition.
+    """
 
     sigRecordingFailed = Qt.Signal()
     sigRecordingFinished = Qt.Signal(object, object)  # file handle, num frames
     sigSavedFrame = Qt.Signal(object)
+    sigWriteStats = Qt.Signal(object)  # dict (see writeStats())
 
-    def __init__(self, ui):
+    def __init__(self, ui, streaming=True):
         Thread.__init__(self)
         self.m = Manager.getManager()
+        self.streaming = streaming and HAVE_STACKWRITER and metaarray.USE_HDF5 is not False
 
         self.stopThread = False
         self._stackSize = 0  # size of currently recorded stack
@@ -38,9 +56,12 @@ class RecordThread(Thread):
         # Interaction with worker thread:
         self.lock = Mutex(Qt.QMutex.Recursive)
         self.newFrames = []  # list of frames and the files they should be sored / appended to.
+        self._wake = threading.Event()
+        self._stats = {'queueDepth': 0, 'maxQueueDepth': 0, 'framesWritten': 0, 'writeTime': 0.0}
 
         # Attributes private to worker thread:
         self.currentStack = None  # file handle of currently recorded stack
+        self.stackWriter = None
         self.startFrameTime = None
         self.lastFrameTime = None
         self.currentFrameNum = 0
@@ -56,6 +77,8 @@ class RecordThread(Thread):
 
         self.frameLimit = frameLimit
         self._stackSize = 0
+        with self.lock:
+            self._stats.update({'maxQueueDepth': 0, 'framesWritten': 0, 'writeTime': 0.0})
         self._recording = True
 
     def stopRecording(self):
@@ -67,6 +90,7 @@ class RecordThread(Thread):
         self._recording = False
         with self.lock:
             self.newFrames.append(False)
+        self._wake.set()
 
     @property
     def recording(self):
@@ -85,6 +109,7 @@ class RecordThread(Thread):
                     'stack': False,
                 }
             )
+        self._wake.set()
 
     def newFrame(self, frame=None):
         """Inform the recording thread that a new frame has arrived.
@@ -100,11 +125,30 @@ class RecordThread(Thread):
                 self.newFrames.append({'frame': self.currentFrame, 'dir': self.m.getCurrentDir(), 'stack': True})
                 self._stackSize += 1
             framesLeft = len(self.newFrames)
+            self._stats['queueDepth'] = framesLeft
+            self._stats['maxQueueDepth'] = max(self._stats['maxQueueDepth'], framesLeft)
+        self._wake.set()
         if self.recording and self.frameLimit is not None and self._stackSize >= self.frameLimit:
             self.frameLimit = None
             self.stopRecording()
         return framesLeft
 
+    def writeStats(self):
+        """Return a dict describing the progress of the writer for the current (or most recent) stack:
+
+        * queueDepth: number of frames waiting to be written
+        * maxQueueDepth: largest queue depth seen since recording started
+        * framesWritten: number of frames written to the stack
+        * writeTime: total time (s) spent writing frames to disk
+
+        If the queue grows while writeTime accounts for most of the elapsed time, the recording is limited by
+        disk throughput rather than by CPU.
+        """
+        with self.lock:
+            stats = self._stats.copy()
+            stats['queueDepth'] = len(self.newFrames)
+        return stats
+
     @property
     def stackSize(self):
         """The total number of frames requested for storage in the current
@@ -121,6 +165,7 @@ class RecordThread(Thread):
             self.stopThread = True
             self.newFrames = []
             self.currentFrame = None
+        self._wake.set()
 
     def run(self):
         # run is invoked in the worker thread automatically after calling start()
@@ -135,9 +180,20 @@ class RecordThread(Thread):
                 self.handleFrames(newFrames)
             except Exception:
                 debug.printExc("Error in image recording thread:")
+                self.closeStackWriter()
                 self.sigRecordingFailed.emit()
 
-            time.sleep(100e-3)
+            if len(newFrames) > 0:
+                self.sigWriteStats.emit(self.writeStats())
+
+            if self.streaming:
+                # frames are written individually; wake as soon as more arrive
+                self._wake.wait(100e-3)
+                self._wake.clear()
+            else:
+                # give frames time to accumulate so they can be appended in batches
+                time.sleep(100e-3)
+        self.closeStackWriter()
 
     def handleFrames(self, frames):
         # Write as many frames into the stack as possible.
@@ -151,15 +207,21 @@ class RecordThread(Thread):
                 if len(recFrames) > 0:
                     # write prior frames now
                     self.writeFrames(recFrames, dh)
+                    self.currentFrameNum += len(recFrames)
                     recFrames = []
 
                 if self.currentStack is not None:
+                    self.closeStackWriter()
                     dur = self.lastFrameTime - self.startFrameTime
                     if dur > 0:
                         fps = (self.currentFrameNum + 1) / dur
                     else:
                         fps = 0
-                    self.currentStack.setInfo({'frames': self.currentFrameNum, 'duration': dur, 'averageFPS': fps})
+                    stats = self.writeStats()
+                    self.currentStack.setInfo({
+                        'frames': self.currentFrameNum, 'duration': dur, 'averageFPS': fps,
+                        'maxWriteQueue': stats['maxQueueDepth'], 'writeTime': stats['writeTime'],
+                    })
                     self.sigRecordingFinished.emit(self.currentStack, self.currentFrameNum)
                     self.currentStack = None
                     self.currentFrameNum = 0
@@ -191,6 +253,33 @@ class RecordThread(Thread):
             self.currentFrameNum += len(recFrames)
 
     def writeFrames(self, frames, dh):
+        start = time.perf_counter()
+        if self.streaming:
+            self.streamFrames(frames, dh)
+        else:
+            self.appendFrames(frames, dh)
+        with self.lock:
+            self._stats['framesWritten'] += len(frames)
+            self._stats['writeTime'] += time.perf_counter() - start
+
+    def streamFrames(self, frames, dh):
+        frames = iter(frames)
+        if self.stackWriter is None:
+            data, info = next(frames)
+            self.startFrameTime = info['time']
+            self.stackWriter = StackWriter(dh, 'video', data, info)
+            self.currentStack = self.stackWriter.fileHandle
+        for data, info in frames:
+            self.stackWriter.write(data, info)
+        self.stackWriter.flush()
+
+    def closeStackWriter(self):
+        if self.stackWriter is not None:
+            writer = self.stackWriter
+            self.stackWriter = None
+            writer.close()
+
+    def appendFrames(self, frames, dh):
         newRec = self.currentStack is None
 
         if newRec:
@@ -0,0 +1,110 @@
+import time
+
+import h5py
+import numpy as np
+from MetaArray import MetaArray
+
+
+class StackWriter:
+    """Streams image frames one at a time into a MetaArray file on disk.
+
+    The file is created by MetaArray (so it remains readable as a normal appendable MetaArray with a 'Time' axis
+    and per-frame 'translation' values), but subsequent frames are written directly from the source array into
+    the HDF5 dataset rather than being concatenated and appended in batches. The image dataset is grown in blocks
+    of *blockSize* frames and trimmed to the number of frames actually written when the writer is closed. Frame
+    times and translations are collected in memory and written to the file when flush() or close() is called.
+
+    Usage::
+
+        writer = StackWriter(dirHandle, 'video', frame.getImage(), frame.info())
+        for frame in frames:
+            writer.write(frame.getImage(), frame.info())
+        fileHandle = writer.close()
+    """
+
+    def __init__(self, dh, fileName, data, info, blockSize=256, autoIncrement=True):
+        self.blockSize = blockSize
+        self.startTime = info['time']
+        self.frameShape = data.shape
+        self.dtype = data.dtype
+        self.writeTime = 0.0  # total time spent writing to disk
+
+        arrayInfo = [
+            {
+                'name': 'Time',
+                'values': np.array([0.0]),
+                'units': 's',
+                'translation': np.array([info['transform'].getTranslation()]),
+            },
+            {'name': 'X'},
+            {'name': 'Y'},
+        ]
+        start = time.perf_counter()
+        ma = MetaArray(data[np.newaxis, ...], info=arrayInfo)
+        self.fileHandle = dh.writeFile(
+            ma, fileName, autoIncrement=autoIncrement, info=info, appendAxis='Time', appendKeys=['translation']
+        )
+
+        self._file = h5py.File(self.fileHandle.name(), 'r+')
+        self._data = self._file['data']
+        axisInfo = self._file['info']['0']
+        self._timeDs = axisInfo['values']
+        self._translationDs = axisInfo['translation']
+
+        self.nFrames = 1
+        self._nIndexed = 1  # number of times / translations already written to the file
+        self._times = np.empty(blockSize)
+        self._times[0] = 0
+        self._translations = np.empty((blockSize, 3))
+        self._translations[0] = arrayInfo[0]['translation'][0]
+        self._grow()
+        self.writeTime += time.perf_counter() - start
+
+    @property
+    def capacity(self):
+        return self._data.shape[0]
+
+    def write(self, data, info):
+        """Write one frame to the end of the stack."""
+        if data.shape != self.frameShape:
+            raise ValueError(f"Frame shape {data.shape} does not match stack shape {self.frameShape}")
+        start = time.perf_counter()
+        n = self.nFrames
+        if n >= self.capacity:
+            self._grow()
+        self._data.write_direct(np.ascontiguousarray(data, dtype=self.dtype), dest_sel=np.s_[n])
+        self._times[n] = info['time'] - self.startTime
+        self._translations[n] = info['transform'].getTranslation()
+        self.nFrames += 1
+        self.writeTime += time.perf_counter() - start
+
+    def _grow(self):
+        size = self.capacity + self.blockSize
+        self._data.resize((size,) + self.frameShape)
+        if len(self._times) < size:
+            self._times = np.resize(self._times, size)
+            self._translations = np.resize(self._translations, (size, 3))
+
+    def flush(self):
+        """Write frame times and translations to the file and flush all buffers to disk."""
+        start = time.perf_counter()
+        n = self.nFrames
+        if n > self._nIndexed:
+            for ds, values in ((self._timeDs, self._times), (self._translationDs, self._translations)):
+                ds.resize((n,) + ds.shape[1:])
+                ds[self._nIndexed:n] = values[self._nIndexed:n]
+            self._nIndexed = n
+        self._file.flush()
+        self.writeTime += time.perf_counter() - start
+
+    def close(self):
+        """Finish writing the stack, trim preallocated space, and return the FileHandle."""
+        if self._file is None:
+            return self.fileHandle
+        self.flush()
+        start = time.perf_counter()
+        self._data.resize((self.nFrames,) + self.frameShape)
+        self._file.close()
+        self._file = None
+        self.writeTime += time.perf_counter() - start
+        return self.fileHandle
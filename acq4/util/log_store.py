@@ -0,0 +1,379 @@
+"""
+Indexed storage for the log files written by LogWindow.
+
+Log entries are appended to a config file (``log.txt``) as one top-level ``LogEntry_N`` block each, so log files
+remain readable with pyqtgraph.configfile.readConfigFile. Parsing a complete log that way is slow once it holds
+hundreds of thousands of entries, so LogStore keeps a binary index next to the log (``.log.txt.index`` for
+``log.txt``). The index has one fixed-size record per entry holding the byte range of its block and the columns used
+for filtering (time, importance, message type and source directory). Displaying a log then only requires reading the
+index and parsing the blocks of the entries that are actually shown.
+
+Index records are appended along with their entries. Log files that have no index, or that were appended to without
+updating it, are indexed by scanning only the part of the file that is not yet covered; this reads the top-level
+fields of each block without evaluating the entire entry.
+"""
+import ast
+import locale
+import os
+import re
+from collections import OrderedDict
+from datetime import datetime
+from threading import RLock
+
+import numpy as np
+from pyqtgraph import ColorMap, Point, configfile, units
+from pyqtgraph.Qt import QtCore
+
+# File encoding used by configfile's text-mode reads and writes
+ENCODING = locale.getpreferredencoding(False)
+
+INDEX_MAGIC = b'ACQ4LOG\x01'
+
+# Columns used to filter log entries
+FILTER_DTYPE = np.dtype([
+    ('time', '<f8'),  # seconds since epoch, or nan if the timestamp could not be parsed
+    ('importance', '<i4'),
+    ('msgType', 'S16'),
+    ('source', '<i4'),  # index into LogStore.sources (the currentDir of the entry)
+    ('entryId', '<i8'),  # the "id" field of the entry
+])
+
+INDEX_DTYPE = np.dtype([
+    ('offset', '<i8'),
+    ('length', '<i8'),
+    ('key', '<i8'),  # number at the end of the entry's top-level key (LogEntry_N), or -1
+] + [(name, FILTER_DTYPE.fields[name][0]) for name in FILTER_DTYPE.names])
+
+# Top-level fields read from each entry when indexing an existing log
+_INDEXED_FIELDS = {b'timestamp', b'importance', b'msgType', b'currentDir', b'id'}
+_FIELD_LINE = re.compile(rb'^    (\w+): (.*?)\r?$')
+_KEY_NUMBER = re.compile(rb'(\d+)\s*:')
+_parseScope = None
+
+
+def indexFileName(fileName):
+    """Return the name of the index file used for the log file *fileName*."""
+    path, name = os.path.split(fileName)
+    return os.path.join(path, f'.{name}.index')
+
+
+def parseTimestamp(timestamp):
+    """Return the time in seconds since epoch of a log entry timestamp, or nan."""
+    if isinstance(timestamp, (int, float)):
+        return float(timestamp)
+    try:
+        return datetime.fromisoformat(timestamp).timestamp()
+    except (TypeError, ValueError):
+        pass
+    try:
+        # format used by older versions of LogWindow
+        return datetime.strptime(timestamp, "%Y.%m.%d %H:%M:%S").timestamp()
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def filterMask(index, sources, msgTypes=None, minImportance=None, sourcePrefix=None, timeRange=None):
+    """Return a boolean mask selecting the records of *index* (with FILTER_DTYPE columns) that pass all filters.
+
+    *msgTypes* is a list of message types to include, *minImportance* the lowest importance to include, *sourcePrefix*
+    a string that the source directory must start with, and *timeRange* a (start, stop) tuple of epoch times (either
+    may be None). Filters that are None are not applied.
+    """
+    mask = np.ones(len(index), dtype=bool)
+    if msgTypes is not None:
+        mask &= np.isin(index['msgType'], [t.encode() for t in msgTypes])
+    if minImportance is not None:
+        mask &= index['importance'] >= minImportance
+    if sourcePrefix is not None:
+        # there are few distinct sources, so only those need to be compared
+        matching = [i for i, src in enumerate(sources) if src.startswith(sourcePrefix)]
+        mask &= np.isin(index['source'], matching)
+    if timeRange is not None:
+        start, stop = timeRange
+        if start is not None:
+            mask &= index['time'] >= start
+        if stop is not None:
+            mask &= index['time'] < stop
+    return mask
+
+
+def _literal(value, default):
+    try:
+        return ast.literal_eval(value.decode(ENCODING, errors='replace'))
+    except (ValueError, SyntaxError, MemoryError, RecursionError):
+        return default
+
+
+def _keyNumber(line):
+    m = _KEY_NUMBER.search(line)
+    return -1 if m is None else int(m.group(1))
+
+
+def _scanBlocks(fd, offset):
+    """Yield (offset, length, keyLine, fields) for each complete top-level block read from *fd*, which is positioned
+    at *offset*. *fields* holds the raw values of the _INDEXED_FIELDS found in the block.
+    """
+    start = None
+    keyLine = None
+    fields = {}
+    continued = False
+    for line in fd:
+        isKey = not continued and line[:1] not in b' \t\r\n#'
+        continued = line.rstrip(b'\r\n').endswith(b'\\')
+        if isKey:
+            if start is not None:
+                yield start, offset - start, keyLine, fields
+            start = offset
+            keyLine = line
+            fields = {}
+        elif start is not None:
+            m = _FIELD_LINE.match(line)
+            if m is not None and m.group(1) in _INDEXED_FIELDS:
+                fields[m.group(1)] = m.group(2)
+        offset += len(line)
+    # the last block is only complete once its final line has been written
+    if start is not None and not continued and line.endswith(b'\n'):
+        yield start, offset - start, keyLine, fields
+
+
+def _entryScope():
+    # names available when evaluating values, as in configfile.readConfigFile
+    global _parseScope
+    if _parseScope is None:
+        scope = {
+            **units.allUnits,
+            'OrderedDict': OrderedDict,
+            'Point': Point,
+            'QtCore': QtCore,
+            'ColorMap': ColorMap,
+            'datetime': datetime,
+            'array': np.array,
+        }
+        for dtype in ['int8', 'uint8', 'int16', 'uint16', 'float16', 'int32', 'uint32', 'float32', 'int64', 'uint64',
+                      'float64']:
+            scope[dtype] = getattr(np, dtype)
+        _parseScope = scope
+    return _parseScope
+
+
+class LogStore:
+    """Append-only log file with an index of its entries.
+
+    Opening a LogStore brings the index up to date with the log file; entries appended to the file by other means
+    since then are picked up by calling update(). Entries are parsed only when they are requested with entry(), and
+    are cached afterward.
+
+    If the index file can not be written (for example, when the log is in a read-only directory), the index is kept
+    in memory only.
+    """
+
+    def __init__(self, fileName):
+        self.fileName = fileName
+        self.indexFileName = indexFileName(fileName)
+        self.lock = RLock()
+        self._readIndex()
+        self.update()
+
+    @classmethod
+    def create(cls, fileName):
+        """Start a new, empty log at *fileName*, discarding any existing log and index."""
+        open(fileName, 'wb').close()
+        if os.path.exists(indexFileName(fileName)):
+            os.remove(indexFileName(fileName))
+        return cls(fileName)
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, i):
+        return self.entry(i)
+
+    @property
+    def index(self):
+        """Record array (INDEX_DTYPE) with one record per entry, in file order."""
+        return self._index[:self._count]
+
+    def _reset(self):
+        self._index = np.zeros(1000, dtype=INDEX_DTYPE)
+        self._count = 0
+        self.sources = []  # distinct currentDir values, in order of first appearance
+        self._sourceIds = {}
+        self._cache = {}
+
+    def _readIndex(self):
+        self._reset()
+        self._indexWritable = True
+        try:
+            with open(self.indexFileName, 'rb') as fd:
+                if fd.read(len(INDEX_MAGIC)) != INDEX_MAGIC:
+                    return
+                data = fd.read()
+        except OSError:
+            return
+        index = np.frombuffer(data[:len(data) - len(data) % INDEX_DTYPE.itemsize], dtype=INDEX_DTYPE)
+        if len(index) == 0 or not self._indexMatchesLog(index[-1]):
+            return
+
+        self._index = np.zeros(max(1000, 2 * len(index)), dtype=INDEX_DTYPE)
+        self._index[:len(index)] = index
+        self._count = len(index)
+        # source names are not stored in the index; read each from the first entry that uses it
+        ids, first = np.unique(index['source'], return_index=True)
+        if not np.array_equal(ids, np.arange(len(ids))):
+            self._reset()
+            return
+        with open(self.fileName, 'rb') as fd:
+            for i in first:
+                fields = self._readFields(fd, index[i])
+                source = _literal(fields[b'currentDir'], '') if b'currentDir' in fields else ''
+                self._sourceId(source)
+        if len(data) % INDEX_DTYPE.itemsize != 0:
+            # drop a partially written record
+            self._writeIndex(self.index, rewrite=True)
+
+    def _indexMatchesLog(self, rec):
+        # check that the last indexed entry is still a complete block in the log (the log may have been replaced)
+        try:
+            with open(self.fileName, 'rb') as fd:
+                if rec['offset'] > 0:
+                    fd.seek(rec['offset'] - 1)
+                    if fd.read(1) != b'\n':
+                        return False
+                fd.seek(rec['offset'])
+                block = fd.read(rec['length'])
+        except OSError:
+            return False
+        return len(block) == rec['length'] and block[:1] not in b' \t\r\n#' and block.endswith(b'\n')
+
+    def _readFields(self, fd, rec):
+        fd.seek(rec['offset'])
+        return next(_scanBlocks(iter(fd.read(rec['length']).splitlines(keepends=True)), rec['offset']))[3]
+
+    def _sourceId(self, source):
+        source = '' if source is None else str(source)
+        sid = self._sourceIds.get(source)
+        if sid is None:
+            sid = len(self.sources)
+            self.sources.append(source)
+            self._sourceIds[source] = sid
+        return sid
+
+    def _record(self, offset, length, keyNumber, timestamp, importance, msgType, currentDir, entryId):
+        if not isinstance(importance, int):
+            importance = 5
+        if not isinstance(entryId, int):
+            entryId = keyNumber
+        return (offset, length, keyNumber, parseTimestamp(timestamp), importance, str(msgType).encode()[:16],
+                self._sourceId(currentDir), entryId)
+
+    def _addRecords(self, records):
+        records = np.array(records, dtype=INDEX_DTYPE)
+        if self._count + len(records) > len(self._index):
+            newIndex = np.zeros(max(2 * len(self._index), self._count + len(records)), dtype=INDEX_DTYPE)
+            newIndex[:self._count] = self.index
+            self._index = newIndex
+        self._index[self._count:self._count + len(records)] = records
+        self._count += len(records)
+        self._writeIndex(records, rewrite=self._count == len(records))
+
+    def _writeIndex(self, records, rewrite=False):
+        if not self._indexWritable:
+            return
+        try:
+            with open(self.indexFileName, 'wb' if rewrite else 'ab') as fd:
+                if rewrite:
+                    fd.write(INDEX_MAGIC)
+                fd.write(records.tobytes())
+        except OSError:
+            self._indexWritable = False
+
+    def _indexedSize(self):
+        if self._count == 0:
+            return 0
+        last = self._index[self._count - 1]
+        return int(last['offset'] + last['length'])
+
+    def update(self):
+        """Index entries that were appended to the log file since it was last read, and return how many there were."""
+        with self.lock:
+            try:
+                size = os.path.getsize(self.fileName)
+            except OSError:
+                size = 0
+            if size < self._indexedSize():
+                # the log file was replaced; start over
+                self._reset()
+            start = self._indexedSize()
+            if size == start:
+                return 0
+            records = []
+            with open(self.fileName, 'rb') as fd:
+                fd.seek(start)
+                for offset, length, keyLine, fields in _scanBlocks(fd, start):
+                    records.append(self._record(
+                        offset,
+                        length,
+                        _keyNumber(keyLine),
+                        _literal(fields[b'timestamp'], None) if b'timestamp' in fields else None,
+                        _literal(fields[b'importance'], 5) if b'importance' in fields else 5,
+                        _literal(fields[b'msgType'], 'status') if b'msgType' in fields else 'status',
+                        _literal(fields[b'currentDir'], '') if b'currentDir' in fields else '',
+                        _literal(fields[b'id'], None) if b'id' in fields else None,
+                    ))
+            if len(records) > 0:
+                self._addRecords(records)
+            return len(records)
+
+    def append(self, entries):
+        """Append *entries*, a dict of {key: entry}, to the log and its index."""
+        with self.lock:
+            self.update()
+            records = []
+            with open(self.fileName, 'ab') as fd:
+                offset = fd.seek(0, os.SEEK_END)
+                for key, entry in entries.items():
+                    block = configfile.genString({key: entry}).encode(ENCODING)
+                    fd.write(block)
+                    records.append(self._record(
+                        offset,
+                        len(block),
+                        _keyNumber(str(key).encode() + b':'),
+                        entry.get('timestamp'),
+                        entry.get('importance', 5),
+                        entry.get('msgType', 'status'),
+                        entry.get('currentDir', ''),
+                        entry.get('id'),
+                    ))
+                    offset += len(block)
+            if len(records) > 0:
+                self._addRecords(records)
+
+    def entry(self, i):
+        """Return the *i*th entry in the log as a dict."""
+        return self.entries([i])[0]
+
+    def entries(self, indices=None):
+        """Return a list of the entries at *indices* (or all entries)."""
+        if indices is None:
+            indices = range(len(self))
+        with self.lock:
+            missing = [i for i in indices if i not in self._cache]
+            if len(missing) > 0:
+                index = self.index
+                with open(self.fileName, 'rb') as fd:
+                    for i in missing:
+                        fd.seek(index[i]['offset'])
+                        text = fd.read(index[i]['length']).decode(ENCODING, errors='replace')
+                        text = text.replace("\r\n", "\n").replace("\r", "\n")
+                        self._cache[i], = configfile.parseString(text, **_entryScope())[1].values()
+            return [self._cache[i] for i in indices]
+
+    def select(self, msgTypes=None, minImportance=None, sourcePrefix=None, timeRange=None):
+        """Return the indices of entries that pass the filters described in filterMask()."""
+        with self.lock:
+            return np.nonzero(filterMask(self.index, self.sources, msgTypes, minImportance, sourcePrefix, timeRange))[0]
+
+    def lastEntryId(self):
+        """Return the largest entry id in the log, or 0 if it is empty."""
+        with self.lock:
+            return int(self.index['entryId'].max()) if len(self) > 0 else 0
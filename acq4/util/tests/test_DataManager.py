@@ -1,6 +1,8 @@
 from __future__ import print_function
 import tempfile, shutil, atexit, os
+from unittest import mock
 import acq4.util.DataManager as dm
+from acq4.util.DataManager.index_store import setDefaultIndexBackend
 from acq4.util.DirTreeWidget import DirTreeWidget
 import pyqtgraph as pg
 
@@ -75,3 +77,108 @@ def test_datamanager():
 
 
 
+
+
+def test_index_backends():
+    rh = dm.getDirHandle(root)
+    d1 = rh.mkdir('config_index', info={'a': 1})
+    f1 = d1.createFile('file1.txt', info={'x': 1})
+    d1.createFile('file2.txt', info={'y': 2})
+    f1.setInfo(z=3)
+    assert os.path.isfile(os.path.join(d1.name(), '.index'))
+    expected = {k: dict(v) for k, v in d1._readIndex().items()}
+
+    # convert to sqlite; the index must read back identically, in the same order
+    d1.migrateIndex('sqlite')
+    assert not os.path.exists(os.path.join(d1.name(), '.index'))
+    assert os.path.isfile(os.path.join(d1.name(), '.index.sqlite'))
+    d1._index = None
+    index = d1._readIndex()
+    assert list(index.keys()) == list(expected.keys())
+    assert {k: dict(v) for k, v in index.items()} == expected
+    assert d1.ls(sortMode='alpha') == ['file1.txt', 'file2.txt']
+
+    # in-place updates, appends and removals
+    f1.setInfo(z=4)
+    d1.createFile('file3.txt', info={'w': 5})
+    d1.forget('file2.txt')
+    d1._index = None
+    assert f1.info()['z'] == 4
+    assert d1['file3.txt'].info()['w'] == 5
+    assert not d1.isManaged('file2.txt')
+    assert list(d1._readIndex().keys()) == ['.', 'file1.txt', 'file3.txt']
+
+    d1.compactIndex()
+    d1.migrateIndex('config')
+    assert os.path.isfile(os.path.join(d1.name(), '.index'))
+    assert not os.path.exists(os.path.join(d1.name(), '.index.sqlite'))
+    assert d1.info()['a'] == 1
+    assert f1.info()['z'] == 4
+
+    # new directories use the default backend
+    setDefaultIndexBackend('sqlite')
+    try:
+        d2 = rh.mkdir('sqlite_index', info={'b': 2})
+    finally:
+        setDefaultIndexBackend('config')
+    assert os.path.isfile(os.path.join(d2.name(), '.index.sqlite'))
+    assert d2.info()['b'] == 2
+
+
+def test_incremental_ls():
+    rh = dm.getDirHandle(root)
+    d1 = rh.mkdir('ls_test')
+    for i in range(5):
+        d1.createFile(f'file_{i}.txt', info={'__timestamp__': 100 + i})
+    d1.mkdir('subdir_a')
+
+    # populate caches for all sort modes
+    for mode in ('date', 'alpha', None):
+        d1.ls(sortMode=mode, useCache=True)
+
+    # new children are inserted into the cached listings in sorted order
+    d1.createFile('file_early.txt', info={'__timestamp__': 50})
+    d1.mkdir('subdir_b')
+    d1['file_2.txt'].delete()
+    for mode in ('date', 'alpha'):
+        assert d1.ls(sortMode=mode, useCache=True) == d1.ls(sortMode=mode, useCache=False)
+    assert sorted(d1.ls(sortMode=None, useCache=True)) == sorted(d1.ls(sortMode=None))
+
+    date = d1.ls(sortMode='date', useCache=True)
+    assert date[0] == 'file_early.txt'
+    assert date[-2:] == ['subdir_a', 'subdir_b']
+    assert 'file_2.txt' not in date
+    assert d1.ls(sortMode='alpha', useCache=True)[-2:] == ['subdir_a', 'subdir_b']
+
+    # parallel timestamp lookup gives the same order as serial lookup
+    d1.cTimeCache = {}
+    d1.cTimeParallelThreshold = 0
+    assert d1.ls(sortMode='date') == date
+
+    # listing from DirHandle methods (eg. autoIncrement) uses the cached listings instead of rescanning
+    with mock.patch.object(d1, '_updateLsCache', wraps=d1._updateLsCache) as update:
+        for i in range(10):
+            d1.mkdir('auto', autoIncrement=True)
+        d1.hasChildren()
+        list(d1)
+    assert update.call_count == 0
+    assert d1.ls(sortMode='alpha', useCache=True) == d1.ls(sortMode='alpha')
+
+
+def test_refresh_external_files():
+    rh = dm.getDirHandle(root)
+    d1 = rh.mkdir('refresh_test')
+    d1.createFile('a.txt')
+    dw = DirTreeWidget(baseDirHandle=d1)
+    dw.sortMode = 'alpha'
+    dw.rebuildTree()
+    for mode in ('date', 'alpha'):
+        d1.ls(sortMode=mode, useCache=True)
+
+    # files created outside of DirHandle appear only after an explicit refresh, in every sort mode
+    open(os.path.join(d1.name(), 'b.txt'), 'w').close()
+    assert d1.ls(sortMode='alpha', useCache=True) == ['a.txt']
+    dw.rebuildTree(useCache=False)
+    assert [dw.topLevelItem(i).text(0) for i in range(dw.topLevelItemCount())] == ['a.txt', 'b.txt']
+    assert d1.ls(sortMode='date', useCache=True) == d1.ls(sortMode='date', useCache=False)
+    assert 'b.txt' in d1.ls(sortMode='date', useCache=True)
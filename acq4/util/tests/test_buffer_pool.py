@@ -0,0 +1,36 @@
+import gc
+
+import numpy as np
+
+from acq4.util.imaging import Frame
+from acq4.util.imaging.buffer_pool import FrameBufferPool
+
+
+def test_buffer_pool_recycles_after_last_view():
+    pool = FrameBufferPool((4, 5), np.uint16, maxFree=2)
+    a = pool.get()
+    assert a.shape == (4, 5) and a.dtype == np.uint16
+    a[:] = 7
+    frame = Frame(a, {'time': 0})
+    view = frame.data()[1:3]
+    del a, frame
+    gc.collect()
+    # a view of the buffer is still alive; it must not be handed out again
+    assert pool.stats()['free'] == 0
+    b = pool.get()
+    b[:] = 0
+    assert np.all(view == 7)
+
+    del view
+    gc.collect()
+    assert pool.stats()['free'] == 1
+    c = pool.get()
+    assert pool.stats() == {'allocated': 2, 'reused': 1, 'free': 0}
+
+    # no more than maxFree idle buffers are kept
+    extra = [pool.get() for i in range(3)]
+    del b, c, extra
+    gc.collect()
+    assert pool.stats()['free'] == 2
+    assert pool.matches((4, 5), 'uint16')
+    assert not pool.matches((5, 4), 'uint16')
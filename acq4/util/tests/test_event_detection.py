@@ -0,0 +1,157 @@
+import numpy as np
+import scipy.ndimage
+
+from acq4.util import functions
+
+
+def makeTrace(n=20000, seed=0):
+    rng = np.random.default_rng(seed)
+    data = scipy.ndimage.gaussian_filter1d(rng.normal(size=n), 3) * 3
+    template = functions.expTemplate(1.0, 5, 30, delay=0, length=200)
+    for i in rng.integers(0, n - 200, size=60):
+        data[i:i + 200] += template * rng.choice([-1, 1]) * rng.uniform(2, 8)
+    return data, template
+
+
+def loopZeroCrossingEvents(data, minLength=3):
+    # previous implementation of zeroCrossingEvents (without noise or size filtering)
+    mask = data > 0
+    times1 = np.argwhere(mask[1:] != mask[:-1])[:, 0]
+    times = np.concatenate([[0], times1, [len(data)]])
+    longEvents = np.argwhere(times[1:] - times[:-1] > minLength)[:, 0]
+    events = np.empty(len(longEvents), dtype=[('index', int), ('len', int), ('sum', float), ('peak', float)])
+    for i, j in enumerate(longEvents):
+        t1 = times[j] + 1
+        t2 = times[j + 1] + 1
+        evData = data[t1:t2]
+        total = evData.sum()
+        events[i] = (t1, t2 - t1, total, evData.max() if total > 0 else evData.min())
+    return events
+
+
+def loopThresholdEvents(data, threshold, adjustTimes=True):
+    # previous implementation of thresholdEvents
+    hits = []
+    for mask in [(data > threshold).astype(np.byte), (data < -threshold).astype(np.byte)]:
+        diff = mask[1:] - mask[:-1]
+        onTimes = np.argwhere(diff == 1)[:, 0] + 1
+        offTimes = np.argwhere(diff == -1)[:, 0] + 1
+        if len(onTimes) == 0 or len(offTimes) == 0:
+            continue
+        if offTimes[0] < onTimes[0]:
+            offTimes = offTimes[1:]
+            if len(offTimes) == 0:
+                continue
+        if offTimes[-1] < onTimes[-1]:
+            onTimes = onTimes[:-1]
+        hits.extend(zip(onTimes, offTimes))
+    hits.sort(key=lambda a: a[0])
+    events = np.empty(len(hits), dtype=[('index', int), ('len', int), ('sum', float), ('peak', float),
+                                        ('peakIndex', int)])
+    mask = np.ones(len(hits), dtype=bool)
+
+    def measure(i, t1, t2):
+        evData = data[int(t1):int(t2)]
+        if len(evData) == 0:
+            mask[i] = False
+            return None
+        total = evData.sum()
+        peakInd = np.argmax(evData) if total > 0 else np.argmin(evData)
+        events[i] = (t1, t2 - t1, total, evData[peakInd], peakInd + t1)
+        return evData, peakInd
+
+    lastAdj = 0
+    for i in range(len(hits)):
+        t1, t2 = hits[i]
+        ln = t2 - t1
+        evData, peakInd = measure(i, t1, t2)
+        if adjustTimes:
+            peak = evData[peakInd]
+            mind = np.argmax(evData)
+            pdiff = abs(peak - evData[0])
+            adj1 = 0 if pdiff == 0 else min(ln, int(threshold * mind / pdiff))
+            t1 -= adj1
+            if i > 0:
+                lt2 = hits[i - 1][1]
+                if t1 < lt2:
+                    diff = lt2 - t1
+                    tot = adj1 + lastAdj
+                    if tot != 0:
+                        d1 = diff * float(lastAdj) / tot
+                        d2 = diff * float(adj1) / tot
+                        hits[i - 1] = (hits[i - 1][0], hits[i - 1][1] - (d1 + 1))
+                        t1 += d2
+            mind = ln - mind
+            pdiff = abs(peak - evData[-1])
+            adj2 = 0 if pdiff == 0 else min(ln, int(threshold * mind / pdiff))
+            t2 += adj2
+            lastAdj = adj2
+        hits[i] = (t1, t2)
+    if adjustTimes:
+        for i in range(len(hits)):
+            measure(i, *hits[i])
+    return events[mask]
+
+
+def assertEventsMatch(events, expected):
+    assert events.dtype.names == expected.dtype.names
+    assert len(events) == len(expected)
+    for name in expected.dtype.names:
+        if name == 'sum':
+            # summation order differs
+            assert np.allclose(events[name], expected[name], rtol=1e-12, atol=1e-9)
+        else:
+            assert np.array_equal(events[name], expected[name]), name
+
+
+def test_zero_crossing_events():
+    data, _ = makeTrace()
+    for minLength in (0, 3, 20):
+        assertEventsMatch(functions.zeroCrossingEvents(data, minLength=minLength),
+                          loopZeroCrossingEvents(data, minLength))
+    # events touching both ends of the data
+    assertEventsMatch(functions.zeroCrossingEvents(np.ones(50)), loopZeroCrossingEvents(np.ones(50)))
+    assert len(functions.zeroCrossingEvents(np.zeros(2))) == 0
+
+
+def test_threshold_events():
+    data, _ = makeTrace()
+    for threshold in (1.0, 3.0, 6.0):
+        for adjustTimes in (True, False):
+            events = functions.thresholdEvents(data, threshold, adjustTimes=adjustTimes)
+            assertEventsMatch(events, loopThresholdEvents(data, threshold, adjustTimes))
+    # closely spaced events collide when their boundaries are adjusted
+    pulses = np.tile([0, 0, 4, 6, 8, 6, 4, 2, -3.5, -4, -8, -4, -3.2, 0, 0, 0], 30)
+    assertEventsMatch(functions.thresholdEvents(pulses, 3.0), loopThresholdEvents(pulses, 3.0))
+    assert len(functions.thresholdEvents(np.zeros(100), 1.0)) == 0
+
+
+def test_clements_bekkers():
+    data, template = makeTrace(5000)
+    dc, scale, offset = functions.clementsBekkers(data, template)
+    N = len(template)
+    for i in (0, 1234, len(dc) - 1):
+        # least-squares fit of scale * template + offset at each position
+        d = data[i:i + N]
+        A = np.stack([template, np.ones(N)], axis=1)
+        (s, o), sse = np.linalg.lstsq(A, d, rcond=None)[:2]
+        assert np.isclose(scale[i], s) and np.isclose(offset[i], o)
+        assert np.isclose(dc[i], s / np.sqrt(sse[0] / (N - 1)))
+
+    events = functions.cbTemplateMatch(data, template, threshold=3.0)
+    mask = dc > 3.0
+    expected = []
+    i = 1 if mask[0] else 0
+    while i < len(dc):
+        if mask[i] and not mask[i - 1]:
+            j = i
+            while j < len(dc) and mask[j]:
+                j += 1
+            if j < len(dc):
+                expected.append(i + np.argmax(dc[i:j]))
+            i = j
+        i += 1
+    assert len(events) > 0
+    assert list(events['peak']) == expected
+    assert np.array_equal(events['dc'], dc[expected])
+    assert np.array_equal(events['scale'], scale[expected])
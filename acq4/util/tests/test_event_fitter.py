@@ -0,0 +1,38 @@
+import multiprocessing
+
+import numpy as np
+
+import acq4.util.functions as functions
+from acq4.util.flowchart.Analysis import processEventFits, processEventFitsParallel
+
+
+def makeEvents(nEvents=30, dt=1e-4):
+    rng = np.random.default_rng(0)
+    onsets = np.cumsum(rng.uniform(10e-3, 40e-3, size=nEvents))
+    tvals = np.arange(int((onsets[-1] + 0.05) / dt)) * dt
+    waveform = rng.normal(scale=1e-12, size=len(tvals))
+    for t0 in onsets:
+        waveform += functions.pspFunc([-50e-12, t0, 1e-3, 5e-3], tvals)
+
+    events = np.zeros(nEvents, dtype=[('index', int), ('len', int), ('sum', float), ('peak', float), ('time', float)])
+    events['index'] = (onsets / dt).astype(int)
+    events['time'] = tvals[events['index']]
+    events['len'] = 80
+    events['len'][5] = 2  # too short to fit; exercises skipped events
+    events['time'][5] = events['time'][4] + dt
+    opts = {'dt': dt, 'tau': None, 'multiFit': False, 'waveform': waveform, 'tvals': tvals}
+    return events, opts
+
+
+def test_parallel_matches_serial():
+    events, opts = makeEvents()
+    serial = processEventFits(events, 0, len(events), opts)
+    assert 5 not in serial['indexes']
+    with multiprocessing.Pool(processes=2) as pool:
+        parallel = processEventFitsParallel(events, opts, pool, batchSize=7)
+    assert parallel['indexes'] == serial['indexes']
+    assert parallel['output'].dtype == serial['output'].dtype
+    for name in serial['output'].dtype.names:
+        assert np.array_equal(parallel['output'][name], serial['output'][name])
+    for a, b in zip(parallel['yVals'], serial['yVals']):
+        assert np.array_equal(a, b)
@@ -0,0 +1,57 @@
+import numpy as np
+import scipy.ndimage
+
+from acq4.util.image_registration import IterativeTemplateMatcher, TemplateMatcher
+
+
+def bruteForceNcc(img, template):
+    h, w = template.shape
+    t = template - template.mean()
+    out = np.zeros((img.shape[0] - h + 1, img.shape[1] - w + 1))
+    for i in range(out.shape[0]):
+        for j in range(out.shape[1]):
+            win = img[i:i + h, j:j + w]
+            win = win - win.mean()
+            out[i, j] = (win * t).sum() / np.sqrt((win ** 2).sum() * (t ** 2).sum())
+    return out
+
+
+def test_correlate_matches_ncc():
+    rng = np.random.default_rng(0)
+    img = rng.normal(size=(30, 37))
+    templates = rng.normal(size=(3, 8, 11))
+    templates[1] = img[4:12, 9:20]
+    matcher = TemplateMatcher(templates)
+
+    cc = matcher.correlate(img)
+    assert cc.shape == (3, 23, 27)
+    for t, c in zip(templates, cc):
+        assert np.allclose(c, bruteForceNcc(img, t))
+
+    # one image per template, restricted to a subset of templates
+    stack = np.stack([img, img[::-1]])
+    cc = matcher.correlate(stack, index=[1, 2])
+    assert np.allclose(cc[1], bruteForceNcc(img[::-1], templates[2]))
+
+    # small searches are correlated directly rather than with an FFT
+    small = img[2:12, 6:20]
+    assert matcher.correlate(small).shape[1:] == (3, 4)
+    for t, c in zip(templates, matcher.correlate(small)):
+        assert np.allclose(c, bruteForceNcc(small, t))
+
+    pos, val, _ = matcher.match(img)
+    assert tuple(pos[1]) == (4, 9)
+    assert np.isclose(val[1], 1.0)
+
+
+def test_iterative_match_z_stack():
+    rng = np.random.default_rng(1)
+    img = scipy.ndimage.gaussian_filter(rng.normal(size=(160, 180)), 2)
+    offsets = np.array([(30 + 3 * i, 45 - 2 * i) for i in range(6)])
+    templates = np.stack([img[r:r + 64, c:c + 72] for r, c in offsets])
+    templates[3] += rng.normal(scale=img.std(), size=templates[3].shape)
+
+    pos, val = IterativeTemplateMatcher(templates).match(img)
+    assert np.array_equal(pos, offsets)
+    assert np.allclose(np.delete(val, 3), 1.0)
+    assert val[3] < 0.9
@@ -0,0 +1,99 @@
+import os
+
+import numpy as np
+import pyqtgraph as pg
+import pyqtgraph.configfile as configfile
+
+from acq4.util.log_store import LogStore, indexFileName
+
+
+def makeEntry(i):
+    return {
+        "message": f"message {i}\nsecond line",
+        "timestamp": f"2024-01-01T00:00:{i:02d}+00:00",
+        "importance": i % 10,
+        "msgType": ["status", "error", "user"][i % 3],
+        "id": i + 1,
+        "currentDir": None if i % 4 == 0 else f"/data/cell{i % 4}",
+        "exception": None,
+        "values": np.arange(40),  # repr spans several lines
+    }
+
+
+def writeLegacyLog(fileName, entries):
+    configfile.writeConfigFile("", fileName)
+    for i, entry in entries:
+        configfile.appendConfigFile({f"LogEntry_{i}": entry}, fileName)
+
+
+def test_read_existing_log(tmp_path):
+    fileName = str(tmp_path / "log.txt")
+    writeLegacyLog(fileName, [(i, makeEntry(i)) for i in range(20)])
+
+    store = LogStore(fileName)
+    assert os.path.exists(indexFileName(fileName))
+    assert len(store) == 20
+    legacy = list(configfile.readConfigFile(fileName).values())
+    for i in range(20):
+        assert store.entry(i)["message"] == legacy[i]["message"]
+        assert np.array_equal(store.entry(i)["values"], legacy[i]["values"])
+    assert np.array_equal(store.index["key"], np.arange(20))
+    assert store.lastEntryId() == 20
+    assert store.sources == ["", "/data/cell1", "/data/cell2", "/data/cell3"]
+
+    errors = store.select(msgTypes=["error"], minImportance=5)
+    assert list(errors) == [i for i in range(20) if i % 3 == 1 and i % 10 >= 5]
+    assert list(store.select(sourcePrefix="/data/cell2")) == list(range(2, 20, 4))
+    start = store.index["time"][0]
+    assert list(store.select(timeRange=(start + 5, start + 8))) == [5, 6, 7]
+
+
+def test_append_and_update(tmp_path):
+    fileName = str(tmp_path / "log.txt")
+    store = LogStore.create(fileName)
+    store.append({f"LogEntry_{i}": makeEntry(i) for i in range(5)})
+    # entries appended without the store are indexed by update()
+    for i in range(5, 8):
+        configfile.appendConfigFile({f"LogEntry_{i}": makeEntry(i)}, fileName)
+    assert store.update() == 3
+    assert [store.entry(i)["id"] for i in range(8)] == list(range(1, 9))
+    assert len(configfile.readConfigFile(fileName)) == 8
+
+    # a second store reads the saved index and indexes only new entries
+    store.append({"LogEntry_8": makeEntry(8)})
+    reopened = LogStore(fileName)
+    assert np.array_equal(reopened.index, store.index)
+    assert reopened.sources == store.sources
+
+    # an index that no longer matches the log is rebuilt
+    writeLegacyLog(fileName, [(i, makeEntry(i)) for i in range(30, 33)])
+    rebuilt = LogStore(fileName)
+    assert list(rebuilt.index["key"]) == [30, 31, 32]
+    assert rebuilt.entry(2)["id"] == 33
+
+
+def test_log_widget_paging(tmp_path):
+    from acq4.util.LogWindow import LogWidget
+
+    pg.mkQApp()
+    fileName = str(tmp_path / "log.txt")
+    writeLegacyLog(fileName, [(i, makeEntry(i)) for i in range(50)])
+    widget = LogWidget(None, None)
+    widget.pageSize = 10
+    widget.importanceFilter = -1
+    widget.loadFile(fileName)
+    assert len(widget.filteredIndices) == 50
+    assert [e["id"] for e in widget.displayedEntries] == list(range(40, 50))
+
+    widget.showEarlierEntries()
+    assert [e["id"] for e in widget.displayedEntries] == list(range(30, 50))
+
+    widget.typeFilters = ["error"]
+    widget.dirFilter = "/data/cell1"
+    widget.filterEntries()
+    assert list(widget.filteredIndices) == [i for i in range(50) if i % 3 == 1 and i % 4 == 1]
+
+    configfile.appendConfigFile({"LogEntry_50": makeEntry(49)}, fileName)
+    assert widget.updateFromFile() == 1
+    widget.filterEntries()
+    assert widget.filteredIndices[-1] == 50
@@ -0,0 +1,40 @@
+import shutil
+import tempfile
+
+import numpy as np
+import pyqtgraph as pg
+from MetaArray import MetaArray
+
+import acq4.util.DataManager as dm
+from acq4.util.imaging.stack_writer import StackWriter
+
+
+def test_stack_writer():
+    root = tempfile.mkdtemp()
+    try:
+        dh = dm.getDirHandle(root)
+        frames = []
+        for i in range(300):
+            tr = pg.SRTTransform3D()
+            tr.setTranslate(i, 2 * i, 3)
+            frames.append((np.full((8, 6), i, dtype=np.uint16), {'time': 100 + i * 0.01, 'transform': tr}))
+
+        writer = StackWriter(dh, 'video', frames[0][0], frames[0][1], blockSize=64)
+        for i, (data, info) in enumerate(frames[1:]):
+            writer.write(data, info)
+            if i % 50 == 0:
+                writer.flush()
+        fh = writer.close()
+        assert writer.nFrames == len(frames)
+
+        ma = MetaArray(file=fh.name())
+        assert ma.shape == (300, 8, 6)
+        assert ma.dtype == np.uint16
+        assert np.all(ma.asarray()[:, 0, 0] == np.arange(300))
+        assert np.allclose(ma.xvals('Time'), np.arange(300) * 0.01)
+        translation = ma.infoCopy()[0]['translation']
+        assert np.allclose(translation[:, 0], np.arange(300))
+        assert np.allclose(translation[:, 2], 3)
+        assert fh.info()['time'] == 100
+    finally:
+        shutil.rmtree(root)
@@ -0,0 +1,67 @@
+"""Measure sustained frame rate and frame-buffer allocation rate of MockCamera acquisition.
+
+Runs the camera's acquisition and processing threads for a fixed duration, once with frame buffers recycled through
+the camera's FrameBufferPool and once with the pool disabled (bufferPoolSize=0, so every frame allocates a new
+buffer as drivers did before the pool existed). A configurable number of recent frames is kept alive to mimic
+consumers such as displays and recorders holding on to frames.
+"""
+
+import argparse
+import collections
+import gc
+import time
+from unittest.mock import MagicMock
+
+import pyqtgraph as pg
+
+from acq4.devices.MockCamera.mock_camera import MockCamera
+from acq4.util import Qt
+
+
+def run(app, duration, poolSize, keep, exposure, binning):
+    manager = MagicMock()
+    manager.getDevice.return_value = None
+    cam = MockCamera(manager, {'bufferPoolSize': poolSize}, 'benchmarkCamera')
+    cam.setParams({'exposure': exposure, 'binning': (binning, binning)})
+
+    recent = collections.deque(maxlen=keep)
+    cam.sigNewFrame.connect(recent.append, type=Qt.Qt.DirectConnection)
+    counter = {'frames': 0}
+
+    def count(frame):
+        counter['frames'] += 1
+
+    cam.sigNewFrame.connect(count, type=Qt.Qt.DirectConnection)
+
+    gc.collect()
+    gcBefore = [s['collections'] for s in gc.get_stats()]
+    cam.start()
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        app.processEvents()
+        time.sleep(1e-3)
+    cam.stop()
+    elapsed = time.perf_counter() - start
+    gcRuns = [s['collections'] - b for s, b in zip(gc.get_stats(), gcBefore)]
+    stats = cam._bufferPool.stats()
+    cam.quit()
+    return counter['frames'] / elapsed, stats['allocated'] / elapsed, stats, gcRuns
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--duration', type=float, default=5.0, help='Seconds to acquire for each configuration')
+    parser.add_argument('--keep', type=int, default=10, help='Number of recent frames held by the consumer')
+    parser.add_argument('--exposure', type=float, default=1e-3, help='Camera exposure time (s)')
+    parser.add_argument('--binning', type=int, default=1, help='Camera binning (higher binning gives higher frame rates)')
+    args = parser.parse_args()
+
+    app = pg.mkQApp()
+    for name, poolSize in (('pooled', 64), ('unpooled', 0)):
+        fps, allocRate, stats, gcRuns = run(app, args.duration, poolSize, args.keep, args.exposure, args.binning)
+        print(f"{name:>9}: {fps:7.1f} fps   {allocRate:7.1f} buffer allocations/s   "
+              f"(allocated={stats['allocated']} reused={stats['reused']})   gc runs per generation={gcRuns}")
+
+
+if __name__ == '__main__':
+    main()
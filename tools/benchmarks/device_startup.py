@@ -0,0 +1,90 @@
+"""Measure Manager device startup time for a rig-sized configuration of mock devices with artificial delays.
+
+The configuration mimics a rig with a DAQ, a microscope on a motorized stage, cameras, lasers, filter wheels, and
+several patch rigs (manipulator + pipette + amplifier channel). Each device sleeps in its constructor for a time
+typical of its hardware (serial handshakes, controller discovery, calibration loading). Devices are created as
+Manager._loadDevices does: one at a time (deviceInitThreads: 0, the previous behavior), and with dependency-ordered
+worker threads.
+"""
+
+import argparse
+import time
+
+import pyqtgraph as pg
+
+from acq4.Manager import constructDevices, deviceDependencies
+from acq4.devices.Device import Device
+
+
+class DelayDevice(Device):
+    concurrentInit = True
+
+    def __init__(self, dm, config, name):
+        Device.__init__(self, dm, config, name)
+        for dep in config.get('requires', []):
+            dm.getDevice(dep)
+        time.sleep(config['delay'])
+
+
+class Registry:
+    def __init__(self):
+        self.devices = {}
+
+    def declareInterface(self, name, types, obj):
+        self.devices[name] = obj
+
+    def getDevice(self, name):
+        return self.devices[name]
+
+
+def rigConfig(nPatch, scale):
+    cfg = {
+        'DAQ': {'delay': 1.0},
+        'Stage': {'delay': 2.0},
+        'Microscope': {'delay': 0.2, 'parentDevice': 'Stage'},
+        'Camera': {'delay': 3.0, 'parentDevice': 'Microscope'},
+        'Camera2': {'delay': 3.0, 'parentDevice': 'Microscope'},
+        'Laser-UV': {'delay': 1.5, 'shutter': {'device': 'DAQ', 'channel': '/Dev1/line30'}},
+        'Laser-2P': {'delay': 2.5, 'pCell': {'device': 'DAQ', 'channel': '/Dev1/ao2'}},
+        'Scanner': {'delay': 0.5, 'parentDevice': 'Microscope', 'XAxis': {'device': 'DAQ'}, 'defaultCamera': 'Camera',
+                    'defaultLaser': 'Laser-UV'},
+        'FilterWheel': {'delay': 1.5, 'parentDevice': 'Microscope'},
+        'LED': {'delay': 0.3, 'channels': {'blue': {'device': 'DAQ'}}},
+        'PressureController': {'delay': 1.0},
+    }
+    for i in range(nPatch):
+        cfg[f'Manipulator{i}'] = {'delay': 2.0, 'parentDevice': 'Stage'}
+        cfg[f'Clamp{i}'] = {'delay': 2.5, 'commandChannel': {'device': 'DAQ'}}
+        cfg[f'Pipette{i}'] = {'delay': 0.2, 'parentDevice': f'Manipulator{i}', 'clampDevice': f'Clamp{i}',
+                              'pressureDevice': 'PressureController'}
+    deps = deviceDependencies(cfg)
+    for name, conf in cfg.items():
+        conf['driver'] = 'DelayDevice'
+        conf['delay'] *= scale
+        conf['requires'] = deps[name]  # fails if a device is created before the devices it refers to
+    return cfg
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--patch', type=int, default=7, help='Number of patch rigs (3 devices each)')
+    parser.add_argument('--scale', type=float, default=0.1, help='Scale factor applied to all device delays')
+    parser.add_argument('--threads', type=int, nargs='+', default=[0, 4, 8, 16], help='Worker thread counts to test')
+    args = parser.parse_args()
+
+    pg.mkQApp()
+    cfg = rigConfig(args.patch, args.scale)
+    deps = deviceDependencies(cfg)
+    print(f"{len(cfg)} devices, total constructor delay {sum(c['delay'] for c in cfg.values()):.2f} s")
+    for threads in args.threads:
+        registry = Registry()
+        start = time.perf_counter()
+        for name, result in constructDevices(deps, lambda name: DelayDevice(registry, cfg[name], name),
+                                             lambda name: True, maxWorkers=threads):
+            result.result()
+        elapsed = time.perf_counter() - start
+        print(f"{threads:3d} threads: {elapsed:6.2f} s")
+
+
+if __name__ == '__main__':
+    main()
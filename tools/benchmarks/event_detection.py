@@ -0,0 +1,94 @@
+"""Measure event detection on a long recording with the functions in acq4.util.functions.
+
+A trace is generated from smoothed noise with PSP-like events of both signs added at random times. Event detection
+is timed with the current vectorized functions and with the per-event loops they replaced (kept in the tests as
+reference implementations), and the results are compared. Clements-Bekkers template matching is timed with the
+template correlation computed directly (as before) and as it is now, for a short and a long template.
+"""
+
+import argparse
+import time
+
+import numpy as np
+import scipy.ndimage
+
+from acq4.util import functions
+from acq4.util.tests.test_event_detection import assertEventsMatch, loopThresholdEvents, loopZeroCrossingEvents
+
+
+def makeTrace(n, nEvents, rng):
+    data = scipy.ndimage.gaussian_filter1d(rng.normal(size=n), 3) * 3
+    template = functions.expTemplate(1.0, 5, 30, delay=0, length=200)
+    for i in rng.integers(0, n - len(template), size=nEvents):
+        data[i:i + len(template)] += template * rng.choice([-1, 1]) * rng.uniform(2, 8)
+    return data, template
+
+
+def directClementsBekkers(data, template):
+    ## clementsBekkers with the template correlation computed directly
+    N = len(template)
+    sumT = template.sum()
+    sumT2 = (template ** 2).sum()
+    sumD = functions.rollingSum(data, N)
+    sumD2 = functions.rollingSum(data ** 2, N)
+    sumTD = np.correlate(data, template, mode='valid')
+    scale = (sumTD - sumT * sumD / N) / (sumT2 - sumT ** 2 / N)
+    offset = (sumD - scale * sumT) / N
+    SSE = sumD2 + scale ** 2 * sumT2 + N * offset ** 2 - 2 * (scale * sumTD + offset * sumD - scale * offset * sumT)
+    return scale / np.sqrt(SSE / (N - 1)), scale, offset
+
+
+def timeit(fn, repeat):
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        ret = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, ret
+
+
+def report(name, old, new, same):
+    print(f"{name:>28s}: {old:8.3f} s -> {new:8.3f} s  ({old / new:6.1f}x)  identical: {same}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--samples', type=int, default=10 ** 7, help='Length of the recording')
+    parser.add_argument('--events', type=int, default=20000, help='Number of PSP-like events added to the noise')
+    parser.add_argument('--threshold', type=float, default=2.0, help='Threshold for thresholdEvents')
+    parser.add_argument('--long-template', type=int, default=3000, help='Length of the long Clements-Bekkers template')
+    parser.add_argument('--repeat', type=int, default=3, help='Report the best of this many runs')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    data, template = makeTrace(args.samples, args.events, np.random.default_rng(args.seed))
+
+    def compare(a, b):
+        try:
+            assertEventsMatch(a, b)
+            return True
+        except AssertionError:
+            return False
+
+    old, expected = timeit(lambda: loopZeroCrossingEvents(data), args.repeat)
+    new, events = timeit(lambda: functions.zeroCrossingEvents(data), args.repeat)
+    report(f'zeroCrossingEvents ({len(events)})', old, new, compare(events, expected))
+
+    for adjustTimes in (False, True):
+        old, expected = timeit(lambda: loopThresholdEvents(data, args.threshold, adjustTimes), args.repeat)
+        new, events = timeit(
+            lambda: functions.thresholdEvents(data, args.threshold, adjustTimes=adjustTimes), args.repeat)
+        report(f'thresholdEvents adjust={adjustTimes} ({len(events)})', old, new, compare(events, expected))
+
+    longTemplate = functions.expTemplate(1.0, 50, 300, delay=0, length=args.long_template)
+    for t in (template, longTemplate):
+        old, expected = timeit(lambda: directClementsBekkers(data, t), args.repeat)
+        new, dc = timeit(lambda: functions.clementsBekkers(data, t), args.repeat)
+        report(f'clementsBekkers ({len(t)} pts)', old, new, np.allclose(dc[0], expected[0], rtol=1e-6, atol=1e-6))
+    elapsed, events = timeit(lambda: functions.cbTemplateMatch(data, template, threshold=6.0), args.repeat)
+    print(f"{'cbTemplateMatch':>28s}: {elapsed:8.3f} s ({len(events)} events)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Measure PSP fitting throughput of the EventFitter flowchart node's serial and worker-pool code paths.
+
+A synthetic trace is built from randomly timed PSPs plus gaussian noise (with a fixed seed, so runs are reproducible),
+and one event is reported at the onset of each PSP. The events are fitted once serially with processEventFits and then
+with processEventFitsParallel for each requested pool size; the parallel results are checked to be identical to the
+serial ones.
+"""
+
+import argparse
+import multiprocessing
+import time
+
+import numpy as np
+
+import acq4.util.functions as functions
+from acq4.util.flowchart.Analysis import processEventFits, processEventFitsParallel
+
+
+def makeTrace(nEvents, rate, dt, seed):
+    rng = np.random.default_rng(seed)
+    intervals = rng.exponential(1.0 / rate, size=nEvents) + 5e-3
+    onsets = np.cumsum(intervals)
+    tvals = np.arange(int((onsets[-1] + 0.1) / dt)) * dt
+    waveform = rng.normal(scale=2e-12, size=len(tvals))
+    amps = -rng.uniform(20e-12, 100e-12, size=nEvents)
+    for t0, amp in zip(onsets, amps):
+        i0 = int(t0 / dt)
+        i1 = min(len(tvals), i0 + int(60e-3 / dt))
+        waveform[i0:i1] += functions.pspFunc([amp, t0, 1e-3, 8e-3], tvals[i0:i1])
+
+    events = np.zeros(nEvents, dtype=[('index', int), ('len', int), ('sum', float), ('peak', float), ('time', float)])
+    events['index'] = (onsets / dt).astype(int)
+    events['time'] = tvals[events['index']]
+    events['len'] = int(10e-3 / dt)
+    events['peak'] = amps
+    opts = {'dt': dt, 'tau': None, 'multiFit': False, 'waveform': waveform, 'tvals': tvals}
+    return events, opts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--events', type=int, default=2000, help='Number of synthetic PSPs to fit')
+    parser.add_argument('--rate', type=float, default=20.0, help='Mean PSP rate (Hz)')
+    parser.add_argument('--dt', type=float, default=1e-4, help='Sample interval (s)')
+    parser.add_argument('--processes', type=int, nargs='+', default=[2, 4], help='Worker pool sizes to test')
+    parser.add_argument('--batch-size', type=int, default=100, help='Events sent to a worker at a time')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    events, opts = makeTrace(args.events, args.rate, args.dt, args.seed)
+
+    start = time.perf_counter()
+    serial = processEventFits(events, 0, len(events), opts)
+    elapsed = time.perf_counter() - start
+    print(f"   serial: {len(events) / elapsed:8.1f} events/s  ({len(serial['output'])} fits)")
+
+    for nProc in args.processes:
+        with multiprocessing.Pool(processes=nProc) as pool:
+            pool.map(abs, range(nProc))  # make sure workers are running before timing
+            start = time.perf_counter()
+            parallel = processEventFitsParallel(events, opts, pool, batchSize=args.batch_size)
+            elapsed = time.perf_counter() - start
+        identical = serial['indexes'] == parallel['indexes'] and all(
+            np.array_equal(serial['output'][name], parallel['output'][name], equal_nan=True)
+            for name in serial['output'].dtype.names
+        )
+        print(f"{nProc:3d} procs: {len(events) / elapsed:8.1f} events/s  (identical to serial: {identical})")
+
+
+if __name__ == '__main__':
+    main()
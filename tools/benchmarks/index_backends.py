@@ -0,0 +1,48 @@
+"""Compare writeFile / setInfo throughput of the DirHandle index backends.
+
+Creates a temporary directory for each backend, fills it with N small files using writeFile(), then updates the
+meta-info of every file using setInfo().
+"""
+
+import argparse
+import shutil
+import tempfile
+import time
+
+from acq4.util import DataManager
+
+
+def run(backend, n):
+    DataManager.setDefaultIndexBackend(backend)
+    root = tempfile.mkdtemp()
+    try:
+        dh = DataManager.getDirHandle(root, create=True)
+        dh.createIndex()
+        data = {'value': 0}
+
+        start = time.perf_counter()
+        for i in range(n):
+            dh.writeFile(data, f'file_{i:05d}.yaml', info={'index': i}, fileType='YamlFile')
+        writeTime = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for i in range(n):
+            dh[f'file_{i:05d}.yaml'].setInfo(updated=True)
+        updateTime = time.perf_counter() - start
+    finally:
+        shutil.rmtree(root)
+    return writeTime, updateTime
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', type=int, default=10000, help='Number of files per directory')
+    args = parser.parse_args()
+
+    for backend in ('config', 'sqlite'):
+        writeTime, updateTime = run(backend, args.n)
+        print(f"{backend:>8}:  writeFile {args.n / writeTime:10.1f} files/s    setInfo {args.n / updateTime:10.1f} updates/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""Measure the time taken to open a long LogWindow log file and to change the filters applied to it.
+
+A log.txt file is written with the given number of entries, in the format used by LogWindow: a mix of message types,
+importances and storage directories, with tracebacks on the error entries. The log is then opened the way LogWidget
+used to (parsing the whole file with readConfigFile and building the filter array one entry at a time) and with
+LogStore, both before its index exists (as for a log written by an older version) and after. Filtering is timed by
+selecting error messages from one directory, and the entries of the last page (the ones that would be displayed)
+are read in each case.
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pyqtgraph.configfile as configfile
+
+from acq4.util.log_store import LogStore, indexFileName
+
+
+def makeEntries(n, rng):
+    dirs = [f"/data/2024.01.{d:02d}/slice_000/cell_{c:03d}" for d in range(1, 11) for c in range(10)]
+    types = np.array(["status", "status", "status", "user", "warning", "error"])
+    for i in range(n):
+        msgType = str(rng.choice(types))
+        entry = {
+            "message": f"Message number {i}",
+            "timestamp": f"2024-01-01T{(i // 3600) % 24:02d}:{(i // 60) % 60:02d}:{i % 60:02d}.000000-08:00",
+            "importance": int(rng.integers(0, 10)),
+            "msgType": msgType,
+            "id": i + 1,
+            "currentDir": str(rng.choice(dirs)),
+            "exception": None,
+        }
+        if msgType == "error":
+            entry["exception"] = {
+                "message": "ValueError: something went wrong",
+                "traceback": [f'  File "/acq4/module{j}.py", line {j * 10}, in function{j}\n' for j in range(8)],
+            }
+        yield f"LogEntry_{i}", entry
+
+
+def oldLoad(fileName):
+    ## previous LogWidget.loadFile and filterEntries
+    dtype = [("index", "int32"), ("importance", "int32"), ("msgType", "|S10"), ("directory", "|S100"),
+             ("entryId", "int32")]
+    logConf = configfile.readConfigFile(fileName)
+    entries = []
+    entryArray = np.zeros(len(logConf), dtype=dtype)
+    for i, (k, v) in enumerate(logConf.items()):
+        v["id"] = k[9:]
+        entries.append(v)
+        entryArray[i] = np.array([(i, v.get("importance", 5), v.get("msgType", "status"), v.get("currentDir", ""),
+                                   v.get("entryId", v["id"]))], dtype=dtype)
+    return entries, entryArray
+
+
+def oldFilter(entries, entryArray, msgType, directory, page):
+    mask = (entryArray["importance"] > 0) & (entryArray["msgType"] == msgType.encode())
+    _d = np.ascontiguousarray(entryArray["directory"])
+    j = len(directory)
+    i = len(_d)
+    _d = _d.view(np.byte).reshape(i, 100)[:, :j]
+    _d = _d.reshape(i * j).view("|S%d" % j)
+    mask &= _d == directory.encode()
+    return [entries[i] for i in entryArray[mask]["index"][-page:]]
+
+
+def newFilter(store, msgType, directory, page):
+    indices = store.select(msgTypes=[msgType], minImportance=1, sourcePrefix=directory)
+    return store.entries(indices[-page:])
+
+
+def timeit(fn):
+    start = time.perf_counter()
+    ret = fn()
+    return time.perf_counter() - start, ret
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--entries', type=int, default=100000, help='Number of entries in the log')
+    parser.add_argument('--page', type=int, default=500, help='Number of entries displayed after filtering')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    try:
+        fileName = os.path.join(tmp, 'log.txt')
+        configfile.writeConfigFile("", fileName)
+        with open(fileName, 'at') as fd:
+            for key, entry in makeEntries(args.entries, np.random.default_rng(args.seed)):
+                fd.write(configfile.genString({key: entry}))
+        print(f"{args.entries} entries, {os.path.getsize(fileName) / 1e6:.1f} MB")
+        directory = "/data/2024.01.03/slice_000/cell_004"
+
+        elapsed, (entries, entryArray) = timeit(lambda: oldLoad(fileName))
+        print(f"{'readConfigFile':>22s}: open {elapsed:7.3f} s", end='')
+        elapsed, old = timeit(lambda: oldFilter(entries, entryArray, "error", directory, args.page))
+        print(f", filter {elapsed * 1000:8.2f} ms")
+
+        for label in ('LogStore (no index)', 'LogStore (indexed)'):
+            elapsed, store = timeit(lambda: LogStore(fileName))
+            print(f"{label:>22s}: open {elapsed:7.3f} s", end='')
+            elapsed, new = timeit(lambda: newFilter(store, "error", directory, args.page))
+            print(f", filter {elapsed * 1000:8.2f} ms (parsing {len(new)} displayed entries)")
+        print(f"index size: {os.path.getsize(indexFileName(fileName)) / 1e6:.1f} MB")
+        print(f"same entries: {[e['message'] for e in old] == [e['message'] for e in new]}")
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Measure the cost of collecting per-site events as MapAnalyzer's spontaneous rate and event statistics analyzers do.
+
+A synthetic event table is generated with a 'ProtocolDir' column holding one handle object per stimulation site (as
+the DirHandles loaded from the database do). Per-site event counts, amplitudes and (time, amp) arrays are collected
+by masking the whole table once per site (the previous behavior) and with a GroupIndex, and the results are compared.
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from acq4.analysis.tools.functions import GroupIndex
+
+
+class Handle:
+    pass
+
+
+def makeEvents(nSites, nEvents, rng):
+    handles = np.empty(nSites, dtype=object)
+    handles[:] = [Handle() for i in range(nSites)]
+    events = np.empty(nEvents, dtype=[('ProtocolDir', object), ('fitTime', float), ('fitAmplitude', float)])
+    events['ProtocolDir'] = handles[rng.integers(0, nSites, size=nEvents)]
+    events['fitTime'] = rng.uniform(0, 1, size=nEvents)
+    events['fitAmplitude'] = rng.normal(size=nEvents)
+    return handles, events
+
+
+def masked(handles, events):
+    counts = []
+    amps = []
+    siteEvents = []
+    for dh in handles:
+        ev = events[events['ProtocolDir'] == dh]
+        counts.append(len(ev))
+        amps.extend(ev['fitAmplitude'])
+        ev2 = np.empty(len(ev), dtype=[('time', float), ('amp', float)])
+        ev2['time'] = ev['fitTime'] - 0.5
+        ev2['amp'] = ev['fitAmplitude']
+        siteEvents.append(ev2)
+    return np.array(counts), np.mean(amps), siteEvents
+
+
+def grouped(handles, events):
+    groups = GroupIndex(events['ProtocolDir'])
+    counts = groups.counts(handles)
+    amps = events['fitAmplitude'][np.concatenate([np.empty(0, dtype=int)] + [groups.indices(dh) for dh in handles])]
+    table = np.empty(len(events), dtype=[('time', float), ('amp', float)])
+    table['time'] = groups.sort(events['fitTime']) - 0.5
+    table['amp'] = groups.sort(events['fitAmplitude'])
+    siteEvents = []
+    for dh in handles:
+        start, stop = groups.bounds(dh)
+        siteEvents.append(table[start:stop])
+    return counts, np.mean(amps), siteEvents
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sites', type=int, default=2000, help='Number of stimulation sites')
+    parser.add_argument('--events', type=int, default=1000000, help='Number of events in the table')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    handles, events = makeEvents(args.sites, args.events, np.random.default_rng(args.seed))
+    results = {}
+    for name, fn in (('masked', masked), ('grouped', grouped)):
+        start = time.perf_counter()
+        results[name] = fn(handles, events)
+        print(f"{name:>8s}: {time.perf_counter() - start:8.2f} s")
+
+    (c1, m1, e1), (c2, m2, e2) = results['masked'], results['grouped']
+    same = np.array_equal(c1, c2) and m1 == m2 and all(np.array_equal(a, b) for a, b in zip(e1, e2))
+    print(f"results identical: {same}")
+
+
+if __name__ == '__main__':
+    main()
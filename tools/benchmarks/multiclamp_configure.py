@@ -0,0 +1,49 @@
+"""Measure MultiClampTask.configure() latency with and without the parameter mirror.
+
+The MultiClamp device is connected to the simulated commander used by the device tests, in which every parameter
+read or write costs --call-delay seconds (AxMultiClampMsg calls select the channel and round-trip through the
+commander; several ms each is typical, more with several amplifiers). Tasks record the full clamp state
+(recordState: True), as the Patch and TaskRunner modules do. A mode switch every --switch-every tasks shows the cost
+of re-reading the mode-dependent parameters.
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from acq4.devices.MultiClamp.multiclamp import MultiClampTask
+from acq4.devices.tests.test_MultiClamp import FakeMultiClampChannel, makeClamp
+
+
+def run(clamp, channel, args):
+    times = []
+    calls = channel.calls
+    for i in range(args.tasks):
+        mode = 'IC' if args.switch_every and (i // args.switch_every) % 2 else 'VC'
+        task = MultiClampTask(clamp, {'mode': mode, 'recordState': True}, None)
+        start = time.perf_counter()
+        task.configure()
+        elapsed = time.perf_counter() - start
+        if i > 0 and (args.switch_every == 0 or i % args.switch_every != 0):
+            times.append(elapsed)  # exclude the 0.5 s mode switch itself
+    return np.array(times) * 1e3, (channel.calls - calls) / args.tasks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--call-delay', type=float, default=5e-3, help='Cost of one commander call (s)')
+    parser.add_argument('--tasks', type=int, default=50, help='Number of tasks to configure')
+    parser.add_argument('--switch-every', type=int, default=10, help='Switch VC/IC every N tasks (0: never)')
+    args = parser.parse_args()
+
+    for name, cache in [('direct', False), ('mirror', True)]:
+        channel = FakeMultiClampChannel(callDelay=args.call_delay)
+        clamp = makeClamp(channel, enableParameterCache=cache)
+        times, calls = run(clamp, channel, args)
+        print(f"{name:>7}: configure median {np.median(times):7.2f} ms, max {times.max():7.2f} ms; "
+              f"{calls:5.1f} commander calls per task")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""Measure the time taken by each pipette tip measurement made by PipetteTracker's template-matching detector.
+
+A reference z-stack and a series of camera frames are rendered from a synthetic pipette tip (a tapered wedge, blurred
+according to its distance from the focal plane, plus camera-like background and shot noise like MockCamera's). The
+tip moves a few pixels and focal planes between frames, as it would during an automated approach. Each frame is
+cropped around the expected tip position and measured three ways:
+
+* per-frame: a new detector for every measurement, matching each reference frame separately with
+  iterativeImageTemplateMatch (the tracker's previous behavior)
+* batched: a new TemplateMatchPipetteDetector for every measurement, which matches all reference frames in one
+  batched FFT
+* cached: one TemplateMatchPipetteDetector reused for every measurement, as PipetteTracker now does
+
+The per-frame mode uses skimage when it is installed, and an equivalent single-template TemplateMatcher otherwise.
+"""
+
+import argparse
+import importlib.util
+import time
+
+import numpy as np
+import scipy.ndimage
+
+from acq4.devices.Pipette.pipette_detection import TemplateMatchPipetteDetector
+from acq4.util.image_registration import TemplateMatcher, imageTemplateMatch, iterativeImageTemplateMatch
+
+
+def renderTip(shape, tip, defocus, rng, length=100, halfAngle=10, noise=True):
+    """Render a pipette pointing along +x with its tip at pixel *tip*, blurred by *defocus* (pixels)."""
+    x, y = np.mgrid[:shape[0], :shape[1]].astype(float)
+    dx = tip[0] - x
+    width = np.tan(np.radians(halfAngle)) * dx
+    wall = (dx > 0) & (dx < length * 2) & (np.abs(np.abs(y - tip[1]) - width) < 2 + 0.05 * dx)
+    img = 1000 - 300 * wall.astype(float)
+    img = scipy.ndimage.gaussian_filter(img, 1 + abs(defocus))
+    if noise:
+        img = rng.poisson(img + 50 * np.sin(x / 40) * np.cos(y / 55)).astype(float)
+    return img
+
+
+def makeReference(nPlanes, zStep, size, rng):
+    center = nPlanes // 2
+    tip = (size * 0.7, size / 2)
+    frames = np.array([
+        renderTip((size, size), tip, (i - center) * zStep / 1e-6 / 4, rng, noise=False) for i in range(nPlanes)
+    ])
+    return {
+        'frames': frames - frames.mean(),
+        'zStep': zStep,
+        'centerInd': center,
+        'centerPos': np.array(tip),
+        'pixelSize': (1e-6, 1e-6),
+        'tipLength': 100e-6,
+    }
+
+
+def skimageAvailable():
+    return importlib.util.find_spec('skimage') is not None
+
+
+def fallbackMatch(img, template):
+    pos, val, cc = TemplateMatcher(template[np.newaxis]).match(img)
+    return pos[0], val[0], cc[0]
+
+
+def perFrameEstimate(reference, img, matchFn):
+    detector = TemplateMatchPipetteDetector(reference)
+    match = [iterativeImageTemplateMatch(img, t, matchFn=matchFn) for t in detector.filtered_ref]
+    maxInd = np.argmax([m[1] for m in match])
+    return match[maxInd][0], (maxInd - reference['centerInd']) * reference['zStep'], match[maxInd][1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--frames', type=int, default=20, help='Number of tip measurements')
+    parser.add_argument('--planes', type=int, default=81, help='Number of reference z-planes')
+    parser.add_argument('--z-step', type=float, default=1e-6, help='Reference z-stack step (m)')
+    parser.add_argument('--size', type=int, default=160, help='Reference frame size (pixels)')
+    parser.add_argument('--padding', type=int, default=50, help='Extra search area around the reference (pixels)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    reference = makeReference(args.planes, args.z_step, args.size, rng)
+    cropSize = args.size + 2 * args.padding
+    images = []
+    for i in range(args.frames):
+        shift = rng.integers(-args.padding // 2, args.padding // 2, size=2)
+        defocus = rng.integers(-args.planes // 4, args.planes // 4) * args.z_step / 1e-6 / 4
+        tip = reference['centerPos'] + args.padding + shift
+        images.append(renderTip((cropSize, cropSize), tip, defocus, rng))
+
+    matchFn = imageTemplateMatch if skimageAvailable() else fallbackMatch
+    cached = TemplateMatchPipetteDetector(reference)
+    modes = [
+        ('per-frame', lambda img: perFrameEstimate(reference, img, matchFn)),
+        ('batched', lambda img: TemplateMatchPipetteDetector(reference).estimateOffset(img)),
+        ('cached', lambda img: cached.estimateOffset(img)),
+    ]
+    filtered = [cached.filterImage(img) for img in images]
+    results = {}
+    for name, estimate in modes:
+        start = time.perf_counter()
+        results[name] = [estimate(img) for img in filtered]
+        elapsed = (time.perf_counter() - start) / len(images)
+        print(f"{name:>10s}: {elapsed * 1000:8.1f} ms per measurement  ({1 / elapsed:6.1f} Hz)")
+
+    for name in ('batched', 'cached'):
+        same = all(
+            np.array_equal(a[0], b[0]) and a[1] == b[1] and np.isclose(a[2], b[2])
+            for a, b in zip(results['per-frame'], results[name])
+        )
+        print(f"{name} results identical to per-frame: {same}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Measure the time taken to load the clamp data of a protocol sequence, as IVCurve does through GetClamps.
+
+A synthetic IV sequence is written to a temporary directory and loaded serially (one run at a time, as before),
+with concurrent reads, and from the consolidated sequence cache. Local disks hide most of the cost of reading many
+small files from a network share, so --latency adds a fixed delay to every file read and directory listing to
+emulate one.
+"""
+
+import argparse
+import shutil
+import tempfile
+import time
+
+import numpy as np
+from MetaArray import MetaArray
+
+import acq4.util.DataManager as dm
+from acq4.analysis.dataModels import PatchEPhys
+
+
+def makeSequence(root, nAmps, nReps, nPts):
+    dh = dm.getDirHandle(root)
+    amps = list(np.linspace(-200e-12, 200e-12, nAmps))
+    params = {('Clamp1', 'Pulse_amplitude'): amps, ('protocol', 'repetitions'): list(range(nReps))}
+    devices = {'Clamp1': {'waveGeneratorWidget': {'stimuli': {'Pulse': {'start': {'value': 0.1}, 'length': {'value': 0.5}}}}}}
+    seq = dh.mkdir('cciv_000', info={'dirType': 'ProtocolSequence', 'sequenceParams': params, 'devices': devices})
+    for rep in range(nReps):
+        for i, amp in enumerate(amps):
+            run = seq.mkdir('%03d_%03d' % (rep, i), info={('protocol', 'repetitions'): rep,
+                                                           ('Clamp1', 'Pulse_amplitude'): i})
+            cmd = np.zeros(nPts)
+            cmd[nPts // 10:nPts * 6 // 10] = amp
+            data = MetaArray(np.stack([cmd, -65e-3 + cmd * 1e8]), info=[
+                {'name': 'Channel', 'cols': [{'name': 'command', 'units': 'A'}, {'name': 'primary', 'units': 'V'}]},
+                {'name': 'Time', 'units': 's', 'values': np.arange(nPts) * 1e-4},
+                {'ClampState': {'mode': 'IC', 'holding': 0.0}, 'DAQ': {'primary': {'rate': 1e4}}, 'startTime': rep},
+            ])
+            run.writeFile(data, 'Clamp1.ma')
+    return seq
+
+
+def addLatency(latency):
+    origRead = dm.FileHandle.read
+    origLs = dm.DirHandle.ls
+
+    def read(self, *args, **kwds):
+        time.sleep(latency)
+        return origRead(self, *args, **kwds)
+
+    def ls(self, *args, **kwds):
+        time.sleep(latency)
+        return origLs(self, *args, **kwds)
+
+    dm.FileHandle.read = read
+    dm.DirHandle.ls = ls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--amplitudes', type=int, default=40, help='Number of pulse amplitudes in the sequence')
+    parser.add_argument('--repetitions', type=int, default=5, help='Number of repetitions of the sequence')
+    parser.add_argument('--points', type=int, default=20000, help='Samples per trace')
+    parser.add_argument('--latency', type=float, default=0.005, help='Delay added to each file access (s)')
+    parser.add_argument('--workers', type=int, default=8, help='Number of reader threads')
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp()
+    try:
+        seq = makeSequence(root, args.amplitudes, args.repetitions, args.points)
+        addLatency(args.latency)
+        pars = {'sequence1': {'index': list(range(args.repetitions)), 'count': args.repetitions},
+                'sequence2': {'index': list(range(args.amplitudes)), 'count': args.amplitudes}}
+        print(f"{args.amplitudes * args.repetitions} runs of {args.points} samples, "
+              f"{args.latency * 1000:.1f} ms added per file access")
+        results = []
+        for label, workers, cache in [('serial', 1, False), (f'{args.workers} workers', args.workers, False),
+                                      ('writing cache', args.workers, True), ('from cache', args.workers, True)]:
+            clamps = PatchEPhys.GetClamps()
+            start = time.perf_counter()
+            clamps.getClampData(seq, dict(pars), workers=workers, cache=cache)
+            elapsed = time.perf_counter() - start
+            results.append(clamps.traces.asarray())
+            print(f"{label:>15s}: {elapsed:7.3f} s (identical: {np.array_equal(results[0], results[-1])})")
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    main()
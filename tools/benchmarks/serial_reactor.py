@@ -0,0 +1,127 @@
+"""Compare polled serial I/O with the shared SerialReactor for many simulated devices.
+
+Each device is a pseudo-terminal answered by a separate process (so that its work is not counted here), replying to
+position requests after a short delay. Every device is monitored as the Scientifica stage monitor does it: polled
+mode uses one thread per device calling SerialDevice.request().result() and sleeping between polls, and reactor mode
+registers one Poller per device with SerialReactor.addPoller(). While the monitors run, request round-trip latency
+is measured on one more port. CPU time is for this process only. Linux only.
+"""
+
+import argparse
+import os
+import pty
+import select
+import threading
+import time
+import tty
+
+import numpy as np
+
+from acq4.drivers.SerialDevice import SerialDevice
+
+
+class ReactorDevice(SerialDevice):
+    useReactor = True
+
+
+def openPorts(n, delay):
+    """Open *n* pseudo-terminals served by a child process; return (port names, function that stops the child)."""
+    masters, names = [], []
+    for i in range(n):
+        master, slave = pty.openpty()
+        tty.setraw(slave)
+        masters.append(master)
+        names.append(os.ttyname(slave))
+    stopRead, stopWrite = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        buffers = {fd: b'' for fd in masters}
+        while True:
+            ready = select.select(masters + [stopRead], [], [])[0]
+            if stopRead in ready:
+                os._exit(0)
+            for fd in ready:
+                buffers[fd] += os.read(fd, 4096)
+                while b'\r' in buffers[fd]:
+                    cmd, _, buffers[fd] = buffers[fd].partition(b'\r')
+                    time.sleep(delay)
+                    os.write(fd, b'1000\t2000\t3000\r' if cmd == b'P' else b'A\r')
+
+    def stop():
+        os.write(stopWrite, b'x')
+        os.waitpid(pid, 0)
+
+    return names, stop
+
+
+def measureLatency(dev, n):
+    times = []
+    for i in range(n):
+        start = time.perf_counter()
+        dev.request('P\r', term='\r').result()
+        times.append(time.perf_counter() - start)
+    return np.array(times) * 1e3
+
+
+def runPolled(ports, args):
+    devs = [SerialDevice(port=port, baudrate=9600) for port in ports]
+    stopped = threading.Event()
+
+    def monitor(dev):
+        while not stopped.is_set():
+            dev.request('P\r', term='\r').result()
+            time.sleep(args.interval)
+
+    threads = [threading.Thread(target=monitor, args=(dev,), daemon=True) for dev in devs[1:]]
+    cpu = time.process_time()
+    start = time.perf_counter()
+    [t.start() for t in threads]
+    latency = measureLatency(devs[0], args.requests)
+    time.sleep(max(0, args.duration - (time.perf_counter() - start)))
+    stopped.set()
+    [t.join() for t in threads]
+    cpu = time.process_time() - cpu
+    elapsed = time.perf_counter() - start
+    [dev.close() for dev in devs]
+    return latency, cpu / elapsed, len(threads) + 1
+
+
+def runReactor(ports, args):
+    devs = [ReactorDevice(port=port, baudrate=9600) for port in ports]
+    reactor = devs[0].reactor
+    wakeups = reactor.wakeups
+    cpu = time.process_time()
+    start = time.perf_counter()
+    pollers = [reactor.addPoller(lambda dev=dev: dev.request('P\r', term='\r'), lambda pos: False,
+                                 interval=args.interval, minInterval=args.interval) for dev in devs[1:]]
+    latency = measureLatency(devs[0], args.requests)
+    time.sleep(max(0, args.duration - (time.perf_counter() - start)))
+    [p.stop() for p in pollers]
+    cpu = time.process_time() - cpu
+    elapsed = time.perf_counter() - start
+    print(f"    reactor wakeups: {(reactor.wakeups - wakeups) / elapsed:.0f}/s")
+    [dev.close() for dev in devs]
+    return latency, cpu / elapsed, 3  # main, reactor and callback threads
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--devices', type=int, default=32, help='Number of monitored devices')
+    parser.add_argument('--interval', type=float, default=0.3, help='Polling interval for each device (s)')
+    parser.add_argument('--delay', type=float, default=1e-3, help='Simulated device response time (s)')
+    parser.add_argument('--requests', type=int, default=500, help='Number of round trips used to measure latency')
+    parser.add_argument('--duration', type=float, default=5.0, help='Minimum run time for each mode (s)')
+    args = parser.parse_args()
+
+    ports, stop = openPorts(args.devices + 1, args.delay)
+    try:
+        for name, run in [('polled', runPolled), ('reactor', runReactor)]:
+            latency, cpu, threads = run(ports, args)
+            print(f"{name:>8}: latency median {np.median(latency):.3f} ms, 99th percentile "
+                  f"{np.percentile(latency, 99):.3f} ms; CPU {cpu * 100:.1f}% with {threads} threads")
+    finally:
+        stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""Measure the cost of the Bendels spatial correlation on photostimulation maps of increasing size.
+
+Maps are square stimulation grids (as produced by combining many cells' maps into one), with a cluster of input sites
+in the middle. bendelsSpatialCorrelationAlgorithm (KD-tree neighbourhoods and binomial tail probabilities) is compared
+against the previous per-site loop for the sizes where the loop finishes in reasonable time.
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from acq4.analysis.tools import functions
+from acq4.analysis.tools.tests.test_spatialCorrelation import loopProbabilities
+
+
+def makeMap(n, spacing, seed=0):
+    rng = np.random.default_rng(seed)
+    side = int(np.ceil(np.sqrt(n)))
+    grid = np.stack(np.meshgrid(np.arange(side), np.arange(side)), axis=-1).reshape(-1, 2)[:n] * spacing
+    grid = grid + rng.normal(scale=spacing * 0.1, size=grid.shape)
+    data = np.zeros(n, dtype=[('xPos', float), ('yPos', float), ('numOfPostEvents', int)])
+    data['xPos'], data['yPos'] = grid.T
+    inputSite = np.hypot(data['xPos'] - data['xPos'].mean(), data['yPos'] - data['yPos'].mean()) < 10 * spacing
+    data['numOfPostEvents'] = rng.poisson(np.where(inputSite, 2.0, 0.1))
+    return data
+
+
+def timeit(fn, repeat):
+    best = np.inf
+    for i in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 4000, 10000, 100000], help='Number of sites per map')
+    parser.add_argument('--radius', type=float, default=90e-6, help='Neighbourhood radius (m)')
+    parser.add_argument('--spacing', type=float, default=20e-6, help='Distance between stimulation sites (m)')
+    parser.add_argument('--loop-max', type=int, default=4000, help='Largest map to run the per-site loop on')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of repetitions (best time is reported)')
+    args = parser.parse_args()
+
+    spontRate, timeWindow = 3.0, 0.1
+    p = 1 - np.exp(-spontRate * timeWindow)
+    for n in args.sizes:
+        data = makeMap(n, args.spacing)
+        vecTime, result = timeit(lambda: functions.bendelsSpatialCorrelationAlgorithm(data, args.radius, spontRate, timeWindow), args.repeat)
+        line = f"{n:7d} sites: kd-tree {vecTime * 1000:9.2f} ms"
+        if n <= args.loop_max:
+            loopTime, expected = timeit(lambda: loopProbabilities(data, args.radius, p, data['numOfPostEvents'] > 0), 1)
+            line += (f", loop {loopTime * 1000:9.2f} ms ({loopTime / vecTime:.0f}x; "
+                     f"same: {np.allclose(result['prob'], expected, rtol=1e-10, atol=1e-14)})")
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
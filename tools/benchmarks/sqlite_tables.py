@@ -0,0 +1,135 @@
+"""Measure bulk reads and writes of a synthetic event table with SqliteDatabase.
+
+The table has int, real and text columns plus a BLOB column holding a short numeric array per record (such as a
+fitted waveform). Each operation is timed with the bulk path and with the previous per-record approach:
+
+* insert: a record array (converted column by column) vs. the same records as a list of dicts
+* many small inserts: insert() per record vs. an insertBatch()
+* select: select(toArray=True) vs. building the array one record at a time from dicts
+* paging: iterSelect (paged by rowid) vs. limit/offset queries
+* blobs: raw typed buffers (encodeBlob) vs. pickle
+"""
+
+import argparse
+import os
+import pickle
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from acq4.util.database.database import SqliteDatabase, decodeBlob, encodeBlob
+
+
+COLUMNS = [('id', 'int'), ('time', 'real'), ('amplitude', 'real'), ('label', 'text'), ('waveform', 'blob')]
+
+
+def makeEvents(n, waveformLength, rng):
+    data = np.empty(n, dtype=[('id', int), ('time', float), ('amplitude', float), ('label', 'U8'),
+                              ('waveform', object)])
+    data['id'] = np.arange(n)
+    data['time'] = rng.uniform(0, 100, size=n)
+    data['amplitude'] = rng.normal(size=n)
+    data['label'] = rng.choice(['spont', 'evoked', 'direct'], size=n)
+    data['waveform'] = list(rng.normal(size=(n, waveformLength)))
+    return data
+
+
+def timeit(fn, repeat=1):
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        ret = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, ret
+
+
+def rowByRowArray(db, table):
+    ## previous implementation of select(toArray=True)
+    recs = db.select(table)
+    dtype = [(k, type(v) if isinstance(v, (int, float)) else object) for k, v in recs[0].items()]
+    arr = np.empty(len(recs), dtype=dtype)
+    for i, rec in enumerate(recs):
+        arr[i] = tuple(rec.values())
+    return arr
+
+
+def offsetPages(db, table, limit):
+    offset = 0
+    while True:
+        res = db.select(table, toArray=True, limit=limit, offset=offset)
+        if res is None:
+            break
+        yield res
+        offset += limit
+
+
+def report(name, old, new):
+    print(f"{name:>22s}: {old:8.3f} s -> {new:8.3f} s  ({old / new:5.1f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--records', type=int, default=200000, help='Number of records in the table')
+    parser.add_argument('--waveform', type=int, default=50, help='Number of samples in each BLOB array')
+    parser.add_argument('--page', type=int, default=10000, help='Records per page for paged reads')
+    parser.add_argument('--small-inserts', type=int, default=5000, help='Number of single-record inserts')
+    parser.add_argument('--repeat', type=int, default=3, help='Report the best of this many runs for each read')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    data = makeEvents(args.records, args.waveform, np.random.default_rng(args.seed))
+    tmp = tempfile.mkdtemp()
+    try:
+        db = SqliteDatabase(os.path.join(tmp, 'events.sqlite'))
+        for table in ('events', 'events_dicts', 'single', 'batched'):
+            db.createTable(table, COLUMNS)
+
+        records = [dict(zip(data.dtype.names, rec)) for rec in data]
+        old, _ = timeit(lambda: db.insert('events_dicts', records))
+        new, _ = timeit(lambda: db.insert('events', data))
+        report('insert', old, new)
+
+        small = data[:args.small_inserts]
+
+        def single():
+            for rec in small:
+                db.insert('single', dict(zip(small.dtype.names, rec)))
+
+        def batched():
+            with db.insertBatch('batched') as batch:
+                for rec in small:
+                    batch.add(dict(zip(small.dtype.names, rec)))
+
+        old, _ = timeit(single)
+        new, _ = timeit(batched)
+        report('many small inserts', old, new)
+
+        old, a = timeit(lambda: rowByRowArray(db, 'events'), args.repeat)
+        new, b = timeit(lambda: db.select('events', toArray=True), args.repeat)
+        report('select', old, new)
+        same = all(np.array_equal(a[k], b[k]) for k in ('id', 'time', 'amplitude', 'label'))
+        same = same and all(np.array_equal(x, y) for x, y in zip(a['waveform'], b['waveform']))
+
+        old, _ = timeit(lambda: sum(len(p) for p in offsetPages(db, 'events', args.page)), args.repeat)
+        new, _ = timeit(lambda: sum(len(p) for p in db.iterSelect('events', toArray=True, limit=args.page)), args.repeat)
+        report('paged select', old, new)
+
+        waveforms = list(data['waveform'])
+        old, pickled = timeit(lambda: [pickle.dumps(w) for w in waveforms])
+        new, encoded = timeit(lambda: [encodeBlob(w) for w in waveforms])
+        report('encode blobs', old, new)
+        old, _ = timeit(lambda: [pickle.loads(p) for p in pickled])
+        new, _ = timeit(lambda: [decodeBlob(e) for e in encoded])
+        report('decode blobs', old, new)
+
+        print(f"selected data identical: {same}")
+        db.close()
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    main()
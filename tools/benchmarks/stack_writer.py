@@ -0,0 +1,77 @@
+"""Measure sustained write rate of image stack recording.
+
+Compares the streaming StackWriter used by RecordThread against the legacy batch-append path (concatenate pending
+frames and append them to the MetaArray file). Frames are taken from a small pool of preallocated buffers, as they
+would be from a camera driver.
+"""
+
+import argparse
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pyqtgraph as pg
+from MetaArray import MetaArray
+
+from acq4.util import DataManager
+from acq4.util.imaging.stack_writer import StackWriter
+
+
+def makeFrames(n, shape, poolSize=8):
+    pool = [np.random.randint(0, 4096, size=shape).astype(np.uint16) for _ in range(poolSize)]
+    tr = pg.SRTTransform3D()
+    return [(pool[i % poolSize], {'time': i * 5e-3, 'transform': tr}) for i in range(n)]
+
+
+def streamed(dh, frames):
+    writer = StackWriter(dh, 'video', *frames[0])
+    for data, info in frames[1:]:
+        writer.write(data, info)
+    writer.close()
+
+
+def batched(dh, frames, batchSize=20):
+    fh = None
+    for i in range(0, len(frames), batchSize):
+        batch = frames[i:i + batchSize]
+        arrayInfo = [
+            {'name': 'Time', 'values': np.array([f[1]['time'] for f in batch]), 'units': 's',
+             'translation': np.array([f[1]['transform'].getTranslation() for f in batch])},
+            {'name': 'X'}, {'name': 'Y'},
+        ]
+        data = MetaArray(np.concatenate([f[0][np.newaxis] for f in batch]), info=arrayInfo)
+        if fh is None:
+            fh = dh.writeFile(data, 'video', autoIncrement=True, info=batch[0][1],
+                              appendAxis='Time', appendKeys=['translation'])
+        else:
+            data.write(fh.name(), appendAxis='Time', appendKeys=['translation'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', type=int, default=400, help='Number of frames to write')
+    parser.add_argument('--shape', type=int, nargs=2, default=(2048, 2048), help='Frame shape')
+    parser.add_argument('--dir', default=None, help='Directory to write into (default is a temporary directory)')
+    args = parser.parse_args()
+
+    frames = makeFrames(args.n, tuple(args.shape))
+    frameBytes = frames[0][0].nbytes
+    for name, fn in (('streamed', streamed), ('batched', batched)):
+        root = tempfile.mkdtemp(dir=args.dir)
+        try:
+            dh = DataManager.getDirHandle(root)
+            start = time.perf_counter()
+            cpuStart = time.process_time()
+            fn(dh, frames)
+            cpu = time.process_time() - cpuStart
+            dt = time.perf_counter() - start
+        finally:
+            shutil.rmtree(root)
+        # wall-clock rate is usually limited by the disk; CPU time per frame shows the cost of the write path itself
+        print(f"{name:>9}: {args.n / dt:8.1f} frames/s  {args.n * frameBytes / dt / 1e6:8.1f} MB/s  "
+              f"{cpu / args.n * 1e3:6.2f} ms CPU/frame")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Measure the cost of propagating stage position updates through a deep OptomechDevice tree.
+
+Several stages (e.g. manipulators) each carry a chain of child devices (focus drive, objective, camera, scanner, ...),
+and every device in each chain has a number of leaf devices attached. Every device has a listener on
+sigGlobalTransformChanged that recomputes its global transform, as canvas items and device GUIs do. For each event
+loop iteration, every stage receives several position updates before the event loop runs.
+
+Updates are applied with immediate signals (as before coalescing was added) and with deferred signals (as
+Stage.posChanged now does); both the time per iteration and the number of listener calls are reported.
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pyqtgraph as pg
+
+from acq4.devices.OptomechDevice import OptomechDevice
+
+
+def buildTree(nStages, depth, leaves):
+    stages = []
+    devices = []
+    for i in range(nStages):
+        stage = OptomechDevice(None, {}, f'stage{i}')
+        stages.append(stage)
+        parent = stage
+        for j in range(depth):
+            dev = OptomechDevice(None, {}, f'stage{i}.dev{j}')
+            dev.setParentDevice(parent)
+            dev.setDeviceTransform({'pos': (0, 0, 1e-3), 'scale': (1.1, 1.1, 1)})
+            devices.append(dev)
+            for k in range(leaves):
+                leaf = OptomechDevice(None, {}, f'stage{i}.dev{j}.leaf{k}')
+                leaf.setParentDevice(dev)
+                devices.append(leaf)
+            parent = dev
+
+    calls = {'n': 0}
+
+    def listener(dev, changed):
+        calls['n'] += 1
+        dev.globalTransform()
+
+    for dev in devices:
+        dev.sigGlobalTransformChanged.connect(listener)
+    return stages, devices, calls
+
+
+def run(app, stages, calls, ticks, updatesPerTick, deferSignals):
+    calls['n'] = 0
+    rng = np.random.default_rng(0)
+    start = time.perf_counter()
+    for tick in range(ticks):
+        for update in range(updatesPerTick):
+            for stage in stages:
+                stage.setDeviceTransform({'pos': rng.normal(scale=1e-3, size=3)}, deferSignals=deferSignals)
+        app.processEvents()
+    elapsed = time.perf_counter() - start
+    return elapsed / ticks, calls['n'] / ticks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--stages', type=int, default=8, help='Number of independently moving stages')
+    parser.add_argument('--depth', type=int, default=6, help='Length of the device chain carried by each stage')
+    parser.add_argument('--leaves', type=int, default=3, help='Leaf devices attached to each device in a chain')
+    parser.add_argument('--updates', type=int, default=5, help='Position updates per stage per event loop iteration')
+    parser.add_argument('--ticks', type=int, default=100, help='Number of event loop iterations')
+    parser.add_argument('--points', type=int, default=10000, help='Number of points for the point mapping test')
+    args = parser.parse_args()
+
+    app = pg.mkQApp()
+    stages, devices, calls = buildTree(args.stages, args.depth, args.leaves)
+    print(f"{len(stages) + len(devices)} devices, {args.updates} updates per stage per iteration")
+    for deferSignals in (False, True):
+        perTick, callsPerTick = run(app, stages, calls, args.ticks, args.updates, deferSignals)
+        mode = 'deferred' if deferSignals else 'immediate'
+        print(f"{mode:>10s}: {perTick * 1000:8.2f} ms per iteration, {callsPerTick:8.0f} listener calls per iteration")
+
+    leaf = devices[-1]
+    points = np.random.default_rng(1).normal(size=(args.points, 3))
+    start = time.perf_counter()
+    mapped = leaf.mapToGlobal(points.T).T
+    loopTime = time.perf_counter() - start
+    start = time.perf_counter()
+    vectorized = leaf.mapPointsToGlobal(points)
+    vecTime = time.perf_counter() - start
+    print(f"map {args.points} points: mapToGlobal {loopTime * 1000:.2f} ms, mapPointsToGlobal {vecTime * 1000:.2f} ms "
+          f"(identical: {np.allclose(mapped, vectorized)})")
+
+
+if __name__ == '__main__':
+    main()
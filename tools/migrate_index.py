@@ -0,0 +1,39 @@
+"""Convert or compact the meta-info indexes of ACQ4 data directories.
+
+Examples::
+
+    python tools/migrate_index.py /data/2024.01.15_000 --backend sqlite --recursive
+    python tools/migrate_index.py /data/2024.01.15_000 --compact
+"""
+
+import argparse
+
+from acq4.util.DataManager import getDirHandle
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path', nargs='+', help='Data directories to process')
+    parser.add_argument('--backend', choices=['config', 'sqlite'], default=None,
+                        help='Convert indexes to this backend')
+    parser.add_argument('--compact', action='store_true', help='Compact indexes after conversion')
+    parser.add_argument('-r', '--recursive', action='store_true', help='Also process all subdirectories')
+    args = parser.parse_args()
+
+    if args.backend is None and not args.compact:
+        parser.error("Nothing to do; specify --backend and/or --compact")
+
+    for path in args.path:
+        dh = getDirHandle(path)
+        if args.backend is not None:
+            print(f"Converting {path} to {args.backend} index..")
+            dh.migrateIndex(args.backend, recursive=args.recursive)
+        if args.compact:
+            print(f"Compacting {path}..")
+            dh.compactIndex(recursive=args.recursive)
+
+
+if __name__ == '__main__':
+    main()